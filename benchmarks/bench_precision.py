@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# File: bench_precision.py
+# Description: accuracy and throughput of the float32 and mixed precision policies against float64,
+#              for ForwardMode, ReverseMode and batched tape replay
+
+import sys
+import timeit
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.ForwardMode as fm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+import LYCET_package.LYCET_Operations_Forward as fmo
+from LYCET_package.Precision import precision
+from LYCET_package.Tape import trace
+
+POLICIES = ['float64', 'float32', 'mixed']
+POINT = [0.5, 1.5, 2.0]
+
+
+def f_reverse(x1, x2, x3):
+    return rmo.cos(x1 + x2) + (x3 * x2 ** 3) + rmo.sigmoid(x1)*rmo.log(x3, 2) + rmo.exp(x1*x2)/x3
+
+
+def f_forward(x):
+    x1, x2, x3 = x
+    return fmo.cos(x1 + x2) + (x3 * x2 ** 3) + fmo.sigmoid(x1)*fmo.log(x3, 2) + fmo.exp(x1*x2)/x3
+
+
+def fan_in(x1, n=2000):
+    """
+    Scalar function whose input adjoint is the sum of n contributions.
+    """
+    s = 0
+    for _ in range(n):
+        s = s + x1*0.1
+    return s
+
+
+def _relative_error(approx, exact):
+    """
+    Largest absolute error relative to the largest exact entry (entries near 0 do not blow it up).
+    """
+    approx, exact = np.asarray(approx, dtype=float), np.asarray(exact, dtype=float)
+    return float(np.max(np.abs(approx - exact))/np.max(np.abs(exact)))
+
+
+def _best(f, number):
+    """
+    Best time of one call of f over 7 repeats, in seconds.
+    """
+    return min(timeit.repeat(f, number=number, repeat=7))/number
+
+
+def run(batch=10**5, number=200):
+    """
+    Measure every policy on every workload.
+
+    Parameters
+    ----------
+    batch : int, optional
+        number of points of the batched tape replay
+    number : int, optional
+        calls per timing of the scalar ForwardMode/ReverseMode workloads
+
+    Returns
+    -------
+    rows : list of dict with, per workload and policy, the largest relative error
+           against float64, the throughput and the speedup over float64
+    """
+    tape = trace(f_reverse, POINT)
+    points = np.random.default_rng(0).uniform(0.5, 2.0, (3, batch))
+    workloads = {
+        'ForwardMode gradient': (lambda: fm.ForwardMode(f_forward, POINT, gradient=True), number),
+        'ReverseMode gradient': (lambda: rm.ReverseMode(f_reverse, POINT)[1], number),
+        'ReverseMode fan-in (2000 terms)': (lambda: rm.ReverseMode(fan_in, 1.0)[1], max(number//100, 1)),
+        f'tape replay (batch {batch})': (lambda: tape.replay(points)[1], 3),
+    }
+    rows = []
+    for workload, (f, calls) in workloads.items():
+        exact = f()
+        float64_time = None
+        for name in POLICIES:
+            with precision(name):
+                result = f()
+                seconds = _best(f, calls)
+            float64_time = seconds if float64_time is None else float64_time
+            points_per_call = batch if workload.startswith('tape') else 1
+            rows.append({'workload': workload, 'policy': name,
+                         'error': _relative_error(result, exact),
+                         'dtype': np.asarray(result).dtype.name,
+                         'per_second': points_per_call/seconds,
+                         'speedup': float64_time/seconds})
+    return rows
+
+
+def table(rows):
+    """
+    Markdown table of the measurements.
+    """
+    lines = ['| workload | policy | result dtype | max relative error vs float64 | points/s | speedup |',
+             '|---|---|---|---:|---:|---:|']
+    for row in rows:
+        lines.append(f"| {row['workload']} | {row['policy']} | {row['dtype']} | {row['error']:.2e} "
+                     f"| {row['per_second']:.4g} | {row['speedup']:.2f}x |")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    batch = int(sys.argv[1]) if len(sys.argv) > 1 else 10**5
+    print(table(run(batch)))
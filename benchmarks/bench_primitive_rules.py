@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# File: bench_primitive_rules.py
+# Description: per-operation count of transcendental (libm) calls and time of the derivative rules,
+#              before and after the rules reuse their primal
+
+import sys
+import timeit
+import numpy
+import numpy as np
+import LYCET_package.Primitives as primitives
+from LYCET_package.Node import Node
+from LYCET_package.DualNumber import DualNumber
+
+# NumPy functions that end up in a libm call (sqrt is a hardware instruction and is not counted)
+_TRANSCENDENTAL = {'sin', 'cos', 'tan', 'exp', 'log', 'arcsin', 'arccos', 'arctan', 'sinh', 'cosh', 'tanh'}
+
+OPS = ['sin', 'cos', 'tan', 'exp', 'ln', 'log', 'arcsin', 'arccos', 'arctan', 'sinh', 'cosh', 'tanh', 'sigmoid']
+POINT = 0.3
+BASE = 3
+
+
+class _CountingNumPy:
+    """
+    Stand-in for the numpy module counting the transcendental calls made through it.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def __getattr__(self, name):
+        attr = getattr(numpy, name)
+        if name not in _TRANSCENDENTAL:
+            return attr
+        def counted(*args, **kwargs):
+            self.calls += 1
+            return attr(*args, **kwargs)
+        return counted
+
+
+# the rules as they were registered before they shared work with the primal (separate
+# check, primal, JVP and VJP); they look numpy up through this module so it can be
+# swapped for the counter, and go through the same Primitive dispatch as the current rules
+_PREVIOUS_RULES = {
+    'sin': dict(primal=lambda a, p: np.sin(a[0]),
+                jvp=lambda a, p, out, t: np.cos(a[0])*t[0],
+                vjp=lambda a, p, out: (np.cos(a[0]),)),
+    'cos': dict(primal=lambda a, p: np.cos(a[0]),
+                jvp=lambda a, p, out, t: -np.sin(a[0])*t[0],
+                vjp=lambda a, p, out: (-np.sin(a[0]),)),
+    'tan': dict(primal=lambda a, p: np.tan(a[0]), check=primitives._check_tan,
+                jvp=lambda a, p, out, t: (1 + (np.sin(a[0])**2)/(np.cos(a[0])**2))*t[0],
+                vjp=lambda a, p, out: (1/((np.cos(a[0]))**2),)),
+    'exp': dict(primal=lambda a, p: np.exp(a[0]),
+                jvp=lambda a, p, out, t: t[0]*np.exp(a[0]),
+                vjp=lambda a, p, out: (np.exp(a[0]),)),
+    'ln': dict(primal=lambda a, p: np.log(a[0]), check=primitives._check_log,
+               jvp=lambda a, p, out, t: t[0]/a[0],
+               vjp=lambda a, p, out: (1/a[0],)),
+    'log': dict(primal=lambda a, p: np.log(a[0])/np.log(p[0]), check=primitives._check_log_base,
+                jvp=lambda a, p, out, t: (t[0]/a[0])/np.log(p[0]),
+                vjp=lambda a, p, out: (1/(a[0]*np.log(p[0])),)),
+    'arcsin': dict(primal=lambda a, p: np.arcsin(a[0]), check=primitives._check_unit_interval,
+                   jvp=lambda a, p, out, t: t[0] * 1 / np.sqrt(1 - a[0] ** 2),
+                   vjp=lambda a, p, out: (1/np.sqrt(1 - a[0]**2),)),
+    'arccos': dict(primal=lambda a, p: np.arccos(a[0]), check=primitives._check_unit_interval,
+                   jvp=lambda a, p, out, t: -t[0] * 1 / np.sqrt(1 - a[0] ** 2),
+                   vjp=lambda a, p, out: (-1/np.sqrt(1 - a[0]**2),)),
+    'arctan': dict(primal=lambda a, p: np.arctan(a[0]),
+                   jvp=lambda a, p, out, t: t[0] * 1 / ((a[0] ** 2) + 1),
+                   vjp=lambda a, p, out: (1/((a[0]**2) + 1),)),
+    'sinh': dict(primal=lambda a, p: np.sinh(a[0]),
+                 jvp=lambda a, p, out, t: t[0]*(np.exp(a[0]) + np.exp(-a[0]))/2,
+                 vjp=lambda a, p, out: (np.cosh(a[0]),)),
+    'cosh': dict(primal=lambda a, p: np.cosh(a[0]),
+                 jvp=lambda a, p, out, t: t[0]*(np.exp(a[0]) - np.exp(-a[0]))/2,
+                 vjp=lambda a, p, out: (np.sinh(a[0]),)),
+    'tanh': dict(primal=lambda a, p: np.tanh(a[0]),
+                 jvp=lambda a, p, out, t: t[0]*(1 - out**2),
+                 vjp=lambda a, p, out: (1 - np.tanh(a[0])**2,)),
+    'sigmoid': dict(primal=lambda a, p: 1/(1 + np.exp(-a[0])),
+                    jvp=lambda a, p, out, t: t[0]*np.exp(-a[0])/(1 + np.exp(-a[0]))**2,
+                    vjp=lambda a, p, out: (out*(1 - out),)),
+}
+
+def _rule(p, name):
+    args = (BASE,) if name == 'log' else ()
+    return lambda operand: p(operand, *args)
+
+
+def count_calls(rule, operand):
+    """
+    Number of transcendental calls made by one application of rule.
+    """
+    global np
+    counter = _CountingNumPy()
+    np, primitives.np = counter, counter
+    try:
+        rule(operand())
+    finally:
+        np, primitives.np = numpy, numpy
+    return counter.calls
+
+
+def time_rule(rule, operand, number=20000):
+    """
+    Best time of one application of rule over 15 repeats, in microseconds.
+    """
+    x = operand()
+    return min(timeit.repeat(lambda: rule(x), number=number, repeat=15))/number*1e6
+
+
+def run(number=20000):
+    """
+    Measure every operation in both modes.
+
+    Returns
+    -------
+    rows : list of dict with, per op and mode, the libm calls and time before and after
+    """
+    rows = []
+    for name in OPS:
+        before = _rule(primitives.Primitive(name, **_PREVIOUS_RULES[name]), name)
+        after = _rule(primitives.primitive(name), name)
+        for mode, operand in [('reverse', lambda: Node(POINT)), ('forward', lambda: DualNumber(POINT))]:
+            rows.append({'op': name, 'mode': mode,
+                         'calls_before': count_calls(before, operand),
+                         'calls_after': count_calls(after, operand),
+                         'us_before': time_rule(before, operand, number),
+                         'us_after': time_rule(after, operand, number)})
+    return rows
+
+
+def table(rows):
+    """
+    Markdown table of the measurements.
+    """
+    lines = ['| op | mode | libm calls before | libm calls after | time before (us) | time after (us) |',
+             '|---|---|---:|---:|---:|---:|']
+    for row in rows:
+        lines.append(f"| {row['op']} | {row['mode']} | {row['calls_before']} | {row['calls_after']} "
+                     f"| {row['us_before']:.2f} | {row['us_after']:.2f} |")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(table(run(number)))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# File: bench_threads.py
+# Description: throughput of concurrent gradient evaluations against the number of threads,
+#              for scalar ReverseMode calls and batched tape replays (whose NumPy loops release the GIL)
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+from LYCET_package.Tape import trace
+from LYCET_package.Precision import precision
+
+THREADS = [1, 2, 4, 8]
+
+
+def f(x1, x2, x3):
+    return rmo.exp(x1*x2)*rmo.sin(x3) + rmo.logsumexp([x1, x2, x3])/x3
+
+
+def _scalar_job(points):
+    # every job runs under its own precision block: the policy stays in its thread
+    with precision('float64'):
+        return [rm.ReverseMode(f, list(x))[1] for x in points]
+
+
+def _replay_job(tape, points):
+    return tape.replay(points)[1]
+
+
+def run(calls=2000, batch=200000, jobs=16):
+    """
+    Points per second of both workloads on 1 to 8 threads, with the results checked against one thread.
+
+    Parameters
+    ----------
+    calls : int, optional
+        scalar ReverseMode calls per job
+    batch : int, optional
+        points of every batched replay job
+    jobs : int, optional
+        number of jobs shared between the threads
+
+    Returns
+    -------
+    rows : list of dict with the workload, threads, points/s and speedup over one thread
+    """
+    rng = np.random.default_rng(0)
+    scalar_points = rng.uniform(0.5, 1.5, (calls, 3))
+    batch_points = rng.uniform(0.5, 1.5, (3, batch))
+    tape = trace(f, [1.0, 1.0, 1.0])
+    workloads = {
+        f'ReverseMode ({calls} calls per job)': (lambda: _scalar_job(scalar_points), calls),
+        f'tape replay (batch {batch} per job)': (lambda: _replay_job(tape, batch_points), batch),
+    }
+    rows = []
+    for workload, (job, points_per_job) in workloads.items():
+        reference = job()
+        single = None
+        for n_threads in THREADS:
+            with ThreadPoolExecutor(n_threads) as pool:
+                start = time.perf_counter()
+                results = list(pool.map(lambda _: job(), range(jobs)))
+                seconds = time.perf_counter() - start
+            assert all(np.allclose(result, reference) for result in results), "concurrent results differ"
+            rate = jobs*points_per_job/seconds
+            single = rate if single is None else single
+            rows.append({'workload': workload, 'threads': n_threads, 'per_second': rate, 'speedup': rate/single})
+    return rows
+
+
+def table(rows):
+    """
+    Markdown table of the measurements.
+    """
+    lines = [f'{os.cpu_count()} CPU(s)', '', '| workload | threads | points/s | speedup |', '|---|---:|---:|---:|']
+    for row in rows:
+        lines.append(f"| {row['workload']} | {row['threads']} | {row['per_second']:.4g} | {row['speedup']:.2f}x |")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    print(table(run(jobs=jobs)))
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+# File: conftest.py
+# Description: minimal stand-in for the benchmark fixture of pytest-benchmark when the plugin is not installed
+
+import pytest
+
+try:
+    import pytest_benchmark
+except ImportError:
+    from suite import measure
+
+    class _Benchmark:
+        """
+        Callable timing a function like the pytest-benchmark fixture (one short measurement).
+        """
+
+        def __init__(self):
+            self.stats = None
+
+        def __call__(self, f, *args, **kwargs):
+            self.stats = measure(lambda: f(*args, **kwargs), min_time=0.01, repeat=3)
+            return f(*args, **kwargs)
+
+    @pytest.fixture
+    def benchmark():
+        return _Benchmark()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# File: suite.py
+# Description: scaling benchmark suite for ForwardMode and ReverseMode, with JSON results
+#              and a comparison against a stored baseline
+
+import sys
+import json
+import time
+import timeit
+import argparse
+import platform
+import statistics
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.ForwardMode as fm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+import LYCET_package.LYCET_Operations_Forward as fmo
+from LYCET_package.Node import Node
+from LYCET_package.DualNumber import DualNumber
+
+BASELINE = 'benchmarks/baseline.json'
+OPS = ['sin', 'cos', 'tan', 'exp', 'ln', 'arctan', 'tanh', 'sigmoid', 'softplus']
+# plain float versions of the elementary functions
+FLOAT_OPS = {'ln': np.log, 'sigmoid': lambda x: 1/(1 + np.exp(-x)), 'softplus': lambda x: np.log1p(np.exp(x))}
+# (full, quick) sizes of every scaling axis
+SIZES = {
+    'gradient': ([4, 16, 64], [4, 16]),
+    'jacobian': ([2, 4, 8, 16], [2, 4]),
+    'depth': ([100, 1000, 10000], [100, 1000]),
+    'sharing': ([10, 100, 1000], [10, 100]),
+}
+
+# every benchmark: name -> (group, params, setup), setup() returns the callable to time
+CASES = {}
+
+
+def case(group, **params):
+    """
+    Register the decorated setup function as a benchmark of group with params.
+    """
+    def register(setup):
+        name = '/'.join([group, setup.__name__.rstrip('_')] + [f'{k}={v}' for k, v in params.items()])
+        CASES[name] = (group, params, lambda: setup(**params))
+        return setup
+    return register
+
+
+def chain_reverse(*x):
+    s = 0
+    for i in range(len(x) - 1):
+        s = s + rmo.sin(x[i])*x[i + 1]
+    return s
+
+
+def chain_forward(x):
+    s = 0
+    for i in range(len(x) - 1):
+        s = s + fmo.sin(x[i])*x[i + 1]
+    return s
+
+
+def outputs_reverse(m):
+    return lambda *x: [rmo.exp(x[i % len(x)])*x[(i + 1) % len(x)] for i in range(m)]
+
+
+def outputs_forward(m):
+    return lambda x: [fmo.exp(x[i % len(x)])*x[(i + 1) % len(x)] for i in range(m)]
+
+
+# gradient scaling with the input dimension n
+for n in SIZES['gradient'][0]:
+    @case('gradient', n=n)
+    def reverse(n):
+        x = np.linspace(0.1, 1.0, n)
+        return lambda: rm.ReverseMode(chain_reverse, x)
+
+    @case('gradient', n=n)
+    def forward(n):
+        x = np.linspace(0.1, 1.0, n)
+        return lambda: fm.ForwardMode(chain_forward, x, gradient=True)
+
+# Jacobian scaling with the input and output dimension n = m
+for n in SIZES['jacobian'][0]:
+    @case('jacobian', n=n)
+    def reverse(n):
+        x, f = np.linspace(0.1, 1.0, n), outputs_reverse(n)
+        # ReverseMode differentiates scalar functions: one sweep per output
+        return lambda: [rm.ReverseMode(lambda *z, k=k: f(*z)[k], x) for k in range(n)]
+
+    @case('jacobian', n=n)
+    def forward(n):
+        x, f = np.linspace(0.1, 1.0, n), outputs_forward(n)
+        return lambda: fm.ForwardMode(f, x, jacobian=True)
+
+# depth of a chain of operations, every node used once
+for depth in SIZES['depth'][0]:
+    @case('depth', depth=depth)
+    def reverse(depth):
+        def f(x):
+            for _ in range(depth):
+                x = rmo.sin(x)
+            return x
+        return lambda: rm.ReverseMode(f, 0.5)
+
+    @case('depth', depth=depth)
+    def forward(depth):
+        def f(x):
+            for _ in range(depth):
+                x = fmo.sin(x)
+            return x
+        return lambda: fm.ForwardMode(f, 0.5)
+
+# sharing: every level uses the previous one twice, so 2**levels paths lead to the input
+for levels in SIZES['sharing'][0]:
+    @case('sharing', levels=levels)
+    def reverse(levels):
+        def f(x):
+            for _ in range(levels):
+                x = rmo.sin(x) + rmo.cos(x)
+            return x
+        return lambda: rm.ReverseMode(f, 0.5)
+
+    @case('sharing', levels=levels)
+    def forward(levels):
+        def f(x):
+            for _ in range(levels):
+                x = fmo.sin(x) + fmo.cos(x)
+            return x
+        return lambda: fm.ForwardMode(f, 0.5)
+
+# cost of one arithmetic operation on the number types
+for op in ['add', 'mul', 'div', 'pow']:
+    @case('overhead', op=op)
+    def float_(op):
+        a, b = 0.7, 1.3
+        return _binary(op, a, b)
+
+    @case('overhead', op=op)
+    def dual(op):
+        a, b = DualNumber(0.7, 1.0), DualNumber(1.3, 0.0)
+        return _binary(op, a, b)
+
+    @case('overhead', op=op)
+    def node(op):
+        a, b = Node(0.7), Node(1.3)
+        return _binary(op, a, b)
+
+# throughput of the elementary functions
+for op in OPS:
+    @case('elementary', op=op)
+    def numpy_(op):
+        f = FLOAT_OPS.get(op) or getattr(np, op)
+        return lambda: f(0.3)
+
+    @case('elementary', op=op)
+    def dual(op):
+        f, x = getattr(fmo, op), DualNumber(0.3, 1.0)
+        return lambda: f(x)
+
+    @case('elementary', op=op)
+    def node(op):
+        f, x = getattr(rmo, op), Node(0.3)
+        return lambda: f(x)
+
+
+def _binary(op, a, b):
+    if op == 'add':
+        return lambda: a + b
+    if op == 'mul':
+        return lambda: a*b
+    if op == 'div':
+        return lambda: a/b
+    return lambda: a**b
+
+
+def selected(pattern=None, quick=False):
+    """
+    Names of the benchmarks containing pattern, restricted to the small sizes if quick.
+    """
+    names = []
+    for name, (group, params, _) in CASES.items():
+        if pattern is not None and pattern not in name:
+            continue
+        if quick and group in SIZES and list(params.values())[0] not in SIZES[group][1]:
+            continue
+        names.append(name)
+    return names
+
+
+def measure(f, min_time=0.05, repeat=5):
+    """
+    Time f, calling it enough times per repeat to last min_time seconds.
+
+    Returns
+    -------
+    dict with the best and median time of one call in seconds, the calls per repeat and the repeats
+    """
+    number = 1
+    while True:
+        elapsed = timeit.timeit(f, number=number)
+        if elapsed >= min_time/10 or number >= 10**6:
+            break
+        number *= 10
+    number = max(1, int(number*min_time/max(elapsed, 1e-9)))
+    times = [t/number for t in timeit.repeat(f, number=number, repeat=repeat)]
+    return {'seconds': min(times), 'median': statistics.median(times), 'number': number, 'repeat': repeat}
+
+
+def environment():
+    """
+    Machine and versions the results were measured with.
+    """
+    return {'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'machine': platform.machine(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def run(pattern=None, quick=False, min_time=0.05, repeat=5):
+    """
+    Run the selected benchmarks.
+
+    Parameters
+    ----------
+    pattern : str, optional
+        only run the benchmarks whose name contains pattern
+    quick : bool, optional
+        only the small sizes of the scaling benchmarks
+    min_time : float, optional
+        seconds every repeat lasts at least
+    repeat : int, optional
+        number of repeats, the best one is reported
+
+    Returns
+    -------
+    results : dict with the environment and, per benchmark, its group, params and times
+    """
+    results = {'environment': environment(), 'benchmarks': {}}
+    for name in selected(pattern, quick):
+        group, params, setup = CASES[name]
+        results['benchmarks'][name] = dict(group=group, params=params, **measure(setup(), min_time, repeat))
+    return results
+
+
+def compare(results, baseline, threshold=1.25):
+    """
+    Compare the best times of results with those of baseline.
+
+    Parameters
+    ----------
+    results, baseline : dict as returned by run
+    threshold : float, optional
+        ratio of the times above which a benchmark has regressed (below 1/threshold it improved)
+
+    Returns
+    -------
+    rows : list of dict with name, baseline and current time, ratio and status
+           ('regression', 'improvement', 'ok', 'new' or 'missing')
+    """
+    current, previous = results['benchmarks'], baseline['benchmarks']
+    rows = []
+    for name in list(previous) + [name for name in current if name not in previous]:
+        old = previous[name]['seconds'] if name in previous else None
+        new = current[name]['seconds'] if name in current else None
+        if old is None or new is None:
+            rows.append({'name': name, 'baseline': old, 'current': new, 'ratio': None,
+                         'status': 'new' if old is None else 'missing'})
+            continue
+        ratio = new/old
+        status = 'regression' if ratio > threshold else 'improvement' if ratio < 1/threshold else 'ok'
+        rows.append({'name': name, 'baseline': old, 'current': new, 'ratio': ratio, 'status': status})
+    return rows
+
+
+def _time(seconds):
+    if seconds is None:
+        return '-'
+    for unit, scale in [('s', 1), ('ms', 1e-3), ('us', 1e-6)]:
+        if seconds >= scale:
+            return f'{seconds/scale:.3g} {unit}'
+    return f'{seconds/1e-9:.3g} ns'
+
+
+def table(results, rows=None):
+    """
+    Markdown table of the results, with the comparison rows if given.
+    """
+    if rows is None:
+        lines = ['| benchmark | best | median | calls/s |', '|---|---:|---:|---:|']
+        for name, r in results['benchmarks'].items():
+            lines.append(f"| {name} | {_time(r['seconds'])} | {_time(r['median'])} | {1/r['seconds']:.4g} |")
+        return '\n'.join(lines)
+    lines = ['| benchmark | baseline | current | ratio | status |', '|---|---:|---:|---:|---|']
+    for row in rows:
+        ratio = '-' if row['ratio'] is None else f"{row['ratio']:.2f}x"
+        lines.append(f"| {row['name']} | {_time(row['baseline'])} | {_time(row['current'])} | {ratio} | {row['status']} |")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """
+    Command line runner, exits with status 1 if a benchmark regressed against the baseline.
+    """
+    parser = argparse.ArgumentParser(description='LYCET scaling benchmarks')
+    parser.add_argument('-k', dest='pattern', help='only run the benchmarks whose name contains this')
+    parser.add_argument('--quick', action='store_true', help='only the small sizes of the scaling benchmarks')
+    parser.add_argument('--min-time', type=float, default=0.05, help='seconds every repeat lasts at least')
+    parser.add_argument('--repeat', type=int, default=5, help='number of repeats')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help=f'compare with this JSON file (e.g. {BASELINE})')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown ratio reported as a regression')
+    args = parser.parse_args(argv)
+    results = run(args.pattern, args.quick, args.min_time, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=1)
+    if not args.baseline:
+        print(table(results))
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    rows = compare(results, baseline, args.threshold)
+    print(table(results, rows))
+    if baseline.get('environment', {}).get('machine') != results['environment']['machine']:
+        print('\nwarning: the baseline was measured on another machine')
+    regressions = [row['name'] for row in rows if row['status'] == 'regression']
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold}x: {', '.join(regressions)}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
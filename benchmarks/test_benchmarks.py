@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+#File: test_benchmarks.py
+#Description: the quick benchmarks of the suite as pytest-benchmark tests
+#             (cd benchmarks && PYTHONPATH=../src python -m pytest test_benchmarks.py)
+
+import json
+import pytest
+import suite
+
+
+@pytest.mark.parametrize('name', suite.selected(quick=True))
+def test_benchmark(benchmark, name):
+    group, params, setup = suite.CASES[name]
+    benchmark(setup())
+
+def test_results_are_json(tmp_path):
+    results = suite.run('gradient/reverse', quick=True, min_time=0.001, repeat=2)
+    path = tmp_path/'results.json'
+    path.write_text(json.dumps(results))
+    loaded = json.loads(path.read_text())
+    assert set(loaded['benchmarks']) == {'gradient/reverse/n=4', 'gradient/reverse/n=16'}
+    assert loaded['benchmarks']['gradient/reverse/n=4']['params'] == {'n': 4}
+
+def test_compare_flags_regressions():
+    baseline = {'benchmarks': {'a': {'seconds': 1.0}, 'b': {'seconds': 1.0}, 'c': {'seconds': 1.0}, 'd': {'seconds': 1.0}}}
+    results = {'benchmarks': {'a': {'seconds': 1.1}, 'b': {'seconds': 2.0}, 'c': {'seconds': 0.5}, 'e': {'seconds': 1.0}}}
+    status = {row['name']: row['status'] for row in suite.compare(results, baseline, threshold=1.25)}
+    assert status == {'a': 'ok', 'b': 'regression', 'c': 'improvement', 'd': 'missing', 'e': 'new'}
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# File: CSE.py
+# Description: opt-in hash-consing of identical subexpressions while recording reverse mode graphs
+
+import functools
+from contextlib import contextmanager
+import numpy as np
+from .Context import _CONTEXT, activated
+
+# operations whose operands can be swapped without changing the result
+_COMMUTATIVE = {'add', 'mul'}
+
+
+class CSEStats:
+    """
+    A class to count the lookups done while hash-consing.
+
+    Attributes
+    ----------
+    hits : int
+        operations answered with an already recorded node
+    misses : int
+        operations that created a new node
+
+    Methods
+    -------
+    lookups():
+        total number of lookups
+    hit_rate():
+        fraction of lookups that were hits
+
+    Example
+    -------
+    >>> with hash_consing() as stats:
+    ...     f = rmo.exp(x) + rmo.exp(x) + rmo.exp(x)
+    >>> stats.hits, stats.misses
+    (2, 3)
+    """
+
+    def __init__(self):
+        """
+        Constructs all necessary attributes for the CSEStats object.
+        """
+        self.hits = 0
+        self.misses = 0
+
+    def lookups(self):
+        """
+        Total number of lookups.
+        """
+        return self.hits + self.misses
+
+    def hit_rate(self):
+        """
+        Fraction of the lookups answered from the table (0 if there were none).
+        """
+        return self.hits/self.lookups() if self.lookups() else 0.0
+
+    def __repr__(self):
+        """
+        Represents the counters as a string.
+        """
+        return f"CSEStats(hits={self.hits}, misses={self.misses}, hit_rate={self.hit_rate():.3f})"
+
+
+@contextmanager
+def hash_consing():
+    """
+    Record reverse mode graphs with common-subexpression elimination.
+
+    Inside the block, Node operators and the LYCET_Operations_Reverse functions
+    look up the structural key (op, operand identities, constants) of every
+    operation and return the node already recorded for it instead of building
+    a new one, so shared work is evaluated and swept backward only once.
+    Blocks can be nested; an inner block starts with an empty table. The
+    table belongs to the thread or asyncio task running the block (Context).
+    The consing versions of these methods are only swapped in while some
+    block is active (Context.activated), so the operators cost nothing
+    extra otherwise.
+
+    Returns
+    -------
+    CSEStats with the hit/miss counters of the block
+
+    Example
+    -------
+    >>> with hash_consing() as stats:
+    ...     value, J = rm.ReverseMode(lambda x1: rmo.exp(x1)*rmo.exp(x1), 1)
+    >>> stats.hits, stats.misses
+    (1, 2)
+    """
+    stats = CSEStats()
+    with activated(_CONTEXT.get().replace(table={}, stats=stats)):
+        yield stats
+
+
+def _operand_key(arg):
+    """
+    Nodes are identified by identity, constants by value.
+    """
+    if isinstance(arg, (int, float, np.number)):
+        return ('c', arg)
+    return ('n', id(arg))
+
+
+def consed(op):
+    """
+    Decorator making a Node operation go through the hash-consing table when it is active.
+
+    Parameters
+    ----------
+    op : str or None
+        name used in the structural key; None for Primitive._node, named after the primitive
+
+    Returns
+    -------
+    decorator
+
+    Example
+    -------
+    >>> @consed('sin')
+    ... def sin(x):
+    ...     ...
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            context = _CONTEXT.get()
+            table = context.table
+            if table is None:
+                return func(*args)
+            operands = tuple(_operand_key(arg) for arg in args)
+            name = op
+            if name is None:
+                name, operands = args[0].name, operands[1:]
+            if name in _COMMUTATIVE:
+                operands = tuple(sorted(operands, key=repr))
+            key = (name, operands)
+            node = table.get(key)
+            if node is not None:
+                context.stats.hits += 1
+                return node
+            context.stats.misses += 1
+            node = func(*args)
+            # the node keeps its operands alive, so their ids stay valid
+            table[key] = node
+            return node
+        return wrapper
+    return decorator
+
+
+def _instrumentation():
+    """
+    Methods replaced while a context is hash-consing (Context.activated).
+    """
+    from .Node import Node
+    from .Primitives import Primitive
+    operators = {'__add__': 'add', '__mul__': 'mul', '__sub__': 'sub', '__truediv__': 'div', '__pow__': 'pow',
+                 '__rsub__': 'rsub', '__rtruediv__': 'rdiv', '__rpow__': 'rpow'}
+    patches = {(Node, name): consed(op) for name, op in operators.items()}
+    patches[(Primitive, '_node')] = consed(None)
+    return patches
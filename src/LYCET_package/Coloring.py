@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# File: Coloring.py
+# Description: graph colorings of sparsity patterns used to compress Hessian evaluations
+
+import numpy as np
+
+
+def _adjacency(pattern):
+    """
+    Neighbours of every vertex of the adjacency graph of a square pattern (diagonal ignored).
+    """
+    n = pattern.shape[0]
+    assert pattern.shape == (n, n), f"Expected a square pattern, got shape {pattern.shape}"
+    neighbours = [set() for _ in range(n)]
+    for i, j in zip(pattern.rows, pattern.cols):
+        if i != j:
+            neighbours[i].add(int(j))
+            neighbours[j].add(int(i))
+    return [sorted(row) for row in neighbours]
+
+
+def star_coloring(pattern, order=None):
+    """
+    Greedy star coloring of the adjacency graph of a symmetric sparsity pattern.
+
+    Adjacent vertices get different colors and every path on four vertices
+    uses at least three colors, which is what lets every Hessian entry be
+    read off directly from one product with a color's seed vector (see
+    Hessian.sparse_hessian). This is the greedy algorithm of Gebremedhin,
+    Manne and Pothen, "What color is your Jacobian?", SIAM Review 2005.
+
+    Parameters
+    ----------
+    pattern : SparseMatrix, square and symmetric
+    order : sequence of int, optional
+        order in which the vertices are colored (default: largest degree first)
+
+    Returns
+    -------
+    colors : np.ndarray of int, color (0, 1, ...) of every vertex
+
+    Example
+    -------
+    >>> pattern = hessian_sparsity(lambda *x: rmo.sum([x[i]*x[i + 1] for i in range(9)]), 10)
+    >>> star_coloring(pattern).max() + 1
+    3
+    """
+    neighbours = _adjacency(pattern)
+    n = len(neighbours)
+    if order is None:
+        order = sorted(range(n), key=lambda v: -len(neighbours[v]))
+    colors = np.full(n, -1, dtype=int)
+    forbidden = np.full(n + 1, -1, dtype=int)
+    for v in order:
+        for w in neighbours[v]:
+            if colors[w] >= 0:
+                forbidden[colors[w]] = v
+            for x in neighbours[w]:
+                if x == v or colors[x] < 0:
+                    continue
+                if colors[w] < 0:
+                    # v and x would be the ends of a path through an uncolored vertex
+                    forbidden[colors[x]] = v
+                elif any(colors[y] == colors[w] for y in neighbours[x] if y != w):
+                    # v-w-x-y would be a path on two colors
+                    forbidden[colors[x]] = v
+        color = 0
+        while forbidden[color] == v:
+            color += 1
+        colors[v] = color
+    return colors
+
+
+def is_star_coloring(pattern, colors):
+    """
+    Check that colors is a star coloring of the adjacency graph of pattern.
+
+    Returns
+    -------
+    bool : adjacent vertices differ and no path on four vertices uses only two colors
+    """
+    neighbours = _adjacency(pattern)
+    for v, row in enumerate(neighbours):
+        for w in row:
+            if colors[v] == colors[w]:
+                return False
+            for x in neighbours[w]:
+                if x == v or colors[x] != colors[v]:
+                    continue
+                for y in neighbours[x]:
+                    if y != w and colors[y] == colors[w]:
+                        return False
+    return True
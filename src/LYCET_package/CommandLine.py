@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+# File: CommandLine.py
+# Description: the lycet console command: bulk evaluation of values, gradients or Jacobians of a function
+#              over inputs streamed from JSONL, CSV or .npy files, in batches and optionally in worker processes
+
+import os
+import re
+import sys
+import csv
+import json
+import shutil
+import argparse
+import tempfile
+import importlib
+import importlib.util
+import multiprocessing
+from collections import deque
+import numpy as np
+from .Node import Node
+from .Tape import trace
+from .Expression import compile_expression
+
+MODES = ('value', 'gradient', 'jacobian')
+FORMATS = ('jsonl', 'csv', 'npy')
+
+_SPEC = re.compile(r'^([\w.]+|.+\.py):(\w+)$')
+
+def load_function(spec):
+    """
+    Function behind a command line spec.
+
+    Parameters
+    ----------
+    spec : str
+        'module:function' (an importable module, or the path of a .py file) or an expression
+        of x1, x2, ... such as 'exp(x1)*sin(x2) + x3**2' (see Expression.parse)
+
+    Returns
+    -------
+    f : function (called as f(*x) for expressions)
+    n_inputs : int or None
+        number of inputs for expressions, None for functions (taken from the input rows)
+    """
+    match = _SPEC.match(spec)
+    if match is None:
+        compiled = compile_expression(spec)
+        return compiled.function(), compiled.n_inputs
+    module, name = match.groups()
+    if module.endswith('.py'):
+        loader = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(module))[0], module)
+        if loader is None:
+            raise ValueError(f"Cannot load the file {module}")
+        imported = importlib.util.module_from_spec(loader)
+        loader.loader.exec_module(imported)
+    else:
+        imported = importlib.import_module(module)
+    try:
+        return getattr(imported, name), None
+    except AttributeError:
+        raise ValueError(f"The module {module} has no function {name!r}") from None
+
+
+def _format(path, fmt):
+    if fmt is not None:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format {fmt!r}, expected one of {FORMATS}")
+        return fmt
+    if path == '-':
+        return 'jsonl'
+    extension = os.path.splitext(path)[1].lower()
+    formats = {'.jsonl': 'jsonl', '.json': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv', '.npy': 'npy'}
+    if extension not in formats:
+        raise ValueError(f"Cannot tell the format of {path} from its extension, give it explicitly")
+    return formats[extension]
+
+
+def _jsonl_rows(file):
+    for line in file:
+        if line.strip():
+            row = json.loads(line)
+            yield row['x'] if isinstance(row, dict) else row
+
+
+def _csv_rows(file):
+    for k, row in enumerate(csv.reader(file)):
+        if not row:
+            continue
+        try:
+            yield [float(value) for value in row]
+        except ValueError:
+            if k:
+                raise
+            # header line
+
+
+def read_batches(path, batch_size=1024, fmt=None):
+    """
+    Stream the input points of a file in batches.
+
+    Only one batch is held in memory at a time: JSONL and CSV files are read
+    line by line, .npy files are memory-mapped and sliced.
+
+    Parameters
+    ----------
+    path : str
+        JSONL (one list of numbers, or an object with an 'x' list, per line; '-' for stdin),
+        CSV (one point per row, an optional header) or .npy (2D array, one point per row)
+    batch_size : int, optional
+        number of points per batch (default 1024)
+    fmt : str, optional
+        'jsonl', 'csv' or 'npy' (default from the extension)
+
+    Yields
+    ------
+    np.ndarray of shape (batch, n_inputs)
+    """
+    fmt = _format(path, fmt)
+    if fmt == 'npy':
+        data = np.load(path, mmap_mode='r')
+        data = data.reshape(len(data), -1)
+        for start in range(0, len(data), batch_size):
+            yield np.array(data[start:start + batch_size], dtype=float)
+        return
+    file = sys.stdin if path == '-' else open(path, newline='')
+    try:
+        rows = _jsonl_rows(file) if fmt == 'jsonl' else _csv_rows(file)
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                yield np.array(batch, dtype=float)
+                batch = []
+        if batch:
+            yield np.array(batch, dtype=float)
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+class Evaluator:
+    """
+    A class to represent the evaluation of a function spec on batches of points.
+
+    The function is traced once into a Tape at the first batch, and every
+    batch is then one replay of the tape along its trailing axis; expressions
+    run their compiled program (Expression.compile_expression) instead. Functions
+    that branch on their inputs are evaluated point by point on a new
+    reverse mode graph instead (traced=False). Evaluators hold only
+    the spec and the options, so they can be sent to worker processes.
+
+    Attributes
+    ----------
+    spec : str
+        see load_function
+    mode : str
+        'value', 'gradient' (scalar functions) or 'jacobian'
+    style : str
+        'reverse' if the function is called as f(*x), 'forward' if it is called as f(x)
+        (ignored for expressions)
+    traced : bool
+        replay one tape (default) or evaluate point by point
+
+    Methods
+    -------
+    __call__(X):
+        values and derivatives at the rows of X
+    """
+
+    def __init__(self, spec, mode='gradient', style='reverse', traced=True):
+        """
+        Constructs all necessary attributes for the Evaluator object.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+        if style not in ('reverse', 'forward'):
+            raise ValueError(f"Unknown style {style!r}, expected 'reverse' or 'forward'")
+        self.spec = spec
+        self.mode = mode
+        self.style = style
+        self.traced = traced
+        self.n_inputs = None
+        self._function = None
+        self._expression = None
+        self._tape = None
+
+    def __getstate__(self):
+        return {'spec': self.spec, 'mode': self.mode, 'style': self.style, 'traced': self.traced}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @property
+    def function(self):
+        """
+        Function of the spec, called as f(*x).
+        """
+        if self._function is None:
+            if _SPEC.match(self.spec) is None:
+                self._expression = compile_expression(self.spec)
+                self.n_inputs = self._expression.n_inputs
+                self._function = self._expression.function()
+            else:
+                f, self.n_inputs = load_function(self.spec)
+                self._function = f if self.style == 'reverse' else (lambda *z: f(list(z)))
+        return self._function
+
+    def _check(self, X):
+        f = self.function
+        if self.n_inputs is not None and X.shape[1] != self.n_inputs:
+            raise ValueError(f"The function expects {self.n_inputs} inputs, the rows have {X.shape[1]}")
+        return f
+
+    def __call__(self, X):
+        """
+        Values and derivatives at the rows of X.
+
+        Parameters
+        ----------
+        X : np.ndarray of shape (batch, n_inputs)
+
+        Returns
+        -------
+        values : np.ndarray of shape (batch,) for scalar functions, (batch, m) for vector functions
+        derivatives : None in 'value' mode, else gradients (batch, n) or Jacobians (batch, m, n)
+        """
+        f = self._check(X)
+        if not self.traced:
+            return self._pointwise(f, X)
+        if self._expression is not None:
+            # compiled once per process, each batch is one call of its NumPy program
+            values, gradients = self._expression(X.T)
+            values = np.asarray(values) + np.zeros(len(X))
+            if self.mode == 'value':
+                return values, None
+            gradients = np.asarray(gradients).reshape(len(X.T), -1).T
+            return values, (gradients[:, None, :] if self.mode == 'jacobian' else gradients)
+        if self._tape is None:
+            self._tape = trace(f, X[0])
+            if self.mode == 'gradient' and not self._tape.scalar_output:
+                raise ValueError("mode 'gradient' needs a scalar function, use 'jacobian'")
+        tape = self._tape
+        zero = np.zeros(len(X))
+        if self.mode == 'value':
+            values = tape.evaluate(X.T)
+            values = np.stack([values[out] + zero for out in tape.outputs], axis=-1)
+            return (values[:, 0] if tape.scalar_output else values), None
+        values, derivatives = tape.replay(X.T)
+        values = np.asarray(values) + zero
+        if tape.scalar_output:
+            derivatives = derivatives.T
+            return values, (derivatives[:, None, :] if self.mode == 'jacobian' else derivatives)
+        return values.T, np.moveaxis(derivatives, -1, 0)
+
+    def _pointwise(self, f, X):
+        values, derivatives = [], []
+        for x in X:
+            # a new graph per point, so every point follows its own branches
+            nodes = [Node(xi) for xi in x]
+            output = f(*nodes)
+            outputs = list(output) if isinstance(output, (list, tuple)) else [output]
+            if self.mode == 'gradient' and len(outputs) > 1:
+                raise ValueError("mode 'gradient' needs a scalar function, use 'jacobian'")
+            rows = []
+            for out in outputs:
+                adjoints = out.get_adjoints() if isinstance(out, Node) else {}
+                rows.append([adjoints.get(node, 1.0 if node is out else 0.0) for node in nodes])
+            outs = [out.value if isinstance(out, Node) else out for out in outputs]
+            values.append(outs if isinstance(output, (list, tuple)) else outs[0])
+            derivatives.append(rows)
+        values = np.array(values, dtype=float)
+        if self.mode == 'value':
+            return values, None
+        derivatives = np.array(derivatives, dtype=float)
+        return values, (derivatives[:, 0, :] if self.mode == 'gradient' else derivatives)
+
+
+class _JsonlWriter:
+    """
+    One object per point: {"value": ...} plus "gradient" or "jacobian".
+    """
+
+    def __init__(self, path, mode):
+        self.file = sys.stdout if path == '-' else open(path, 'w')
+        self.key = {'gradient': 'gradient', 'jacobian': 'jacobian'}.get(mode)
+
+    def write(self, values, derivatives):
+        lines = []
+        for k in range(len(values)):
+            row = {'value': values[k].tolist()}
+            if self.key is not None:
+                row[self.key] = derivatives[k].tolist()
+            lines.append(json.dumps(row))
+        self.file.write('\n'.join(lines) + '\n')
+
+    def close(self):
+        if self.file is sys.stdout:
+            self.file.flush()
+        else:
+            self.file.close()
+
+
+def _columns(values, derivatives):
+    """
+    One row per point: the value(s), then the derivatives flattened row-major.
+    """
+    blocks = [values.reshape(len(values), -1)]
+    if derivatives is not None:
+        blocks.append(derivatives.reshape(len(values), -1))
+    return np.concatenate(blocks, axis=1)
+
+
+class _CsvWriter:
+    def __init__(self, path, mode):
+        self.file = sys.stdout if path == '-' else open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+
+    def write(self, values, derivatives):
+        self.writer.writerows(_columns(values, derivatives).tolist())
+
+    def close(self):
+        if self.file is sys.stdout:
+            self.file.flush()
+        else:
+            self.file.close()
+
+
+class _NpyWriter:
+    """
+    2D float64 array with the columns of _columns. The rows are streamed to a
+    temporary file and copied behind the .npy header once their number is known.
+    """
+
+    def __init__(self, path, mode):
+        self.path = path
+        self.rows = 0
+        self.width = None
+        descriptor, self.raw = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.raw')
+        self.file = os.fdopen(descriptor, 'wb')
+
+    def write(self, values, derivatives):
+        block = np.ascontiguousarray(_columns(values, derivatives), dtype='<f8')
+        if self.width is None:
+            self.width = block.shape[1]
+        self.rows += len(block)
+        self.file.write(block.tobytes())
+
+    def close(self):
+        self.file.close()
+        try:
+            with open(self.path, 'wb') as out, open(self.raw, 'rb') as raw:
+                header = {'descr': '<f8', 'fortran_order': False, 'shape': (self.rows, self.width or 0)}
+                np.lib.format.write_array_header_1_0(out, header)
+                shutil.copyfileobj(raw, out)
+        finally:
+            os.remove(self.raw)
+
+
+_WRITERS = {'jsonl': _JsonlWriter, 'csv': _CsvWriter, 'npy': _NpyWriter}
+
+# the evaluator of a worker process, set by the pool initializer
+_worker = None
+
+
+def _initialize(evaluator):
+    global _worker
+    _worker = evaluator
+
+
+def _evaluate(X):
+    return _worker(X)
+
+
+def _results(evaluator, batches, workers):
+    """
+    Results of the batches, in order. With workers > 1 at most 2*workers batches are in flight.
+    """
+    if workers <= 1:
+        for X in batches:
+            yield evaluator(X)
+        return
+    with multiprocessing.Pool(workers, initializer=_initialize, initargs=(evaluator,)) as pool:
+        pending = deque()
+        for X in batches:
+            pending.append(pool.apply_async(_evaluate, (X,)))
+            if len(pending) >= 2*workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def evaluate_file(spec, inputs, output, mode='gradient', style='reverse', batch_size=1024, workers=1,
+                  traced=True, input_format=None, output_format=None):
+    """
+    Evaluate a function at every point of an input file and stream the results to an output file.
+
+    Parameters
+    ----------
+    spec : str
+        'module:function' or an expression of x1, x2, ... (see load_function)
+    inputs : str
+        input file, see read_batches
+    output : str
+        output file ('-' for stdout): JSONL objects with 'value' and 'gradient' or 'jacobian',
+        or CSV/.npy rows with the value(s) followed by the flattened derivatives
+    mode : str, optional
+        'value', 'gradient' (default, scalar functions) or 'jacobian'
+    style : str, optional
+        'reverse' (default) if the function is called as f(*x), 'forward' if it is called as f(x)
+    batch_size : int, optional
+        points per batch (default 1024)
+    workers : int, optional
+        number of worker processes (default 1, evaluate in this process)
+    traced : bool, optional
+        replay one tape per batch (default True); False evaluates point by point, for functions
+        that branch on their inputs
+    input_format, output_format : str, optional
+        'jsonl', 'csv' or 'npy' (default from the extensions)
+
+    Returns
+    -------
+    int, number of points evaluated
+
+    Example
+    -------
+    >>> evaluate_file('exp(x1)*sin(x2) + x3**2', 'points.npy', 'gradients.jsonl', batch_size=4096, workers=4)
+    1000000
+    """
+    assert isinstance(batch_size, int) and batch_size > 0, f"batch_size {batch_size} has to be a positive integer"
+    evaluator = Evaluator(spec, mode, style, traced)
+    writer = _WRITERS[_format(output, output_format)](output, mode)
+    count = 0
+    try:
+        for values, derivatives in _results(evaluator, read_batches(inputs, batch_size, input_format), workers):
+            writer.write(values, derivatives)
+            count += len(values)
+    finally:
+        writer.close()
+    return count
+
+
+def main(argv=None):
+    """
+    Entry point of the lycet console command.
+    """
+    parser = argparse.ArgumentParser(
+        prog='lycet', description="Evaluate values, gradients or Jacobians of a function over a file of points.")
+    parser.add_argument('function', help="'module:function', 'path/to/file.py:function' or an expression of "
+                                         "x1, x2, ... such as 'exp(x1)*sin(x2) + x3**2'")
+    parser.add_argument('inputs', help="JSONL, CSV or .npy file of points, one per row ('-' for JSONL on stdin)")
+    parser.add_argument('-o', '--output', default='-', help="output file, JSONL, CSV or .npy (default: JSONL on stdout)")
+    parser.add_argument('-m', '--mode', choices=MODES, default='gradient')
+    parser.add_argument('--style', choices=('reverse', 'forward'), default='reverse',
+                        help="how the function is called: f(*x) with reverse operations (default) or f(x)")
+    parser.add_argument('-b', '--batch-size', type=int, default=1024)
+    parser.add_argument('-j', '--workers', type=int, default=1, help="worker processes (default 1)")
+    parser.add_argument('--untraced', action='store_true',
+                        help="evaluate point by point, for functions that branch on their inputs")
+    parser.add_argument('--input-format', choices=FORMATS)
+    parser.add_argument('--output-format', choices=FORMATS)
+    args = parser.parse_args(argv)
+    try:
+        count = evaluate_file(args.function, args.inputs, args.output, args.mode, args.style, args.batch_size,
+                              args.workers, not args.untraced, args.input_format, args.output_format)
+    except (ValueError, SyntaxError, OSError) as error:
+        parser.exit(2, f"lycet: error: {error}\n")
+    if args.output != '-':
+        print(f"{count} points evaluated", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# File: Compiler.py
+# Description: turn a traced Tape into straight-line NumPy source for the value and gradient/Jacobian
+
+import math
+import types
+import operator
+import weakref
+import numpy as np
+from .Tape import trace
+from .Optimize import optimize as optimize_tape
+from .DiskCache import function_key, persistent_key, global_names
+from .Primitives import primitive, _REGISTRY
+
+_FUNCTIONS = ['sin', 'cos', 'tan', 'exp', 'log', 'log1p', 'sqrt', 'arcsin', 'arccos', 'arctan', 'sinh', 'cosh', 'tanh']
+
+_BACKENDS = {
+    # numpy works elementwise, so the generated code accepts batched inputs
+    'numpy': dict({name: f'np.{name}' for name in _FUNCTIONS}, abs='np.abs', maximum='np.maximum'),
+    # math is faster on plain floats but only handles one point at a time
+    'math': dict({name: f'math.{name}' for name in _FUNCTIONS},
+                 arcsin='math.asin', arccos='math.acos', arctan='math.atan', abs='abs', maximum='max'),
+}
+
+_cache = weakref.WeakKeyDictionary()
+# stand-ins in snapshots for an empty closure cell and for the function itself
+_EMPTY, _SELF = object(), object()
+
+
+def _literal(value):
+    """
+    Source literal for a constant captured on the tape.
+    """
+    value = float(value)
+    if math.isfinite(value):
+        return repr(value)
+    return f"float('{value}')"
+
+
+def _tuple(args):
+    """
+    Source of the tuple of the variables args.
+    """
+    return '(' + ''.join(f'v{a}, ' for a in args) + ')'
+
+
+def generate_source(tape, name='lycet_compiled', backend='numpy', derivatives=True):
+    """
+    Generate the source of a function computing the value and the derivatives of a Tape.
+
+    The generated function only uses NumPy (or math) calls: it evaluates
+    every instruction once, then runs one reverse sweep per output with
+    the adjoints held in local variables.
+
+    User primitives registered with custom_jvp/custom_vjp have no source
+    template and are called through their registered rules instead, so
+    their code needs the registry in scope (compile_tape provides it).
+
+    Parameters
+    ----------
+    tape : Tape
+    name : str, optional
+        name of the generated function
+    backend : str, optional
+        'numpy' (default, accepts batched inputs and returns arrays) or
+        'math' (scalar inputs only, returns floats and lists, needs no NumPy)
+    derivatives : bool, optional
+        if False the function only returns the value(s)
+
+    Returns
+    -------
+    source : str
+
+    Example
+    -------
+    >>> tape = trace(lambda x1: rmo.sin(x1)*x1, 1.0)
+    >>> print(generate_source(tape))
+    def lycet_compiled(x):
+        x = np.asarray(x, dtype=float)
+        _z = np.zeros(x.shape[1:])
+        v0 = x[0]
+        v1 = np.sin(v0)
+        ...
+    """
+    assert backend in _BACKENDS, f"Unknown backend {backend}, must be one of {list(_BACKENDS)}"
+    functions = _BACKENDS[backend]
+    instructions = tape.instructions
+    if backend == 'numpy':
+        # _z broadcasts every result to the batch shape of the input
+        broadcast, zero, container = '{} + _z', '_z', 'np.array({})'
+    else:
+        broadcast, zero, container = '{}', '0.0', '{}'
+
+    # only variables that depend on an input need an adjoint
+    active = [False]*len(instructions)
+    for k, ins in enumerate(instructions):
+        active[k] = ins.op == 'input' or any(active[a] for a in ins.args)
+
+    lines = [f'def {name}(x):']
+    if backend == 'numpy':
+        lines.append('    x = np.asarray(x, dtype=float)')
+        lines.append('    _z = np.zeros(x.shape[1:])')
+
+    expanded = {}  # variable index -> partials of an n-ary template, already in source form
+    for k, ins in enumerate(instructions):
+        template = None if ins.op in ('input', 'const') else primitive(ins.op).template
+        operands = [f'v{a}' for a in ins.args]
+        if ins.op == 'input':
+            expr = f'x[{ins.params[0]}]'
+        elif ins.op == 'const':
+            expr = _literal(ins.params[0])
+        elif template is None:
+            # user primitive: call its rules, which the compiled function keeps a reference to
+            expr = f'_primitives[{ins.op!r}].primal({_tuple(ins.args)}, {ins.params!r})'
+        elif callable(template):
+            # n-ary operation: statements before the result, then the result
+            statements, expr, expanded[k] = template(operands, ins.params, f'v{k}', functions)
+            lines.extend(f'    {statement}' for statement in statements)
+        else:
+            params = [_literal(p) for p in ins.params]
+            expr = template[0].format(*operands, p=params, out=f'v{k}', **functions)
+        lines.append(f'    v{k} = {expr}')
+
+    values = [broadcast.format(f'v{out}') for out in tape.outputs]
+    value = values[0] if tape.scalar_output else container.format('[' + ', '.join(values) + ']')
+    if not derivatives:
+        lines.append(f'    return {value}')
+        return '\n'.join(lines) + '\n'
+
+    inputs = [k for k, ins in enumerate(instructions) if ins.op == 'input']
+    inputs.sort(key=lambda k: instructions[k].params[0])
+    rows = []
+    for o, out in enumerate(tape.outputs):
+        adjoint = {}  # variable index -> name of its adjoint
+        if active[out]:
+            adjoint[out] = f'a{o}_{out}'
+            lines.append(f'    a{o}_{out} = 1.0')
+        for k in range(out, -1, -1):
+            ins = instructions[k]
+            if k not in adjoint or ins.op in ('input', 'const'):
+                continue
+            operands = [f'v{a}' for a in ins.args]
+            params = [_literal(p) for p in ins.params]
+            template = primitive(ins.op).template
+            if template is None:
+                lines.append(f'    d{o}_{k} = _primitives[{ins.op!r}].vjp({_tuple(ins.args)}, {ins.params!r}, v{k})')
+                terms = [f'd{o}_{k}[{i}]' for i in range(len(ins.args))]
+            elif callable(template):
+                terms = expanded[k]
+            else:
+                terms = [partial.format(*operands, p=params, out=f'v{k}', **functions) for partial in template[1]]
+            for a, term in zip(ins.args, terms):
+                if not active[a] or term == '0.0':
+                    continue
+                term = adjoint[k] if term == '1.0' else f'{adjoint[k]} * ({term})'
+                if a in adjoint:
+                    lines.append(f'    {adjoint[a]} = {adjoint[a]} + {term}')
+                else:
+                    adjoint[a] = f'a{o}_{a}'
+                    lines.append(f'    {adjoint[a]} = {term}')
+        rows.append('[' + ', '.join(broadcast.format(adjoint[k]) if k in adjoint else zero for k in inputs) + ']')
+
+    if tape.scalar_output:
+        derivative = container.format(rows[0])
+    else:
+        derivative = container.format('[' + ', '.join(rows) + ']')
+    lines.append(f'    return {value}, {derivative}')
+    return '\n'.join(lines) + '\n'
+
+
+def compile_tape(tape, name='lycet_compiled', backend='numpy'):
+    """
+    Compile a Tape into a Python function with no LYCET objects in it.
+
+    Parameters
+    ----------
+    tape : Tape
+    name : str, optional
+        name of the generated function
+    backend : str, optional
+        'numpy' (default) or 'math'
+
+    Returns
+    -------
+    function g(x) returning (value, gradient) for a scalar function and
+    (values, Jacobian) for a vector function (arrays with the numpy backend,
+    floats and lists with the math backend); the generated source is kept
+    in g.source
+
+    Example
+    -------
+    >>> g = compile_tape(trace(lambda x1, x2: x1*x2, [1, 2]))
+    >>> g([3, 4])
+    (12.0, array([4., 3.]))
+    >>> g([[3, 1], [4, 2]])  # batch of two points
+    (array([12.,  2.]), array([[4., 2.], [3., 1.]]))
+    """
+    source = generate_source(tape, name, backend)
+    namespace = {'np': np, 'math': math, '_primitives': _REGISTRY}
+    exec(compile(source, f'<{name}>', 'exec'), namespace)
+    compiled = namespace[name]
+    compiled.source = source
+    compiled.tape = tape
+    return compiled
+
+
+def _snapshot(f, names):
+    """
+    The objects the program traced from f depends on: code, defaults, closure contents and the globals names.
+    """
+    if not isinstance(f, types.FunctionType):
+        return None
+    values = [f.__code__, f.__defaults__]
+    for cell in f.__closure__ or ():
+        try:
+            values.append(cell.cell_contents)
+        except ValueError:
+            values.append(_EMPTY)
+    namespace = f.__globals__
+    for name in names:
+        value = namespace.get(name, _EMPTY)
+        # a recursive function would keep its own cache entry alive
+        values.append(_SELF if value is f else value)
+    return values
+
+
+def _unchanged(before, now):
+    return before is not None and now is not None and len(before) == len(now) and all(map(operator.is_, before, now))
+
+
+def compile_function(f, x, backend='numpy', optimize=True, cache=None):
+    """
+    Trace f once at x and compile it, caching the result per function and input dimension.
+
+    Control flow in f is frozen at the trace point: branches taken on the
+    values of x are baked into the compiled code. The cached program is
+    checked against DiskCache.function_key of f, so changed closure
+    values, defaults or constants read from the globals trace f again;
+    other mutable state f reads (attributes, dict or list globals) does not.
+    The key is only hashed again when one of these objects was replaced:
+    arrays modified in place are not noticed.
+
+    Parameters
+    ----------
+    f : user defined function with reverse LYCET operations, called as f(*nodes)
+    x : input variable(s) at which f is traced
+    backend : str, optional
+        'numpy' (default) or 'math'
+    optimize : bool, optional
+        run the tape through Optimize.optimize before generating code (default True)
+    cache : DiskCache.GradientCache, optional
+        persistent cache consulted before tracing; a known function is then
+        read from disk instead of being traced again. Functions capturing
+        values that can neither be hashed nor pickled are not cached on disk
+
+    Returns
+    -------
+    compiled function, see compile_tape
+
+    Example
+    -------
+    >>> f = lambda x1, x2, x3: rmo.cos(x1 + x2) + (x3 * x2 ** 3)
+    >>> g = compile_function(f, [1, 2, 3])
+    >>> g([1, 2, 3])
+    (23.010007503399553, array([-0.14112001, 35.85887999,  8.        ]))
+    """
+    if isinstance(x, (int, float)):
+        x = [x]
+    key = (len(x), backend, optimize)
+    try:
+        per_function = _cache.setdefault(f, {})
+    except TypeError: # f cannot be weakly referenced, compile without caching
+        per_function = {}
+    entry = per_function.get(key)
+    if entry is not None:
+        names, before, state, program = entry
+        snapshot = _snapshot(f, names)
+        if _unchanged(before, snapshot):
+            return program
+    names = global_names(f.__code__) if isinstance(f, types.FunctionType) else ()
+    snapshot = _snapshot(f, names)
+    # a closure keeps its identity when the values it captures change
+    state = function_key(f, len(x), optimize=optimize)
+    if entry is not None and entry[2] == state:
+        per_function[key] = (names, snapshot, state, entry[3])
+        return entry[3]
+    tape = None
+    # values only known by their id make the key unusable in another process
+    disk_key = persistent_key(f, len(x), optimize=optimize) if cache is not None else None
+    if disk_key is not None:
+        tape = cache.load(disk_key)
+    if tape is None:
+        tape = trace(f, x)
+        if optimize:
+            tape, _ = optimize_tape(tape)
+        if disk_key is not None:
+            cache.store(disk_key, tape)
+    program = compile_tape(tape, backend=backend)
+    per_function[key] = (names, snapshot, state, program)
+    return program
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# File: Context.py
+# Description: trace contexts holding the state of the traces of one thread or asyncio task
+#              (precision policy, hash-consing table, profile, node hooks)
+
+import threading
+import importlib
+import contextvars
+from contextlib import contextmanager
+
+
+class TraceContext:
+    """
+    A class to represent the state the traces of one thread or task run with.
+
+    The active context lives in a contextvars.ContextVar: every thread starts
+    with the default context, every asyncio task with a copy of the context
+    of its creator. Blocks like Precision.precision, CSE.hash_consing,
+    Profiler.profiling and Memory.memory_limit never modify a context; they
+    activate a modified copy until they exit (activated, which also
+    installs the instrumented methods the copy needs). Concurrent ReverseMode and
+    ForwardMode evaluations in other threads or tasks therefore never see
+    each other's state.
+
+    Attributes
+    ----------
+    policy : PrecisionPolicy or None
+        precision policy, None for the default float64 path
+    table : dict or None
+        hash-consing table, None when hash-consing is off
+    stats : CSEStats or None
+        counters of the hash-consing table
+    profile : Profile or None
+        profile the instrumented operations record into
+    node_hooks : tuple of functions
+        called with every Node constructed in the context
+
+    Methods
+    -------
+    replace(**changes):
+        copy of the context with some attributes changed
+    run(f, *args, **kwargs):
+        call f with this context active, in a copy of the current contextvars context
+
+    Example
+    -------
+    >>> context = TraceContext().replace(policy=get_policy('mixed'))
+    >>> with ThreadPoolExecutor() as pool:
+    ...     value, J = pool.submit(context.run, rm.ReverseMode, f, x).result()
+    """
+
+    __slots__ = ('policy', 'table', 'stats', 'profile', 'node_hooks')
+
+    def __init__(self, policy=None, table=None, stats=None, profile=None, node_hooks=()):
+        """
+        Constructs all necessary attributes for the TraceContext object.
+        """
+        self.policy = policy
+        self.table = table
+        self.stats = stats
+        self.profile = profile
+        self.node_hooks = node_hooks
+
+    def replace(self, **changes):
+        """
+        Copy of the context with the given attributes changed.
+        """
+        attributes = {name: getattr(self, name) for name in self.__slots__}
+        attributes.update(changes)
+        return TraceContext(**attributes)
+
+    def run(self, f, *args, **kwargs):
+        """
+        Call f(*args, **kwargs) with this context active, without touching the caller's context.
+        """
+        def call():
+            with activated(self):
+                return f(*args, **kwargs)
+        return contextvars.copy_context().run(call)
+
+    def __repr__(self):
+        """
+        Represents the context as a string.
+        """
+        return (f"TraceContext(policy={self.policy!r}, hash_consing={self.table is not None}, "
+                f"profiling={self.profile is not None}, node_hooks={len(self.node_hooks)})")
+
+
+# context of the current thread or task; the default one is never modified
+_CONTEXT = contextvars.ContextVar('lycet_trace_context', default=TraceContext())
+
+# features needing instrumented methods, innermost wrapper first, with the modules whose
+# _instrumentation() gives the {(class, method name): wrap} of the feature
+_FEATURES = {'trace': ('Node', 'DualNumber'), 'cse': ('CSE',), 'profile': ('Profiler',)}
+_lock = threading.Lock()
+_active = {}    # feature -> number of active blocks whose context needs it
+_wraps = {}     # feature -> {(class, method name): function wrapping the plain method}
+_plain = {}     # (class, method name) -> plain method, for the methods currently wrapped
+
+
+def _features(context):
+    """
+    Features whose instrumented methods context needs.
+    """
+    features = []
+    if context.policy is not None or context.node_hooks:
+        features.append('trace')
+    if context.table is not None:
+        features.append('cse')
+    if context.profile is not None:
+        features.append('profile')
+    return features
+
+
+def _rebuild():
+    """
+    Install on every method the wrappers of the active features, and the plain method where there are none.
+    """
+    wanted = {}
+    for feature, modules in _FEATURES.items():
+        if not _active.get(feature):
+            continue
+        if feature not in _wraps:
+            _wraps[feature] = {}
+            for module in modules:
+                _wraps[feature].update(importlib.import_module(f'.{module}', __package__)._instrumentation())
+        for target, wrap in _wraps[feature].items():
+            wanted.setdefault(target, []).append(wrap)
+    for target in set(_plain) | set(wanted):
+        owner, name = target
+        method = _plain.setdefault(target, owner.__dict__[name])
+        for wrap in wanted.get(target, ()):
+            method = wrap(method)
+        setattr(owner, name, method)
+        if target not in wanted:
+            del _plain[target]
+
+
+def _count(features, step):
+    with _lock:
+        changed = False
+        for feature in features:
+            _active[feature] = _active.get(feature, 0) + step
+            changed |= _active[feature] == (1 if step > 0 else 0)
+        if changed:
+            _rebuild()
+
+
+def current_context():
+    """
+    TraceContext of the current thread or task.
+    """
+    return _CONTEXT.get()
+
+
+@contextmanager
+def activated(context):
+    """
+    Make context the active TraceContext inside the block.
+
+    By default Node, DualNumber and Primitive run plain methods that never
+    look at the context. While some active block (in any thread or task)
+    needs a precision policy, node hooks, a hash-consing table or a profile,
+    the methods involved are replaced by wrappers reading the context of
+    their caller, so work done elsewhere keeps its own state. The plain methods are restored when the
+    last such block exits: a copy of the context still used afterwards (an
+    asyncio task or thread outliving the block) runs with the plain methods.
+
+    Parameters
+    ----------
+    context : TraceContext
+
+    Returns
+    -------
+    context
+    """
+    features = _features(context)
+    if features:
+        _count(features, 1)
+    token = _CONTEXT.set(context)
+    try:
+        yield context
+    finally:
+        _CONTEXT.reset(token)
+        if features:
+            _count(features, -1)
+
+
+def trace_context():
+    """
+    Block running with a fresh default TraceContext, isolated from the enclosing blocks.
+
+    Example
+    -------
+    >>> with precision('float32'):
+    ...     with trace_context():
+    ...         value, J = rm.ReverseMode(f, x)  # float64
+    """
+    return activated(TraceContext())
+
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# File: DiskCache.py
+# Description: persistent, size-bounded on-disk cache of traced gradient programs
+
+import os
+import sys
+import types
+import pickle
+import hashlib
+import tempfile
+import numpy as np
+from .Tape import Tape
+
+_SUFFIX = '.tape'
+
+# marker left in the seen set when a value could only be identified by its id
+_BY_ID = 'by-id'
+
+_GLOBAL_TYPES = (bool, int, float, complex, str, bytes, tuple, np.number, np.ndarray, types.FunctionType)
+
+
+def default_directory():
+    """
+    Cache directory used when none is given: $LYCET_CACHE_DIR, else ~/.cache/lycet.
+    """
+    return os.environ.get('LYCET_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'lycet'))
+
+
+def _update_value(h, value, seen):
+    """
+    Feed a closure, default or global value into the digest.
+    """
+    if isinstance(value, types.FunctionType):
+        _update_function(h, value, seen)
+    elif isinstance(value, types.ModuleType):
+        h.update(b'module:' + value.__name__.encode())
+    elif isinstance(value, np.ndarray):
+        h.update(f'ndarray:{value.dtype.str}:{value.shape}:'.encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (bool, int, float, complex, str, bytes, type(None), np.number)):
+        h.update(f'{type(value).__name__}:{value!r}'.encode())
+    elif isinstance(value, (tuple, list)):
+        h.update(f'{type(value).__name__}:{len(value)}'.encode())
+        for item in value:
+            _update_value(h, item, seen)
+    else:
+        try:
+            h.update(pickle.dumps(value, protocol=4))
+        except Exception:
+            # unknown objects only match themselves within one process: the key must not be persisted
+            h.update(f'{type(value).__qualname__}:{id(value)}'.encode())
+            seen.add(_BY_ID)
+
+
+def global_names(code):
+    """
+    Names a code object and the functions, lambdas and comprehensions nested in it read from the globals.
+    """
+    names = list(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names.extend(name for name in global_names(const) if name not in names)
+    return names
+
+
+def _update_code(h, code):
+    """
+    Feed a code object (and the code objects nested in its constants) into the digest.
+    """
+    h.update(code.co_code)
+    h.update(repr((code.co_argcount, code.co_kwonlyargcount, code.co_names,
+                   code.co_varnames, code.co_freevars, code.co_cellvars)).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _update_code(h, const)
+        else:
+            h.update(f'{type(const).__name__}:{const!r}'.encode())
+
+
+def _update_function(h, f, seen):
+    """
+    Feed a function's code, defaults, closure constants and the globals it reads into the digest.
+    """
+    if id(f) in seen:
+        h.update(b'recursive')
+        return
+    seen.add(id(f))
+    _update_code(h, f.__code__)
+    _update_value(h, f.__defaults__, seen)
+    for cell in f.__closure__ or ():
+        try:
+            _update_value(h, cell.cell_contents, seen)
+        except ValueError: # empty cell
+            h.update(b'empty')
+    for name in global_names(f.__code__):
+        # constants and helper functions read from the globals; mutable state is not part of the key
+        value = f.__globals__.get(name)
+        if isinstance(value, _GLOBAL_TYPES):
+            h.update(name.encode())
+            _update_value(h, value, seen)
+
+
+def _digest(f, n_inputs, options):
+    h = hashlib.sha256()
+    h.update(f'lycet-tape:{sys.version_info[0]}.{sys.version_info[1]}:{n_inputs}:{sorted(options.items())!r}'.encode())
+    seen = set()
+    if isinstance(f, types.FunctionType):
+        _update_function(h, f, seen)
+    else:
+        _update_value(h, f, seen)
+    return h.hexdigest(), _BY_ID not in seen
+
+
+def function_key(f, n_inputs, **options):
+    """
+    Cache key of a user function: hash of its code object, closure constants,
+    defaults and referenced globals, the input dimension and any extra options.
+
+    Values that can be neither hashed by content nor pickled enter the key
+    by their id, so such a key is only valid within one process; see
+    persistent_key.
+
+    Parameters
+    ----------
+    f : Python function
+    n_inputs : int
+        input dimension
+    options : extra keyword values that change the cached program (backend, ...)
+
+    Returns
+    -------
+    key : str (hex digest)
+
+    Example
+    -------
+    >>> scale = 2
+    >>> function_key(lambda x1: x1*scale, 1) == function_key(lambda x1: x1*scale, 1)
+    True
+    """
+    return _digest(f, n_inputs, options)[0]
+
+
+def persistent_key(f, n_inputs, **options):
+    """
+    function_key of f if it can be stored on disk, None if it depends on the id of some value.
+
+    An id can be reused by another object in another process, so such a key
+    could load the program of a different function.
+    """
+    key, persistent = _digest(f, n_inputs, options)
+    return key if persistent else None
+
+
+class GradientCache:
+    """
+    A class to represent a directory of traced gradient programs shared between processes.
+
+    Every entry is one file holding a serialized Tape. Files are written to a
+    temporary name and atomically renamed, so concurrent readers only ever
+    see complete entries. A hit refreshes the file's modification time, and
+    when the directory grows past max_bytes the least recently used entries
+    are deleted.
+
+    Attributes
+    ----------
+    directory : str
+        where entries are stored
+    max_bytes : int
+        size budget of the directory
+    hits : int
+        number of successful loads
+    misses : int
+        number of failed loads
+
+    Methods
+    -------
+    load(key):
+        Tape stored under key, or None
+    store(key, tape):
+        write a Tape under key and evict if over budget
+    evict():
+        delete least recently used entries until the directory fits max_bytes
+    size():
+        total bytes currently stored
+    clear():
+        delete every entry
+
+    Example
+    -------
+    >>> cache = GradientCache('/tmp/lycet-cache')
+    >>> g = compile_function(f, x, cache=cache)  # traces and stores on the first run
+    >>> g = compile_function(f, x, cache=cache)  # later runs only read the file
+    """
+
+    def __init__(self, directory=None, max_bytes=64*2**20):
+        """
+        Constructs all necessary attributes for the GradientCache object.
+
+        Parameters
+        ----------
+        directory : str, optional
+            cache directory, created if needed (default: see default_directory)
+        max_bytes : int, optional
+            size budget of the directory (default 64 MiB)
+        """
+        self.directory = directory if directory is not None else default_directory()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def load(self, key):
+        """
+        Read the Tape stored under key.
+
+        Parameters
+        ----------
+        key : str
+
+        Returns
+        -------
+        Tape, or None if there is no (readable) entry
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            tape = Tape.from_bytes(data)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (ValueError, EOFError, TypeError):
+            # unreadable entry, e.g. written by an older format: drop it
+            self.misses += 1
+            self._remove(path)
+            return None
+        try:
+            os.utime(path) # mark as recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return tape
+
+    def store(self, key, tape):
+        """
+        Atomically write tape under key, then evict old entries if over budget.
+
+        Parameters
+        ----------
+        key : str
+        tape : Tape
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix=_SUFFIX)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(tape.to_bytes())
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            self._remove(tmp)
+            raise
+        self.evict()
+
+    def _entries(self):
+        """
+        (mtime, size, path) of every complete entry.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(_SUFFIX) or name.startswith('.tmp-'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError: # removed by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self):
+        """
+        Total bytes held by the entries of the cache.
+        """
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """
+        Delete least recently used entries until the directory fits in max_bytes.
+
+        Returns
+        -------
+        removed : int
+            number of entries deleted
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """
+        Delete every entry of the cache.
+        """
+        for _, _, path in self._entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def __repr__(self):
+        """
+        Represents the cache as a string.
+        """
+        return f"GradientCache(directory={self.directory!r}, max_bytes={self.max_bytes}, hits={self.hits}, misses={self.misses})"
@@ -3,6 +3,7 @@
 # Description: Create dual number for forward mode of AD 
 
 import numpy as np
+from .Context import _CONTEXT
 
 class DualNumber:
 
@@ -77,6 +78,7 @@ class DualNumber:
         dual : int or float
             the derivative of f(x)
         """
+        # the plain constructor: _traced_init replaces it while a precision policy is active
         self.real = real 
         self.dual = dual 
 
@@ -555,7 +557,8 @@ class DualNumber:
             if (self.real > 0):
                 return DualNumber(0, 0)
             raise ValueError('Cannot divide by zero or compute logarithm of zero or both')
-        return DualNumber(num**self.real, self.dual*np.log(num)*(num**self.real))
+        value = num**self.real
+        return DualNumber(value, self.dual*np.log(num)*value)
 
     def __repr__(self):
         """
@@ -577,3 +580,23 @@ class DualNumber:
         """
         return f"Dual Number (real={self.real}, dual={self.dual})"
 
+
+def _traced_init(self, real, dual=1.0):
+    """
+    DualNumber.__init__ while some context has a precision policy or node hooks (Context.activated).
+    """
+    policy = _CONTEXT.get().policy
+    if policy is not None:
+        # reduced precision: store the value and the tangent in the storage type
+        real = policy.cast(real)
+        if isinstance(dual, (int, float, np.number, np.ndarray)):
+            dual = policy.cast(dual)
+    self.real = real
+    self.dual = dual
+
+
+def _instrumentation():
+    """
+    Methods replaced while a context needs them (Context.activated).
+    """
+    return {(DualNumber, '__init__'): lambda plain: _traced_init}
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# File: Export.py
+# Description: ahead-of-time export of traced gradients as standalone Python modules that do not import LYCET
+
+import os
+import tempfile
+import importlib.util
+import numpy as np
+from .Tape import trace
+from .Optimize import optimize as optimize_tape
+from .Compiler import generate_source
+from .Primitives import primitive
+from .ReverseMode import ReverseMode
+
+_HEADER = '''"""
+Value, gradient and Jacobian of {name}, exported ahead of time by LYCET.
+
+Generated code: it only depends on {requirements} and can be shipped
+without the LYCET package. Control flow was frozen at the trace point.
+
+value(x)     -> {value_doc}
+grad(x)      -> gradient (scalar functions only)
+jacobian(x)  -> Jacobian, one row per output
+"""
+
+{imports}
+
+__all__ = ['value', 'grad', 'jacobian']
+
+n_inputs = {n_inputs}
+n_outputs = {n_outputs}
+'''
+
+_WRAPPERS = '''
+
+def value(x):
+    return _value(x)
+
+
+def grad(x):
+    {grad_body}
+
+
+def jacobian(x):
+    {jacobian_body}
+'''
+
+
+def export_source(f, x, name=None, backend='math', optimize=True):
+    """
+    Trace f once at x and generate the source of a standalone module.
+
+    Parameters
+    ----------
+    f : user defined function with reverse LYCET operations, called as f(*nodes)
+    x : input variable(s) at which f is traced
+    name : str, optional
+        name of the function quoted in the module docstring
+    backend : str, optional
+        'math' (default, the module only imports math) or 'numpy'
+        (the module imports numpy and accepts batched inputs)
+    optimize : bool, optional
+        run the tape through Optimize.optimize first (default True)
+
+    Returns
+    -------
+    source : str
+
+    Example
+    -------
+    >>> source = export_source(lambda x1, x2: rmo.sin(x1)*x2, [1.0, 2.0])
+    >>> 'import math' in source and 'LYCET_package' not in source
+    True
+    """
+    if isinstance(x, (int, float)):
+        x = [x]
+    tape = trace(f, x)
+    if optimize:
+        tape, _ = optimize_tape(tape)
+    if name is None:
+        name = getattr(f, '__name__', 'f')
+    custom = sorted({ins.op for ins in tape.instructions
+                     if ins.op not in ('input', 'const') and primitive(ins.op).template is None})
+    if custom:
+        raise ValueError(f"Cannot export the user primitives {custom}: they have no source template")
+
+    if backend == 'numpy':
+        imports = 'import math\nimport numpy as np'
+        requirements = 'math and NumPy'
+    else:
+        imports = 'import math'
+        requirements = 'the math module'
+    header = _HEADER.format(name=name, requirements=requirements, imports=imports,
+                            value_doc='value' if tape.scalar_output else 'values, one per output',
+                            n_inputs=tape.n_inputs, n_outputs=len(tape.outputs))
+    if tape.scalar_output:
+        grad_body = 'return _value_and_derivatives(x)[1]'
+        jacobian_body = 'return [grad(x)]' if backend == 'math' else 'return grad(x)[np.newaxis]'
+    else:
+        grad_body = "raise ValueError('grad is only defined for scalar functions, use jacobian')"
+        jacobian_body = 'return _value_and_derivatives(x)[1]'
+    return '\n'.join([
+        header,
+        generate_source(tape, '_value', backend, derivatives=False),
+        generate_source(tape, '_value_and_derivatives', backend),
+    ]) + _WRAPPERS.format(grad_body=grad_body, jacobian_body=jacobian_body)
+
+
+def export_module(f, x, path, name=None, backend='math', optimize=True):
+    """
+    Write the standalone module generated by export_source to path.
+
+    The file is written to a temporary name and renamed, so a reader never
+    sees a half-written module.
+
+    Parameters
+    ----------
+    f : user defined function with reverse LYCET operations
+    x : input variable(s) at which f is traced
+    path : str
+        destination .py file
+    name, backend, optimize : see export_source
+
+    Returns
+    -------
+    path : str
+
+    Example
+    -------
+    >>> export_module(lambda x1, x2: rmo.exp(x1)*x2, [1.0, 2.0], 'model_grad.py')
+    'model_grad.py'
+    >>> import model_grad  # on the inference node, without LYCET installed
+    >>> model_grad.grad([1.0, 2.0])
+    [5.43656365691809, 2.718281828459045]
+    """
+    source = export_source(f, x, name, backend, optimize)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.py')
+    try:
+        with os.fdopen(fd, 'w') as file:
+            file.write(source)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return path
+
+
+def load_module(path, name='lycet_exported'):
+    """
+    Import an exported module from its file path.
+
+    Parameters
+    ----------
+    path : str
+    name : str, optional
+        module name to import it under
+
+    Returns
+    -------
+    module
+    """
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def verify_module(module, f, points, rtol=1e-9, atol=1e-12):
+    """
+    Check an exported module against ReverseMode at sample points.
+
+    Parameters
+    ----------
+    module : module or str
+        the exported module, or the path of its file
+    f : the user function the module was exported from
+    points : list of input points
+    rtol, atol : float, optional
+        tolerances of the comparison (see numpy.allclose)
+
+    Returns
+    -------
+    report : dict
+        'points' checked, the largest absolute error of the 'value' and of
+        the 'derivatives', and 'ok' which is True if every point matched
+
+    Example
+    -------
+    >>> verify_module('model_grad.py', f, [[1.0, 2.0], [0.5, -1.0]])
+    {'points': 2, 'value': 0.0, 'derivatives': 0.0, 'ok': True}
+    """
+    if isinstance(module, str):
+        module = load_module(module)
+    report = {'points': 0, 'value': 0.0, 'derivatives': 0.0, 'ok': True}
+    for x in points:
+        if isinstance(x, (int, float)):
+            x = [x]
+        x = [float(xi) for xi in x]
+        if module.n_outputs == 1 and not isinstance(module.value(x), (list, tuple, np.ndarray)):
+            expected_value, expected = ReverseMode(f, x)
+            value, derivatives = module.value(x), module.grad(x)
+        else:
+            expected_value, expected = [], []
+            for i in range(module.n_outputs):
+                value_i, row = ReverseMode(lambda *nodes: f(*nodes)[i], x)
+                expected_value.append(value_i)
+                expected.append(row)
+            value, derivatives = module.value(x), module.jacobian(x)
+        value_error = float(np.max(np.abs(np.subtract(value, expected_value))))
+        derivative_error = float(np.max(np.abs(np.subtract(derivatives, expected)))) if len(expected) else 0.0
+        report['points'] += 1
+        report['value'] = max(report['value'], value_error)
+        report['derivatives'] = max(report['derivatives'], derivative_error)
+        report['ok'] = report['ok'] and bool(np.allclose(value, expected_value, rtol, atol)
+                                             and np.allclose(derivatives, expected, rtol, atol))
+    return report
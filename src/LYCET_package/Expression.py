@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# File: Expression.py
+# Description: parse formula strings such as "exp(x1)*sin(x2)+x3**2" into a compact expression graph
+#              and compile them once into cached value and gradient programs
+
+import ast
+import math
+import threading
+from collections import OrderedDict
+import numpy as np
+from . import LYCET_Operations_Reverse as rmo
+from . import LYCET_Operations_Forward as fmo
+from .Tape import trace
+from .Optimize import optimize
+from .Compiler import compile_tape
+
+# functions an expression can call, with their number of arguments (None: one list argument)
+FUNCTIONS = {'sin': 1, 'cos': 1, 'tan': 1, 'exp': 1, 'ln': 1, 'log': 2, 'arcsin': 1, 'arccos': 1, 'arctan': 1,
+             'sinh': 1, 'cosh': 1, 'tanh': 1, 'sigmoid': 1, 'softplus': 1, 'sqrt': 1,
+             'sum': None, 'mean': None, 'prod': None, 'norm': None, 'logsumexp': None}
+CONSTANTS = {'pi': math.pi, 'e': math.e}
+
+_OPERATORS = {ast.Add: 'add', ast.Sub: 'sub', ast.Mult: 'mul', ast.Div: 'div', ast.Pow: 'pow'}
+_FOLD = {'add': lambda a, b: a + b, 'sub': lambda a, b: a - b, 'mul': lambda a, b: a*b,
+         'div': lambda a, b: a/b, 'pow': lambda a, b: a**b}
+
+# compiled expressions by normalized expression and variables, least recently used first
+CACHE_SIZE = 256
+_cache = OrderedDict()
+_lock = threading.Lock()
+_hits = _misses = 0
+
+
+class ExpressionGraph:
+    """
+    A class to represent a parsed expression as a list of distinct operations.
+
+    Every operation is an (op, args, params) triple: op is 'input', 'const',
+    'add', 'sub', 'mul', 'div', 'pow', 'neg' or one of FUNCTIONS, args are
+    indices of earlier operations. Identical subexpressions are stored once
+    and operations on constants only are folded, so "sin(x1)*sin(x1) + 2*3"
+    holds one sin and no product of the constants.
+
+    Attributes
+    ----------
+    expression : str
+        normalized expression (whitespace, parentheses and number formats canonical)
+    variables : tuple of str
+        input names, in input order
+    ops : list of (op, args, params)
+    output : int
+        index of the operation computing the expression
+
+    Methods
+    -------
+    function(mode='reverse'):
+        Python function computing the expression with LYCET operations
+    """
+
+    def __init__(self, expression, variables, ops, output):
+        """
+        Constructs all necessary attributes for the ExpressionGraph object.
+        """
+        self.expression = expression
+        self.variables = variables
+        self.ops = ops
+        self.output = output
+
+    def __len__(self):
+        """
+        Number of distinct operations.
+        """
+        return len(self.ops)
+
+    def function(self, mode='reverse'):
+        """
+        Function computing the expression: f(*x) with LYCET_Operations_Reverse for mode 'reverse',
+        f(x) with LYCET_Operations_Forward for mode 'forward'.
+        """
+        if mode not in ('reverse', 'forward'):
+            raise ValueError(f"Unknown mode {mode!r}, expected 'reverse' or 'forward'")
+        module = rmo if mode == 'reverse' else fmo
+        ops, output = self.ops, self.output
+
+        def f(*x):
+            values = []
+            for op, args, params in ops:
+                operands = [values[a] for a in args]
+                if op == 'input':
+                    values.append(x[params[0]])
+                elif op == 'const':
+                    values.append(params[0])
+                elif op == 'neg':
+                    # Node has no unary minus
+                    values.append(-1.0*operands[0])
+                elif op in _FOLD:
+                    values.append(_FOLD[op](*operands))
+                elif op == 'sqrt':
+                    values.append(operands[0]**0.5)
+                elif FUNCTIONS[op] is None:
+                    values.append(getattr(module, op)(operands))
+                else:
+                    values.append(getattr(module, op)(*operands))
+            return values[output]
+        return f if mode == 'reverse' else (lambda x: f(*x))
+
+    def __repr__(self):
+        """
+        Represents the graph as a string.
+        """
+        return f"ExpressionGraph({self.expression!r}, variables={self.variables}, ops={len(self.ops)})"
+
+
+class _Builder(ast.NodeVisitor):
+    """
+    Walk the syntax tree of an expression and record its operations.
+    """
+
+    def __init__(self, variables):
+        self.variables = variables
+        self.names = {}
+        self.ops = []
+        self.index = {}
+
+    def add(self, op, args=(), params=()):
+        key = (op, args, params)
+        if key not in self.index:
+            self.index[key] = len(self.ops)
+            self.ops.append(key)
+        return self.index[key]
+
+    def constant(self, k):
+        op, _, params = self.ops[k]
+        return params[0] if op == 'const' else None
+
+    def generic_visit(self, node):
+        raise ValueError(f"Unsupported syntax in the expression: {ast.unparse(node)!r}")
+
+    def visit_Expression(self, node):
+        return self.visit(node.body)
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ValueError(f"Unsupported constant {node.value!r} in the expression")
+        return self.add('const', params=(float(node.value),))
+
+    def visit_Name(self, node):
+        if node.id in CONSTANTS:
+            return self.add('const', params=(CONSTANTS[node.id],))
+        if self.variables is None:
+            if not (node.id[0] == 'x' and node.id[1:].isdigit() and int(node.id[1:]) > 0):
+                raise ValueError(f"Unknown name {node.id!r} in the expression, the variables are x1, x2, ...")
+            position = int(node.id[1:]) - 1
+        elif node.id in self.variables:
+            position = self.variables.index(node.id)
+        else:
+            raise ValueError(f"Unknown name {node.id!r} in the expression, the variables are {self.variables}")
+        self.names[node.id] = position
+        return self.add('input', params=(position,))
+
+    def visit_UnaryOp(self, node):
+        operand = self.visit(node.operand)
+        if isinstance(node.op, ast.UAdd):
+            return operand
+        if not isinstance(node.op, ast.USub):
+            raise ValueError(f"Unsupported operator in {ast.unparse(node)!r}")
+        value = self.constant(operand)
+        if value is not None:
+            return self.add('const', params=(-value,))
+        return self.add('neg', (operand,))
+
+    def visit_BinOp(self, node):
+        op = _OPERATORS.get(type(node.op))
+        if op is None:
+            raise ValueError(f"Unsupported operator in {ast.unparse(node)!r}")
+        args = (self.visit(node.left), self.visit(node.right))
+        values = [self.constant(a) for a in args]
+        if None not in values:
+            try:
+                value = _FOLD[op](*values)
+            except (ZeroDivisionError, OverflowError) as error:
+                raise ValueError(f"Cannot evaluate the constants in {ast.unparse(node)!r}: {error}") from None
+            if isinstance(value, complex) or not math.isfinite(value):
+                raise ValueError(f"Cannot evaluate the constants in {ast.unparse(node)!r}: not a finite real number")
+            return self.add('const', params=(float(value),))
+        return self.add(op, args)
+
+    def visit_Call(self, node):
+        name = node.func.id if isinstance(node.func, ast.Name) else None
+        if name not in FUNCTIONS or node.keywords:
+            raise ValueError(f"Unknown function call {ast.unparse(node)!r}, the functions are {sorted(FUNCTIONS)}")
+        arity = FUNCTIONS[name]
+        if arity is None:
+            items = node.args[0].elts if len(node.args) == 1 and isinstance(node.args[0], (ast.List, ast.Tuple)) else node.args
+            return self.add(name, tuple(self.visit(item) for item in items))
+        if len(node.args) != arity:
+            raise ValueError(f"{name} takes {arity} argument(s), got {len(node.args)} in {ast.unparse(node)!r}")
+        if name == 'log':
+            base = self.constant(self.visit(node.args[1]))
+            if base is None:
+                raise ValueError(f"The base of log has to be a constant in {ast.unparse(node)!r}")
+            return self.add('log', (self.visit(node.args[0]), self.visit(node.args[1])))
+        return self.add(name, tuple(self.visit(arg) for arg in node.args))
+
+
+def parse(expression, variables=None):
+    """
+    Parse an expression string into an ExpressionGraph.
+
+    The expression may use numbers, the variables, the operators + - * / **,
+    the constants pi and e, and the functions of FUNCTIONS (sum, mean,
+    prod, norm and logsumexp take a list, or their operands directly).
+    Nothing in the string is ever executed: it is read with ast.parse and
+    only the syntax above is accepted.
+
+    Parameters
+    ----------
+    expression : str
+    variables : sequence of str, optional
+        input names, in input order (default x1, x2, ..., up to the largest index used)
+
+    Returns
+    -------
+    ExpressionGraph
+
+    Example
+    -------
+    >>> graph = parse('exp(x1)*sin(x2) + x3**2')
+    >>> graph.expression, len(graph)
+    ('exp(x1) * sin(x2) + x3 ** 2', 9)
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError as error:
+        raise ValueError(f"Cannot parse the expression {expression!r}: {error.msg}") from None
+    variables = tuple(variables) if variables is not None else None
+    builder = _Builder(variables)
+    output = builder.visit(tree)
+    if variables is None:
+        variables = tuple(f'x{k + 1}' for k in range(max(builder.names.values(), default=-1) + 1))
+    # drop the operands of folded constants, then put the inputs first, in input order,
+    # whether the expression uses them or not
+    live = {output}
+    for k in range(output, -1, -1):
+        if k in live:
+            live.update(builder.ops[k][1])
+    ops = [('input', (), (k,)) for k in range(len(variables))]
+    remap = {}
+    for k, op in enumerate(builder.ops):
+        if k not in live:
+            continue
+        if op[0] == 'input':
+            remap[k] = op[2][0]
+        else:
+            remap[k] = len(ops)
+            ops.append((op[0], tuple(remap[a] for a in op[1]), op[2]))
+    return ExpressionGraph(ast.unparse(tree), variables, ops, remap[output])
+
+
+class CompiledExpression:
+    """
+    A class to represent an expression compiled into a value and gradient program.
+
+    The expression graph is traced once (at the first point it is evaluated
+    at, so that no domain check of the operations fails on a made-up point),
+    the tape is optimized and turned into straight-line NumPy code by
+    Compiler.compile_tape. Later calls only run that code: no parsing, no
+    tracing, no Node objects. The domain checks of the LYCET operations are
+    not repeated by the compiled code, NumPy returns nan or inf instead.
+
+    Attributes
+    ----------
+    graph : ExpressionGraph
+    n_inputs : int
+    program : function or None
+        compiled program, x -> (value, gradient), None until the first call
+
+    Methods
+    -------
+    __call__(x):
+        value and gradient at x (or at the columns of a batch)
+    value(x):
+        value only
+    function(mode='reverse'):
+        function for ReverseMode (f(*x)) or ForwardMode (f(x))
+
+    Example
+    -------
+    >>> program = compile_expression('exp(x1)*sin(x2) + x3**2')
+    >>> program([0.0, 0.0, 2.0])
+    (4.0, array([0., 1., 4.]))
+    """
+
+    def __init__(self, graph):
+        """
+        Constructs all necessary attributes for the CompiledExpression object.
+        """
+        self.graph = graph
+        self.n_inputs = len(graph.variables)
+        self.program = None
+        self._lock = threading.Lock()
+
+    @property
+    def expression(self):
+        """
+        Normalized expression.
+        """
+        return self.graph.expression
+
+    def _compile(self, x):
+        with self._lock:
+            if self.program is None:
+                point = x if x.ndim == 1 else x[:, 0]
+                tape, _ = optimize(trace(self.graph.function(), point))
+                self.program = compile_tape(tape, name='lycet_expression')
+        return self.program
+
+    def _point(self, x):
+        x = np.asarray(x, dtype=float)
+        if len(x) != self.n_inputs:
+            raise ValueError(f"The expression {self.expression!r} has {self.n_inputs} inputs "
+                             f"{self.graph.variables}, got {len(x)}")
+        return x
+
+    def __call__(self, x):
+        """
+        Value and gradient at x, an array of length n_inputs, optionally with a trailing batch dimension.
+        """
+        x = self._point(x)
+        program = self.program or self._compile(x)
+        return program(x)
+
+    def value(self, x):
+        """
+        Value at x (computed together with the gradient by the compiled program).
+        """
+        return self(x)[0]
+
+    def function(self, mode='reverse'):
+        """
+        Function for ReverseMode (f(*x), mode 'reverse') or ForwardMode (f(x), mode 'forward').
+        """
+        return self.graph.function(mode)
+
+    def __repr__(self):
+        """
+        Represents the compiled expression as a string.
+        """
+        return f"CompiledExpression({self.expression!r}, n_inputs={self.n_inputs}, compiled={self.program is not None})"
+
+
+def compile_expression(expression, variables=None):
+    """
+    Parse and compile an expression, or take it from the cache.
+
+    The cache is keyed by the exact string first, then by the normalized
+    expression, so "x1*x2" and "x1 * (x2)" share one program. It keeps the
+    CACHE_SIZE most recently used expressions.
+
+    Parameters
+    ----------
+    expression : str
+    variables : sequence of str, optional
+        input names, in input order (default x1, x2, ...)
+
+    Returns
+    -------
+    CompiledExpression
+
+    Example
+    -------
+    >>> value, gradient = compile_expression('a*sin(b)', variables=['a', 'b'])([2.0, 0.0])
+    >>> compile_expression('a * sin(b)', variables=['a', 'b']) is compile_expression('a*sin(b)', ['a', 'b'])
+    True
+    """
+    global _hits, _misses
+    variables = tuple(variables) if variables is not None else None
+    with _lock:
+        compiled = _cache.get((expression, variables))
+        if compiled is not None:
+            _cache.move_to_end((expression, variables))
+            _hits += 1
+            return compiled
+    graph = parse(expression, variables)
+    with _lock:
+        key = (graph.expression, variables)
+        compiled = _cache.get(key)
+        if compiled is None:
+            _misses += 1
+            compiled = CompiledExpression(graph)
+            _cache[key] = compiled
+        else:
+            _hits += 1
+        _cache.move_to_end(key)
+        if expression != graph.expression:
+            # the raw string is an alias of the normalized entry
+            _cache[(expression, variables)] = compiled
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return compiled
+
+
+def cache_info():
+    """
+    Hits, misses and size of the expression cache.
+    """
+    with _lock:
+        return {'hits': _hits, 'misses': _misses, 'size': len(_cache), 'max_size': CACHE_SIZE}
+
+
+def clear_cache():
+    """
+    Empty the expression cache and reset its counters.
+    """
+    global _hits, _misses
+    with _lock:
+        _cache.clear()
+        _hits = _misses = 0
@@ -4,9 +4,11 @@
 
 import numpy as np
 from .DualNumber import DualNumber
+from .Precision import precision as _precision, current_policy
+from .SparseTangent import sparse_jacobian
 
 
-def ForwardMode(f, x, p=None, gradient=False, jacobian=False):
+def ForwardMode(f, x, p=None, gradient=False, jacobian=False, precision=None, sparse=False):
     """
     Function that user interfaces with to compute scalar/vector functions with scalar/vector inputs of their complex function.
 
@@ -18,6 +20,12 @@ def ForwardMode(f, x, p=None, gradient=False, jacobian=False):
         seed vector
     gradient : optional
     jacobian : optional
+    precision : optional
+        precision policy of this call, 'float64', 'float32' or 'mixed'
+        (float32 values and tangents); see Precision.precision
+    sparse : optional
+        with jacobian=True, propagate sparse tangents (SparseTangent) in one
+        pass and return the Jacobian as a SparseMatrix
 
     Output
     ------
@@ -31,6 +39,8 @@ def ForwardMode(f, x, p=None, gradient=False, jacobian=False):
         return only gradient
     if jacobian == True:
         return only Jacobian 
+    if jacobian == True and sparse == True:
+        return the Jacobian as a SparseMatrix (one row for a scalar function)
 
     EXAMPLE
     -------
@@ -42,6 +52,13 @@ def ForwardMode(f, x, p=None, gradient=False, jacobian=False):
     >>> print(f, df)
     (53.66938209690045, 34.360705101546074)
     """
+    if precision is not None:
+        with _precision(precision):
+            return ForwardMode(f, x, p, gradient, jacobian, sparse=sparse)
+    if sparse:
+        if not jacobian:
+            raise ValueError("sparse=True computes a sparse Jacobian, use it with jacobian=True")
+        return sparse_jacobian(f, x)
     if not (gradient or jacobian): 
         if p is None: # Unidimentional
             assert isinstance(x, (DualNumber)) or np.issubdtype(type(x), np.integer) or isinstance(x, (np.floating, float)) or ((type(x) in [tuple, list, np.ndarray]) and (len(x)==1)), f"{x}, {type(x)} has to be a DualNumber, an integer, a float or an array-like of length one in the unidimentional case"
@@ -73,6 +90,8 @@ def ForwardMode(f, x, p=None, gradient=False, jacobian=False):
 
                     x = np.array(x)
                     p = np.array(p)
+                    if current_policy().storage is not np.float64:
+                        x, p = current_policy().cast(x), current_policy().cast(p)
 
                     if np.issubdtype(type(f(x)), np.integer) or isinstance(f(x), (np.floating, float)): # function at values in R
 
@@ -93,7 +112,7 @@ def ForwardMode(f, x, p=None, gradient=False, jacobian=False):
                         else:
                             nb_var = len(x)
                         nb_func = len(f(x))
-                        jacobian = np.zeros((nb_func, nb_var))
+                        jacobian = np.zeros((nb_func, nb_var), dtype=current_policy().storage)
                         for j in range(nb_var): #goes through variables
                             for i in range(nb_func): #goes through coordinates functions
                                 coord_func = lambda y : f(y)[i]
@@ -142,7 +161,7 @@ def ForwardMode(f, x, p=None, gradient=False, jacobian=False):
                 else:
                     nb_var = len(x)
                 nb_func = len(f(x)) 
-                jacobian = np.zeros((nb_func, nb_var))
+                jacobian = np.zeros((nb_func, nb_var), dtype=current_policy().storage)
                 for j in range(nb_var): #goes through variables
                     for i in range(nb_func): #goes through coordinates functions
                         coord_func = lambda y : f(y)[i]
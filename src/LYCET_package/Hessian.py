@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# File: Hessian.py
+# Description: Hessian-vector products, sparse Hessians from star colorings of the Hessian sparsity pattern,
+#              and the edge-pushing second order reverse sweep over Node graphs
+
+import numpy as np
+from .Node import Node
+from .Primitives import primitive
+from .Tape import trace
+from .SparseMatrix import SparseMatrix
+from .Sparsity import hessian_sparsity
+from .Coloring import star_coloring
+from .DiskCache import function_key
+
+# star colorings already computed, by function_key of the function
+_COLORINGS = {}
+
+
+def hessian_vector_product(f, x, v):
+    """
+    Hessian-vector products of a scalar function, by forward over reverse on a traced tape.
+
+    Parameters
+    ----------
+    f : user defined scalar function with reverse LYCET operations, called as f(*nodes)
+    x : input variable(s)
+    v : array-like of shape (n,) or (n, k), the k vectors are pushed through one sweep
+
+    Returns
+    -------
+    value, gradient, H @ v
+
+    Example
+    -------
+    >>> f = lambda x1, x2: x1*x1*x2
+    >>> hessian_vector_product(f, [1, 2], [1, 0])
+    (2.0, array([4., 1.]), array([4., 2.]))
+    """
+    if isinstance(x, (int, float)):
+        x = [x]
+    return trace(f, x).hessian_vector_product(x, np.atleast_1d(v))
+
+
+def _recover(pattern, colors, B):
+    """
+    Entries of a symmetric matrix from its products B with the color seed vectors (star coloring).
+    """
+    rows, cols = pattern.rows, pattern.cols
+    off = rows != cols
+    # number of neighbours of every vertex in every color
+    counts = np.zeros((pattern.shape[0], colors.max() + 1 if len(colors) else 1), dtype=int)
+    np.add.at(counts, (rows[off], colors[cols[off]]), 1)
+    # H_ij is read in row i when j is the only neighbour of i with its color, else in row j
+    direct = counts[rows, colors[cols]] == 1
+    data = np.where(direct | ~off, B[rows, colors[cols]], B[cols, colors[rows]])
+    return SparseMatrix(rows, cols, data, pattern.shape)
+
+
+def sparse_hessian(f, x, pattern=None, cache=True):
+    """
+    Sparse Hessian of a scalar function from as many Hessian-vector products as colors.
+
+    The Hessian sparsity pattern is traced once (Sparsity.hessian_sparsity)
+    and star colored (Coloring.star_coloring). Every color gives one seed
+    vector, the sum of the unit vectors of its columns, and all the seeds
+    go through a single forward-over-reverse sweep. The star coloring makes
+    every nonzero readable from one of the compressed products, so the cost
+    grows with the number of colors (a few for banded or locally coupled
+    problems) instead of with n.
+
+    Parameters
+    ----------
+    f : user defined scalar function with reverse LYCET operations, called as f(*nodes)
+    x : input variable(s)
+    pattern : SparseMatrix, optional
+        Hessian sparsity pattern (default: traced with hessian_sparsity)
+    cache : bool, optional
+        reuse the pattern and coloring computed for f before (default True)
+
+    Returns
+    -------
+    value : f evaluated at x
+    gradient : np.ndarray
+    H : SparseMatrix, the Hessian at x on the sparsity pattern
+
+    Example
+    -------
+    >>> f = lambda *x: rmo.sum([rmo.sin(x[i])*x[i + 1] for i in range(999)])
+    >>> value, gradient, H = sparse_hessian(f, np.ones(1000))
+    >>> H.nnz, H.toarray()[0, :2]
+    (2997, array([-0.84147098,  0.54030231]))
+    """
+    if isinstance(x, (int, float)):
+        x = [x]
+    n = len(x)
+    key = function_key(f, n, sparsity='hessian-coloring') if cache and pattern is None else None
+    if key is not None and key in _COLORINGS:
+        pattern, colors = _COLORINGS[key]
+    else:
+        if pattern is None:
+            pattern = hessian_sparsity(f, n, cache=cache)
+        colors = star_coloring(pattern)
+        if key is not None:
+            _COLORINGS[key] = (pattern, colors)
+    n_colors = colors.max() + 1 if n else 0
+    seeds = np.zeros((n, max(n_colors, 1)))
+    seeds[np.arange(n), colors] = 1.0
+    value, gradient, B = trace(f, x).hessian_vector_product(x, seeds)
+    return value, gradient, _recover(pattern, colors, B)
+
+
+def _add(W, a, b, value):
+    row = W.get(a)
+    if row is None:
+        W[a] = {b: value}
+    else:
+        row[b] = row.get(b, 0.0) + value
+
+
+def edge_pushing(output):
+    """
+    Adjoints and second order adjoints of every leaf of a Node graph, in one reverse sweep.
+
+    This is the edge-pushing algorithm of Gower and Mello (2012). The nodes
+    are visited in reverse topological order, like in Node.get_adjoints.
+    Besides the adjoint, the sweep keeps a sparse symmetric map W of second
+    order adjoints between the nodes still alive. When node i is
+    eliminated, its entries of W are pushed onto its children through the
+    partials of its edges, and adjoint(i) times its local second derivatives
+    (the hessian rule of the primitive recorded in node.op) is created between
+    its children. Only pairs of nodes that really interact are ever stored.
+
+    Parameters
+    ----------
+    output : Node
+        scalar result of the function
+
+    Returns
+    -------
+    adjoints : dict, id(node) -> adjoint
+    W : dict of dict, id(node) -> {id(other node) -> second order adjoint}, symmetric,
+        restricted to the leaves at the end of the sweep
+
+    Example
+    -------
+    >>> x1, x2 = Node(1.0), Node(2.0)
+    >>> adjoints, W = edge_pushing(x1*x1*x2)
+    >>> W[id(x1)][id(x1)], W[id(x1)][id(x2)]
+    (4.0, 2.0)
+    """
+    order = output.topological_order()
+    adjoints = {id(output): 1.0}
+    W = {}
+    for node in reversed(order):
+        if not node.deriv:
+            continue
+        i = id(node)
+        row = W.pop(i, {})
+        w_ii = row.pop(i, 0.0)
+        for p in row:
+            del W[p][i]
+        # several edges may lead to the same child (x*x): merge them
+        partials = {}
+        for child, partial in node.deriv:
+            c = id(child)
+            partials[c] = partials.get(c, 0.0) + partial
+        # pushing: the second order adjoints of node go to its children
+        for p, w in row.items():
+            for c, d in partials.items():
+                _add(W, c, p, d*w)
+                _add(W, p, c, d*w)
+        if w_ii != 0.0:
+            for c, d in partials.items():
+                for e, g in partials.items():
+                    _add(W, c, e, d*g*w_ii)
+        # creating: adjoint times the local second derivatives
+        adjoint = adjoints.get(i, 0.0)
+        if adjoint != 0.0:
+            if node.op is None or node.op == 'input' or primitive(node.op).hessian is None:
+                raise ValueError(f"The node {node} has no second derivative rule (op {node.op!r})")
+            children = [id(child) for child, _ in node.deriv]
+            values = [child.value for child, _ in node.deriv]
+            for j, k, h in primitive(node.op).hessian(values, tuple(node.params), node.value):
+                _add(W, children[j], children[k], adjoint*h)
+                if j != k:
+                    _add(W, children[k], children[j], adjoint*h)
+            for c, d in partials.items():
+                adjoints[c] = adjoints.get(c, 0.0) + adjoint*d
+    return adjoints, W
+
+
+def reverse_hessian(f, x):
+    """
+    Value, gradient and full sparse Hessian of a scalar function, by edge pushing on its Node graph.
+
+    One forward pass records the graph, one second order reverse sweep
+    (edge_pushing) gives every Hessian entry: no sparsity pattern or
+    coloring is needed in advance, and only interacting pairs are stored.
+
+    Parameters
+    ----------
+    f : user defined scalar function with reverse LYCET operations, called as f(*nodes)
+    x : input variable(s)
+
+    Returns
+    -------
+    value : f evaluated at x
+    gradient : list, like ReverseMode
+    H : SparseMatrix, the Hessian at x
+
+    Example
+    -------
+    >>> value, gradient, H = reverse_hessian(lambda x1, x2: x1*x1*x2 + rmo.sin(x2), [1.0, 2.0])
+    >>> H.toarray()
+    array([[ 4.        ,  2.        ],
+           [ 2.        , -0.90929743]])
+    """
+    if isinstance(x, (int, float)):
+        x = [x]
+    nodes = [Node(xi) for xi in x]
+    output = f(*nodes)
+    n = len(nodes)
+    if not isinstance(output, Node):
+        # f does not depend on its inputs
+        return output, [0]*n, SparseMatrix([], [], np.zeros(0), (n, n))
+    adjoints, W = edge_pushing(output)
+    position = {id(node): k for k, node in enumerate(nodes)}
+    rows, cols, data = [], [], []
+    for a, row in W.items():
+        if a not in position:
+            continue
+        for b, value in row.items():
+            if b in position and value != 0.0:
+                rows.append(position[a])
+                cols.append(position[b])
+                data.append(value)
+    gradient = [adjoints.get(id(node), 0) for node in nodes]
+    return output.value, gradient, SparseMatrix(rows, cols, np.array(data, dtype=float), (n, n))
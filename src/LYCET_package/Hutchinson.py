@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# File: Hutchinson.py
+# Description: stochastic estimators of the trace and the diagonal of Hessians (Hutchinson, Hutch++ and Diag++)
+#              from batched Hessian-vector products
+
+import numpy as np
+from .Tape import trace
+
+
+class StochasticEstimate:
+    """
+    A class to represent a stochastic estimate together with its uncertainty.
+
+    Attributes
+    ----------
+    estimate : float or np.ndarray
+        the estimated quantity (a float for traces, an array for diagonals)
+    variance : float or np.ndarray
+        estimated variance of estimate, the sample variance of the probes over their number
+    n_probes : int
+        number of random probes averaged by the estimator
+    n_hvp : int
+        total number of Hessian-vector products, including the sketch of Hutch++
+    method : str
+        'hutchinson' or 'hutch++'
+    value : float
+        function evaluated at x
+    gradient : np.ndarray
+        gradient at x, a by-product of the Hessian-vector products
+
+    Methods
+    -------
+    standard_error():
+        square root of the variance
+
+    Example
+    -------
+    >>> result = hessian_trace(f, x, n_probes=60, seed=0)
+    >>> result.estimate, result.standard_error(), result.n_hvp
+    (12.03, 0.41, 60)
+    """
+
+    def __init__(self, estimate, variance, n_probes, n_hvp, method, value, gradient):
+        """
+        Constructs all necessary attributes for the StochasticEstimate object.
+
+        Parameters
+        ----------
+        estimate, variance : float or np.ndarray
+        n_probes, n_hvp : int
+        method : str
+        value : float
+        gradient : np.ndarray
+        """
+        self.estimate = estimate
+        self.variance = variance
+        self.n_probes = n_probes
+        self.n_hvp = n_hvp
+        self.method = method
+        self.value = value
+        self.gradient = gradient
+
+    def standard_error(self):
+        """
+        Standard error of the estimate, the square root of its variance.
+        """
+        return np.sqrt(self.variance)
+
+    def __repr__(self):
+        """
+        Represents the estimate as a string.
+        """
+        return (f"StochasticEstimate(method={self.method!r}, n_probes={self.n_probes}, n_hvp={self.n_hvp}, "
+                f"standard_error={np.max(self.standard_error()):.3g})")
+
+
+def _tape(f, x, mode):
+    """
+    Trace f, called like ReverseMode ('reverse', f(*x)) or ForwardMode ('forward', f(x)).
+    """
+    if isinstance(x, (int, float)):
+        x = [x]
+    x = np.asarray(x, dtype=float)
+    if mode == 'reverse':
+        return trace(f, x), x
+    if mode == 'forward':
+        # the forward operations also accept Nodes, so f records the same tape
+        return trace(lambda *z: f(list(z)), x), x
+    raise ValueError(f"Unknown mode {mode!r}, expected 'reverse' or 'forward'")
+
+
+def _probes(rng, n, k):
+    """
+    n x k matrix of Rademacher probes (independent random signs).
+    """
+    return rng.integers(0, 2, size=(n, k))*2.0 - 1.0
+
+
+def _split(n_probes, method, n):
+    """
+    Number of sketch vectors and of residual probes of a budget of n_probes Hessian-vector products.
+    """
+    assert isinstance(n_probes, (int, np.integer)) and n_probes > 0, f"n_probes {n_probes} has to be a positive integer"
+    if method == 'hutchinson':
+        return 0, n_probes
+    if method == 'hutch++':
+        # a third of the budget sketches the range, a third applies H to its basis (Meyer et al., 2021)
+        k = min(n_probes//3, n)
+        assert n_probes - 2*k > 1, f"hutch++ needs at least 4 Hessian-vector products, got {n_probes}"
+        return k, n_probes - 2*k
+    raise ValueError(f"Unknown method {method!r}, expected 'hutchinson' or 'hutch++'")
+
+
+def _mean(samples):
+    """
+    Mean of the samples along the last axis and the estimated variance of that mean.
+    """
+    m = samples.shape[-1]
+    variance = samples.var(axis=-1, ddof=1)/m if m > 1 else np.full(samples.shape[:-1], np.inf)
+    return samples.mean(axis=-1), variance
+
+
+def _basis(tape, x, n, k, rng):
+    """
+    Orthonormal basis Q of the dominant range of H and the product H Q (two batched sweeps).
+    """
+    value, gradient, HS = tape.hessian_vector_product(x, _probes(rng, n, k))
+    Q, _ = np.linalg.qr(HS)
+    _, _, HQ = tape.hessian_vector_product(x, Q)
+    return Q, HQ
+
+
+def hessian_trace(f, x, n_probes=30, method='hutchinson', mode='reverse', seed=None):
+    """
+    Stochastic estimate of the trace of the Hessian of a scalar function.
+
+    Hutchinson's estimator averages z^T H z over Rademacher probes z, all
+    pushed through a single batched forward-over-reverse sweep of the
+    traced tape (Tape.hessian_vector_product). With method='hutch++' a
+    third of the budget sketches the dominant range of H, whose trace
+    tr(Q^T H Q) is computed exactly, and the remaining probes, projected
+    out of that range, only estimate the trace of the rest. For Hessians
+    with decaying spectra this needs far fewer products for the same error.
+
+    Parameters
+    ----------
+    f : user defined scalar function with LYCET operations
+    x : input variable(s)
+    n_probes : int, optional
+        budget of Hessian-vector products (default 30)
+    method : str, optional
+        'hutchinson' (default) or 'hutch++'
+    mode : str, optional
+        'reverse' (default) to call f(*x) like ReverseMode, 'forward' to call f(x) like ForwardMode
+    seed : int or np.random.Generator, optional
+
+    Returns
+    -------
+    StochasticEstimate with a float estimate
+
+    Example
+    -------
+    >>> f = lambda *x: rmo.sum([xi**4 for xi in x])
+    >>> hessian_trace(f, np.ones(100), n_probes=10, seed=0).estimate
+    1200.0
+    """
+    tape, x = _tape(f, x, mode)
+    n = len(x)
+    k, m = _split(n_probes, method, n)
+    rng = np.random.default_rng(seed)
+    exact = 0.0
+    G = _probes(rng, n, m)
+    if k:
+        Q, HQ = _basis(tape, x, n, k, rng)
+        exact = np.trace(Q.T @ HQ)
+        G = G - Q @ (Q.T @ G)
+    value, gradient, HG = tape.hessian_vector_product(x, G)
+    estimate, variance = _mean(np.einsum('ij,ij->j', G, HG))
+    return StochasticEstimate(float(exact + estimate), float(variance), m, 2*k + m, method, value, gradient)
+
+
+def hessian_diagonal(f, x, n_probes=30, method='hutchinson', mode='reverse', seed=None):
+    """
+    Stochastic estimate of the diagonal of the Hessian of a scalar function.
+
+    The estimator (Bekas, Kokiopoulou and Saad, 2007) averages z * (H z)
+    over Rademacher probes z, pushed through one batched sweep. With
+    method='hutch++' (Diag++, Baston and Nakatsukasa, 2022) the diagonal
+    of the projection Q Q^T H on a sketched dominant range is computed
+    exactly and only the diagonal of the remainder (I - Q Q^T) H is
+    estimated from the probes. The variance is reported per entry.
+
+    Parameters
+    ----------
+    f : user defined scalar function with LYCET operations
+    x : input variable(s)
+    n_probes : int, optional
+        budget of Hessian-vector products (default 30)
+    method : str, optional
+        'hutchinson' (default) or 'hutch++'
+    mode : str, optional
+        'reverse' (default) to call f(*x) like ReverseMode, 'forward' to call f(x) like ForwardMode
+    seed : int or np.random.Generator, optional
+
+    Returns
+    -------
+    StochasticEstimate with an np.ndarray estimate of shape (n,)
+
+    Example
+    -------
+    >>> f = lambda *x: rmo.sum([xi**4 for xi in x])
+    >>> hessian_diagonal(f, np.ones(3), n_probes=10, seed=0).estimate
+    array([12., 12., 12.])
+    """
+    tape, x = _tape(f, x, mode)
+    n = len(x)
+    k, m = _split(n_probes, method, n)
+    rng = np.random.default_rng(seed)
+    exact = np.zeros(n)
+    G = _probes(rng, n, m)
+    value, gradient, HG = tape.hessian_vector_product(x, G)
+    if k:
+        Q, HQ = _basis(tape, x, n, k, rng)
+        # (Q Q^T H)_ii = sum_j Q_ij (H Q)_ij since H is symmetric
+        exact = np.einsum('ij,ij->i', Q, HQ)
+        HG = HG - Q @ (HQ.T @ G)
+    estimate, variance = _mean(G*HG)
+    return StochasticEstimate(exact + estimate, variance, m, 2*k + m, method, value, gradient)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# File: IndexSet.py
+# Description: create IndexSet class, a value-free tracer carrying the set of inputs a variable depends on
+
+import numpy as np
+
+
+class IndexSet:
+    """
+    A class to represent the dependencies of a variable on the inputs, for sparsity tracing.
+
+    An IndexSet carries no value: only a bitset whose bit i is set when the
+    variable depends on input i. Every operation returns the union of the
+    bitsets of its operands, so running a function once on IndexSet inputs
+    gives the Boolean pattern of its Jacobian at every point. Comparisons
+    raise a TypeError, since there is no value to branch on.
+
+    Attributes
+    ----------
+    deps : int
+        bitset of the inputs the variable depends on
+
+    Methods
+    -------
+    indices():
+        sorted list of the inputs the variable depends on
+    combine(op, operands):
+        IndexSet of the result of an operation (used by the primitives)
+    __add__(other), __sub__(other), __mul__(other), __truediv__(other), __pow__(other):
+        union of the dependencies of the operands
+    __radd__(other), __rsub__(other), __rmul__(other), __rtruediv__(other), __rpow__(other):
+        reverse operations
+    __neg__(), __pos__():
+        same dependencies
+    __repr__():
+        string representation of index sets
+
+    Example
+    -------
+    >>> x = [IndexSet.input(i) for i in range(3)]
+    >>> (x[0]*x[2] + 1).indices()
+    [0, 2]
+    """
+
+    __slots__ = ('deps',)
+
+    def __init__(self, deps=0):
+        """
+        Constructs all the necessary attributes for the IndexSet object.
+
+        Parameters
+        ----------
+        deps : int, optional
+            bitset of the inputs the variable depends on (default: none, a constant)
+        """
+        self.deps = deps
+
+    @classmethod
+    def input(cls, i):
+        """
+        IndexSet of input variable i.
+        """
+        return cls(1 << i)
+
+    @staticmethod
+    def union(operands):
+        """
+        IndexSet depending on every input any of the operands depends on (numbers are constants).
+        """
+        deps = 0
+        for operand in operands:
+            if isinstance(operand, IndexSet):
+                deps |= operand.deps
+        return IndexSet(deps)
+
+    def indices(self):
+        """
+        Sorted list of the inputs the variable depends on.
+        """
+        return list(_bits(self.deps))
+
+    def combine(self, op, operands):
+        """
+        Result of the operation op on the operands (IndexSets or numbers): the union of their dependencies.
+        """
+        return IndexSet.union(operands)
+
+    def _binary(self, op, operands):
+        for operand in operands:
+            assert isinstance(operand, (IndexSet, int, float, np.number)), f"The object {operand} is not an IndexSet, integer, or float"
+        return self.combine(op, operands)
+
+    def __add__(self, other):
+        return self._binary('add', (self, other))
+
+    def __sub__(self, other):
+        return self._binary('sub', (self, other))
+
+    def __mul__(self, other):
+        return self._binary('mul', (self, other))
+
+    def __truediv__(self, other):
+        return self._binary('div', (self, other))
+
+    def __pow__(self, other):
+        return self._binary('pow', (self, other))
+
+    def __radd__(self, other):
+        return self._binary('add', (other, self))
+
+    def __rsub__(self, other):
+        return self._binary('sub', (other, self))
+
+    def __rmul__(self, other):
+        return self._binary('mul', (other, self))
+
+    def __rtruediv__(self, other):
+        return self._binary('div', (other, self))
+
+    def __rpow__(self, other):
+        return self._binary('rpow', (other, self))
+
+    def __neg__(self):
+        return self._binary('sub', (0.0, self))
+
+    def __pos__(self):
+        return self
+
+    def _compare(self, other=None):
+        raise TypeError("Cannot compare IndexSets: sparsity tracing has no values, "
+                        "so the traced function must not branch on its inputs")
+
+    __eq__ = __ne__ = __lt__ = __le__ = __gt__ = __ge__ = __bool__ = _compare
+    __hash__ = object.__hash__
+
+    def __repr__(self):
+        """
+        Represents the index set as a string.
+        """
+        return f"IndexSet({self.indices()})"
+
+
+# operations of the registry grouped by the structure of their second derivatives
+_LINEAR = {'add', 'sub', 'sum', 'mean'}
+# operand k of the first half only interacts with operand k of the second half
+_BILINEAR = {'mul', 'dot'}
+_PAIRWISE = {'mse', 'least_squares'}
+
+
+def _bits(deps):
+    while deps:
+        low = deps & -deps
+        yield low.bit_length() - 1
+        deps ^= low
+
+
+class HessianIndexSet(IndexSet):
+    """
+    A class to represent the dependencies of a variable for Hessian sparsity tracing.
+
+    Besides the inputs it depends on, every HessianIndexSet shares a table
+    with the other variables of the same trace. Each nonlinear operation
+    records there which inputs interact in its second derivatives: x*y adds
+    the pairs between the dependencies of x and of y, sin(x) all the pairs
+    of the dependencies of x, additions add nothing. After one pass the
+    table is the sparsity pattern of the Hessian. It is conservative: work
+    whose result is never used still records its pairs.
+
+    Attributes
+    ----------
+    deps : int
+        bitset of the inputs the variable depends on
+    rows : list of int
+        shared table, rows[i] is the bitset of the inputs interacting with input i
+
+    Methods
+    -------
+    inputs(n):
+        the n input variables of a new trace
+    combine(op, operands):
+        IndexSet of the result, recording the interactions of op
+
+    Example
+    -------
+    >>> x = HessianIndexSet.inputs(3)
+    >>> y = x[0]*x[1] + rmo.sin(x[2])
+    >>> [list(_bits(row)) for row in y.rows]
+    [[1], [0], [2]]
+    """
+
+    __slots__ = ('rows',)
+
+    def __init__(self, deps, rows):
+        """
+        Constructs all the necessary attributes for the HessianIndexSet object.
+
+        Parameters
+        ----------
+        deps : int
+            bitset of the inputs the variable depends on
+        rows : list of int
+            interaction table shared by the variables of the trace
+        """
+        super().__init__(deps)
+        self.rows = rows
+
+    @classmethod
+    def inputs(cls, n):
+        """
+        The n input variables of a new trace, sharing an empty interaction table.
+        """
+        rows = [0]*n
+        return [cls(1 << i, rows) for i in range(n)]
+
+    def _interact(self, a, b):
+        """
+        Record that every input of bitset a interacts with every input of bitset b.
+        """
+        if not a or not b:
+            return
+        for i in _bits(a):
+            self.rows[i] |= b
+        for j in _bits(b):
+            self.rows[j] |= a
+
+    def combine(self, op, operands):
+        """
+        IndexSet of the result of op, recording its second order interactions.
+        """
+        deps = [operand.deps if isinstance(operand, IndexSet) else 0 for operand in operands]
+        half = len(deps)//2
+        if op in _LINEAR:
+            pass
+        elif op in _BILINEAR:
+            for a, b in zip(deps[:half], deps[half:]):
+                self._interact(a, b)
+        elif op in _PAIRWISE:
+            for a, b in zip(deps[:half], deps[half:]):
+                self._interact(a | b, a | b)
+        elif op == 'div':
+            self._interact(deps[0], deps[1])
+            self._interact(deps[1], deps[1])
+        else:
+            union = 0
+            for a in deps:
+                union |= a
+            self._interact(union, union)
+        union = 0
+        for a in deps:
+            union |= a
+        return HessianIndexSet(union, self.rows)
@@ -3,7 +3,34 @@
 # Description: Define functions (which do not have a magic function) and their derivatives for Forward Mode
 
 from .DualNumber import DualNumber
+from .IndexSet import IndexSet
+from .Node import Node
 import numpy as np
+from .Primitives import primitive
+
+# the primitives are bound once: DualNumber operands go straight to their rules
+_arccos = primitive('arccos')
+_arcsin = primitive('arcsin')
+_arctan = primitive('arctan')
+_cos = primitive('cos')
+_cosh = primitive('cosh')
+_dot = primitive('dot')
+_exp = primitive('exp')
+_least_squares = primitive('least_squares')
+_ln = primitive('ln')
+_log = primitive('log')
+_logsumexp = primitive('logsumexp')
+_mean = primitive('mean')
+_mse = primitive('mse')
+_norm = primitive('norm')
+_prod = primitive('prod')
+_sigmoid = primitive('sigmoid')
+_sin = primitive('sin')
+_sinh = primitive('sinh')
+_softplus = primitive('softplus')
+_sum = primitive('sum')
+_tan = primitive('tan')
+_tanh = primitive('tanh')
 
 def sin(z):
     """
@@ -25,11 +52,9 @@ def sin(z):
     >>> print(f1)
     Dual Number (real=0.9092974268256817, dual=-1.2484405096414273)
     """
-    assert isinstance(z, (DualNumber)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, integer, or float"
-    if np.issubdtype(type(z), np.integer) or isinstance(z, (np.floating, float)):
-        return np.sin(z)
-    return DualNumber(np.sin(z.real), np.cos(z.real)*z.dual)
-    
+    assert isinstance(z, (DualNumber, IndexSet, Node)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, Node, IndexSet, integer, or float"
+    return _sin._dual(z) if isinstance(z, DualNumber) else _evaluate(_sin, z)
+
 def cos(z):
     """
     Overloaded elementary trig function cosine
@@ -50,10 +75,8 @@ def cos(z):
     >>> print(f1)
     Dual Number (real=-0.4161468365471424, dual=-2.727892280477045)
     """
-    assert isinstance(z, (DualNumber)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, integer, or float"
-    if np.issubdtype(type(z), np.integer) or isinstance(z, (np.floating, float)):
-        return np.cos(z) 
-    return DualNumber(np.cos(z.real), -np.sin(z.real)*z.dual) 
+    assert isinstance(z, (DualNumber, IndexSet, Node)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, Node, IndexSet, integer, or float"
+    return _cos._dual(z) if isinstance(z, DualNumber) else _evaluate(_cos, z)
 
 def tan(z):
     """
@@ -75,13 +98,8 @@ def tan(z):
     >>> print(f1)
     Dual Number (real=-2.185039863261519, dual=17.323197612125753)
     """
-    assert isinstance(z, (DualNumber)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, integer, or float"
-    if np.issubdtype(type(z), np.integer) or isinstance(z, (np.floating, float)):
-        return np.tan(z)
-    if (np.abs(np.cos(z.real)) < np.finfo(float).eps):
-        raise ValueError("Invalid domain for Tan.")
-    return DualNumber(np.tan(z.real), (1 + (np.sin(z.real)**2)/(np.cos(z.real)**2))*z.dual) 
-    
+    assert isinstance(z, (DualNumber, IndexSet, Node)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, Node, IndexSet, integer, or float"
+    return _tan._dual(z) if isinstance(z, DualNumber) else _evaluate(_tan, z)
 
 def ln(z):
     """
@@ -103,12 +121,8 @@ def ln(z):
     >>> print(f1)
     Dual Number (real=0.6931471805599453, dual=1.5)
     """
-    assert isinstance(z, (DualNumber)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, integer, or float"
-    if np.issubdtype(type(z), np.integer) or isinstance(z, (np.floating, float)):
-        return np.log(z)
-    if (z.real <= 0):
-        raise ValueError("Cannot compute logarithm of negative numbers or 0")
-    return DualNumber(np.log(z.real), z.dual/z.real)
+    assert isinstance(z, (DualNumber, IndexSet, Node)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, Node, IndexSet, integer, or float"
+    return _ln._dual(z) if isinstance(z, DualNumber) else _evaluate(_ln, z)
 
 def log(z, base):
     """
@@ -131,12 +145,10 @@ def log(z, base):
     >>> print(f1)
     Dual Number (real=0.30102999566398114, dual=0.6514417228548777)
     """
-    assert isinstance(z, (DualNumber)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, integer, or float"
+    assert isinstance(z, (DualNumber, IndexSet, Node)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, Node, IndexSet, integer, or float"
     if base <= 0:
         raise ValueError("Cannot compute logarithm of negative numbers")
-    if np.issubdtype(type(z), np.integer) or isinstance(z, (np.floating, float)):
-        return np.log(z)/np.log(base)
-    return ln(z)/np.log(base)
+    return _log._dual(z, base) if isinstance(z, DualNumber) else _evaluate(_log, z, base)
 
 def exp(z):
     """
@@ -158,11 +170,8 @@ def exp(z):
     >>> print(f1)
     Dual Number (real=7.38905609893065, dual=22.16716829679195)
     """
-    assert isinstance(z, (DualNumber)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, integer, or float"
-    if np.issubdtype(type(z), np.integer) or isinstance(z, (np.floating, float)):
-        return np.exp(z)
-    return DualNumber(np.exp(z.real), z.dual*np.exp(z.real))
-
+    assert isinstance(z, (DualNumber, IndexSet, Node)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, Node, IndexSet, integer, or float"
+    return _exp._dual(z) if isinstance(z, DualNumber) else _evaluate(_exp, z)
 
 def arcsin(z):
     """
@@ -184,14 +193,8 @@ def arcsin(z):
     >>> print(f1)
     Dual Number (real=0.5235987755982988, dual=0.0)
     """
-    assert isinstance(z, (DualNumber)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, integer, or float"
-    if np.issubdtype(type(z), np.integer) or isinstance(z, (np.floating, float)):
-        return np.arcsin(z)
-    if -1 > z.real or z.real > 1:
-        raise ValueError("Invalid Domain, must between -1 and 1")
-    new_arcsin = np.arcsin(z.real)
-    der_arcsin = z.dual * 1 / np.sqrt(1 - z.real ** 2)
-    return DualNumber(new_arcsin, der_arcsin)
+    assert isinstance(z, (DualNumber, IndexSet, Node)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, Node, IndexSet, integer, or float"
+    return _arcsin._dual(z) if isinstance(z, DualNumber) else _evaluate(_arcsin, z)
 
 def arccos(z):
     """
@@ -213,14 +216,8 @@ def arccos(z):
     >>> print(f1)
     Dual Number (real=1.0471975511965976, dual=0.0)
     """
-    assert isinstance(z, (DualNumber)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, integer, or float"
-    if np.issubdtype(type(z), np.integer) or isinstance(z, (np.floating, float)):
-        return np.arccos(z)
-    if -1 > z.real or z.real > 1:
-        raise ValueError("Invalid Domain, must between -1 and 1")
-    new_arccos = np.arccos(z.real)
-    der_arccos = -z.dual * 1 / np.sqrt(1 - z.real ** 2)
-    return DualNumber(new_arccos, der_arccos)
+    assert isinstance(z, (DualNumber, IndexSet, Node)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, Node, IndexSet, integer, or float"
+    return _arccos._dual(z) if isinstance(z, DualNumber) else _evaluate(_arccos, z)
 
 def arctan(z):
     """
@@ -242,12 +239,8 @@ def arctan(z):
     >>> print(f1)
     Dual Number (real=1.1071487177940906, dual=0.6)
     """
-    assert isinstance(z, (DualNumber)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, integer, or float"
-    if np.issubdtype(type(z), np.integer) or isinstance(z, (np.floating, float)):
-        return np.arctan(z)
-    new_arctan = np.arctan(z.real)
-    der_arctan= z.dual * 1 / ((z.real ** 2) + 1)
-    return DualNumber(new_arctan, der_arctan)
+    assert isinstance(z, (DualNumber, IndexSet, Node)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, Node, IndexSet, integer, or float"
+    return _arctan._dual(z) if isinstance(z, DualNumber) else _evaluate(_arctan, z)
 
 def sinh(z):
     """
@@ -269,10 +262,8 @@ def sinh(z):
     >>> print(f1)
     Dual Number (real=3.626860407847019, dual=11.286587073250894)
     """
-    assert isinstance(z, (DualNumber)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, integer, or float"
-    if np.issubdtype(type(z), np.integer) or isinstance(z, (np.floating, float)):
-        return np.sinh(z)
-    return (exp(z) - exp(-z))/2
+    assert isinstance(z, (DualNumber, IndexSet, Node)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, Node, IndexSet, integer, or float"
+    return _sinh._dual(z) if isinstance(z, DualNumber) else _evaluate(_sinh, z)
 
 def cosh(z):
     """
@@ -294,10 +285,8 @@ def cosh(z):
     >>> print(f1)
     Dual Number (real=3.7621956910836314, dual=10.880581223541055)
     """
-    assert isinstance(z, (DualNumber)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, integer, or float"
-    if np.issubdtype(type(z), np.integer) or isinstance(z, (np.floating, float)):
-        return np.cosh(z)
-    return (exp(z) + exp(-z))/2
+    assert isinstance(z, (DualNumber, IndexSet, Node)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, Node, IndexSet, integer, or float"
+    return _cosh._dual(z) if isinstance(z, DualNumber) else _evaluate(_cosh, z)
 
 def tanh(z):
     """
@@ -319,10 +308,8 @@ def tanh(z):
     >>> print(f1)
     Dual Number (real=0.964027580075817, dual=0.2119524745594934)
     """
-    assert isinstance(z, (DualNumber)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, integer, or float"
-    if np.issubdtype(type(z), np.integer) or isinstance(z, (np.floating, float)):
-        return np.tanh(z)
-    return (exp(z) - exp(-z))/(exp(z) + exp(-z))
+    assert isinstance(z, (DualNumber, IndexSet, Node)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, Node, IndexSet, integer, or float"
+    return _tanh._dual(z) if isinstance(z, DualNumber) else _evaluate(_tanh, z)
 
 def sigmoid(z):
     """
@@ -344,9 +331,224 @@ def sigmoid(z):
     >>> print(f1)
     Dual Number (real=0.8807970779778823, dual=0.3149807562105195)
     """
-    assert isinstance(z, (DualNumber)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, integer, or float"
-    if np.issubdtype(type(z), np.integer) or isinstance(z, (np.floating, float)):
-        return 1/(1 + np.exp(-z))
+    assert isinstance(z, (DualNumber, IndexSet, Node)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, Node, IndexSet, integer, or float"
+    return _sigmoid._dual(z) if isinstance(z, DualNumber) else _evaluate(_sigmoid, z)
+
+def _duals(zs):
+    """
+    Check a sequence of operands of a reduction.
+    """
+    assert isinstance(zs, (list, tuple, np.ndarray)) and len(zs) > 0, f"{zs} has to be a non-empty list, tuple or np.ndarray"
+    for z in zs:
+        assert isinstance(z, (DualNumber, IndexSet, Node)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, Node, IndexSet, integer, or float"
+    return list(zs)
+
+def _pair(zs, ws):
+    """
+    Operands of a reduction over two sequences of the same length.
+    """
+    zs, ws = _duals(zs), _duals(ws)
+    assert len(zs) == len(ws), f"The sequences have different lengths {len(zs)} and {len(ws)}"
+    return zs + ws
+
+def _evaluate(p, z, *params):
+    """
+    Primitive p on a Node or IndexSet operand, or on a plain number evaluated like NumPy
+    without the domain check (nan with a RuntimeWarning outside the domain).
+    """
+    if isinstance(z, (Node, IndexSet)):
+        return p(z, *params)
+    return p.primal([z], params)
+
+def _apply(p, operands):
+    """
+    Reduction p, straight to its DualNumber rule when the first operand is a DualNumber.
+    """
+    return p._dual(*operands) if isinstance(operands[0], DualNumber) else p(*operands)
+
+def sum(zs):
+    """
+    Sum of a sequence, evaluated as one operation
+
+    Parameters
+    =======
+    zs: list, tuple or np.ndarray of DualNumber, int, or float
+
+    Returns
+    =======
+    A new DualNumber object with the sum on the real part and
+    the sum of the tangents on the dual part
+
+    EXAMPLES
+    =======
+    >>> f1 = fm.sum([DualNumber(1, 1), DualNumber(2, 0), 3])
+    >>> print(f1)
+    Dual Number (real=6.0, dual=1.0)
+    """
+    return _apply(_sum, _duals(zs))
+
+def mean(zs):
+    """
+    Arithmetic mean of a sequence, evaluated as one operation
+
+    Parameters
+    =======
+    zs: list, tuple or np.ndarray of DualNumber, int, or float
+
+    Returns
+    =======
+    A new DualNumber object with the mean computation done on the real (function) and dual (derivative)
+
+    EXAMPLES
+    =======
+    >>> f1 = fm.mean([DualNumber(1), DualNumber(2, 0), DualNumber(6, 0)])
+    >>> print(f1)
+    Dual Number (real=3.0, dual=0.3333333333333333)
+    """
+    return _apply(_mean, _duals(zs))
+
+def prod(zs):
+    """
+    Product of a sequence, evaluated as one operation
+
+    Parameters
+    =======
+    zs: list, tuple or np.ndarray of DualNumber, int, or float
+
+    Returns
+    =======
+    A new DualNumber object with the product computation done on the real (function) and dual (derivative)
+
+    EXAMPLES
+    =======
+    >>> f1 = fm.prod([DualNumber(2), 3, 4])
+    >>> print(f1)
+    Dual Number (real=24.0, dual=12.0)
+    """
+    return _apply(_prod, _duals(zs))
+
+def dot(zs, ws):
+    """
+    Dot product of two sequences of the same length, evaluated as one operation
+
+    Parameters
+    =======
+    zs: list, tuple or np.ndarray of DualNumber, int, or float
+    ws: list, tuple or np.ndarray of DualNumber, int, or float
+
+    Returns
+    =======
+    A new DualNumber object with the dot product computation done on the real (function) and dual (derivative)
+
+    EXAMPLES
+    =======
+    >>> f1 = fm.dot([DualNumber(1), 2], [3, 4])
+    >>> print(f1)
+    Dual Number (real=11.0, dual=3.0)
+    """
+    return _apply(_dot, _pair(zs, ws))
+
+def norm(zs):
+    """
+    Euclidean norm of a sequence, evaluated as one operation
 
-    return 1/(1 + exp(-z))
+    Parameters
+    =======
+    zs: list, tuple or np.ndarray of DualNumber, int, or float
 
+    Returns
+    =======
+    A new DualNumber object with the norm computation done on the real (function) and dual (derivative)
+
+    EXAMPLES
+    =======
+    >>> f1 = fm.norm([DualNumber(3), 4])
+    >>> print(f1)
+    Dual Number (real=5.0, dual=0.6)
+    """
+    return _apply(_norm, _duals(zs))
+
+def logsumexp(zs):
+    """
+    log(exp(z_1) + ... + exp(z_n)) of a sequence, evaluated as one operation without overflow
+
+    Parameters
+    =======
+    zs: list, tuple or np.ndarray of DualNumber, int, or float
+
+    Returns
+    =======
+    A new DualNumber object with the log-sum-exp computation done on the real (function) and dual (derivative)
+
+    EXAMPLES
+    =======
+    >>> f1 = fm.logsumexp([DualNumber(1), 2])
+    >>> print(f1)
+    Dual Number (real=2.313261687518223, dual=0.2689414213699951)
+    """
+    return _apply(_logsumexp, _duals(zs))
+
+def softplus(z):
+    """
+    Overloaded elementary function softplus log(1 + exp(z)), stable for large |z|
+
+    Parameters
+    =======
+    z: must be DualNumber, int, or float
+
+    Returns
+    =======
+    A new DualNumber object with the
+    softplus computation done on the real (function) and dual (derivative)
+
+    EXAMPLES
+    =======
+    >>> x = DualNumber(0.5)
+    >>> f1 = fm.softplus(x)
+    >>> print(f1)
+    Dual Number (real=0.9740769841801067, dual=0.6224593312018546)
+    """
+    assert isinstance(z, (DualNumber, IndexSet, Node)) or isinstance(z, (np.floating, float)) or np.issubdtype(type(z), np.integer), f"The object {z} is not a Dual Number, Node, IndexSet, integer, or float"
+    return _softplus._dual(z) if isinstance(z, DualNumber) else _evaluate(_softplus, z)
+
+def mse(predictions, targets):
+    """
+    Mean squared error between two sequences, evaluated as one operation
+
+    Parameters
+    =======
+    predictions: list, tuple or np.ndarray of DualNumber, int, or float
+    targets: list, tuple or np.ndarray of DualNumber, int, or float, same length
+
+    Returns
+    =======
+    A new DualNumber object with mean((predictions - targets)**2) on the real (function) and dual (derivative)
+
+    EXAMPLES
+    =======
+    >>> f1 = fm.mse([DualNumber(1), 2], [0, 0])
+    >>> print(f1)
+    Dual Number (real=2.5, dual=1.0)
+    """
+    return _apply(_mse, _pair(predictions, targets))
+
+def least_squares(predictions, targets):
+    """
+    Least-squares loss 0.5*sum((predictions - targets)**2), evaluated as one operation
+
+    Parameters
+    =======
+    predictions: list, tuple or np.ndarray of DualNumber, int, or float
+    targets: list, tuple or np.ndarray of DualNumber, int, or float, same length
+
+    Returns
+    =======
+    A new DualNumber object with the loss computation done on the real (function) and dual (derivative)
+
+    EXAMPLES
+    =======
+    >>> f1 = fm.least_squares([DualNumber(1), 3], [0.5, 2])
+    >>> print(f1)
+    Dual Number (real=0.625, dual=0.5)
+    """
+    return _apply(_least_squares, _pair(predictions, targets))
@@ -4,6 +4,32 @@
 
 import numpy as np
 from .Node import Node
+from .IndexSet import IndexSet
+from .Primitives import primitive
+
+# the primitives are bound once: Node operands go straight to their rules
+_arccos = primitive('arccos')
+_arcsin = primitive('arcsin')
+_arctan = primitive('arctan')
+_cos = primitive('cos')
+_cosh = primitive('cosh')
+_dot = primitive('dot')
+_exp = primitive('exp')
+_least_squares = primitive('least_squares')
+_ln = primitive('ln')
+_log = primitive('log')
+_logsumexp = primitive('logsumexp')
+_mean = primitive('mean')
+_mse = primitive('mse')
+_norm = primitive('norm')
+_prod = primitive('prod')
+_sigmoid = primitive('sigmoid')
+_sin = primitive('sin')
+_sinh = primitive('sinh')
+_softplus = primitive('softplus')
+_sum = primitive('sum')
+_tan = primitive('tan')
+_tanh = primitive('tanh')
 
 def sin(x):
     """
@@ -25,14 +51,10 @@ def sin(x):
     >>> print(f1)
     [(Reverse-Mode AD:(f(x)=0.9092974268256817, J=[((f(x)=2, J=()), -0.4161468365471424)]
     """
-    assert isinstance(x, (Node, int, float)), f"The object {x} is not a Node, integer, or float"
+    assert isinstance(x, (Node, IndexSet, int, float)), f"The object {x} is not a Node, IndexSet, integer, or float"
     if isinstance(x, (int, float)):
         x = Node(x, )
-    val = np.sin(x.value)
-    deriv = (
-        (x, np.cos(x.value)),
-    )
-    return Node(val, list(deriv))
+    return _sin(x) if isinstance(x, IndexSet) else _sin._node(x)
 
 def cos(x):
     """
@@ -56,14 +78,10 @@ def cos(x):
     >>> f1.deriv
     [(Reverse-Mode AD: (f(x)=2, J=()), -0.9092974268256817)]
     """
-    assert isinstance(x, (Node, int, float)), f"The object {x} is not a Node, integer, or float"
+    assert isinstance(x, (Node, IndexSet, int, float)), f"The object {x} is not a Node, IndexSet, integer, or float"
     if isinstance(x, (int, float)):
         x = Node(x, )
-    val = np.cos(x.value)
-    deriv = (
-        (x, -np.sin(x.value)),
-    )
-    return Node(val, list(deriv))
+    return _cos(x) if isinstance(x, IndexSet) else _cos._node(x)
 
 def tan(x):
     """
@@ -87,16 +105,10 @@ def tan(x):
     >>> f1.deriv
     [(Reverse-Mode AD: (f(x)=2, J=()), 5.774399204041917)]
     """
-    assert isinstance(x, (Node, int, float)), f"The object {x} is not a Node, integer, or float"
+    assert isinstance(x, (Node, IndexSet, int, float)), f"The object {x} is not a Node, IndexSet, integer, or float"
     if isinstance(x, (int, float)):
         x = Node(x, )
-    if (np.abs(np.cos(x.value)) < np.finfo(float).eps):
-        raise ValueError("Invalid domain for Tan.")
-    val = np.tan(x.value)
-    deriv = (
-        (x, 1/((np.cos(x.value))**2)),
-    )
-    return Node(val, list(deriv))
+    return _tan(x) if isinstance(x, IndexSet) else _tan._node(x)
 
 def exp(x):
     """
@@ -120,14 +132,10 @@ def exp(x):
     >>> f1.deriv
     [(Reverse-Mode AD: (f(x)=2, J=()), 7.38905609893065)]
     """
-    assert isinstance(x, (Node, int, float)), f"The object {x} is not a Node, integer, or float"
+    assert isinstance(x, (Node, IndexSet, int, float)), f"The object {x} is not a Node, IndexSet, integer, or float"
     if isinstance(x, (int, float)):
         x = Node(x, )
-    val = np.exp(x.value)
-    deriv = (
-        (x, np.exp(x.value)),
-    )
-    return Node(val, list(deriv))
+    return _exp(x) if isinstance(x, IndexSet) else _exp._node(x)
 
 def ln(x):
     """
@@ -151,16 +159,10 @@ def ln(x):
     >>> f1.deriv
     [(Reverse-Mode AD: (f(x)=2, J=()), 0.5)]
     """
-    assert isinstance(x, (Node, int, float)), f"The object {x} is not a Node, integer, or float"
+    assert isinstance(x, (Node, IndexSet, int, float)), f"The object {x} is not a Node, IndexSet, integer, or float"
     if isinstance(x, (int, float)):
         x = Node(x, )
-    if x.value <= 0:
-        raise ValueError("Cannot comput log of negative numbers or 0")
-    val = np.log(x.value)
-    deriv = (
-        (x, 1/x.value),
-    )
-    return Node(val, list(deriv))
+    return _ln(x) if isinstance(x, IndexSet) else _ln._node(x)
 
 def log(x, base):
     """
@@ -185,16 +187,10 @@ def log(x, base):
     >>> f1.deriv
     [(Reverse-Mode AD: (f(x)=2, J=()), 0.31066746727980593)]
     """
-    assert isinstance(x, (Node, int, float)), f"The object {x} is not a Node, integer, or float"
+    assert isinstance(x, (Node, IndexSet, int, float)), f"The object {x} is not a Node, IndexSet, integer, or float"
     if isinstance(x, (int, float)):
         x = Node(x, )
-    if x.value <= 0:
-        raise ValueError("Cannot comput log of negative numbers or 0")
-    val = np.log(x.value)/np.log(base)
-    deriv = (
-        (x, 1/(x.value*np.log(base))),
-    )
-    return Node(val, list(deriv))
+    return _log(x, base) if isinstance(x, IndexSet) else _log._node(x, base)
 
 def arcsin(x):
     """
@@ -218,16 +214,10 @@ def arcsin(x):
     >>> f1.deriv
     [(Reverse-Mode AD: (f(x)=0.05, J=()), 1.0012523486435176)]
     """
-    assert isinstance(x, (Node, int, float)), f"The object {x} is not a Node, integer, or float"
+    assert isinstance(x, (Node, IndexSet, int, float)), f"The object {x} is not a Node, IndexSet, integer, or float"
     if isinstance(x, (int, float)):
         x = Node(x, )
-    if -1 > x.value or x.value > 1:
-        raise ValueError("Invalid Domain, must be between -1 and 1")
-    val = np.arcsin(x.value)
-    deriv = (
-        (x, 1/np.sqrt(1 - x.value**2)),
-    )
-    return Node(val, list(deriv))
+    return _arcsin(x) if isinstance(x, IndexSet) else _arcsin._node(x)
 
 def arccos(x):
     """
@@ -251,16 +241,10 @@ def arccos(x):
     >>> f1.deriv
     [(Reverse-Mode AD: (f(x)=0.05, J=()), -1.0012523486435176)]
     """
-    assert isinstance(x, (Node, int, float)), f"The object {x} is not a Node, integer, or float"
+    assert isinstance(x, (Node, IndexSet, int, float)), f"The object {x} is not a Node, IndexSet, integer, or float"
     if isinstance(x, (int, float)):
         x = Node(x, )
-    if -1 > x.value or x.value > 1:
-        raise ValueError("Invalid Domain, must be between -1 and 1")
-    val = np.arccos(x.value)
-    deriv = (
-        (x, -1/np.sqrt(1 - x.value**2)),
-    )
-    return Node(val, list(deriv))
+    return _arccos(x) if isinstance(x, IndexSet) else _arccos._node(x)
 
 def arctan(x):
     """
@@ -284,14 +268,10 @@ def arctan(x):
     >>> f1.deriv
     [(Reverse-Mode AD: (f(x)=0.05, J=()), 0.9975062344139651)]
     """
-    assert isinstance(x, (Node, int, float)), f"The object {x} is not a Node, integer, or float"
+    assert isinstance(x, (Node, IndexSet, int, float)), f"The object {x} is not a Node, IndexSet, integer, or float"
     if isinstance(x, (int, float)):
         x = Node(x, )
-    val = np.arctan(x.value)
-    deriv = (
-        (x, 1/((x.value**2) + 1)),
-    )
-    return Node(val, list(deriv))
+    return _arctan(x) if isinstance(x, IndexSet) else _arctan._node(x)
 
 def sinh(x):
     """
@@ -315,14 +295,10 @@ def sinh(x):
     >>> f1.deriv
     [(Reverse-Mode AD: (f(x)=0.05, J=()), 1.001250260438369)]
     """
-    assert isinstance(x, (Node, int, float)), f"The object {x} is not a Node, integer, or float"
+    assert isinstance(x, (Node, IndexSet, int, float)), f"The object {x} is not a Node, IndexSet, integer, or float"
     if isinstance(x, (int, float)):
         x = Node(x, )
-    val = np.sinh(x.value)
-    deriv = (
-        (x, np.cosh(x.value)),
-    )
-    return Node(val, list(deriv))
+    return _sinh(x) if isinstance(x, IndexSet) else _sinh._node(x)
 
 def cosh(x):
     """
@@ -346,14 +322,10 @@ def cosh(x):
     >>> f1.deriv
     [(Reverse - Mode AD: (f(x) = 0.05, J = ()), 0.050020835937655016)]
     """
-    assert isinstance(x, (Node, int, float)), f"The object {x} is not a Node, integer, or float"
+    assert isinstance(x, (Node, IndexSet, int, float)), f"The object {x} is not a Node, IndexSet, integer, or float"
     if isinstance(x, (int, float)):
         x = Node(x, )
-    val = np.cosh(x.value)
-    deriv = (
-        (x, np.sinh(x.value)),
-    )
-    return Node(val, list(deriv))
+    return _cosh(x) if isinstance(x, IndexSet) else _cosh._node(x)
 
 def tanh(x):
     """
@@ -377,14 +349,10 @@ def tanh(x):
     >>> f1.deriv
     [(Reverse - Mode AD: (f(x) = 0.05, J = ()), 0.9975041607715679)]
     """
-    assert isinstance(x, (Node, int, float)), f"The object {x} is not a Node, integer, or float"
+    assert isinstance(x, (Node, IndexSet, int, float)), f"The object {x} is not a Node, IndexSet, integer, or float"
     if isinstance(x, (int, float)):
         x = Node(x, )
-    val = np.tanh(x.value)
-    deriv = (
-        (x, 1 - np.tanh(x.value)**2),
-    )
-    return Node(val, list(deriv))
+    return _tanh(x) if isinstance(x, IndexSet) else _tanh._node(x)
 
 def sigmoid(x):
     """
@@ -408,11 +376,240 @@ def sigmoid(x):
     >>> f1.deriv
     [(Reverse-Mode AD: (f(x)=0.05, J=()), 0.24984381508111644)]
     """
-    assert isinstance(x, (Node, int, float)), f"The object {x} is not a Node, integer, or float"
+    assert isinstance(x, (Node, IndexSet, int, float)), f"The object {x} is not a Node, IndexSet, integer, or float"
     if isinstance(x, (int, float)):
         x = Node(x, )
-    val = 1/(1 + np.exp(-x.value))
-    deriv = (
-        (x, val*(1 - val)),
-    )
-    return Node(val, list(deriv))
\ No newline at end of file
+    return _sigmoid(x) if isinstance(x, IndexSet) else _sigmoid._node(x)
+
+def _nodes(xs):
+    """
+    Check a sequence of operands of a reduction and turn numbers into constant Nodes.
+    """
+    assert isinstance(xs, (list, tuple, np.ndarray)) and len(xs) > 0, f"{xs} has to be a non-empty list, tuple or np.ndarray"
+    for x in xs:
+        assert isinstance(x, (Node, IndexSet, int, float)), f"The object {x} is not a Node, IndexSet, integer, or float"
+    if any(isinstance(x, IndexSet) for x in xs):
+        # sparsity tracing: numbers stay constants of the index sets
+        return list(xs)
+    return [x if isinstance(x, Node) else Node(x, ) for x in xs]
+
+def _pair(xs, ys):
+    """
+    Operands of a reduction over two sequences of the same length.
+    """
+    xs, ys = _nodes(xs), _nodes(ys)
+    assert len(xs) == len(ys), f"The sequences have different lengths {len(xs)} and {len(ys)}"
+    return xs + ys
+
+def _apply(p, operands):
+    """
+    Reduction p on Node operands, through the dispatch of Primitive.__call__ while sparsity tracing.
+    """
+    return p._node(*operands) if isinstance(operands[0], Node) else p(*operands)
+
+def sum(xs):
+    """
+    Sum of a sequence, recorded as one node
+
+    Parameters
+    =======
+    xs: list, tuple or np.ndarray of Node, int, or float
+
+    Returns
+    =======
+    A new Node object whose value is the sum and whose
+    children are the elements of xs (partials all 1)
+
+    EXAMPLES
+    =======
+    >>> xs = [Node(1), Node(2), Node(3)]
+    >>> f1 = rmo.sum(xs)
+    >>> f1.value
+    6.0
+    >>> len(f1.deriv)
+    3
+    """
+    return _apply(_sum, _nodes(xs))
+
+def mean(xs):
+    """
+    Arithmetic mean of a sequence, recorded as one node
+
+    Parameters
+    =======
+    xs: list, tuple or np.ndarray of Node, int, or float
+
+    Returns
+    =======
+    A new Node object with the mean and its gradient (partials all 1/n)
+
+    EXAMPLES
+    =======
+    >>> f1 = rmo.mean([Node(1), Node(2), Node(6)])
+    >>> f1.value
+    3.0
+    """
+    return _apply(_mean, _nodes(xs))
+
+def prod(xs):
+    """
+    Product of a sequence, recorded as one node
+
+    The partials are computed from prefix and suffix products, so they
+    are exact even when an element is 0.
+
+    Parameters
+    =======
+    xs: list, tuple or np.ndarray of Node, int, or float
+
+    Returns
+    =======
+    A new Node object with the product and its gradient
+
+    EXAMPLES
+    =======
+    >>> f1 = rmo.prod([Node(2), Node(3), Node(4)])
+    >>> f1.value
+    24.0
+    >>> [partial for _, partial in f1.deriv]
+    [12.0, 8.0, 6.0]
+    """
+    return _apply(_prod, _nodes(xs))
+
+def dot(xs, ys):
+    """
+    Dot product of two sequences of the same length, recorded as one node
+
+    Parameters
+    =======
+    xs: list, tuple or np.ndarray of Node, int, or float
+    ys: list, tuple or np.ndarray of Node, int, or float
+
+    Returns
+    =======
+    A new Node object with the dot product and its gradient
+
+    EXAMPLES
+    =======
+    >>> f1 = rmo.dot([Node(1), Node(2)], [Node(3), Node(4)])
+    >>> f1.value
+    11.0
+    """
+    return _apply(_dot, _pair(xs, ys))
+
+def norm(xs):
+    """
+    Euclidean norm of a sequence, recorded as one node
+
+    Parameters
+    =======
+    xs: list, tuple or np.ndarray of Node, int, or float
+
+    Returns
+    =======
+    A new Node object with the norm and its gradient x/|x|
+    (0 at the origin)
+
+    EXAMPLES
+    =======
+    >>> f1 = rmo.norm([Node(3), Node(4)])
+    >>> f1.value
+    5.0
+    >>> [partial for _, partial in f1.deriv]
+    [0.6, 0.8]
+    """
+    return _apply(_norm, _nodes(xs))
+
+def logsumexp(xs):
+    """
+    log(exp(x_1) + ... + exp(x_n)) of a sequence, recorded as one node
+
+    The largest element is factored out, so large inputs do not overflow;
+    the partials are the softmax of xs.
+
+    Parameters
+    =======
+    xs: list, tuple or np.ndarray of Node, int, or float
+
+    Returns
+    =======
+    A new Node object with the log-sum-exp and its gradient
+
+    EXAMPLES
+    =======
+    >>> f1 = rmo.logsumexp([Node(1), Node(2)])
+    >>> f1.value
+    2.313261687518223
+    >>> [partial for _, partial in f1.deriv]
+    [0.2689414213699951, 0.7310585786300049]
+    """
+    return _apply(_logsumexp, _nodes(xs))
+
+def softplus(x):
+    """
+    Overloaded elementary function softplus log(1 + exp(x)), stable for large |x|
+
+    Parameters
+    =======
+    x: must be Node, int, or float
+
+    Returns
+    =======
+    A new Node object with the derivative (the sigmoid of x) of the
+    softplus computation and the evaluation of the gradient
+
+    EXAMPLES
+    =======
+    >>> x = Node(.5)
+    >>> f1 = rmo.softplus(x)
+    >>> f1.value
+    0.9740769841801067
+    >>> f1.deriv
+    [(Reverse-Mode AD: (f(x)=0.5, J=()), 0.6224593312018546)]
+    """
+    assert isinstance(x, (Node, IndexSet, int, float)), f"The object {x} is not a Node, IndexSet, integer, or float"
+    if isinstance(x, (int, float)):
+        x = Node(x, )
+    return _softplus(x) if isinstance(x, IndexSet) else _softplus._node(x)
+
+def mse(predictions, targets):
+    """
+    Mean squared error between two sequences, recorded as one node
+
+    Parameters
+    =======
+    predictions: list, tuple or np.ndarray of Node, int, or float
+    targets: list, tuple or np.ndarray of Node, int, or float, same length
+
+    Returns
+    =======
+    A new Node object with mean((predictions - targets)**2) and its gradient
+
+    EXAMPLES
+    =======
+    >>> f1 = rmo.mse([Node(1), Node(3)], [0, 0])
+    >>> f1.value
+    5.0
+    """
+    return _apply(_mse, _pair(predictions, targets))
+
+def least_squares(predictions, targets):
+    """
+    Least-squares loss 0.5*sum((predictions - targets)**2), recorded as one node
+
+    Parameters
+    =======
+    predictions: list, tuple or np.ndarray of Node, int, or float
+    targets: list, tuple or np.ndarray of Node, int, or float, same length
+
+    Returns
+    =======
+    A new Node object with the loss and its gradient (the residuals)
+
+    EXAMPLES
+    =======
+    >>> f1 = rmo.least_squares([Node(1), Node(3)], [0.5, 2])
+    >>> f1.value
+    0.625
+    """
+    return _apply(_least_squares, _pair(predictions, targets))
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# File: Memoize.py
+# Description: opt-in memoization of ForwardMode and ReverseMode evaluations in a bounded LRU cache
+
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from .ReverseMode import ReverseMode
+from .ForwardMode import ForwardMode
+
+
+class MemoStats:
+    """
+    A class to count the lookups of an EvaluationCache.
+
+    Attributes
+    ----------
+    hits : int
+        requests answered from the cache
+    misses : int
+        requests that ran ForwardMode, ReverseMode or the function
+    evictions : int
+        points dropped to stay within max_size
+
+    Methods
+    -------
+    lookups():
+        total number of lookups
+    hit_rate():
+        fraction of lookups that were hits
+    """
+
+    def __init__(self):
+        """
+        Constructs all necessary attributes for the MemoStats object.
+        """
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookups(self):
+        """
+        Total number of lookups.
+        """
+        return self.hits + self.misses
+
+    def hit_rate(self):
+        """
+        Fraction of the lookups answered from the cache (0 if there were none).
+        """
+        return self.hits/self.lookups() if self.lookups() else 0.0
+
+    def __repr__(self):
+        """
+        Represents the counters as a string.
+        """
+        return (f"MemoStats(hits={self.hits}, misses={self.misses}, evictions={self.evictions}, "
+                f"hit_rate={self.hit_rate():.3f})")
+
+
+def point_digest(x):
+    """
+    Digest of the bytes, shape and dtype of an input point (as float64).
+    """
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(x.shape).encode())
+    h.update(x.tobytes())
+    return h.digest()
+
+
+def _options(kwargs):
+    """
+    Hashable form of the keyword arguments of a call.
+    """
+    return tuple(sorted((name, point_digest(value) if name == 'p' and value is not None else value)
+                        for name, value in kwargs.items()))
+
+
+def _copy(result):
+    """
+    Copy of the mutable parts of a result, so callers cannot modify the cached one.
+    """
+    if isinstance(result, tuple):
+        return tuple(_copy(item) for item in result)
+    if isinstance(result, list):
+        return [_copy(item) for item in result]
+    if isinstance(result, np.ndarray):
+        return result.copy()
+    return result
+
+
+class EvaluationCache:
+    """
+    A class to represent a bounded LRU cache of ForwardMode and ReverseMode results.
+
+    Results are keyed by the identity of the function (the object, not its
+    code: a closure over changing state has to be cleared explicitly) and
+    a digest of the input bytes, so calling again at exactly the same point
+    returns the stored result without running the function. All the
+    results computed at one point share an entry: the value of a cached
+    gradient computation is returned by value() without another
+    evaluation. The max_size least recently used points are kept. Returned
+    lists and arrays are copies.
+
+    Attributes
+    ----------
+    max_size : int
+        number of (function, point) entries kept
+    stats : MemoStats
+
+    Methods
+    -------
+    reverse(f, x, **options):
+        memoized ReverseMode(f, x, **options)
+    forward(f, x, **options):
+        memoized ForwardMode(f, x, **options)
+    value(f, x, mode='reverse'):
+        value of f at x, from any cached result at x when possible
+    clear():
+        drop all entries and reset the counters
+
+    Example
+    -------
+    >>> cache = EvaluationCache(max_size=64)
+    >>> value, J = cache.reverse(f, [1.0, 2.0])
+    >>> cache.value(f, [1.0, 2.0]) == value  # answered by the gradient computation
+    True
+    >>> cache.stats
+    MemoStats(hits=1, misses=1, evictions=0, hit_rate=0.500)
+    """
+
+    def __init__(self, max_size=128):
+        """
+        Constructs all necessary attributes for the EvaluationCache object.
+
+        Parameters
+        ----------
+        max_size : int, optional
+            number of (function, point) entries kept (default 128)
+        """
+        assert isinstance(max_size, int) and max_size > 0, f"max_size {max_size} has to be a positive integer"
+        self.max_size = max_size
+        self.stats = MemoStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """
+        Number of cached (function, point) entries.
+        """
+        return len(self._entries)
+
+    def _lookup(self, f, x, kinds):
+        """
+        First cached result of one of kinds at (f, x), counting a hit or a miss.
+        """
+        key = (f, point_digest(x))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                for kind in kinds:
+                    if kind in entry:
+                        self.stats.hits += 1
+                        return key, kind, entry[kind]
+            self.stats.misses += 1
+        return key, None, None
+
+    def _store(self, key, kind, result):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {}
+            entry[kind] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def reverse(self, f, x, **options):
+        """
+        ReverseMode(f, x, **options), from the cache when f was already differentiated at x.
+        """
+        kind = ('reverse', _options(options))
+        key, _, result = self._lookup(f, x, [kind])
+        if result is None:
+            result = ReverseMode(f, x, **options)
+            self._store(key, kind, result)
+        return _copy(result)
+
+    def forward(self, f, x, **options):
+        """
+        ForwardMode(f, x, **options), from the cache when the same call was already made at x.
+        """
+        kind = ('forward', _options(options))
+        key, _, result = self._lookup(f, x, [kind])
+        if result is None:
+            result = ForwardMode(f, x, **options)
+            self._store(key, kind, result)
+        return _copy(result)
+
+    def value(self, f, x, mode='reverse'):
+        """
+        Value of f at x.
+
+        A cached ReverseMode result at x (without options), or for mode
+        'forward' a cached default ForwardMode result, answers directly. On
+        a miss, mode 'reverse' runs ReverseMode and caches its gradient as
+        well, so asking for the gradient next is a hit; mode 'forward' only
+        evaluates f(x) on floats.
+
+        Parameters
+        ----------
+        f : user defined function, f(*x) for mode 'reverse', f(x) for mode 'forward'
+        x : input variable(s)
+        mode : str, optional
+            'reverse' (default) or 'forward'
+        """
+        if mode not in ('reverse', 'forward'):
+            raise ValueError(f"Unknown mode {mode!r}, expected 'reverse' or 'forward'")
+        kinds = [('value', mode), (mode, ())]
+        key, kind, result = self._lookup(f, x, kinds)
+        if kind is not None:
+            return _copy(result if kind[0] == 'value' else result[0])
+        if mode == 'reverse':
+            result = ReverseMode(f, x)
+            self._store(key, kinds[1], result)
+            return _copy(result[0])
+        value = f(x)
+        self._store(key, kinds[0], value)
+        return _copy(value)
+
+    def clear(self):
+        """
+        Drop all entries and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.stats = MemoStats()
+
+    def __repr__(self):
+        """
+        Represents the cache as a string.
+        """
+        return f"EvaluationCache(size={len(self)}, max_size={self.max_size}, stats={self.stats!r})"
+
+
+class MemoizedFunction:
+    """
+    A class to represent a scalar function with memoized value and gradient, for optimizers.
+
+    Methods
+    -------
+    value(x):
+        value of f at x
+    gradient(x):
+        gradient of f at x, as an np.ndarray
+    __call__(x):
+        (value, gradient) at x
+
+    Example
+    -------
+    >>> f = memoize(lambda x1, x2: (1 - x1)**2 + 100*(x2 - x1**2)**2)
+    >>> f.value([1.0, 2.0]), f.gradient([1.0, 2.0])  # one ReverseMode run
+    (100.0, array([-400.,  200.]))
+    """
+
+    def __init__(self, f, mode='reverse', cache=None):
+        """
+        Constructs all necessary attributes for the MemoizedFunction object.
+
+        Parameters
+        ----------
+        f : user defined scalar function, f(*x) for mode 'reverse', f(x) for mode 'forward'
+        mode : str, optional
+            'reverse' (default) or 'forward'
+        cache : EvaluationCache, optional
+            cache to use, possibly shared with other functions (default a new one)
+        """
+        if mode not in ('reverse', 'forward'):
+            raise ValueError(f"Unknown mode {mode!r}, expected 'reverse' or 'forward'")
+        self.f = f
+        self.mode = mode
+        self.cache = cache if cache is not None else EvaluationCache()
+
+    @property
+    def stats(self):
+        """
+        Counters of the cache.
+        """
+        return self.cache.stats
+
+    def value(self, x):
+        """
+        Value of f at x.
+        """
+        return self.cache.value(self.f, x, self.mode)
+
+    def gradient(self, x):
+        """
+        Gradient of f at x.
+        """
+        if self.mode == 'reverse':
+            return np.array(self.cache.reverse(self.f, x)[1], dtype=float)
+        return np.atleast_1d(np.asarray(self.cache.forward(self.f, x, gradient=True), dtype=float))
+
+    def __call__(self, x):
+        """
+        Value and gradient of f at x.
+        """
+        return self.value(x), self.gradient(x)
+
+    def __repr__(self):
+        """
+        Represents the memoized function as a string.
+        """
+        return f"MemoizedFunction({getattr(self.f, '__name__', self.f)!r}, mode={self.mode!r}, cache={self.cache!r})"
+
+
+def memoize(f, mode='reverse', max_size=128, cache=None):
+    """
+    Wrap a scalar function so that repeated values and gradients at the same point are computed once.
+
+    Parameters
+    ----------
+    f : user defined scalar function, f(*x) for mode 'reverse', f(x) for mode 'forward'
+    mode : str, optional
+        'reverse' (default) or 'forward'
+    max_size : int, optional
+        number of points kept when a new cache is created (default 128)
+    cache : EvaluationCache, optional
+        existing cache to use instead
+
+    Returns
+    -------
+    MemoizedFunction
+    """
+    return MemoizedFunction(f, mode, cache if cache is not None else EvaluationCache(max_size))
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# File: Memory.py
+# Description: memory accounting of reverse mode graphs and tapes, a probe-based estimator
+#              and a ceiling aborting traces that grow too large
+
+import sys
+import weakref
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+import numpy as np
+from .Node import Node
+from .Context import _CONTEXT, activated
+
+MemoryEstimate = namedtuple('MemoryEstimate', ['bytes', 'exponent', 'probes'])
+MemoryEstimate.__doc__ = """
+Memory predicted by estimate_memory.
+
+Attributes
+----------
+bytes : float
+    predicted graph bytes (nodes, edges and adjoints) at the requested input size
+exponent : float
+    fitted growth rate, bytes ~ n**exponent (1 for linear, 2 for quadratic graphs)
+probes : dict
+    input size -> MemoryReport of the probe traces
+"""
+
+
+class MemoryLimitError(MemoryError):
+    """
+    Raised when the Nodes recorded inside a memory_limit block exceed its ceiling.
+    """
+
+
+class MemoryReport:
+    """
+    A class to represent the memory held by a reverse mode graph or a tape.
+
+    Attributes
+    ----------
+    nodes : int
+        number of nodes (tape instructions)
+    edges : int
+        number of (parent, child) edges (tape operands)
+    node_bytes : int
+        bytes of the node objects, their values and params
+    edge_bytes : int
+        bytes of the edge lists and their partial derivatives
+    adjoint_bytes : int
+        bytes of the adjoint map of the reverse sweep (for tapes, an estimate of the
+        value and adjoint arrays of one replay)
+    peak_traced : int or None
+        peak of the allocations traced by tracemalloc during the run, None if not measured
+    by_op : dict
+        op -> [count, bytes of the nodes and edges recorded by that op]
+
+    Methods
+    -------
+    total_bytes():
+        node_bytes + edge_bytes + adjoint_bytes
+    summary():
+        text table with the per-op breakdown
+
+    Example
+    -------
+    >>> report = memory_report(lambda x1, x2: rmo.sin(x1)*x2, [1.0, 2.0])
+    >>> report.nodes, report.edges, sorted(report.by_op)
+    (4, 3, ['input', 'mul', 'sin'])
+    """
+
+    def __init__(self, nodes, edges, node_bytes, edge_bytes, adjoint_bytes, by_op, peak_traced=None):
+        """
+        Constructs all necessary attributes for the MemoryReport object.
+        """
+        self.nodes = nodes
+        self.edges = edges
+        self.node_bytes = node_bytes
+        self.edge_bytes = edge_bytes
+        self.adjoint_bytes = adjoint_bytes
+        self.by_op = by_op
+        self.peak_traced = peak_traced
+
+    def total_bytes(self):
+        """
+        Bytes held by the nodes, the edges and the adjoints.
+        """
+        return self.node_bytes + self.edge_bytes + self.adjoint_bytes
+
+    def summary(self):
+        """
+        Text table of the bytes per op, then the totals.
+        """
+        lines = [f"{'op':<16}{'count':>10}{'bytes':>14}"]
+        for op, (count, size) in sorted(self.by_op.items(), key=lambda item: item[1][1], reverse=True):
+            lines.append(f"{op:<16}{count:>10}{size:>14}")
+        lines.append(f"nodes: {self.node_bytes} B, edges: {self.edge_bytes} B, adjoints: {self.adjoint_bytes} B, "
+                     f"total: {self.total_bytes()} B")
+        if self.peak_traced is not None:
+            lines.append(f"peak traced allocations: {self.peak_traced} B")
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        """
+        Represents the report as a string.
+        """
+        return (f"MemoryReport(nodes={self.nodes}, edges={self.edges}, total_bytes={self.total_bytes()}, "
+                f"peak_traced={self.peak_traced})")
+
+
+def _sizes(node):
+    """
+    Bytes of a node (object, attributes, value, params) and of its edges (list, pairs, partials).
+    """
+    size = sys.getsizeof(node) + sys.getsizeof(node.__dict__) + sys.getsizeof(node.value)
+    if node.params:
+        size += sys.getsizeof(node.params)
+    edges = 0
+    if node.deriv:
+        edges = sys.getsizeof(node.deriv) + sum(sys.getsizeof(pair) + sys.getsizeof(pair[1]) for pair in node.deriv)
+    return size, edges
+
+
+def _adjoint_bytes(adjoints):
+    return sys.getsizeof(adjoints) + sum(sys.getsizeof(value) for value in adjoints.values())
+
+
+def graph_memory(output, adjoints=None):
+    """
+    Memory held by the Node graph ending at output.
+
+    Parameters
+    ----------
+    output : Node
+    adjoints : dict, optional
+        result of output.get_adjoints(), counted in adjoint_bytes (default: none)
+
+    Returns
+    -------
+    MemoryReport, without peak_traced
+    """
+    nodes = edges = node_bytes = edge_bytes = 0
+    by_op = {}
+    for node in output.topological_order():
+        size, edge_size = _sizes(node)
+        nodes += 1
+        edges += len(node.deriv)
+        node_bytes += size
+        edge_bytes += edge_size
+        entry = by_op.setdefault(node.op or 'input', [0, 0])
+        entry[0] += 1
+        entry[1] += size + edge_size
+    return MemoryReport(nodes, edges, node_bytes, edge_bytes, _adjoint_bytes(adjoints) if adjoints else 0, by_op)
+
+
+def memory_report(f, x, trace_allocations=True):
+    """
+    Run f in reverse mode like ReverseMode and report the memory of its graph and adjoints.
+
+    Parameters
+    ----------
+    f : user defined scalar function with reverse LYCET operations, called as f(*nodes)
+    x : input variable(s)
+    trace_allocations : bool, optional
+        measure the peak allocations of the run with tracemalloc (default True, which slows it down)
+
+    Returns
+    -------
+    MemoryReport
+
+    Example
+    -------
+    >>> report = memory_report(f, np.ones(1000))
+    >>> print(report.summary())
+    """
+    if isinstance(x, (int, float)):
+        x = [x]
+    tracing = trace_allocations and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    elif trace_allocations:
+        tracemalloc.reset_peak()
+    try:
+        nodes = [Node(xi) for xi in x]
+        output = f(*nodes)
+        adjoints = output.get_adjoints() if isinstance(output, Node) else None
+        peak = tracemalloc.get_traced_memory()[1] if trace_allocations else None
+    finally:
+        if tracing:
+            tracemalloc.stop()
+    if not isinstance(output, Node):
+        # f does not depend on its inputs: only the leaves were recorded
+        report = MemoryReport(len(nodes), 0, sum(_sizes(node)[0] for node in nodes), 0, 0,
+                              {'input': [len(nodes), sum(_sizes(node)[0] for node in nodes)]})
+    else:
+        report = graph_memory(output, adjoints)
+    report.peak_traced = peak
+    return report
+
+
+def tape_memory(tape, x=None):
+    """
+    Memory held by a recorded tape, and by the arrays of one replay.
+
+    Parameters
+    ----------
+    tape : Tape
+    x : array-like, optional
+        point (or batch of points, trailing axis) to replay: its peak allocations are
+        then measured with tracemalloc and its batch size sets adjoint_bytes (default one point, not run)
+
+    Returns
+    -------
+    MemoryReport
+    """
+    node_bytes = edge_bytes = edges = 0
+    by_op = {}
+    for ins in tape.instructions:
+        size = sys.getsizeof(ins) + sys.getsizeof(ins.params) + sum(sys.getsizeof(p) for p in ins.params)
+        edge_size = sys.getsizeof(ins.args) + sum(sys.getsizeof(a) for a in ins.args)
+        edges += len(ins.args)
+        node_bytes += size
+        edge_bytes += edge_size
+        entry = by_op.setdefault(ins.op, [0, 0])
+        entry[0] += 1
+        entry[1] += size + edge_size
+    node_bytes += sys.getsizeof(tape.instructions)
+    batch = int(np.prod(np.shape(x)[1:])) if x is not None else 1
+    # one value and one adjoint per variable, 8 bytes per point
+    adjoint_bytes = 2*len(tape)*(8*batch + (sys.getsizeof(np.zeros(batch)) - 8*batch if batch > 1 else 24))
+    peak = None
+    if x is not None:
+        tracing = not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+        try:
+            tape.replay(x)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            if tracing:
+                tracemalloc.stop()
+    return MemoryReport(len(tape), edges, node_bytes, edge_bytes, adjoint_bytes, by_op, peak)
+
+
+def estimate_memory(f, n, probe_sizes=(16, 32, 64), point=None):
+    """
+    Predict the graph memory of f at input size n from small probe traces.
+
+    f is traced at every probe size (without tracemalloc), and a power law
+    bytes = c*n**exponent is fitted to the probe totals by least squares in
+    log-log scale and evaluated at n. This catches graphs growing faster than
+    their input before a full size trace is attempted.
+
+    Parameters
+    ----------
+    f : user defined scalar function with reverse LYCET operations, called as f(*nodes),
+        taking any number of inputs
+    n : int
+        input size to predict the memory for
+    probe_sizes : sequence of int, optional
+        at least two input sizes to trace (default (16, 32, 64))
+    point : function, optional
+        point(size) -> input of that size (default np.linspace(0.1, 1.0, size))
+
+    Returns
+    -------
+    MemoryEstimate
+
+    Example
+    -------
+    >>> estimate = estimate_memory(lambda *x: rmo.sum([xi*xj for xi in x for xj in x]), 10**4)
+    >>> round(estimate.exponent, 1)
+    2.0
+    """
+    assert len(set(probe_sizes)) >= 2, "Give at least two different probe sizes"
+    point = point or (lambda size: np.linspace(0.1, 1.0, size))
+    probes = {size: memory_report(f, point(size), trace_allocations=False) for size in probe_sizes}
+    sizes = np.array(list(probes), dtype=float)
+    totals = np.array([report.total_bytes() for report in probes.values()], dtype=float)
+    exponent, intercept = np.polyfit(np.log(sizes), np.log(totals), 1)
+    return MemoryEstimate(float(np.exp(intercept)*n**exponent), float(exponent), probes)
+
+
+def _counter(max_bytes):
+    """
+    Node hook counting the bytes of the live nodes, raising MemoryLimitError above max_bytes.
+    """
+    used = 0
+    live = {}  # weak reference to a counted node -> its bytes
+
+    def release(ref):
+        # the node was freed: its bytes no longer count
+        nonlocal used
+        used -= live.pop(ref, 0)
+
+    def count(node):
+        nonlocal used
+        size, edge_size = _sizes(node)
+        used += size + edge_size
+        live[weakref.ref(node, release)] = size + edge_size
+        if used > max_bytes:
+            raise MemoryLimitError(f"The graph recorded so far takes {used} bytes, above the limit of "
+                                   f"{max_bytes} bytes (last node: op {node.op!r}); raise the limit or trace "
+                                   f"a smaller problem")
+    return count
+
+
+@contextmanager
+def memory_limit(max_bytes):
+    """
+    Abort any trace whose Nodes take more than max_bytes.
+
+    Inside the block every Node construction adds the bytes of the node and
+    its edges to a counter, and raises MemoryLimitError (a MemoryError) as
+    soon as the counter goes over max_bytes, so a runaway graph stops with a
+    clear error instead of swapping or being killed. The bytes of a node are
+    subtracted again when it is freed, so the ceiling applies to the graphs
+    alive at a time: a loop of small independent traces never reaches it.
+    The counter only sees the recorded graph, not the adjoints or other
+    allocations, and only the Nodes of the thread or asyncio task running
+    the block (Context). Blocks can be nested, every ceiling applies to the
+    Nodes created inside its own block.
+
+    Parameters
+    ----------
+    max_bytes : int
+        ceiling on the bytes of the live Nodes created in the block
+
+    Returns
+    -------
+    None
+
+    Example
+    -------
+    >>> with memory_limit(10**6):
+    ...     rm.ReverseMode(f, np.ones(10**5))
+    MemoryLimitError: The graph recorded so far takes 1000120 bytes, above the limit of 1000000 bytes ...
+    """
+    assert isinstance(max_bytes, (int, np.integer)) and max_bytes > 0, f"max_bytes {max_bytes} has to be a positive integer"
+    context = _CONTEXT.get()
+    with activated(context.replace(node_hooks=context.node_hooks + (_counter(int(max_bytes)),))):
+        yield
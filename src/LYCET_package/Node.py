@@ -4,6 +4,7 @@
 
 import numpy as np
 from collections import defaultdict
+from .Context import _CONTEXT
     
 class Node: 
     """
@@ -15,6 +16,10 @@ class Node:
         value of input x
     deriv : tuple
         child node and its partial derivative(s) (outer part of chain rule)
+    op : str or None
+        name of the elementary operation that created the node (None for inputs and constants)
+    params : tuple
+        constant, non-differentiated arguments of the operation (e.g. the base of log)
 
     Methods
     -------
@@ -52,6 +57,8 @@ class Node:
         reverse divide Nodes
     __repr__():
         string representation of Nodes
+    __reduce__():
+        pickle the graph ending at the Node as flat arrays (Serialization.FlatGraph)
     Example
     -------
     >>> x = Node(4)
@@ -61,7 +68,7 @@ class Node:
     ()
     """
 
-    def __init__(self, value, deriv=()):
+    def __init__(self, value, deriv=(), op=None, params=()):
         """
         Constructs all necessary attributes for the Node object.
         
@@ -71,14 +78,26 @@ class Node:
             value of input x
         dual : tuple
             child node and its partial derivative(s) (outer part of chain rule)
+        op : str, optional
+            name of the elementary operation that created the node
+        params : tuple, optional
+            constant, non-differentiated arguments of the operation
         """
-        assert isinstance(value, (int, float)), f"The value input {value} is not a integer, or float"
+        assert isinstance(value, (int, float, np.floating)), f"The value input {value} is not a integer, or float"
+        # the plain constructor: _traced_init replaces it while a precision policy or node hooks are active
         self.value = value
         self.deriv = deriv
+        self.op = op
+        self.params = params
 
     def get_adjoints(self):
         """
-        Recursively compute the adjoints.
+        Compute the adjoints with one reverse sweep over the graph.
+
+        The nodes are first put in topological order (iteratively, so deep
+        graphs do not hit the recursion limit), then every node passes its
+        accumulated adjoint on to its children exactly once, however many
+        paths lead to it.
         
         Parameters
         ----------
@@ -102,37 +121,87 @@ class Node:
              Reverse-Mode AD: (f(x)=5, J=()): 0.19999999999999996,
              Reverse-Mode AD: (f(x)=9, J=()): -0.11111111111111109})
         """
+        order = self.topological_order()
+        policy = _CONTEXT.get().policy
+        # the type of the seed sets the type the adjoints are summed in
+        vbar = {id(self): 1 if policy is None else policy.one()}
         adjoints = defaultdict(int)
-
-        def compute_adjoints(node, val):
-            """
-            Computes the adjoints.
-            
-            Parameters
-            ----------
-            node : parent node
-            val : value of adjoint
-
-            Returns
-            -------
-            adjoints : dictionary
-                adjoints resulting from reverse pass 
-
-            Example
-            -------
-            User does not directly call compute_adjoints.
-            See get_adjoints for an example on how to retrieve the Jacobian.
-            """
+        for node in reversed(order):
+            val = vbar.get(id(node))
+            if val is None or not node.deriv:
+                continue
             for child, deriv in node.deriv:
                 # calculate adjoint:
-                vbar = val*deriv
-                adjoints[child] += vbar
-                # keep traversing through the graph
-                compute_adjoints(child, vbar)
-
-        compute_adjoints(self, 1) # end of forward pass
+                vbar[id(child)] = vbar.get(id(child), 0) + val*deriv
+        for node in order:
+            if node is not self and id(node) in vbar:
+                adjoints[node] = vbar[id(node)]
         return adjoints
+
+    def topological_order(self):
+        """
+        List the nodes of the graph ending at this node, children before parents.
+        
+        Parameters
+        ----------
+        none
+
+        Returns
+        -------
+        order : list of Node, ending with self
+
+        Example
+        -------
+        >>> x1 = Node(2)
+        >>> f = rmo.sin(x1)*x1
+        >>> [node.op for node in f.topological_order()]
+        [None, 'sin', 'mul']
+        """
+        order = []
+        visited = set()
+        stack = [(self, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                order.append(node)
+                continue
+            if id(node) in visited:
+                continue
+            visited.add(id(node))
+            stack.append((node, True))
+            if node.deriv:
+                for child, _ in reversed(node.deriv):
+                    if id(child) not in visited:
+                        stack.append((child, False))
+        return order
          
+    def __reduce__(self):
+        """
+        Pickle the graph ending at this node as flat arrays.
+
+        The default pickling recurses through deriv and hits the recursion
+        limit on deep graphs; Serialization.FlatGraph numbers the nodes
+        iteratively instead. Shared subgraphs stay shared, but Nodes pickled
+        separately are rebuilt separately: pickle a FlatGraph with the
+        inputs and outputs together to keep them connected.
+
+        Example
+        -------
+        >>> f = pickle.loads(pickle.dumps(rmo.sin(Node(2.0))*3))
+        >>> f.value, f.op
+        (2.727892280477045, 'mul')
+        """
+        from .Serialization import FlatGraph, _node_from_graph
+        return (_node_from_graph, (FlatGraph.from_nodes(self),))
+
+    def __copy__(self):
+        """
+        Shallow copy: a new Node sharing the children of this one.
+        """
+        node = Node.__new__(Node)
+        node.__dict__.update(self.__dict__)
+        return node
+
     def __eq__(self, other):
         """
         Overload the equal operator to see if nodes are equal.
@@ -337,11 +406,11 @@ class Node:
         """
         assert isinstance(other, (Node,int,float)), f'input {other} is not a Node, int, or float'
         if isinstance(other, (int, float)): # other is a constant
-            other = Node(other, 0) 
+            other = Node(other, ) 
         value = self.value + other.value
         deriv = ((self, 1), (other, 1))# the partial derivative with respect to x1 is 1, the partial derivative with respect to x2 is 1
         
-        return Node(value, deriv)
+        return Node(value, deriv, op='add')
 
     def __mul__(self, other):
         """
@@ -371,7 +440,7 @@ class Node:
         value = self.value * other.value
         deriv = ((self, other.value), (other, self.value))
 
-        return Node(value, deriv)
+        return Node(value, deriv, op='mul')
 
     def __sub__(self, other): 
         """
@@ -397,10 +466,10 @@ class Node:
         """
         assert isinstance(other, (Node,int,float)), f'input {other} is not a Node'
         if isinstance(other, (int, float)):
-            other = Node(other, 0)
+            other = Node(other, )
         value = self.value - other.value
         deriv = ((self, 1), (other, -1))
-        return Node(value, deriv)
+        return Node(value, deriv, op='sub')
 
     def __truediv__(self, other): 
         """
@@ -426,10 +495,10 @@ class Node:
         """
         assert isinstance(other, (Node, int, float)), f"The object {other} is not a Node, integer, or float"
         if isinstance(other, (int, float)):
-            other = Node(other, 0)
+            other = Node(other, )
         value = self.value / other.value
         deriv = ((self, 1/other.value), (other, -1*self.value/(other.value**2)))
-        return Node(value, list(deriv))
+        return Node(value, list(deriv), op='div')
 
     def __pow__(self, other): 
         """
@@ -454,13 +523,16 @@ class Node:
     	((Reverse-Mode AD: (f(x)=5, J=()), 75),)
         """
         assert isinstance(other, (Node, int, float)), f"The object {other} is not a Node, integer, or float"
-        if isinstance(other, (int, float)):
-            other = Node(other, 0)
+        variable = isinstance(other, Node)
+        if not variable:
+            other = Node(other, )
         value = self.value ** other.value
         deriv = (
             (self, other.value*(self.value**(other.value-1))), 
+            # d(x**y)/dy = x**y log(x), taken as 0 where x <= 0 (no real derivative in y there)
+            (other, value*np.log(self.value) if variable and self.value > 0 else 0),
         )
-        return Node(value, deriv)
+        return Node(value, deriv, op='pow')
 
     def __radd__(self, other):
         """
@@ -501,14 +573,18 @@ class Node:
         Example
         -------
         >>> X1 = Node(5)
-	    >>> X2 = Node(6)
-	    >>> x3 = X1-X2
+	    >>> x3 = 6 - X1
 	    >>> x3.value
-   		-1
+   		1
 	    >>> x3.deriv
-        ((Reverse-Mode AD:((f(x)=5, J=()), 1), Reverse-Mode AD: ((f(x)=6, J=()), -1)))
+        ((Reverse-Mode AD: (f(x)=6, J=()), 1), (Reverse-Mode AD: (f(x)=5, J=()), -1))
         """
-        return self.__sub__(other)
+        assert isinstance(other, (Node, int, float)), f'input {other} is not a Node'
+        if isinstance(other, (int, float)):
+            other = Node(other, )
+        value = other.value - self.value
+        deriv = ((other, 1), (self, -1))
+        return Node(value, deriv, op='sub')
 
     def __rmul__(self, other):
         """
@@ -566,7 +642,7 @@ class Node:
             other = Node(other, )
         value = other.value / self.value
         deriv = ((other, 1/self.value), (self, -1*other.value/(self.value**2)))
-        return Node(value, list(deriv))
+        return Node(value, list(deriv), op='div')
 
 
     def __rpow__(self, other):
@@ -589,7 +665,7 @@ class Node:
 	    >>> x3.value
     	243
 	    >>> x3.deriv
-    	((Reverse-Mode AD: (f(x)=3, J=()), 405),)
+    	((Reverse-Mode AD: (f(x)=3, J=()), 0), (Reverse-Mode AD: (f(x)=5, J=()), 266.9680308158475))
         """
         assert np.issubdtype(type(other), np.integer) or isinstance(other, (np.floating, float)), f"The object {other} is not an integer or float"
         if (np.abs(other) < np.finfo(float).eps):
@@ -598,9 +674,10 @@ class Node:
             other = Node(other, )
         value = other.value ** self.value
         deriv = (
-            (other, self.value*(other.value**(self.value-1))), 
+            (other, 0),
+            (self, value*np.log(other.value)), 
         )
-        return Node(value, deriv)
+        return Node(value, deriv, op='rpow')
 
     def __repr__(self):
         """
@@ -627,4 +704,33 @@ class Node:
         Reverse-Mode AD: (f(x)=3, J=[1/3, -1])
         """
         return f"Reverse-Mode AD: (f(x)={self.value}, J={self.deriv})"
-    
\ No newline at end of file
+    
+
+
+def _traced_init(self, value, deriv=(), op=None, params=()):
+    """
+    Node.__init__ while some context has a precision policy or node hooks (Context.activated).
+    """
+    assert isinstance(value, (int, float, np.floating)), f"The value input {value} is not a integer, or float"
+    context = _CONTEXT.get()
+    policy = context.policy
+    if policy is not None:
+        # reduced precision: store the value and the local partials in the storage type
+        value = policy.storage(value)
+        if deriv:
+            deriv = [(child, policy.storage(partial)) for child, partial in deriv]
+    self.value = value
+    self.deriv = deriv
+    self.op = op
+    self.params = params
+    if context.node_hooks:
+        # memory limits and profiles of the trace context watching the new node
+        for hook in context.node_hooks:
+            hook(self)
+
+
+def _instrumentation():
+    """
+    Methods replaced while a context needs them (Context.activated).
+    """
+    return {(Node, '__init__'): lambda plain: _traced_init}
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# File: Optimize.py
+# Description: algebraic simplification and dead-code elimination over a traced Tape
+
+from .Tape import Tape, Instruction
+from .Primitives import primitive
+
+# integer exponents rewritten as repeated multiplication
+_MAX_STRENGTH_REDUCED_POWER = 8
+
+
+def optimize(tape, fast_math=False):
+    """
+    Simplify a Tape and drop every variable that does not contribute to an output.
+
+    The pass, done in one forward walk plus one backward liveness walk, does
+        * constant folding: operations whose operands are all constants are evaluated once
+        * identity elimination: x + 0, 0 + x, x - 0, x * 1, 1 * x, x / 1, x ** 1 become x;
+          with fast_math, x * 0, 0 * x and x ** 0 also become constants
+        * strength reduction: x ** n for a constant integer 2 <= n <= 8 becomes repeated
+          multiplication (square-and-multiply), x ** -1 becomes 1 / x
+        * merging of equal constants (0.0 and -0.0 are kept apart)
+        * dead-node removal
+
+    Inputs are always kept, so the optimized tape has the same signature.
+    Without fast_math the optimized tape computes the same values as the
+    original one, nan and inf included.
+
+    Parameters
+    ----------
+    tape : Tape
+    fast_math : bool, optional
+        also fold x * 0 and x ** 0, which differ from the original tape when x is
+        inf or nan (0 instead of nan) and in the gradient of x ** 0 at x = 0 (default False)
+
+    Returns
+    -------
+    optimized : Tape
+    report : dict
+        number of variables 'before' and 'after' the pass, how many rewrites of
+        each kind ('folded', 'identities', 'strength_reduced', 'dead') were
+        applied, the number of variables 'added' by strength reduction, and the
+        number of variables of the original tape 'removed' (before + added - after)
+
+    Example
+    -------
+    >>> tape = trace(lambda x1: (x1*1 + 0)**2 + rmo.sin(2*3), 1.0)
+    >>> optimized, report = optimize(tape)
+    >>> report['removed']
+    6
+    """
+    report = {'before': len(tape), 'folded': 0, 'identities': 0, 'strength_reduced': 0, 'added': 0, 'dead': 0}
+    instructions = []
+    constants = {}  # value -> index of the const instruction holding it
+    alias = []      # old index -> new index
+
+    def emit(op, args, params=()):
+        if op == 'const':
+            # repr keeps -0.0 apart from 0.0, which compare equal
+            key = (type(params[0]), params[0], repr(params[0]))
+            if key in constants:
+                return constants[key]
+            constants[key] = len(instructions)
+        instructions.append(Instruction(op, tuple(args), tuple(params)))
+        return len(instructions) - 1
+
+    def const(value):
+        return emit('const', (), (value,))
+
+    def is_const(k, value=None):
+        ins = instructions[k]
+        if ins.op != 'const':
+            return False
+        return value is None or ins.params[0] == value
+
+    for ins in tape.instructions:
+        if ins.op in ('input', 'const'):
+            alias.append(emit(ins.op, (), ins.params))
+            continue
+        args = [alias[a] for a in ins.args]
+
+        # constant folding
+        if all(is_const(a) for a in args):
+            folded = primitive(ins.op).primal([instructions[a].params[0] for a in args], ins.params)
+            report['folded'] += 1
+            alias.append(const(folded))
+            continue
+
+        # identity elimination
+        simplified = None
+        if ins.op == 'add':
+            if is_const(args[1], 0):
+                simplified = args[0]
+            elif is_const(args[0], 0):
+                simplified = args[1]
+        elif ins.op == 'sub' and is_const(args[1], 0):
+            simplified = args[0]
+        elif ins.op == 'mul':
+            if is_const(args[1], 1):
+                simplified = args[0]
+            elif is_const(args[0], 1):
+                simplified = args[1]
+            elif fast_math and (is_const(args[0], 0) or is_const(args[1], 0)):
+                simplified = const(0.0)
+        elif ins.op == 'div' and is_const(args[1], 1):
+            simplified = args[0]
+        elif ins.op == 'pow' and is_const(args[1], 1):
+            simplified = args[0]
+        elif fast_math and ins.op == 'pow' and is_const(args[1], 0):
+            simplified = const(1.0)
+        if simplified is not None:
+            report['identities'] += 1
+            alias.append(simplified)
+            continue
+
+        # strength reduction of integer powers
+        if ins.op == 'pow' and is_const(args[1]):
+            exponent = instructions[args[1]].params[0]
+            start = len(instructions)
+            if float(exponent).is_integer() and 2 <= exponent <= _MAX_STRENGTH_REDUCED_POWER:
+                reduced = _repeated_multiplication(emit, args[0], int(exponent))
+            elif exponent == -1:
+                reduced = emit('div', (const(1.0), args[0]))
+            else:
+                reduced = None
+            if reduced is not None:
+                report['strength_reduced'] += 1
+                # the instructions beyond the one replacing the power
+                report['added'] += len(instructions) - start - 1
+                alias.append(reduced)
+                continue
+
+        alias.append(emit(ins.op, args, ins.params))
+
+    outputs = [alias[out] for out in tape.outputs]
+
+    # dead-node removal: keep inputs and whatever the outputs depend on
+    live = [ins.op == 'input' for ins in instructions]
+    for out in outputs:
+        live[out] = True
+    for k in range(len(instructions) - 1, -1, -1):
+        if live[k]:
+            for a in instructions[k].args:
+                live[a] = True
+    renumber = {}
+    kept = []
+    for k, ins in enumerate(instructions):
+        if not live[k]:
+            continue
+        renumber[k] = len(kept)
+        kept.append(Instruction(ins.op, tuple(renumber[a] for a in ins.args), ins.params))
+    report['dead'] = len(instructions) - len(kept)
+
+    optimized = Tape(tape.n_inputs, kept, [renumber[out] for out in outputs], scalar_output=tape.scalar_output)
+    if tape.values is not None:
+        inputs = sorted((ins.params[0], k) for k, ins in enumerate(tape.instructions) if ins.op == 'input')
+        optimized.values = optimized.evaluate([tape.values[k] for _, k in inputs])
+    report['after'] = len(optimized)
+    report['removed'] = report['before'] + report['added'] - report['after']
+    return optimized, report
+
+
+def _repeated_multiplication(emit, base, n):
+    """
+    Emit base ** n (n >= 2) as a chain of multiplications by square-and-multiply.
+    """
+    result = None
+    square = base
+    while True:
+        if n & 1:
+            result = square if result is None else emit('mul', (result, square))
+        n >>= 1
+        if not n:
+            return result
+        square = emit('mul', (square, square))
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# File: Precision.py
+# Description: floating point precision policies (float64, float32, mixed) for dual numbers, nodes and tapes
+
+from contextlib import contextmanager
+import numpy as np
+from .Context import _CONTEXT, activated
+
+
+class PrecisionPolicy:
+    """
+    A class to represent the floating point types used while differentiating.
+
+    Attributes
+    ----------
+    name : str
+        name of the policy
+    storage : numpy scalar type
+        type of the stored primals (DualNumber.real, Node.value, tape values),
+        tangents (DualNumber.dual) and local partials (Node.deriv, tape partials)
+    accumulation : numpy scalar type
+        type the adjoints are summed in during reverse sweeps
+
+    Methods
+    -------
+    cast(x):
+        x converted to the storage type
+    one():
+        seed adjoint of a reverse sweep, in the accumulation type
+
+    Example
+    -------
+    >>> policy = get_policy('mixed')
+    >>> policy.storage, policy.accumulation
+    (<class 'numpy.float32'>, <class 'numpy.float64'>)
+    """
+
+    def __init__(self, name, storage, accumulation=None):
+        """
+        Constructs all necessary attributes for the PrecisionPolicy object.
+
+        Parameters
+        ----------
+        name : str
+            name of the policy
+        storage : numpy floating type (np.float32 or np.float64)
+            type of primals, tangents and partials
+        accumulation : numpy floating type, optional
+            type of the adjoint sums (default: the storage type)
+        """
+        assert issubclass(storage, np.floating), f"{storage} is not a numpy floating type"
+        accumulation = storage if accumulation is None else accumulation
+        assert issubclass(accumulation, np.floating), f"{accumulation} is not a numpy floating type"
+        self.name = name
+        self.storage = storage
+        self.accumulation = accumulation
+
+    def cast(self, x):
+        """
+        Convert a scalar or array to the storage type (scalars stay scalars).
+        """
+        return np.asarray(x, dtype=self.storage)[()]
+
+    def one(self):
+        """
+        Seed adjoint of a reverse sweep, in the accumulation type.
+        """
+        return self.accumulation(1.0)
+
+    def __repr__(self):
+        """
+        Represents the policy as a string.
+        """
+        return (f"PrecisionPolicy(name={self.name!r}, storage={np.dtype(self.storage).name}, "
+                f"accumulation={np.dtype(self.accumulation).name})")
+
+
+_POLICIES = {
+    'float64': PrecisionPolicy('float64', np.float64),
+    'float32': PrecisionPolicy('float32', np.float32),
+    'mixed': PrecisionPolicy('mixed', np.float32, np.float64),
+}
+
+
+def get_policy(policy):
+    """
+    Resolve a policy name.
+
+    Parameters
+    ----------
+    policy : str ('float64', 'float32' or 'mixed') or PrecisionPolicy
+
+    Returns
+    -------
+    PrecisionPolicy
+    """
+    if isinstance(policy, PrecisionPolicy):
+        return policy
+    if policy not in _POLICIES:
+        raise ValueError(f"Unknown precision policy {policy!r}, expected one of {sorted(_POLICIES)}")
+    return _POLICIES[policy]
+
+
+def current_policy():
+    """
+    Policy of the innermost active precision block of this thread or task (float64 outside of any block).
+    """
+    policy = _CONTEXT.get().policy
+    return _POLICIES['float64'] if policy is None else policy
+
+
+@contextmanager
+def precision(policy):
+    """
+    Run ForwardMode, ReverseMode and tape replays inside the block with a precision policy.
+
+    'float32' stores primals, tangents and partials in single precision and
+    also sums the adjoints in single precision; 'mixed' stores in single
+    precision but sums the adjoints in double precision; 'float64' is the
+    default path. Values are converted when DualNumbers and Nodes are built,
+    so the block has to surround the whole computation. Blocks can be nested,
+    and only apply to the thread or asyncio task running them (Context).
+
+    Parameters
+    ----------
+    policy : str or PrecisionPolicy
+
+    Returns
+    -------
+    the active PrecisionPolicy
+
+    Example
+    -------
+    >>> with precision('mixed'):
+    ...     value, J = rm.ReverseMode(lambda x1, x2: rmo.sin(x1)*x2, [1, 2])
+    >>> type(value), type(J[0])
+    (<class 'numpy.float32'>, <class 'numpy.float64'>)
+    """
+    policy = get_policy(policy)
+    default = policy.storage is np.float64 and policy.accumulation is np.float64
+    # the float64 policy is the uncast fast path
+    with activated(_CONTEXT.get().replace(policy=None if default else policy)):
+        yield policy
@@ -0,0 +1,732 @@
+#!/usr/bin/env python3
+# File: Primitives.py
+# Description: single registry of elementary operations (primal, JVP and VJP rules) shared by both modes
+
+import inspect
+import numpy as np
+from .Node import Node
+from .DualNumber import DualNumber
+from .IndexSet import IndexSet
+
+
+class Primitive:
+    """
+    A class to represent one elementary operation and its derivative rules.
+
+    Every rule works on plain values: a is the list of operand values, p the
+    tuple of constant (non-differentiated) params and out the primal result,
+    which the derivative rules may reuse. The rules are written with NumPy
+    calls, so they also accept batched arrays (Tape.replay).
+
+    A Primitive is called like a function and dispatches on its operands:
+    Nodes build one reverse mode Node, DualNumbers one forward mode
+    DualNumber, plain numbers just give the primal value.
+
+    Attributes
+    ----------
+    name : str
+        name recorded on Nodes and Tapes
+    n_args : int or None
+        number of differentiated operands, further call arguments are params;
+        None for n-ary operations (reductions) whose arguments are all operands
+    primal : function (a, p) -> value
+    jvp : function (a, p, out, t) -> tangent of the result
+        t holds one tangent per operand
+    vjp : function (a, p, out) -> tuple of partial derivatives
+        the pullback of a unit cotangent, one partial per operand; reverse
+        sweeps multiply it by the adjoint of the result
+    check : function (a, p) raising ValueError outside the domain, or None
+    linearize : function (a, p) -> (value, partials), or None
+        fused rule used when building Nodes and DualNumbers: it computes the
+        primal and the partials together so that transcendental calls are
+        shared between them, and does the domain check itself
+    template : (value template, partial templates) used by Compiler, a function
+        generating the source of an n-ary operation, or None
+    hessian : function (a, p, out) -> list of (i, j, value), or None
+        second derivatives of the result at one point, as triplets with
+        i <= j (zero entries left out); used by Hessian-vector products
+
+    Methods
+    -------
+    __call__(*args):
+        apply the primitive to Nodes, DualNumbers or numbers
+
+    Example
+    -------
+    >>> primitive('sin')(Node(2)).deriv
+    [(Reverse-Mode AD: (f(x)=2, J=()), -0.4161468365471424)]
+    >>> primitive('sin')(DualNumber(2))
+    Dual Number (real=0.9092974268256817, dual=-0.4161468365471424)
+    """
+
+    def __init__(self, name, primal, jvp=None, vjp=None, n_args=1, check=None, template=None, linearize=None,
+                 hessian=None):
+        """
+        Constructs all necessary attributes for the Primitive object.
+
+        At least one of jvp and vjp must be given; the missing one is derived
+        from the other (a JVP from the partials, or the partials from one JVP
+        per operand with unit tangents).
+
+        Parameters
+        ----------
+        name : str
+        primal : function (a, p) -> value
+        jvp : function (a, p, out, t) -> tangent, optional
+        vjp : function (a, p, out) -> partials, optional
+        n_args : int or None, optional
+            number of differentiated operands (default 1), None for n-ary operations
+        check : function (a, p), optional
+            domain check raising ValueError
+        template : tuple, optional
+            source templates for Compiler
+        linearize : function (a, p) -> (value, partials), optional
+            fused primal and partials (see the class attributes)
+        hessian : function (a, p, out) -> list of (i, j, value), optional
+            second derivatives (see the class attributes)
+        """
+        assert jvp is not None or vjp is not None, f"Primitive {name} needs a JVP or a VJP rule"
+        self.name = name
+        self.n_args = n_args
+        self.primal = primal
+        self.check = check
+        self.template = template
+        self.hessian = hessian
+        if vjp is None:
+            assert n_args is not None, f"The n-ary primitive {name} needs a VJP rule"
+            units = [tuple(1.0 if i == j else 0.0 for j in range(n_args)) for i in range(n_args)]
+            vjp = lambda a, p, out: tuple(jvp(a, p, out, unit) for unit in units)
+        self._fused = linearize is not None
+        if jvp is None:
+            jvp = lambda a, p, out, t: sum(partial*ti for partial, ti in zip(vjp(a, p, out), t))
+        if linearize is None:
+            linearize = lambda a, p: self._linearize(a, p)
+        self.jvp = jvp
+        self.vjp = vjp
+        self.linearize = linearize
+
+    def _linearize(self, a, params):
+        """
+        Value and partials from the separate check, primal and VJP rules.
+        """
+        if self.check is not None:
+            self.check(a, params)
+        out = self.primal(a, params)
+        return out, self.vjp(a, params, out)
+
+    def _node(self, *args):
+        """
+        One reverse mode Node whose edges carry the partials of the VJP rule.
+        """
+        n = self.n_args if self.n_args is not None else len(args)
+        params = args[n:]
+        # op and params passed positionally: keyword arguments cost a noticeable part of a unary call
+        if n == 1:
+            x = args[0]
+            if not isinstance(x, Node):
+                x = Node(x, )
+            out, partials = self.linearize([x.value], params)
+            return Node(out, [(x, partials[0])], self.name, params)
+        operands = [x if isinstance(x, Node) else Node(x, ) for x in args[:n]]
+        out, partials = self.linearize([x.value for x in operands], params)
+        return Node(out, list(zip(operands, partials)), self.name, params)
+
+    def _dual(self, *args):
+        """
+        One forward mode DualNumber whose dual part comes from the JVP rule.
+        """
+        n = self.n_args if self.n_args is not None else len(args)
+        params = args[n:]
+        a = [x.real if isinstance(x, DualNumber) else x for x in args[:n]]
+        t = [x.dual if isinstance(x, DualNumber) else 0.0 for x in args[:n]]
+        if self._fused:
+            out, partials = self.linearize(a, params)
+            if n == 1:
+                return DualNumber(out, partials[0]*t[0])
+            if self.n_args is None:
+                # reductions: one dot product of the local gradient with the tangents
+                return DualNumber(out, np.dot(partials, t))
+            return DualNumber(out, sum(partial*ti for partial, ti in zip(partials, t)))
+        if self.check is not None:
+            self.check(a, params)
+        out = self.primal(a, params)
+        return DualNumber(out, self.jvp(a, params, out, t))
+
+    def _index_set(self, *args):
+        """
+        One IndexSet depending on every input the operands depend on (no rule is evaluated).
+        """
+        n = self.n_args if self.n_args is not None else len(args)
+        tracer = next(operand for operand in args[:n] if isinstance(operand, IndexSet))
+        return tracer.combine(self.name, args[:n])
+
+    def _value(self, *args):
+        n = self.n_args if self.n_args is not None else len(args)
+        a, params = list(args[:n]), args[n:]
+        if self.check is not None:
+            self.check(a, params)
+        return self.primal(a, params)
+
+    def __call__(self, *args):
+        """
+        Apply the primitive, dispatching on the type of the operands.
+
+        Parameters
+        ----------
+        args : n_args operands (Node, DualNumber, IndexSet, int or float), then the params
+
+        Returns
+        -------
+        Node, DualNumber or value
+        """
+        method = _TRACERS.get(type(args[0]))
+        if method is None:
+            return self._dispatch(args)
+        return getattr(self, method)(*args)
+
+    def _dispatch(self, args):
+        """
+        Slow path of __call__: tracer among the later operands, subclasses of tracer types, plain values.
+        """
+        n = self.n_args if self.n_args is not None else len(args)
+        assert len(args) >= n, f"{self.name} expects {n} operand(s), got {len(args)}"
+        for operand in args[:n]:
+            method = next((m for cls, m in _TRACERS.items() if isinstance(operand, cls)), None)
+            if method is not None:
+                return getattr(self, method)(*args)
+        return self._value(*args)
+
+    def __repr__(self):
+        """
+        Represents the primitive as a string.
+        """
+        return f"Primitive(name={self.name!r}, n_args={self.n_args})"
+
+
+# operand types that trace through primitives and the Primitive method building their result
+_TRACERS = {
+    Node: '_node',
+    DualNumber: '_dual',
+    IndexSet: '_index_set',
+}
+
+_REGISTRY = {}
+_BUILTINS = set()
+
+
+def register(primitive, builtin=False):
+    """
+    Add a Primitive to the registry so Tapes, Compiler and Optimize know it by name.
+
+    Parameters
+    ----------
+    primitive : Primitive
+    builtin : bool, optional
+        built-in operations cannot be replaced later
+
+    Returns
+    -------
+    primitive
+    """
+    if primitive.name in _BUILTINS or primitive.name in ('input', 'const'):
+        raise ValueError(f"{primitive.name} is a built-in operation and cannot be redefined")
+    _REGISTRY[primitive.name] = primitive
+    if builtin:
+        _BUILTINS.add(primitive.name)
+    return primitive
+
+
+def primitive(name):
+    """
+    Look up a registered Primitive by name.
+
+    Parameters
+    ----------
+    name : str
+
+    Returns
+    -------
+    Primitive
+    """
+    try:
+        return _REGISTRY[name]
+    except KeyError:
+        raise ValueError(f"Unknown operation {name}, register it with custom_jvp or custom_vjp first") from None
+
+
+def apply(name, *args):
+    """
+    Apply the registered primitive name to args (see Primitive.__call__).
+    """
+    return primitive(name)(*args)
+
+
+def _n_args(f, n_args):
+    if n_args is not None:
+        return n_args
+    parameters = inspect.signature(f).parameters.values()
+    assert all(p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD) for p in parameters), \
+        "Give n_args for a primal with *args or keyword-only arguments"
+    return len(parameters)
+
+
+def custom_jvp(primal, jvp, name=None, n_args=None):
+    """
+    Register a user primitive with a hand-written forward derivative rule.
+
+    The primitive is recorded as a single node: nothing inside primal is
+    traced, so its internals may use any Python or NumPy code.
+
+    Parameters
+    ----------
+    primal : function (x1, ..., xn) -> value, on plain numbers
+    jvp : function (primals, tangents) -> tangent of the result
+        primals and tangents are tuples with one entry per operand
+    name : str, optional
+        registry name (default primal.__name__)
+    n_args : int, optional
+        number of operands (default: the number of arguments of primal)
+
+    Returns
+    -------
+    Primitive, callable on Nodes, DualNumbers and numbers
+
+    Example
+    -------
+    >>> def softplus(x):
+    ...     return np.log1p(np.exp(x))
+    >>> softplus = custom_jvp(softplus, lambda x, t: t[0]/(1 + np.exp(-x[0])))
+    >>> ReverseMode(lambda x1: softplus(x1)*2, [0.0])
+    (1.3862943611198906, [1.0])
+    """
+    n = _n_args(primal, n_args)
+    return register(Primitive(name or primal.__name__, lambda a, p: primal(*a),
+                              jvp=lambda a, p, out, t: jvp(tuple(a), tuple(t)), n_args=n))
+
+
+def custom_vjp(primal, vjp, name=None, n_args=None):
+    """
+    Register a user primitive with a hand-written reverse derivative rule.
+
+    The primitive is recorded as a single node: nothing inside primal is
+    traced, so its internals may use any Python or NumPy code.
+
+    Parameters
+    ----------
+    primal : function (x1, ..., xn) -> value, on plain numbers
+    vjp : function (primals, out) -> partial derivatives
+        primals is a tuple with one entry per operand, out the primal result;
+        returns one partial derivative of the result per operand
+    name : str, optional
+        registry name (default primal.__name__)
+    n_args : int, optional
+        number of operands (default: the number of arguments of primal)
+
+    Returns
+    -------
+    Primitive, callable on Nodes, DualNumbers and numbers
+
+    Example
+    -------
+    >>> def hypot(x, y):
+    ...     return np.hypot(x, y)
+    >>> hypot = custom_vjp(hypot, lambda a, out: (a[0]/out, a[1]/out))
+    >>> ReverseMode(lambda x1, x2: hypot(x1, x2), [3.0, 4.0])
+    (5.0, [0.6, 0.8])
+    """
+    n = _n_args(primal, n_args)
+    return register(Primitive(name or primal.__name__, lambda a, p: primal(*a),
+                              vjp=lambda a, p, out: tuple(vjp(tuple(a), out)), n_args=n))
+
+
+"""
+
+domain checks
+
+"""
+
+def _check_tan_cos(c):
+    if np.abs(c) < np.finfo(float).eps:
+        raise ValueError("Invalid domain for Tan.")
+
+def _check_tan(a, p):
+    _check_tan_cos(np.cos(a[0]))
+
+def _check_log(a, p):
+    if a[0] <= 0:
+        raise ValueError("Cannot compute logarithm of negative numbers or 0")
+
+def _check_log_base(a, p):
+    if p[0] <= 0:
+        raise ValueError("Cannot compute logarithm of negative numbers")
+    _check_log(a, p)
+
+def _check_unit_interval(a, p):
+    if -1 > a[0] or a[0] > 1:
+        raise ValueError("Invalid Domain, must be between -1 and 1")
+
+
+"""
+
+fused rules: every transcendental of the primal is evaluated once and
+reused for the partial (NumPy has no sincos, so sin and cos keep one
+call each for the value and the partial)
+
+"""
+
+def _linearize_sin(a, p):
+    return np.sin(a[0]), (np.cos(a[0]),)
+
+def _linearize_cos(a, p):
+    return np.cos(a[0]), (-np.sin(a[0]),)
+
+def _linearize_tan(a, p):
+    # the cosine of the domain check is the one of the partial
+    c = np.cos(a[0])
+    _check_tan_cos(c)
+    return np.tan(a[0]), (1/c**2,)
+
+def _linearize_exp(a, p):
+    out = np.exp(a[0])
+    return out, (out,)
+
+def _linearize_ln(a, p):
+    _check_log(a, p)
+    return np.log(a[0]), (1/a[0],)
+
+def _linearize_log(a, p):
+    _check_log_base(a, p)
+    log_base = np.log(p[0])
+    return np.log(a[0])/log_base, (1/(a[0]*log_base),)
+
+def _linearize_arcsin(a, p):
+    _check_unit_interval(a, p)
+    return np.arcsin(a[0]), (1/np.sqrt(1 - a[0]**2),)
+
+def _linearize_arccos(a, p):
+    _check_unit_interval(a, p)
+    return np.arccos(a[0]), (-1/np.sqrt(1 - a[0]**2),)
+
+def _linearize_arctan(a, p):
+    return np.arctan(a[0]), (1/((a[0]**2) + 1),)
+
+def _linearize_sinh(a, p):
+    # cosh from sqrt(1 + sinh^2) would overflow for |x| > 355 where cosh itself is finite
+    return np.sinh(a[0]), (np.cosh(a[0]),)
+
+def _linearize_cosh(a, p):
+    # sinh from cosh would cancel near 0, so it is evaluated
+    return np.cosh(a[0]), (np.sinh(a[0]),)
+
+def _linearize_tanh(a, p):
+    out = np.tanh(a[0])
+    return out, (1 - out**2,)
+
+def _linearize_sigmoid(a, p):
+    # sigmoid' = sigmoid (1 - sigmoid) reuses exp(-x): 1 - sigmoid = exp(-x) sigmoid avoids the
+    # cancellation for x >= 0, and for x < 0 (where exp(-x) may overflow) 1 - sigmoid does not cancel
+    x = a[0]
+    e = np.exp(-x)
+    out = 1/(1 + e)
+    return out, (out*np.where(x >= 0, e*out, 1 - out),)
+
+
+"""
+
+built-in operations
+
+templates: {0}, {1} are the operand variables, {out} the result, {p[i]}
+the constant params and {sin}, {log}, ... the library functions of the
+Compiler backend
+
+"""
+
+def _log_base(b):
+    # log of the base of pow where it is positive and 0 elsewhere, for scalars and arrays alike:
+    # b ** y has no real derivative in y for b <= 0, and a constant exponent must not give nan there
+    return np.log((b > 0)*b + (b <= 0))
+
+def _hessian_pow(a, p, out):
+    b, y = a
+    c = y*(y - 1)
+    # x**0 and x**1 have no curvature (and 0**(c - 2) may not be finite)
+    entries = [(0, 0, c*b**(y - 2))] if c != 0 else []
+    if b > 0:
+        log = np.log(b)
+        entries += [(0, 1, b**(y - 1)*(1 + y*log)), (1, 1, out*log**2)]
+    return entries
+
+for _primitive in [
+    Primitive('add', lambda a, p: a[0] + a[1], n_args=2,
+              vjp=lambda a, p, out: (1.0, 1.0),
+              template=('{0} + {1}', ('1.0', '1.0')),
+              hessian=lambda a, p, out: []),
+    Primitive('sub', lambda a, p: a[0] - a[1], n_args=2,
+              vjp=lambda a, p, out: (1.0, -1.0),
+              template=('{0} - {1}', ('1.0', '-1.0')),
+              hessian=lambda a, p, out: []),
+    Primitive('mul', lambda a, p: a[0] * a[1], n_args=2,
+              vjp=lambda a, p, out: (a[1], a[0]),
+              template=('{0} * {1}', ('{1}', '{0}')),
+              hessian=lambda a, p, out: [(0, 1, 1.0)]),
+    Primitive('div', lambda a, p: a[0] / a[1], n_args=2,
+              vjp=lambda a, p, out: (1.0 / a[1], -a[0] / a[1] ** 2),
+              template=('{0} / {1}', ('1.0 / {1}', '-{0} / {1} ** 2')),
+              hessian=lambda a, p, out: [(0, 1, -1.0 / a[1] ** 2), (1, 1, 2 * a[0] / a[1] ** 3)]),
+    # the partial in the exponent is out * log(base), 0 where the base is not positive
+    Primitive('pow', lambda a, p: a[0] ** a[1], n_args=2,
+              vjp=lambda a, p, out: (a[1] * a[0] ** (a[1] - 1), out * _log_base(a[0])),
+              template=('{0} ** {1}', ('{1} * {0} ** ({1} - 1)', '{out} * {log}(({0} > 0) * {0} + ({0} <= 0))')),
+              hessian=_hessian_pow),
+    # constant base raised to a variable power
+    Primitive('rpow', lambda a, p: a[0] ** a[1], n_args=2,
+              vjp=lambda a, p, out: (0.0, out * np.log(a[0])),
+              template=('{0} ** {1}', ('0.0', '{out} * {log}({0})')),
+              hessian=lambda a, p, out: [(1, 1, out * np.log(a[0]) ** 2)]),
+    Primitive('sin', lambda a, p: np.sin(a[0]), linearize=_linearize_sin,
+              vjp=lambda a, p, out: (np.cos(a[0]),),
+              template=('{sin}({0})', ('{cos}({0})',)),
+              hessian=lambda a, p, out: [(0, 0, -out)]),
+    Primitive('cos', lambda a, p: np.cos(a[0]), linearize=_linearize_cos,
+              vjp=lambda a, p, out: (-np.sin(a[0]),),
+              template=('{cos}({0})', ('-{sin}({0})',)),
+              hessian=lambda a, p, out: [(0, 0, -out)]),
+    Primitive('tan', lambda a, p: np.tan(a[0]), check=_check_tan, linearize=_linearize_tan,
+              vjp=lambda a, p, out: (1 + out**2,),
+              template=('{tan}({0})', ('1.0 + {out} ** 2',)),
+              hessian=lambda a, p, out: [(0, 0, 2*out*(1 + out**2))]),
+    Primitive('exp', lambda a, p: np.exp(a[0]), linearize=_linearize_exp,
+              vjp=lambda a, p, out: (out,),
+              template=('{exp}({0})', ('{out}',)),
+              hessian=lambda a, p, out: [(0, 0, out)]),
+    Primitive('ln', lambda a, p: np.log(a[0]), check=_check_log, linearize=_linearize_ln,
+              vjp=lambda a, p, out: (1/a[0],),
+              template=('{log}({0})', ('1.0 / {0}',)),
+              hessian=lambda a, p, out: [(0, 0, -1/a[0]**2)]),
+    Primitive('log', lambda a, p: np.log(a[0])/np.log(p[0]), check=_check_log_base, linearize=_linearize_log,
+              vjp=lambda a, p, out: (1/(a[0]*np.log(p[0])),),
+              template=('{log}({0}) / {log}({p[0]})', ('1.0 / ({0} * {log}({p[0]}))',)),
+              hessian=lambda a, p, out: [(0, 0, -1/(a[0]**2*np.log(p[0])))]),
+    Primitive('arcsin', lambda a, p: np.arcsin(a[0]), check=_check_unit_interval, linearize=_linearize_arcsin,
+              vjp=lambda a, p, out: (1/np.sqrt(1 - a[0]**2),),
+              template=('{arcsin}({0})', ('1.0 / {sqrt}(1.0 - {0} ** 2)',)),
+              hessian=lambda a, p, out: [(0, 0, a[0]/(1 - a[0]**2)**1.5)]),
+    Primitive('arccos', lambda a, p: np.arccos(a[0]), check=_check_unit_interval, linearize=_linearize_arccos,
+              vjp=lambda a, p, out: (-1/np.sqrt(1 - a[0]**2),),
+              template=('{arccos}({0})', ('-1.0 / {sqrt}(1.0 - {0} ** 2)',)),
+              hessian=lambda a, p, out: [(0, 0, -a[0]/(1 - a[0]**2)**1.5)]),
+    Primitive('arctan', lambda a, p: np.arctan(a[0]), linearize=_linearize_arctan,
+              vjp=lambda a, p, out: (1/((a[0]**2) + 1),),
+              template=('{arctan}({0})', ('1.0 / ({0} ** 2 + 1.0)',)),
+              hessian=lambda a, p, out: [(0, 0, -2*a[0]/(1 + a[0]**2)**2)]),
+    Primitive('sinh', lambda a, p: np.sinh(a[0]), linearize=_linearize_sinh,
+              vjp=lambda a, p, out: (np.cosh(a[0]),),
+              template=('{sinh}({0})', ('{cosh}({0})',)),
+              hessian=lambda a, p, out: [(0, 0, out)]),
+    Primitive('cosh', lambda a, p: np.cosh(a[0]), linearize=_linearize_cosh,
+              vjp=lambda a, p, out: (np.sinh(a[0]),),
+              template=('{cosh}({0})', ('{sinh}({0})',)),
+              hessian=lambda a, p, out: [(0, 0, out)]),
+    Primitive('tanh', lambda a, p: np.tanh(a[0]), linearize=_linearize_tanh,
+              vjp=lambda a, p, out: (1 - out**2,),
+              template=('{tanh}({0})', ('1.0 - {out} ** 2',)),
+              hessian=lambda a, p, out: [(0, 0, -2*out*(1 - out**2))]),
+    Primitive('sigmoid', lambda a, p: 1/(1 + np.exp(-a[0])), linearize=_linearize_sigmoid,
+              vjp=lambda a, p, out: (out*(1 - out),),
+              template=('1.0 / (1.0 + {exp}(-{0}))', ('{out} * (1.0 - {out})',)),
+              hessian=lambda a, p, out: [(0, 0, out*(1 - out)*(1 - 2*out))]),
+]:
+    register(_primitive, builtin=True)
+
+
+"""
+
+n-ary reductions and losses, recorded as one node with a vectorized local gradient
+
+The rules stack the operand values into an array whose first axis runs over
+the operands (a trailing batch axis is kept when replaying a Tape). Their
+templates are functions (operands, params, out, functions) returning the
+statements to emit before the result, the value expression and one partial
+expression per operand; sums are accumulated statement by statement so the
+generated code stays flat for thousands of operands.
+
+"""
+
+def _stack(a):
+    try:
+        return np.asarray(a, dtype=float)
+    except ValueError: # constants mixed with batched operands
+        return np.array(np.broadcast_arrays(*a), dtype=float)
+
+def _halves(x):
+    n = len(x)//2
+    assert 2*n == len(x), "Expected two sequences of the same length"
+    return x[:n], x[n:]
+
+def _linearize_sum(a, p):
+    x = _stack(a)
+    return x.sum(axis=0), np.ones_like(x)
+
+def _linearize_mean(a, p):
+    x = _stack(a)
+    return x.mean(axis=0), np.full_like(x, 1/len(x))
+
+def _linearize_prod(a, p):
+    # prefix and suffix products: exact partials even when an operand is 0
+    x = _stack(a)
+    ones = np.ones_like(x[:1])
+    before = np.cumprod(np.concatenate([ones, x[:-1]]), axis=0)
+    after = np.cumprod(np.concatenate([ones, x[:0:-1]]), axis=0)[::-1]
+    return np.prod(x, axis=0), before*after
+
+def _linearize_dot(a, p):
+    u, v = _halves(_stack(a))
+    return (u*v).sum(axis=0), np.concatenate([v, u])
+
+def _linearize_norm(a, p):
+    x = _stack(a)
+    out = np.linalg.norm(x, axis=0)
+    # the subgradient 0 is used at the origin
+    return out, np.divide(x, out, out=np.zeros_like(x), where=out != 0)
+
+def _linearize_logsumexp(a, p):
+    x = _stack(a)
+    m = x.max(axis=0)
+    e = np.exp(x - m)
+    s = e.sum(axis=0)
+    # the partials are the softmax, from the same exponentials
+    return m + np.log(s), e/s
+
+def _linearize_mse(a, p):
+    d = np.subtract(*_halves(_stack(a)))
+    g = 2*d/len(d)
+    return (d*d).mean(axis=0), np.concatenate([g, -g])
+
+def _linearize_least_squares(a, p):
+    d = np.subtract(*_halves(_stack(a)))
+    return 0.5*(d*d).sum(axis=0), np.concatenate([d, -d])
+
+def _linearize_softplus(a, p):
+    # log(1 + exp(x)) = max(x, 0) + log1p(exp(-|x|)), the sigmoid reuses exp(-|x|)
+    x = a[0]
+    e = np.exp(-np.abs(x))
+    return np.maximum(x, 0) + np.log1p(e), (np.where(x >= 0, 1.0, e)/(1 + e),)
+
+
+def _hessian_prod(a, p, out):
+    # d2/dxi dxj is the product of the other operands: the partials of the product with xi set to 1
+    triplets = []
+    for i in range(len(a)):
+        b = list(a)
+        b[i] = 1.0
+        partials = _linearize_prod(b, p)[1]
+        triplets.extend((i, j, partials[j]) for j in range(i + 1, len(a)))
+    return triplets
+
+def _hessian_dot(a, p, out):
+    n = len(a)//2
+    return [(k, n + k, 1.0) for k in range(n)]
+
+def _hessian_norm(a, p, out):
+    if out == 0:
+        return []
+    u = _stack(a)/out
+    # (I - u u^T)/|x|
+    return [(i, j, ((i == j) - u[i]*u[j])/out) for i in range(len(a)) for j in range(i, len(a))]
+
+def _hessian_logsumexp(a, p, out):
+    s = np.exp(_stack(a) - out)
+    # diag(s) - s s^T with s the softmax
+    return [(i, j, (i == j)*s[i] - s[i]*s[j]) for i in range(len(a)) for j in range(i, len(a))]
+
+def _hessian_squares(scale):
+    def hessian(a, p, out):
+        n = len(a)//2
+        c = scale(n)
+        return [(k, k, c) for k in range(2*n)] + [(k, n + k, -c) for k in range(n)]
+    return hessian
+
+
+def _accumulate(out, name, terms, op='+'):
+    """
+    Statements accumulating terms[0] op terms[1] op ... into the temporary {out}_{name}.
+    """
+    target = f'{out}_{name}'
+    return [f'{target} = {terms[0]}'] + [f'{target} = {target} {op} {term}' for term in terms[1:]], target
+
+def _template_sum(operands, params, out, functions):
+    lines, total = _accumulate(out, 's', operands)
+    return lines, total, ['1.0']*len(operands)
+
+def _template_mean(operands, params, out, functions):
+    lines, total = _accumulate(out, 's', operands)
+    return lines, f'{total} / {len(operands)}', [repr(1/len(operands))]*len(operands)
+
+def _template_prod(operands, params, out, functions):
+    n = len(operands)
+    lines, total = _accumulate(out, 'p', operands, '*')
+    # prefix products b_i = x_0 ... x_{i-1} and suffix products a_i = x_{i+1} ... x_{n-1}
+    lines += [f'{out}_b0 = 1.0'] + [f'{out}_b{i} = {out}_b{i-1} * {operands[i-1]}' for i in range(1, n)]
+    lines += [f'{out}_a{n-1} = 1.0'] + [f'{out}_a{i} = {out}_a{i+1} * {operands[i+1]}' for i in range(n - 2, -1, -1)]
+    return lines, total, [f'{out}_b{i} * {out}_a{i}' for i in range(n)]
+
+def _template_dot(operands, params, out, functions):
+    u, v = _halves(operands)
+    lines, total = _accumulate(out, 's', [f'{ui} * {vi}' for ui, vi in zip(u, v)])
+    return lines, total, list(v) + list(u)
+
+def _template_norm(operands, params, out, functions):
+    lines, total = _accumulate(out, 's', [f'{x} ** 2' for x in operands])
+    # out > 0 is at least the smallest subnormal 5e-324, so the maximum only changes 0/0 at the origin into
+    # the subgradient 0 used by _linearize_norm, and works elementwise and on floats alike
+    return lines, f'{functions["sqrt"]}({total})', [f'{x} / {functions["maximum"]}({out}, 5e-324)' for x in operands]
+
+def _template_logsumexp(operands, params, out, functions):
+    m = f'{out}_m'
+    lines = [f'{m} = {operands[0]}'] + [f'{m} = {functions["maximum"]}({m}, {x})' for x in operands[1:]]
+    more, total = _accumulate(out, 's', [f'{functions["exp"]}({x} - {m})' for x in operands])
+    return lines + more, f'{m} + {functions["log"]}({total})', [f'{functions["exp"]}({x} - {out})' for x in operands]
+
+def _template_mse(operands, params, out, functions):
+    u, v = _halves(operands)
+    n = len(u)
+    lines = [f'{out}_d{i} = {ui} - {vi}' for i, (ui, vi) in enumerate(zip(u, v))]
+    more, total = _accumulate(out, 's', [f'{out}_d{i} ** 2' for i in range(n)])
+    g = [f'{2/n!r} * {out}_d{i}' for i in range(n)]
+    return lines + more, f'{total} / {n}', g + [f'-{gi}' for gi in g]
+
+def _template_least_squares(operands, params, out, functions):
+    u, v = _halves(operands)
+    n = len(u)
+    lines = [f'{out}_d{i} = {ui} - {vi}' for i, (ui, vi) in enumerate(zip(u, v))]
+    more, total = _accumulate(out, 's', [f'{out}_d{i} ** 2' for i in range(n)])
+    d = [f'{out}_d{i}' for i in range(n)]
+    return lines + more, f'0.5 * {total}', d + [f'-{di}' for di in d]
+
+
+def _fused_vjp(linearize):
+    return lambda a, p, out: linearize(a, p)[1]
+
+for _name, _primal, _linearize, _template, _hessian in [
+    ('sum', lambda a, p: _stack(a).sum(axis=0), _linearize_sum, _template_sum,
+     lambda a, p, out: []),
+    ('mean', lambda a, p: _stack(a).mean(axis=0), _linearize_mean, _template_mean,
+     lambda a, p, out: []),
+    ('prod', lambda a, p: np.prod(_stack(a), axis=0), _linearize_prod, _template_prod, _hessian_prod),
+    ('dot', lambda a, p: np.multiply(*_halves(_stack(a))).sum(axis=0), _linearize_dot, _template_dot, _hessian_dot),
+    ('norm', lambda a, p: np.linalg.norm(_stack(a), axis=0), _linearize_norm, _template_norm, _hessian_norm),
+    ('logsumexp', lambda a, p: _linearize_logsumexp(a, p)[0], _linearize_logsumexp, _template_logsumexp,
+     _hessian_logsumexp),
+    ('mse', lambda a, p: _linearize_mse(a, p)[0], _linearize_mse, _template_mse,
+     _hessian_squares(lambda n: 2/n)),
+    ('least_squares', lambda a, p: _linearize_least_squares(a, p)[0], _linearize_least_squares, _template_least_squares,
+     _hessian_squares(lambda n: 1.0)),
+]:
+    register(Primitive(_name, _primal, vjp=_fused_vjp(_linearize), n_args=None,
+                       linearize=_linearize, template=_template, hessian=_hessian), builtin=True)
+
+register(Primitive('softplus', lambda a, p: _linearize_softplus(a, p)[0], linearize=_linearize_softplus,
+                   vjp=lambda a, p, out: (np.exp(a[0] - out),),
+                   template=('{log1p}({exp}(-{abs}({0}))) + {maximum}({0}, 0.0)', ('{exp}({0} - {out})',)),
+                   hessian=lambda a, p, out: [(0, 0, np.exp(a[0] - out)*(1 - np.exp(a[0] - out)))]),
+         builtin=True)
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# File: Profiler.py
+# Description: opt-in profiling of AD runs: per-operation counts and times, graph statistics,
+#              forward and backward wall time, Chrome trace export
+
+import os
+import json
+import functools
+import threading
+from time import perf_counter
+from contextlib import contextmanager
+from .Node import Node
+from .DualNumber import DualNumber
+from .Primitives import Primitive
+from .Context import _CONTEXT, activated
+
+_OPERATORS = ['__add__', '__radd__', '__sub__', '__rsub__', '__mul__', '__rmul__',
+              '__truediv__', '__rtruediv__', '__pow__', '__rpow__', '__neg__']
+
+
+class OpStats:
+    """
+    A class to hold the count and cumulative time of one operation.
+
+    Attributes
+    ----------
+    count : int
+        number of calls
+    seconds : float
+        cumulative wall time of the calls, including nested operations
+    """
+
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        """
+        Constructs all necessary attributes for the OpStats object.
+        """
+        self.count = 0
+        self.seconds = 0.0
+
+    def __repr__(self):
+        """
+        Represents the counters as a string.
+        """
+        return f"OpStats(count={self.count}, seconds={self.seconds:.3g})"
+
+
+class GraphStats:
+    """
+    A class to describe a reverse mode graph swept by Node.get_adjoints.
+
+    Attributes
+    ----------
+    nodes : int
+        number of distinct nodes, leaves included
+    edges : int
+        number of (parent, child) edges
+    depth : int
+        length of the longest path from a leaf to the output
+    max_fan_out : int
+        largest number of parents of a node (uses of one intermediate)
+    """
+
+    def __init__(self, nodes, edges, depth, max_fan_out):
+        """
+        Constructs all necessary attributes for the GraphStats object.
+        """
+        self.nodes = nodes
+        self.edges = edges
+        self.depth = depth
+        self.max_fan_out = max_fan_out
+
+    @classmethod
+    def of(cls, output):
+        """
+        Statistics of the graph ending at the Node output.
+        """
+        order = output.topological_order()
+        depth, fan_out = {}, {}
+        edges = 0
+        for node in order:
+            depth[id(node)] = 1 + max((depth[id(child)] for child, _ in node.deriv), default=-1)
+            for child, _ in node.deriv:
+                fan_out[id(child)] = fan_out.get(id(child), 0) + 1
+                edges += 1
+        return cls(len(order), edges, depth[id(output)], max(fan_out.values(), default=0))
+
+    def __repr__(self):
+        """
+        Represents the statistics as a string.
+        """
+        return f"GraphStats(nodes={self.nodes}, edges={self.edges}, depth={self.depth}, max_fan_out={self.max_fan_out})"
+
+
+class Profile:
+    """
+    A class to represent what happened inside a profiling block.
+
+    Attributes
+    ----------
+    ops : dict
+        operation name -> OpStats. Primitives are named 'node.sin', 'dual.sin', ...
+        after the type of their operands, operators 'node.__mul__', 'dual.__add__', ...
+    nodes_created : int
+        number of Node objects constructed
+    graphs : list of GraphStats
+        one per call of Node.get_adjoints
+    forward_seconds : float
+        wall time of the block outside the backward sweeps
+    backward_seconds : float
+        wall time spent in Node.get_adjoints
+    events : list of dict
+        Chrome trace events (the backward sweeps, and every operation if events=True)
+
+    Methods
+    -------
+    total_seconds():
+        wall time of the block
+    top(n):
+        the n operations with the largest cumulative time
+    to_chrome_trace(path):
+        write the events as a Chrome trace JSON file (chrome://tracing, Perfetto)
+    summary():
+        text table of the operations
+
+    Example
+    -------
+    >>> with profiling() as profile:
+    ...     rm.ReverseMode(lambda x1, x2: rmo.sin(x1)*x2, [1.0, 2.0])
+    >>> profile.ops['node.sin'].count, profile.graphs[0].nodes
+    (1, 4)
+    """
+
+    def __init__(self, record_events=False):
+        """
+        Constructs all necessary attributes for the Profile object.
+
+        Parameters
+        ----------
+        record_events : bool, optional
+            keep one trace event per operation (default False, only the backward sweeps)
+        """
+        self.ops = {}
+        self.nodes_created = 0
+        self.graphs = []
+        self.forward_seconds = 0.0
+        self.backward_seconds = 0.0
+        self.events = []
+        self.record_events = record_events
+        self._start = perf_counter()
+        self._stop = None
+        self._thread = threading.get_ident()
+        self._in_operator = False
+
+    def _call(self, name, category, func, args):
+        # called by the _timed wrappers of the operators, the Primitive rules and Node.get_adjoints
+        if category == 'backward':
+            return self._backward(func, args[0])
+        if category == 'operator':
+            if self._in_operator:
+                # __radd__ delegating to __add__, ...: only the operator the user called is recorded
+                return func(*args)
+            self._in_operator = True
+        else:
+            # primitives are named after the kind of their result and their name
+            name = f'{name}.{args[0].name}'
+        start = perf_counter()
+        try:
+            return func(*args)
+        finally:
+            stop = perf_counter()
+            if category == 'operator':
+                self._in_operator = False
+            self._record(name, start, stop, category)
+
+    def _backward(self, get_adjoints, output):
+        graph = GraphStats.of(output)
+        start = perf_counter()
+        try:
+            return get_adjoints(output)
+        finally:
+            stop = perf_counter()
+            self.graphs.append(graph)
+            self.backward_seconds += stop - start
+            self._event('get_adjoints', start, stop, 'backward', vars(graph))
+
+    def _record(self, name, start, stop, category):
+        stats = self.ops.get(name)
+        if stats is None:
+            stats = self.ops[name] = OpStats()
+        stats.count += 1
+        stats.seconds += stop - start
+        if self.record_events:
+            self._event(name, start, stop, category)
+
+    def _event(self, name, start, stop, category, args=None):
+        event = {'name': name, 'cat': category, 'ph': 'X', 'pid': os.getpid(), 'tid': threading.get_ident(),
+                 'ts': (start - self._start)*1e6, 'dur': (stop - start)*1e6}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def total_seconds(self):
+        """
+        Wall time of the profiling block (up to now if it is still running).
+        """
+        return (perf_counter() if self._stop is None else self._stop) - self._start
+
+    def top(self, n=10):
+        """
+        The n operations with the largest cumulative time, as (name, OpStats) pairs.
+        """
+        return sorted(self.ops.items(), key=lambda item: item[1].seconds, reverse=True)[:n]
+
+    def to_chrome_trace(self, path=None):
+        """
+        Chrome trace of the block, written as JSON to path if given.
+
+        Returns
+        -------
+        dict with the 'traceEvents' list
+        """
+        trace = {'traceEvents': [{'name': 'profiling', 'cat': 'phase', 'ph': 'X', 'pid': os.getpid(),
+                                  'tid': self._thread, 'ts': 0.0, 'dur': self.total_seconds()*1e6}]
+                 + self.events, 'displayTimeUnit': 'ms'}
+        if path is not None:
+            with open(path, 'w') as file:
+                json.dump(trace, file)
+        return trace
+
+    def summary(self, n=20):
+        """
+        Text table of the n most expensive operations, graph statistics and phase times.
+        """
+        lines = [f"{'operation':<24}{'count':>10}{'total (ms)':>14}{'per call (us)':>16}"]
+        for name, stats in self.top(n):
+            lines.append(f"{name:<24}{stats.count:>10}{stats.seconds*1e3:>14.3f}{stats.seconds/stats.count*1e6:>16.3f}")
+        lines.append(f"nodes created: {self.nodes_created}")
+        for graph in self.graphs:
+            lines.append(repr(graph))
+        lines.append(f"forward: {self.forward_seconds*1e3:.3f} ms, backward: {self.backward_seconds*1e3:.3f} ms")
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        """
+        Represents the profile as a string.
+        """
+        return (f"Profile(ops={sum(s.count for s in self.ops.values())}, nodes_created={self.nodes_created}, "
+                f"forward_seconds={self.forward_seconds:.3g}, backward_seconds={self.backward_seconds:.3g})")
+
+
+@contextmanager
+def profiling(events=False):
+    """
+    Profile the forward and reverse mode work done inside the block.
+
+    The DualNumber and Node operators, every primitive (so every
+    LYCET_Operations_* function) and Node.get_adjoints record into the
+    profile of the active trace context, and Node construction is counted
+    through a node hook. The timed versions of these methods are swapped in
+    only while a profiling block is active (Context.activated), so the
+    operators cost nothing extra otherwise. The profile belongs to the
+    thread or asyncio task running the block: work done concurrently
+    elsewhere is not recorded, though it runs the timed methods meanwhile.
+    An operator is recorded once, under the name the user called: the
+    operators it delegates to (__radd__ to __add__, ...) are part of its
+    time. Times are inclusive: an operator calling a primitive counts the
+    primitive's time too. Blocks cannot be nested in one thread or task.
+
+    Parameters
+    ----------
+    events : bool, optional
+        record one Chrome trace event per operation (default False: only the backward sweeps,
+        which is much cheaper for long runs)
+
+    Returns
+    -------
+    Profile, filled in while the block runs
+
+    Example
+    -------
+    >>> with profiling(events=True) as profile:
+    ...     fm.ForwardMode(lambda x: fmo.exp(x[0])*x[1], [1.0, 2.0], gradient=True)
+    >>> profile.ops['dual.exp'].count > 0
+    True
+    >>> profile.to_chrome_trace('trace.json')
+    """
+    context = _CONTEXT.get()
+    if context.profile is not None:
+        raise RuntimeError("profiling blocks cannot be nested")
+    profile = Profile(events)
+
+    def count(node):
+        profile.nodes_created += 1
+
+    try:
+        with activated(context.replace(profile=profile, node_hooks=context.node_hooks + (count,))):
+            yield profile
+    finally:
+        profile._stop = perf_counter()
+        profile.forward_seconds = profile.total_seconds() - profile.backward_seconds
+
+
+def _timed(name, category):
+    """
+    Wrapper of a method recording its calls into the profile of the caller's context.
+    """
+    def wrap(method):
+        @functools.wraps(method)
+        def timed(*args):
+            profile = _CONTEXT.get().profile
+            if profile is None:
+                return method(*args)
+            return profile._call(name, category, method, args)
+        return timed
+    return wrap
+
+
+def _instrumentation():
+    """
+    Methods replaced while a context is profiling (Context.activated).
+    """
+    patches = {}
+    for cls, kind in ((Node, 'node'), (DualNumber, 'dual')):
+        for name in _OPERATORS:
+            if name in cls.__dict__:
+                patches[(cls, name)] = _timed(f'{kind}.{name}', 'operator')
+    for kind in ('node', 'dual', 'value'):
+        patches[(Primitive, f'_{kind}')] = _timed(kind, 'primitive')
+    patches[(Node, 'get_adjoints')] = _timed('get_adjoints', 'backward')
+    return patches
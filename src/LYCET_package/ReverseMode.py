@@ -3,8 +3,10 @@
 # Description: function that user interfaces with to carry out reverse mode automatic differentiation
 
 from .Node import Node
+from .Precision import precision as _precision
+from .Memory import memory_limit
 
-def ReverseMode(f, x):
+def ReverseMode(f, x, precision=None, max_memory=None):
     """
     Function that user interfaces with to compute the Jacobian of their complex function.
 
@@ -12,6 +14,12 @@ def ReverseMode(f, x):
     ----------
     f : user defined function with reverse LYCET operations
     x : input variable(s)
+    precision : optional
+        precision policy of this call, 'float64', 'float32' or 'mixed'
+        (float32 values and partials, float64 adjoints); see Precision.precision
+    max_memory : int, optional
+        ceiling in bytes on the recorded graph, MemoryError (Memory.MemoryLimitError)
+        is raised when the trace goes over it; see Memory.memory_limit
 
     Output
     ------
@@ -31,6 +39,12 @@ def ReverseMode(f, x):
     >>> ad_funct[1]
     [-0.1411200080598672, 35.858879991940135, 8] --> gradient of f 
     """
+    if max_memory is not None:
+        with memory_limit(max_memory):
+            return ReverseMode(f, x, precision)
+    if precision is not None:
+        with _precision(precision):
+            return ReverseMode(f, x)
     if isinstance(x, (int, float)):
         x = [x]
     nodes = []
@@ -38,6 +52,9 @@ def ReverseMode(f, x):
         node = Node(x[i])
         nodes.append(node)
     f = f(*nodes) # unpack list
+    if not isinstance(f, Node):
+        # f does not depend on its inputs
+        return f, [0]*len(x)
     df = Node.get_adjoints(f)
     J = []
     for i in range(len(x)):
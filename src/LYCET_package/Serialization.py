@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# File: Serialization.py
+# Description: flat, non-recursive serialization of reverse mode graphs (pickle support for Node)
+#              and zero-copy transfer to other processes through multiprocessing.shared_memory
+
+import sys
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+from .Node import Node
+from .Tape import Tape, Instruction
+
+# numeric arrays of a FlatGraph, in the order they are laid out in shared memory
+_ARRAYS = (('values', np.float64), ('op_codes', np.int32), ('offsets', np.int64), ('children', np.int64),
+           ('partials', np.float64), ('roots', np.int64))
+
+
+class FlatGraph:
+    """
+    A class to represent a reverse mode graph as flat arrays.
+
+    The nodes are numbered in topological order (children before parents).
+    The edges of node k are children[offsets[k]:offsets[k + 1]] with the
+    local partial derivatives partials[offsets[k]:offsets[k + 1]], in the
+    order of Node.deriv, so the arrays are a compressed sparse row copy of
+    the graph. Building, rebuilding and sweeping the arrays never recurses,
+    whatever the depth of the graph, and pickling them only writes a few
+    contiguous buffers.
+
+    Attributes
+    ----------
+    values : np.ndarray of float64, shape (n,)
+        node values
+    op_codes : np.ndarray of int32, shape (n,)
+        index into op_names of the operation of every node, -1 for leaves
+    op_names : tuple of str
+    params : dict
+        node index -> params, for the nodes whose operation has some
+    offsets : np.ndarray of int64, shape (n + 1,)
+    children : np.ndarray of int64, shape (edges,)
+    partials : np.ndarray of float64, shape (edges,)
+    roots : np.ndarray of int64
+        indices of the packed outputs, then of the packed inputs
+    n_outputs : int
+
+    Methods
+    -------
+    from_nodes(outputs, inputs=()):
+        flatten the graph of one or more output Nodes
+    to_nodes():
+        rebuild the Nodes, returns (outputs, inputs)
+    adjoints(output=0):
+        reverse sweep over the arrays, adjoint of every node
+    gradient(output=0):
+        adjoints of the packed inputs
+    to_tape():
+        Tape replaying the graph at new inputs
+    share():
+        copy the arrays into shared memory, see SharedGraph
+
+    Example
+    -------
+    >>> x1, x2 = Node(1.0), Node(2.0)
+    >>> flat = FlatGraph.from_nodes(rmo.sin(x1)*x2, inputs=[x1, x2])
+    >>> flat.gradient()
+    array([1.08060461, 0.84147098])
+    """
+
+    def __init__(self, values, op_codes, op_names, params, offsets, children, partials, roots, n_outputs):
+        """
+        Constructs all necessary attributes for the FlatGraph object.
+        """
+        self.values = values
+        self.op_codes = op_codes
+        self.op_names = tuple(op_names)
+        self.params = dict(params)
+        self.offsets = offsets
+        self.children = children
+        self.partials = partials
+        self.roots = roots
+        self.n_outputs = n_outputs
+
+    @classmethod
+    def from_nodes(cls, outputs, inputs=()):
+        """
+        Flatten the graph hanging off one or more output Nodes.
+
+        Parameters
+        ----------
+        outputs : Node or list of Node
+        inputs : list of Node, optional
+            leaves to keep track of (their indices are stored in roots, after the outputs)
+
+        Returns
+        -------
+        FlatGraph
+        """
+        outputs = [outputs] if isinstance(outputs, Node) else list(outputs)
+        inputs = list(inputs)
+        order = []
+        visited = set()
+        for root in inputs + outputs:
+            stack = [(root, False)]
+            while stack:
+                node, expanded = stack.pop()
+                if expanded:
+                    order.append(node)
+                    continue
+                if id(node) in visited:
+                    continue
+                visited.add(id(node))
+                stack.append((node, True))
+                if node.deriv:
+                    for child, _ in reversed(node.deriv):
+                        if id(child) not in visited:
+                            stack.append((child, False))
+        index = {id(node): k for k, node in enumerate(order)}
+        op_names = {}
+        op_codes = np.full(len(order), -1, dtype=np.int32)
+        offsets = np.zeros(len(order) + 1, dtype=np.int64)
+        children, partials = [], []
+        for k, node in enumerate(order):
+            if node.op is not None:
+                op_codes[k] = op_names.setdefault(node.op, len(op_names))
+            for child, partial in node.deriv:
+                children.append(index[id(child)])
+                partials.append(partial)
+            offsets[k + 1] = len(children)
+        params = {k: tuple(node.params) for k, node in enumerate(order) if node.params}
+        return cls(np.array([node.value for node in order], dtype=np.float64), op_codes, list(op_names), params,
+                   offsets, np.array(children, dtype=np.int64), np.array(partials, dtype=np.float64),
+                   np.array([index[id(node)] for node in outputs + inputs], dtype=np.int64), len(outputs))
+
+    def __len__(self):
+        """
+        Number of nodes.
+        """
+        return len(self.values)
+
+    @property
+    def nbytes(self):
+        """
+        Bytes of the numeric arrays.
+        """
+        return sum(getattr(self, name).nbytes for name, _ in _ARRAYS)
+
+    def to_nodes(self):
+        """
+        Rebuild the graph as Nodes.
+
+        Returns
+        -------
+        outputs : list of Node
+        inputs : list of Node
+        """
+        values = self.values.tolist()
+        offsets = self.offsets.tolist()
+        children = self.children.tolist()
+        partials = self.partials.tolist()
+        op_codes = self.op_codes.tolist()
+        nodes = []
+        for k in range(len(values)):
+            deriv = [(nodes[children[e]], partials[e]) for e in range(offsets[k], offsets[k + 1])]
+            op = self.op_names[op_codes[k]] if op_codes[k] >= 0 else None
+            nodes.append(Node(values[k], deriv if deriv else (), op, self.params.get(k, ())))
+        roots = [nodes[k] for k in self.roots.tolist()]
+        return roots[:self.n_outputs], roots[self.n_outputs:]
+
+    def adjoints(self, output=0):
+        """
+        Adjoint of every node with respect to one of the packed outputs, by a reverse sweep over the arrays.
+
+        Returns
+        -------
+        np.ndarray of shape (n,)
+        """
+        out = int(self.roots[output])
+        offsets = self.offsets.tolist()
+        children = self.children.tolist()
+        partials = self.partials.tolist()
+        adjoints = [0.0]*len(self.values)
+        adjoints[out] = 1.0
+        for k in range(out, -1, -1):
+            adjoint = adjoints[k]
+            if adjoint == 0.0:
+                continue
+            for e in range(offsets[k], offsets[k + 1]):
+                adjoints[children[e]] += adjoint*partials[e]
+        return np.array(adjoints)
+
+    def gradient(self, output=0):
+        """
+        Adjoints of the packed inputs with respect to one of the packed outputs.
+        """
+        return self.adjoints(output)[self.roots[self.n_outputs:]]
+
+    def to_tape(self):
+        """
+        Tape of the graph: the packed inputs become the tape inputs, the other leaves constants.
+
+        Returns
+        -------
+        Tape (scalar output if one output was packed)
+        """
+        inputs = {k: i for i, k in enumerate(self.roots[self.n_outputs:].tolist())}
+        offsets = self.offsets.tolist()
+        children = self.children.tolist()
+        instructions = []
+        for k, code in enumerate(self.op_codes.tolist()):
+            if k in inputs:
+                instructions.append(Instruction('input', (), (inputs[k],)))
+            elif code < 0:
+                instructions.append(Instruction('const', (), (float(self.values[k]),)))
+            else:
+                instructions.append(Instruction(self.op_names[code], tuple(children[offsets[k]:offsets[k + 1]]),
+                                                self.params.get(k, ())))
+        return Tape(len(inputs), instructions, self.roots[:self.n_outputs].tolist(), self.values.tolist(),
+                    scalar_output=self.n_outputs == 1)
+
+    def share(self):
+        """
+        Copy the graph into a shared memory block, see SharedGraph.
+        """
+        return SharedGraph.create(self)
+
+    def __repr__(self):
+        """
+        Represents the graph as a string.
+        """
+        return f"FlatGraph(nodes={len(self)}, edges={len(self.children)}, outputs={self.n_outputs}, nbytes={self.nbytes})"
+
+
+def _node_from_graph(flat):
+    """
+    Unpickle a Node: rebuild the flattened graph and return its output.
+    """
+    return flat.to_nodes()[0][0]
+
+
+class SharedGraph:
+    """
+    A class to represent a FlatGraph stored in a multiprocessing.shared_memory block.
+
+    The numeric arrays are copied once into one shared block. Pickling a
+    SharedGraph only writes the block name, the array layout and the op
+    names and params, so sending it to a worker process (Pool, Process,
+    Queue) costs a few hundred bytes plus the params of the operations
+    that have some (log bases, ...), whatever the size of the graph, and
+    the worker reads the arrays in place: graph is a FlatGraph of NumPy
+    views on the block. The creating process owns the block and unlinks it
+    on unlink() or at the end of a with block; the other processes only
+    close their mapping.
+
+    Attributes
+    ----------
+    name : str
+        name of the shared memory block
+    graph : FlatGraph
+        zero-copy view of the block
+
+    Methods
+    -------
+    create(flat):
+        copy a FlatGraph into a new block
+    close():
+        release this process's mapping
+    unlink():
+        close, and destroy the block (owner only)
+
+    Example
+    -------
+    >>> with FlatGraph.from_nodes(output, inputs=nodes).share() as shared:
+    ...     with multiprocessing.Pool(4) as pool:
+    ...         gradients = pool.map(backward, [(shared, k) for k in range(4)])
+    """
+
+    def __init__(self, memory, layout, meta, owner):
+        """
+        Constructs all necessary attributes for the SharedGraph object.
+        """
+        self._memory = memory
+        self._layout = layout
+        self._meta = meta
+        self._owner = owner
+        arrays = {name: np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=offset)
+                  for name, dtype, shape, offset in layout}
+        op_names, params, n_outputs = meta
+        self.graph = FlatGraph(arrays['values'], arrays['op_codes'], op_names, params, arrays['offsets'],
+                               arrays['children'], arrays['partials'], arrays['roots'], n_outputs)
+
+    @property
+    def name(self):
+        """
+        Name of the shared memory block.
+        """
+        return self._memory.name
+
+    @classmethod
+    def create(cls, flat):
+        """
+        Copy the arrays of a FlatGraph into a new shared memory block.
+        """
+        layout, offset = [], 0
+        for name, dtype in _ARRAYS:
+            array = getattr(flat, name)
+            # keep every array aligned on 8 bytes
+            offset = -(-offset//8)*8
+            layout.append((name, np.dtype(dtype).str, array.shape, offset))
+            offset += array.nbytes
+        memory = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for name, dtype, shape, start in layout:
+            np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=start)[...] = getattr(flat, name)
+        return cls(memory, layout, (flat.op_names, flat.params, flat.n_outputs), owner=True)
+
+    def __reduce__(self):
+        return (_attach, (self.name, self._layout, self._meta))
+
+    def close(self):
+        """
+        Release the mapping of the block in this process (the arrays of graph become invalid).
+        """
+        if self._memory is not None:
+            self.graph = None
+            self._memory.close()
+
+    def unlink(self):
+        """
+        Close the block and, in the creating process, destroy it.
+        """
+        memory = self._memory
+        self.close()
+        if memory is not None and self._owner:
+            memory.unlink()
+        self._memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.unlink()
+
+    def __repr__(self):
+        """
+        Represents the shared graph as a string.
+        """
+        return f"SharedGraph(name={self.name!r}, owner={self._owner}, graph={self.graph!r})"
+
+
+def _attach(name, layout, meta):
+    """
+    Unpickle a SharedGraph in another process: map the existing block.
+    """
+    if sys.version_info >= (3, 13):
+        # only the owner tracks the block
+        return SharedGraph(shared_memory.SharedMemory(name=name, track=False), layout, meta, owner=False)
+    # attaching registers the block with the resource tracker of this process. Fork, spawn and
+    # forkserver children share the tracker of their parent, where the owner registered the block
+    # and its unlink unregisters it: that registration must stay. A tracker started by this
+    # attach belongs to this process alone and would destroy the block when the process exits
+    tracker = resource_tracker._resource_tracker
+    own_tracker = tracker._fd is None
+    memory = shared_memory.SharedMemory(name=name)
+    if own_tracker:
+        resource_tracker.unregister(memory._name, 'shared_memory')
+    return SharedGraph(memory, layout, meta, owner=False)
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+# File: Service.py
+# Description: asyncio gradient service coalescing concurrent requests into batched tape evaluations,
+#              served as newline-delimited JSON over TCP or a Unix socket
+
+import json
+import time
+import asyncio
+import bisect
+import numpy as np
+from .ReverseMode import ReverseMode
+from .Tape import trace
+
+
+class Histogram:
+    """
+    A class to represent a histogram with fixed bucket bounds.
+
+    Attributes
+    ----------
+    bounds : list of float
+        upper bounds of the buckets, in increasing order (a last bucket takes everything above)
+    counts : list of int
+        number of observations per bucket, len(bounds) + 1 entries
+    count : int
+        number of observations
+    total : float
+        sum of the observations
+
+    Methods
+    -------
+    observe(value):
+        add an observation
+    mean():
+        mean of the observations
+    quantile(q):
+        upper bound of the bucket holding the q-quantile
+    to_dict():
+        JSON-serializable form
+
+    Example
+    -------
+    >>> h = Histogram([1, 2, 4, 8])
+    >>> for size in [1, 3, 3, 8]:
+    ...     h.observe(size)
+    >>> h.counts, h.quantile(0.5)
+    ([1, 0, 2, 1, 0], 4)
+    """
+
+    def __init__(self, bounds):
+        """
+        Constructs all necessary attributes for the Histogram object.
+
+        Parameters
+        ----------
+        bounds : sequence of float, increasing
+        """
+        self.bounds = list(bounds)
+        assert self.bounds == sorted(self.bounds), "The bucket bounds have to be increasing"
+        self.counts = [0]*(len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        """
+        Add an observation.
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def mean(self):
+        """
+        Mean of the observations (0 if there are none).
+        """
+        return self.total/self.count if self.count else 0.0
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the q-quantile (inf for the last bucket, None if empty).
+        """
+        if not self.count:
+            return None
+        seen = 0
+        for bound, count in zip(self.bounds + [float('inf')], self.counts):
+            seen += count
+            if seen >= q*self.count:
+                return bound
+
+    def to_dict(self):
+        """
+        JSON-serializable form of the histogram.
+        """
+        return {'bounds': self.bounds, 'counts': self.counts, 'count': self.count, 'mean': self.mean()}
+
+    def __repr__(self):
+        """
+        Represents the histogram as a string.
+        """
+        return f"Histogram(count={self.count}, mean={self.mean():.3g}, p50={self.quantile(0.5)}, p99={self.quantile(0.99)})"
+
+
+# latency buckets in seconds and batch size buckets
+LATENCY_BOUNDS = [1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0]
+BATCH_BOUNDS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+
+
+class _Function:
+    """
+    A registered function, its tape and its queue of pending requests.
+    """
+
+    def __init__(self, name, f, n_inputs, mode, traced):
+        self.name = name
+        self.f = f
+        self.n_inputs = n_inputs
+        self.mode = mode
+        self.tape = None
+        if traced:
+            call = f if mode == 'reverse' else (lambda *z: f(list(z)))
+            self.tape = trace(call, np.ones(n_inputs))
+            assert self.tape.scalar_output, f"The function {name} has to return a single value"
+        self.queue = asyncio.Queue()
+        self.worker = None
+
+    def evaluate(self, X):
+        """
+        Values and gradients at the columns of X (n_inputs, batch).
+        """
+        if self.tape is None:
+            return self._pointwise(X)
+        with np.errstate(all='ignore'):
+            values, gradients = self.tape.replay(X)
+        values = np.array(np.broadcast_to(values, X.shape[1:]), dtype=float)
+        gradients = np.array(gradients, dtype=float).reshape(self.n_inputs, -1)
+        # the replay skips the domain checks (log of a negative number is nan there): points with a
+        # non-finite result go through ReverseMode, which raises the errors of the untraced path
+        bad = ~(np.isfinite(values) & np.isfinite(gradients).all(axis=0))
+        if bad.any():
+            values[bad], gradients[:, bad] = self._pointwise(X[:, bad])
+        return values, gradients
+
+    def _pointwise(self, X):
+        # one ReverseMode call per point
+        call = self.f if self.mode == 'reverse' else (lambda *z: self.f(list(z)))
+        results = [ReverseMode(call, list(x)) for x in X.T]
+        return (np.array([value for value, _ in results], dtype=float),
+                np.array([gradient for _, gradient in results], dtype=float).T)
+
+    def evaluate_each(self, X):
+        """
+        Every column of X evaluated on its own: (value, gradient), or the exception it raised.
+        """
+        outcomes = []
+        for k in range(X.shape[1]):
+            try:
+                values, gradients = self.evaluate(X[:, k:k + 1])
+                outcomes.append((float(values[0]), gradients[:, 0].copy()))
+            except Exception as error:
+                outcomes.append(error)
+        return outcomes
+
+
+class GradientService:
+    """
+    A class to represent an asyncio service evaluating values and gradients of registered functions.
+
+    Every registered function is traced once into a Tape. Requests for it
+    wait in a queue; a worker task takes the first one, keeps collecting
+    until max_batch requests are pending or max_wait seconds have passed,
+    and evaluates the whole batch with one batched replay of the tape (the
+    NumPy loops run in a thread, so the event loop keeps accepting
+    requests). The per-call Python overhead of ReverseMode is paid once per
+    batch instead of once per request. When a batch fails, its points are
+    evaluated again one by one, so an error only fails the request that
+    caused it.
+
+    Attributes
+    ----------
+    max_batch : int
+        largest number of requests evaluated together
+    max_wait : float
+        longest time in seconds the first request of a batch waits for others
+    latency : Histogram
+        seconds from the arrival of a request to its result
+    batch_size : Histogram
+        number of requests of every evaluated batch
+
+    Methods
+    -------
+    register(name, f, n_inputs, mode='reverse', traced=True):
+        make f available under name
+    evaluate(name, x):
+        coroutine, value and gradient of the function name at x
+    serve(host=None, port=0, path=None):
+        coroutine, listen on TCP (host, port) or on the Unix socket path
+    stats():
+        histograms and counters as a dict
+    close():
+        coroutine, stop the server and the workers
+
+    Example
+    -------
+    >>> service = GradientService(max_batch=32, max_wait=0.001)
+    >>> service.register('rosenbrock', lambda x1, x2: (1 - x1)**2 + 100*(x2 - x1**2)**2, 2)
+    >>> value, gradient = await service.evaluate('rosenbrock', [1.0, 2.0])
+    >>> server = await service.serve(port=8765)
+    """
+
+    def __init__(self, max_batch=64, max_wait=0.002):
+        """
+        Constructs all necessary attributes for the GradientService object.
+
+        Parameters
+        ----------
+        max_batch : int, optional
+            largest number of requests evaluated together (default 64)
+        max_wait : float, optional
+            longest wait in seconds for a batch to fill up (default 2 ms)
+        """
+        assert isinstance(max_batch, int) and max_batch > 0, f"max_batch {max_batch} has to be a positive integer"
+        assert max_wait >= 0, f"max_wait {max_wait} has to be non-negative"
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.latency = Histogram(LATENCY_BOUNDS)
+        self.batch_size = Histogram(BATCH_BOUNDS)
+        self.requests = 0
+        self.errors = 0
+        self._functions = {}
+        self._server = None
+
+    def register(self, name, f, n_inputs, mode='reverse', traced=True):
+        """
+        Make the scalar function f available under name.
+
+        Parameters
+        ----------
+        name : str
+        f : user defined scalar function with LYCET operations
+        n_inputs : int
+            input dimension
+        mode : str, optional
+            'reverse' (default) if f is called as f(*x), 'forward' if it is called as f(x)
+        traced : bool, optional
+            evaluate batches with one replay of the tape of f (default True); give False for
+            functions that branch on their inputs, which are then evaluated point by point.
+            The replay does not check domains, so points with a nan or inf value or gradient
+            are evaluated again by ReverseMode: a domain error (log of a negative number, ...)
+            fails the request as it does for an untraced function
+        """
+        if mode not in ('reverse', 'forward'):
+            raise ValueError(f"Unknown mode {mode!r}, expected 'reverse' or 'forward'")
+        self._functions[name] = _Function(name, f, n_inputs, mode, traced)
+
+    async def evaluate(self, name, x):
+        """
+        Value and gradient of the function name at x, evaluated in a batch with concurrent requests.
+
+        Returns
+        -------
+        value : float
+        gradient : np.ndarray of shape (n_inputs,)
+        """
+        function = self._functions.get(name)
+        if function is None:
+            raise KeyError(f"No function registered under the name {name!r}")
+        x = np.asarray(x, dtype=float)
+        if x.shape != (function.n_inputs,):
+            raise ValueError(f"The function {name} expects {function.n_inputs} inputs, got shape {x.shape}")
+        if function.worker is None:
+            function.worker = asyncio.get_running_loop().create_task(self._work(function))
+        future = asyncio.get_running_loop().create_future()
+        self.requests += 1
+        await function.queue.put((x, future, time.perf_counter()))
+        return await future
+
+    async def _batch(self, queue):
+        """
+        Wait for one request, then collect more until the batch is full or max_wait is over.
+        """
+        batch = [await queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # take what is already waiting, without yielding
+                while len(batch) < self.max_batch and not queue.empty():
+                    batch.append(queue.get_nowait())
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _work(self, function):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._batch(function.queue)
+            X = np.stack([x for x, _, _ in batch], axis=1)
+            self.batch_size.observe(len(batch))
+            try:
+                values, gradients = await loop.run_in_executor(None, function.evaluate, X)
+                outcomes = [(float(values[k]), gradients[:, k].copy()) for k in range(len(batch))]
+            except Exception as error:
+                # one bad point only fails its own request: the batch is evaluated again point by point
+                if len(batch) == 1:
+                    outcomes = [error]
+                else:
+                    outcomes = await loop.run_in_executor(None, function.evaluate_each, X)
+            now = time.perf_counter()
+            for (_, future, start), outcome in zip(batch, outcomes):
+                if isinstance(outcome, Exception):
+                    self.errors += 1
+                    if not future.done():
+                        future.set_exception(outcome)
+                    continue
+                self.latency.observe(now - start)
+                if not future.done():
+                    future.set_result(outcome)
+
+    async def _handle(self, reader, writer):
+        """
+        Serve one connection: every line is a JSON request, answered as soon as its batch is done.
+        """
+        lock = asyncio.Lock()
+        pending = set()
+
+        async def answer(line):
+            request = None
+            try:
+                request = json.loads(line)
+                value, gradient = await self.evaluate(request['function'], request['x'])
+                response = {'id': request.get('id'), 'value': value, 'gradient': gradient.tolist()}
+            except Exception as error:
+                response = {'id': request.get('id') if isinstance(request, dict) else None,
+                            'error': f'{type(error).__name__}: {error}'}
+            async with lock:
+                writer.write((json.dumps(response) + '\n').encode())
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip() == b'stats':
+                    async with lock:
+                        writer.write((json.dumps(self.stats()) + '\n').encode())
+                        await writer.drain()
+                    continue
+                task = asyncio.get_running_loop().create_task(answer(line))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+        finally:
+            writer.close()
+
+    async def serve(self, host=None, port=0, path=None):
+        """
+        Listen for requests on TCP (host, port), or on the Unix socket path if given.
+
+        The protocol is newline-delimited JSON: every request line
+        {"id": ..., "function": name, "x": [...]} is answered by a line
+        {"id": ..., "value": ..., "gradient": [...]} or {"id": ..., "error": "..."},
+        in the order the batches complete; the line "stats" is answered with stats().
+
+        Returns
+        -------
+        asyncio.Server (port=0 picks a free port, see server.sockets[0].getsockname())
+        """
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle, path=path)
+        else:
+            self._server = await asyncio.start_server(self._handle, host or '127.0.0.1', port)
+        return self._server
+
+    def stats(self):
+        """
+        Request counters and the latency and batch size histograms.
+        """
+        return {'requests': self.requests, 'errors': self.errors, 'latency': self.latency.to_dict(),
+                'batch_size': self.batch_size.to_dict()}
+
+    async def close(self):
+        """
+        Stop the server and the batching workers.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for function in self._functions.values():
+            if function.worker is not None:
+                function.worker.cancel()
+                try:
+                    await function.worker
+                except asyncio.CancelledError:
+                    pass
+                function.worker = None
+
+
+class GradientClient:
+    """
+    A class to represent a connection to a GradientService.
+
+    Requests can be sent concurrently over one connection; the answers are
+    matched to them by id.
+
+    Methods
+    -------
+    connect(host=None, port=None, path=None):
+        coroutine, open the connection (TCP or Unix socket)
+    evaluate(name, x):
+        coroutine, value and gradient of the function name at x
+    stats():
+        coroutine, statistics of the service
+    close():
+        coroutine, close the connection
+
+    Example
+    -------
+    >>> client = await GradientClient.connect(port=8765)
+    >>> results = await asyncio.gather(*[client.evaluate('rosenbrock', x) for x in points])
+    """
+
+    def __init__(self, reader, writer):
+        """
+        Constructs all necessary attributes for the GradientClient object.
+        """
+        self._reader = reader
+        self._writer = writer
+        self._next = 0
+        self._pending = {}
+        self._stats = None
+        self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    @classmethod
+    async def connect(cls, host=None, port=None, path=None):
+        """
+        Open a connection to a service on TCP (host, port) or on the Unix socket path.
+        """
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host or '127.0.0.1', port)
+        return cls(reader, writer)
+
+    async def _listen(self):
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            if 'requests' in response and 'id' not in response:
+                if self._stats is not None and not self._stats.done():
+                    self._stats.set_result(response)
+                continue
+            # an answer without a known id (an error about a line the service could not read)
+            # cannot be matched to a request, and requests whose callers were cancelled are done
+            future = self._pending.pop(response.get('id'), None)
+            if future is None or future.done():
+                continue
+            if 'error' in response:
+                future.set_exception(RuntimeError(response['error']))
+            else:
+                future.set_result((response['value'], np.array(response['gradient'])))
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("The service closed the connection"))
+
+    async def evaluate(self, name, x):
+        """
+        Value and gradient of the function name at x.
+        """
+        self._next += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._next] = future
+        request = {'id': self._next, 'function': name, 'x': [float(xi) for xi in x]}
+        self._writer.write((json.dumps(request) + '\n').encode())
+        await self._writer.drain()
+        return await future
+
+    async def stats(self):
+        """
+        Statistics of the service (GradientService.stats).
+        """
+        self._stats = asyncio.get_running_loop().create_future()
+        self._writer.write(b'stats\n')
+        await self._writer.drain()
+        return await self._stats
+
+    async def close(self):
+        """
+        Close the connection.
+        """
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._listener.cancel()
+        try:
+            await self._listener
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# File: Sketch.py
+# Description: randomized low-rank sketches of large Jacobians from batched JVPs and VJPs
+
+import numpy as np
+from .Tape import trace
+
+# with p Gaussian test vectors the error bound holds with probability 1 - 10**-p
+_BOUND = 10*np.sqrt(2/np.pi)
+
+
+class LowRankJacobian:
+    """
+    A class to represent a randomized low-rank factorization J ~ U diag(S) Vt of a Jacobian.
+
+    Attributes
+    ----------
+    U : np.ndarray (m, r)
+        orthonormal left factor
+    S : np.ndarray (r,)
+        estimated singular values, in decreasing order
+    Vt : np.ndarray (r, n)
+        orthonormal right factor
+    error_estimate : float
+        probabilistic bound on the spectral norm error ||J - U diag(S) Vt||
+        (holds with probability at least 1 - 10**-n_test)
+    n_jvp : int
+        number of Jacobian-vector products evaluated
+    n_vjp : int
+        number of vector-Jacobian products evaluated
+
+    Methods
+    -------
+    toarray():
+        dense approximation of J
+    matvec(v):
+        approximation of J @ v
+    rmatvec(w):
+        approximation of J^T @ w
+    numerical_rank(tol):
+        number of singular values above tol times the largest one
+    relative_error():
+        error_estimate divided by the largest singular value
+
+    Example
+    -------
+    >>> sketch = sketch_jacobian(f, x, rank=20)
+    >>> sketch.numerical_rank(1e-8), sketch.relative_error() < 1e-6
+    (12, True)
+    """
+
+    def __init__(self, U, S, Vt, error_estimate, n_jvp, n_vjp):
+        """
+        Constructs all necessary attributes for the LowRankJacobian object.
+
+        Parameters
+        ----------
+        U, S, Vt : np.ndarray
+            factors of the approximation
+        error_estimate : float
+            probabilistic bound on the spectral norm error
+        n_jvp, n_vjp : int
+            numbers of products evaluated
+        """
+        self.U = U
+        self.S = S
+        self.Vt = Vt
+        self.error_estimate = error_estimate
+        self.n_jvp = n_jvp
+        self.n_vjp = n_vjp
+
+    def toarray(self):
+        """
+        Dense approximation U diag(S) Vt of the Jacobian.
+        """
+        return (self.U*self.S) @ self.Vt
+
+    def matvec(self, v):
+        """
+        Approximation of J @ v, without forming J.
+        """
+        return self.U @ (self.S*(self.Vt @ v)) if np.ndim(v) == 1 else self.U @ (self.S[:, None]*(self.Vt @ v))
+
+    def rmatvec(self, w):
+        """
+        Approximation of J^T @ w, without forming J.
+        """
+        return self.Vt.T @ (self.S*(self.U.T @ w)) if np.ndim(w) == 1 else self.Vt.T @ (self.S[:, None]*(self.U.T @ w))
+
+    def numerical_rank(self, tol=1e-10):
+        """
+        Number of estimated singular values above tol times the largest one.
+        """
+        if not len(self.S) or self.S[0] == 0:
+            return 0
+        return int(np.sum(self.S > tol*self.S[0]))
+
+    def relative_error(self):
+        """
+        Error estimate relative to the largest singular value.
+        """
+        return self.error_estimate/self.S[0] if len(self.S) and self.S[0] > 0 else 0.0
+
+    def __repr__(self):
+        """
+        Represents the factorization as a string.
+        """
+        return (f"LowRankJacobian(shape=({self.U.shape[0]}, {self.Vt.shape[1]}), rank={len(self.S)}, "
+                f"error_estimate={self.error_estimate:.3g}, n_jvp={self.n_jvp}, n_vjp={self.n_vjp})")
+
+
+def _tape(f, x):
+    if isinstance(x, (int, float)):
+        x = [x]
+    x = np.asarray(x, dtype=float)
+    tape = trace(f, x)
+    return tape, x, len(tape.outputs)
+
+
+def _jvp(tape, x, V):
+    return np.asarray(tape.jacobian_vector_product(x, V)[1]).reshape(len(tape.outputs), -1)
+
+
+def _vjp(tape, x, W):
+    return np.asarray(tape.vector_jacobian_product(x, W)[1]).reshape(tape.n_inputs, -1)
+
+
+def range_finder(f, x, k, power_iterations=0, n_test=10, seed=None):
+    """
+    Orthonormal basis Q of an approximate range of the Jacobian, from k random JVPs.
+
+    The k Gaussian test vectors are pushed through one batched forward
+    sweep of the traced tape, Y = J Omega, and Q comes from the QR
+    factorization of Y. Each power iteration replaces Y by J J^T Y (one
+    batched VJP and one batched JVP sweep) for slowly decaying spectra.
+
+    Parameters
+    ----------
+    f : user defined function with reverse LYCET operations, called as f(*nodes)
+    x : input variable(s)
+    k : int
+        number of random test vectors (dimension of the basis)
+    power_iterations : int, optional
+        number of power iterations (default 0)
+    n_test : int, optional
+        number of extra Gaussian vectors used to estimate the error (default 10)
+    seed : int or np.random.Generator, optional
+
+    Returns
+    -------
+    Q : np.ndarray (m, k)
+    error_estimate : float
+        bound on ||(I - Q Q^T) J|| holding with probability at least 1 - 10**-n_test
+
+    Example
+    -------
+    >>> Q, error = range_finder(f, x, 10, seed=0)
+    """
+    tape, x, m = _tape(f, x)
+    return _range_finder(tape, x, k, power_iterations, n_test, np.random.default_rng(seed))[:2]
+
+
+def _range_finder(tape, x, k, power_iterations, n_test, rng):
+    n = tape.n_inputs
+    omega = rng.standard_normal((n, k + n_test))
+    # the basis and the test vectors share the forward sweep
+    Y = _jvp(tape, x, omega)
+    n_jvp, n_vjp = k + n_test, 0
+    Q, _ = np.linalg.qr(Y[:, :k])
+    for _ in range(power_iterations):
+        Z, _ = np.linalg.qr(_vjp(tape, x, Q))
+        Q, _ = np.linalg.qr(_jvp(tape, x, Z))
+        n_jvp, n_vjp = n_jvp + k, n_vjp + k
+    test = Y[:, k:]
+    residual = test - Q @ (Q.T @ test)
+    error = _BOUND*np.max(np.linalg.norm(residual, axis=0)) if n_test else np.nan
+    return Q, float(error), n_jvp, n_vjp
+
+
+def sketch_jacobian(f, x, rank, oversampling=10, power_iterations=0, n_test=10, seed=None):
+    """
+    Randomized low-rank factorization of the Jacobian of f at x (Halko, Martinsson and Tropp, 2011).
+
+    rank + oversampling random JVPs give an orthonormal basis Q of the
+    range of J (range_finder), as many VJPs give B = Q^T J, and the SVD of
+    the small matrix B gives J ~ U diag(S) Vt truncated to rank. The
+    products are batched, so the whole sketch costs a few sweeps of the
+    traced tape however large n is, instead of n passes for the full
+    Jacobian. The error estimate uses n_test extra random JVPs.
+
+    Parameters
+    ----------
+    f : user defined function with reverse LYCET operations, called as f(*nodes)
+    x : input variable(s)
+    rank : int
+        rank of the returned factorization
+    oversampling : int, optional
+        extra random vectors improving the basis (default 10)
+    power_iterations : int, optional
+        power iterations of the range finder (default 0)
+    n_test : int, optional
+        Gaussian vectors of the a posteriori error estimate (default 10)
+    seed : int or np.random.Generator, optional
+
+    Returns
+    -------
+    LowRankJacobian
+
+    Example
+    -------
+    >>> sketch = sketch_jacobian(f, np.ones(10**4), rank=5, seed=0)
+    >>> sketch.S.shape, sketch.n_jvp + sketch.n_vjp
+    ((5,), 40)
+    """
+    tape, x, m = _tape(f, x)
+    rng = np.random.default_rng(seed)
+    k = min(rank + oversampling, m, tape.n_inputs)
+    Q, error, n_jvp, n_vjp = _range_finder(tape, x, k, power_iterations, n_test, rng)
+    B = _vjp(tape, x, Q).T
+    n_vjp += k
+    U_small, S, Vt = np.linalg.svd(B, full_matrices=False)
+    r = min(rank, len(S))
+    # dropping the singular values beyond rank adds at most the largest of them
+    truncation = S[r] if r < len(S) else 0.0
+    return LowRankJacobian(Q @ U_small[:, :r], S[:r], Vt[:r], error + truncation, n_jvp, n_vjp)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# File: SparseMatrix.py
+# Description: minimal coordinate-format sparse matrix returned by the sparsity, sparse Jacobian and Hessian drivers
+
+import numpy as np
+
+
+class SparseMatrix:
+    """
+    A class to represent a sparse matrix as sorted (row, column, value) triplets.
+
+    Entries are kept sorted by row then column, without duplicates (duplicate
+    entries given to the constructor are summed, or or-ed for Boolean data),
+    so the rows can be sliced with indptr like a CSR matrix.
+
+    Attributes
+    ----------
+    shape : tuple of int
+        (number of rows, number of columns)
+    rows : np.ndarray of int
+        row index of every stored entry
+    cols : np.ndarray of int
+        column index of every stored entry
+    data : np.ndarray
+        value of every stored entry (bool for sparsity patterns)
+
+    Methods
+    -------
+    nnz:
+        number of stored entries
+    indptr():
+        start of every row in rows/cols/data, plus the end (CSR layout)
+    row(i):
+        columns and values of the stored entries of row i
+    toarray():
+        dense np.ndarray
+    from_dense(a):
+        SparseMatrix holding the nonzeros of a dense matrix
+    T:
+        transpose
+    __matmul__(v):
+        product with a dense vector or matrix
+
+    Example
+    -------
+    >>> A = SparseMatrix([0, 1, 1], [0, 0, 2], [1.0, 2.0, 3.0], (2, 3))
+    >>> A.toarray()
+    array([[1., 0., 0.],
+           [2., 0., 3.]])
+    >>> A @ np.ones(3)
+    array([1., 5.])
+    """
+
+    def __init__(self, rows, cols, data, shape):
+        """
+        Constructs all necessary attributes for the SparseMatrix object.
+
+        Parameters
+        ----------
+        rows : sequence of int
+        cols : sequence of int
+        data : sequence of values, same length as rows and cols
+        shape : tuple of int
+        """
+        rows = np.asarray(rows, dtype=np.intp).ravel()
+        cols = np.asarray(cols, dtype=np.intp).ravel()
+        data = np.asarray(data).ravel()
+        assert len(rows) == len(cols) == len(data), "rows, cols and data must have the same length"
+        shape = (int(shape[0]), int(shape[1]))
+        if len(rows):
+            assert rows.min() >= 0 and rows.max() < shape[0], f"row index out of range for shape {shape}"
+            assert cols.min() >= 0 and cols.max() < shape[1], f"column index out of range for shape {shape}"
+        order = np.lexsort((cols, rows))
+        rows, cols, data = rows[order], cols[order], data[order]
+        if len(rows) > 1:
+            first = np.ones(len(rows), dtype=bool)
+            first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+            if not first.all():
+                starts = np.flatnonzero(first)
+                combine = np.logical_or if data.dtype == bool else np.add
+                rows, cols, data = rows[starts], cols[starts], combine.reduceat(data, starts)
+        self.shape = shape
+        self.rows = rows
+        self.cols = cols
+        self.data = data
+
+    @property
+    def nnz(self):
+        """
+        Number of stored entries.
+        """
+        return len(self.data)
+
+    def indptr(self):
+        """
+        Start of every row in rows/cols/data, followed by nnz (CSR layout).
+        """
+        return np.searchsorted(self.rows, np.arange(self.shape[0] + 1))
+
+    def row(self, i):
+        """
+        Columns and values of the stored entries of row i.
+        """
+        start, stop = np.searchsorted(self.rows, [i, i + 1])
+        return self.cols[start:stop], self.data[start:stop]
+
+    def toarray(self):
+        """
+        Dense np.ndarray with the entries of the matrix.
+        """
+        a = np.zeros(self.shape, dtype=self.data.dtype if self.nnz else float)
+        a[self.rows, self.cols] = self.data
+        return a
+
+    @classmethod
+    def from_dense(cls, a):
+        """
+        SparseMatrix holding the nonzero entries of a dense 2-D array.
+        """
+        a = np.atleast_2d(np.asarray(a))
+        rows, cols = np.nonzero(a)
+        return cls(rows, cols, a[rows, cols], a.shape)
+
+    @property
+    def T(self):
+        """
+        Transposed matrix.
+        """
+        return SparseMatrix(self.cols, self.rows, self.data, (self.shape[1], self.shape[0]))
+
+    def __matmul__(self, v):
+        """
+        Product with a dense vector (n,) or matrix (n, k).
+        """
+        v = np.asarray(v)
+        assert v.shape[0] == self.shape[1], f"Cannot multiply a {self.shape} matrix by {v.shape}"
+        out = np.zeros((self.shape[0],) + v.shape[1:], dtype=np.result_type(self.data, v))
+        np.add.at(out, self.rows, (self.data.reshape((-1,) + (1,)*(v.ndim - 1)))*v[self.cols])
+        return out
+
+    def __eq__(self, other):
+        """
+        Two sparse matrices are equal if they store the same entries.
+        """
+        if not isinstance(other, SparseMatrix):
+            return NotImplemented
+        return (self.shape == other.shape and np.array_equal(self.rows, other.rows)
+                and np.array_equal(self.cols, other.cols) and np.array_equal(self.data, other.data))
+
+    __hash__ = None
+
+    def __repr__(self):
+        """
+        Represents the matrix as a string.
+        """
+        return f"SparseMatrix(shape={self.shape}, nnz={self.nnz}, dtype={self.data.dtype})"
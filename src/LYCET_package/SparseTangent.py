@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# File: SparseTangent.py
+# Description: sparse tangent vectors for forward mode, so each operation costs as many inputs as it depends on
+
+import numpy as np
+from .DualNumber import DualNumber
+from .SparseMatrix import SparseMatrix
+
+
+class SparseTangent:
+    """
+    A class to represent the tangent of a DualNumber as a sparse map from input index to partial.
+
+    Used as the dual part of DualNumbers, it lets one forward pass carry the
+    derivatives with respect to all the inputs at once while every
+    operation only touches the inputs its operands depend on: additions
+    merge the two maps, multiplications by the local partials scale one.
+    NumPy scalars defer to these operators (__array_ufunc__ is None).
+
+    Attributes
+    ----------
+    entries : dict
+        input index -> partial derivative (missing indices are 0)
+
+    Methods
+    -------
+    nnz():
+        number of stored partials
+    __add__(other), __sub__(other):
+        merge two tangents (the number 0 is the zero tangent)
+    __mul__(c), __truediv__(c):
+        scale by a number
+    __neg__():
+        negate
+    __repr__():
+        string representation of sparse tangents
+
+    Example
+    -------
+    >>> x = [DualNumber(2.0, SparseTangent({0: 1.0})), DualNumber(3.0, SparseTangent({1: 1.0}))]
+    >>> (x[0]*x[1]).dual
+    SparseTangent({0: 3.0, 1: 2.0})
+    """
+
+    __slots__ = ('entries',)
+    __array_ufunc__ = None
+
+    def __init__(self, entries=None):
+        """
+        Constructs all the necessary attributes for the SparseTangent object.
+
+        Parameters
+        ----------
+        entries : dict, optional
+            input index -> partial derivative (default: the zero tangent)
+        """
+        self.entries = {} if entries is None else entries
+
+    def nnz(self):
+        """
+        Number of stored partials.
+        """
+        return len(self.entries)
+
+    def _merge(self, other, sign):
+        if not isinstance(other, SparseTangent):
+            assert other == 0, f"Cannot add the number {other} to a tangent"
+            return self
+        if len(other.entries) > len(self.entries) and sign == 1:
+            return other._merge(self, 1)
+        entries = dict(self.entries)
+        for i, value in other.entries.items():
+            entries[i] = entries.get(i, 0.0) + sign*value
+        return SparseTangent(entries)
+
+    def __add__(self, other):
+        return self._merge(other, 1)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self._merge(other, -1)
+
+    def __rsub__(self, other):
+        return (-self)._merge(other, 1)
+
+    def __mul__(self, c):
+        assert not isinstance(c, SparseTangent), "The product of two tangents is not a tangent"
+        return SparseTangent({i: value*c for i, value in self.entries.items()})
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, c):
+        return SparseTangent({i: value/c for i, value in self.entries.items()})
+
+    def __neg__(self):
+        return SparseTangent({i: -value for i, value in self.entries.items()})
+
+    def __repr__(self):
+        """
+        Represents the tangent as a string.
+        """
+        return f"SparseTangent({dict(sorted(self.entries.items()))})"
+
+
+def sparse_jacobian(f, x):
+    """
+    Jacobian of f from one forward pass with sparse tangents.
+
+    Input i is seeded with the tangent {i: 1}; every output then carries
+    the nonzero partials of its row of the Jacobian.
+
+    Parameters
+    ----------
+    f : user defined function with forward LYCET operations, called as f(x)
+    x : input variable(s)
+
+    Returns
+    -------
+    SparseMatrix of shape (number of outputs, number of inputs), one row for a scalar function
+
+    Example
+    -------
+    >>> J = sparse_jacobian(lambda x: [x[0]*x[1], fmo.sin(x[2])], [1.0, 2.0, 0.0])
+    >>> J.toarray()
+    array([[2., 1., 0.],
+           [0., 0., 1.]])
+    """
+    scalar_input = np.issubdtype(type(x), np.integer) or isinstance(x, (np.floating, float))
+    if scalar_input:
+        output = f(DualNumber(x, SparseTangent({0: 1.0})))
+        n = 1
+    else:
+        assert type(x) in [list, tuple, np.ndarray], f"input {x} has to be an integer, float, list, tuple or np.ndarray"
+        n = len(x)
+        output = f([DualNumber(xi, SparseTangent({i: 1.0})) for i, xi in enumerate(x)])
+    outputs = list(output) if isinstance(output, (list, tuple, np.ndarray)) else [output]
+    rows, cols, data = [], [], []
+    for k, out in enumerate(outputs):
+        if not isinstance(out, DualNumber) or not isinstance(out.dual, SparseTangent):
+            # constant output, or one that does not depend on the inputs
+            continue
+        for i, value in out.dual.entries.items():
+            rows.append(k)
+            cols.append(i)
+            data.append(value)
+    return SparseMatrix(rows, cols, np.array(data, dtype=float), (len(outputs), n))
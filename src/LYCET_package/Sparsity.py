@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# File: Sparsity.py
+# Description: Jacobian and Hessian sparsity detection by propagating input index sets through the user function
+
+import numpy as np
+from .IndexSet import IndexSet, HessianIndexSet, _bits
+from .SparseMatrix import SparseMatrix
+from .DiskCache import function_key
+
+# patterns already traced, by function_key of the function
+_PATTERNS = {}
+
+
+def _call(f, inputs, mode):
+    """
+    Call f the way ReverseMode ('reverse', f(*x)) or ForwardMode ('forward', f(x)) does.
+    """
+    if mode == 'reverse':
+        return f(*inputs)
+    if mode == 'forward':
+        return f(inputs)
+    raise ValueError(f"Unknown mode {mode!r}, expected 'reverse' or 'forward'")
+
+
+def trace_sparsity(f, n_inputs, mode='reverse'):
+    """
+    Run f once on IndexSet inputs and return the IndexSet of every output.
+
+    Parameters
+    ----------
+    f : user defined function with LYCET operations
+    n_inputs : int
+        input dimension
+    mode : str, optional
+        'reverse' (default) to call f(*x) like ReverseMode, 'forward' to call f(x) like ForwardMode
+
+    Returns
+    -------
+    outputs : list of IndexSet, one per output (constant outputs depend on no input)
+    scalar_output : bool
+        True if f returned a single value rather than a sequence
+    """
+    assert isinstance(n_inputs, (int, np.integer)) and n_inputs > 0, f"n_inputs {n_inputs} has to be a positive integer"
+    inputs = [IndexSet.input(i) for i in range(n_inputs)]
+    output = _call(f, inputs, mode)
+    scalar_output = not isinstance(output, (list, tuple, np.ndarray))
+    outs = [output] if scalar_output else list(output)
+    for out in outs:
+        assert isinstance(out, (IndexSet, int, float, np.number)), f"output {out} has to be a value computed with LYCET operations"
+    return [out if isinstance(out, IndexSet) else IndexSet() for out in outs], scalar_output
+
+
+def jacobian_sparsity(f, n_inputs, mode='reverse', cache=True):
+    """
+    Boolean sparsity pattern of the Jacobian of f, found in one pass with index sets.
+
+    Every intermediate carries the bitset of the inputs it depends on, so
+    entry (i, j) of the pattern is True when output i depends on input j.
+    The pattern holds at every point: f may not branch on its inputs (a
+    TypeError is raised if it compares traced values). Patterns are cached
+    by the code, closure constants and globals of f (see
+    DiskCache.function_key), so a model is only traced once.
+
+    Parameters
+    ----------
+    f : user defined function with LYCET operations
+    n_inputs : int
+        input dimension
+    mode : str, optional
+        'reverse' (default) to call f(*x) like ReverseMode, 'forward' to call f(x) like ForwardMode
+    cache : bool, optional
+        reuse and store the pattern in the in-process cache (default True)
+
+    Returns
+    -------
+    SparseMatrix with Boolean data, shape (number of outputs, n_inputs)
+
+    Example
+    -------
+    >>> f = lambda x1, x2, x3: [x1*x2, rmo.sin(x3), 4.0]
+    >>> jacobian_sparsity(f, 3).toarray()
+    array([[ True,  True, False],
+           [False, False,  True],
+           [False, False, False]])
+    """
+    key = function_key(f, int(n_inputs), mode=mode, sparsity='jacobian') if cache else None
+    if key is not None and key in _PATTERNS:
+        return _PATTERNS[key]
+    outputs, _ = trace_sparsity(f, n_inputs, mode)
+    rows, cols = [], []
+    for i, out in enumerate(outputs):
+        indices = out.indices()
+        rows.extend([i]*len(indices))
+        cols.extend(indices)
+    pattern = SparseMatrix(rows, cols, np.ones(len(rows), dtype=bool), (len(outputs), n_inputs))
+    if key is not None:
+        _PATTERNS[key] = pattern
+    return pattern
+
+
+def hessian_sparsity(f, n_inputs, mode='reverse', cache=True):
+    """
+    Symmetric Boolean sparsity pattern of the Hessian of a scalar function, found in one pass.
+
+    The inputs are HessianIndexSets: every nonlinear operation records
+    which inputs interact in its second derivatives (x*y pairs the inputs of
+    x with those of y, sin(x) pairs all the inputs of x, sums pair nothing).
+    As for jacobian_sparsity, f may not branch on its inputs and the result
+    is cached per function.
+
+    Parameters
+    ----------
+    f : user defined scalar function with LYCET operations
+    n_inputs : int
+        input dimension
+    mode : str, optional
+        'reverse' (default) to call f(*x) like ReverseMode, 'forward' to call f(x) like ForwardMode
+    cache : bool, optional
+        reuse and store the pattern in the in-process cache (default True)
+
+    Returns
+    -------
+    SparseMatrix with Boolean data, shape (n_inputs, n_inputs)
+
+    Example
+    -------
+    >>> f = lambda x1, x2, x3: x1*x2 + rmo.sin(x3) + x1
+    >>> hessian_sparsity(f, 3).toarray()
+    array([[False,  True, False],
+           [ True, False, False],
+           [False, False,  True]])
+    """
+    key = function_key(f, int(n_inputs), mode=mode, sparsity='hessian') if cache else None
+    if key is not None and key in _PATTERNS:
+        return _PATTERNS[key]
+    assert isinstance(n_inputs, (int, np.integer)) and n_inputs > 0, f"n_inputs {n_inputs} has to be a positive integer"
+    inputs = HessianIndexSet.inputs(n_inputs)
+    output = _call(f, inputs, mode)
+    assert isinstance(output, (IndexSet, int, float, np.number)), f"output {output} has to be a scalar computed with LYCET operations"
+    rows, cols = [], []
+    for i, row in enumerate(inputs[0].rows):
+        indices = list(_bits(row))
+        rows.extend([i]*len(indices))
+        cols.extend(indices)
+    pattern = SparseMatrix(rows, cols, np.ones(len(rows), dtype=bool), (n_inputs, n_inputs))
+    if key is not None:
+        _PATTERNS[key] = pattern
+    return pattern
+
+
+def clear_cache():
+    """
+    Forget every cached sparsity pattern.
+    """
+    _PATTERNS.clear()
@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+# File: Tape.py
+# Description: record a Node graph once as a flat, topologically ordered list of instructions
+
+import marshal
+import numpy as np
+from collections import namedtuple
+from .Node import Node
+from .Primitives import primitive
+from .Context import _CONTEXT
+
+# bumped whenever the serialized layout of a tape changes
+_FORMAT_VERSION = 1
+
+Instruction = namedtuple('Instruction', ['op', 'args', 'params'])
+Instruction.__doc__ = """
+One recorded elementary operation.
+
+Attributes
+----------
+op : str
+    'input', 'const' or the name of the elementary operation (e.g. 'mul', 'sin')
+args : tuple of int
+    indices of the operand variables on the tape
+params : tuple
+    constant, non-differentiated arguments (the input index for 'input',
+    the value for 'const', the base for 'log', ...)
+"""
+
+class Tape:
+    """
+    A class to represent a traced computation as a flat list of instructions.
+    Variable k of the tape is the result of instructions[k]; operands always
+    refer to earlier variables, so the list is in topological order.
+
+    Attributes
+    ----------
+    n_inputs : int
+        number of input variables
+    instructions : list of Instruction
+        recorded operations, one per variable
+    outputs : list of int
+        indices of the output variables
+    values : list
+        value of every variable at the point the tape was traced at
+    scalar_output : bool
+        True if the traced function returned a single value rather than a sequence
+
+    Methods
+    -------
+    from_nodes(inputs, output):
+        flatten a Node graph into a Tape
+    evaluate(x):
+        value of every variable at a new point
+    replay(x):
+        value and gradient/Jacobian at a new point, without creating Nodes
+    jacobian_vector_product(x, v):
+        values and Jacobian-vector products at a point (one forward sweep)
+    vector_jacobian_product(x, w):
+        values and vector-Jacobian products at a point (one reverse sweep)
+    hessian_vector_product(x, v):
+        value, gradient and Hessian-vector products at a point (scalar functions)
+    to_bytes():
+        compact serialized form of the tape
+    from_bytes(data):
+        rebuild a tape from to_bytes output
+    __len__():
+        number of variables on the tape
+
+    Example
+    -------
+    >>> tape = trace(lambda x1, x2: rmo.sin(x1)*x2, [1, 2])
+    >>> [ins.op for ins in tape.instructions]
+    ['input', 'input', 'sin', 'mul']
+    """
+
+    def __init__(self, n_inputs, instructions, outputs, values=None, scalar_output=True):
+        """
+        Constructs all necessary attributes for the Tape object.
+
+        Parameters
+        ----------
+        n_inputs : int
+            number of input variables
+        instructions : list of Instruction
+            recorded operations in topological order
+        outputs : list of int
+            indices of the output variables
+        values : list, optional
+            value of every variable at the trace point
+        scalar_output : bool, optional
+            whether the traced function returned a single value
+        """
+        self.n_inputs = n_inputs
+        self.instructions = list(instructions)
+        self.outputs = list(outputs)
+        self.values = list(values) if values is not None else None
+        self.scalar_output = scalar_output
+
+    def __len__(self):
+        """
+        Number of variables (instructions) recorded on the tape.
+        """
+        return len(self.instructions)
+
+    def evaluate(self, x):
+        """
+        Re-run the recorded operations at a new point, in the storage type of
+        the active precision policy (float64 by default).
+
+        Parameters
+        ----------
+        x : array-like of length n_inputs, optionally with a trailing batch dimension
+
+        Returns
+        -------
+        values : list with the value of every variable on the tape
+        """
+        policy = _CONTEXT.get().policy
+        x = np.asarray(x, dtype=float if policy is None else policy.storage)
+        assert len(x) == self.n_inputs, f"Expected {self.n_inputs} inputs, got {len(x)}"
+        values = []
+        for ins in self.instructions:
+            if ins.op == 'input':
+                values.append(x[ins.params[0]])
+            elif ins.op == 'const':
+                values.append(ins.params[0] if policy is None else policy.cast(ins.params[0]))
+            elif policy is None:
+                values.append(primitive(ins.op).primal([values[a] for a in ins.args], ins.params))
+            else:
+                # float64 constants inside a rule (e.g. log(base)) would promote the result
+                values.append(policy.cast(primitive(ins.op).primal([values[a] for a in ins.args], ins.params)))
+        return values
+
+    def replay(self, x):
+        """
+        Value and gradient (or Jacobian) of the recorded function at a new point.
+
+        The forward values come from evaluate; the reverse sweep visits each
+        variable once, in reverse tape order. Inside a Precision.precision
+        block the values and partials are kept in the storage type and the
+        adjoints are summed in the accumulation type of the policy.
+
+        Parameters
+        ----------
+        x : array-like of length n_inputs, optionally with a trailing batch dimension
+
+        Returns
+        -------
+        value, gradient for a scalar function or values, Jacobian for a vector function
+
+        Example
+        -------
+        >>> tape = trace(lambda x1, x2: x1*x2, [1, 2])
+        >>> tape.replay([3, 4])
+        (12.0, array([4., 3.]))
+        """
+        policy = _CONTEXT.get().policy
+        values = self.evaluate(x)
+        shape = np.shape(x)[1:]
+        zero = np.zeros(shape) if policy is None else np.zeros(shape, dtype=policy.accumulation)
+        zero_value = zero if policy is None else np.zeros(shape, dtype=policy.storage)
+        inputs = {ins.params[0]: k for k, ins in enumerate(self.instructions) if ins.op == 'input'}
+        rows = []
+        for out in self.outputs:
+            adjoints = [None]*len(self.instructions)
+            # the type of the seed sets the type the adjoints are summed in
+            adjoints[out] = 1.0 if policy is None else policy.one()
+            for k in range(out, -1, -1):
+                ins = self.instructions[k]
+                if adjoints[k] is None or ins.op in ('input', 'const'):
+                    continue
+                partials = primitive(ins.op).vjp([values[a] for a in ins.args], ins.params, values[k])
+                if policy is not None:
+                    partials = [policy.cast(partial) for partial in partials]
+                for a, partial in zip(ins.args, partials):
+                    term = adjoints[k] * partial
+                    adjoints[a] = term if adjoints[a] is None else adjoints[a] + term
+            rows.append([zero if adjoints[inputs[i]] is None else adjoints[inputs[i]] + zero for i in range(self.n_inputs)])
+        outputs = [values[out] + zero_value for out in self.outputs]
+        if self.scalar_output:
+            return outputs[0], np.array(rows[0])
+        return np.array(outputs), np.array(rows)
+
+    def _point(self, x):
+        """
+        Values of the variables at one point, and the input variable of every input.
+        """
+        x = np.asarray(x, dtype=float)
+        assert x.ndim == 1, "Expected one point, not a batch"
+        values = self.evaluate(x)
+        inputs = {ins.params[0]: k for k, ins in enumerate(self.instructions) if ins.op == 'input'}
+        return values, inputs
+
+    def jacobian_vector_product(self, x, v):
+        """
+        Values and Jacobian-vector products at a point.
+
+        One forward sweep propagates the tangents of all the columns of v at
+        once (they form a trailing axis of every tangent).
+
+        Parameters
+        ----------
+        x : array-like of length n_inputs
+        v : array-like of shape (n_inputs,) or (n_inputs, k)
+
+        Returns
+        -------
+        values of the outputs, J @ v of shape (n_outputs,) + v.shape[1:]
+        (the first axis is dropped for a scalar function)
+
+        Example
+        -------
+        >>> tape = trace(lambda x1, x2: [x1*x2, x2], [1, 2])
+        >>> tape.jacobian_vector_product([1, 2], [1, 1])
+        (array([2., 2.]), array([3., 1.]))
+        """
+        values, _ = self._point(x)
+        v = np.asarray(v, dtype=float)
+        assert v.shape[0] == self.n_inputs, f"Expected {self.n_inputs} rows in v, got {v.shape[0]}"
+        zero = np.zeros(v.shape[1:])
+        tangents = []
+        for k, ins in enumerate(self.instructions):
+            if ins.op == 'input':
+                tangents.append(v[ins.params[0]])
+            elif ins.op == 'const':
+                tangents.append(zero)
+            else:
+                partials = primitive(ins.op).vjp([values[a] for a in ins.args], ins.params, values[k])
+                tangent = zero
+                for a, partial in zip(ins.args, partials):
+                    tangent = tangent + partial*tangents[a]
+                tangents.append(tangent)
+        outputs = np.array([values[out] for out in self.outputs], dtype=float)
+        products = np.array([tangents[out] + zero for out in self.outputs])
+        if self.scalar_output:
+            return outputs[0], products[0]
+        return outputs, products
+
+    def vector_jacobian_product(self, x, w):
+        """
+        Values and vector-Jacobian products at a point.
+
+        One reverse sweep, seeded with all the columns of w at once, gives
+        J^T @ w (the adjoints carry a trailing axis).
+
+        Parameters
+        ----------
+        x : array-like of length n_inputs
+        w : array-like of shape (n_outputs,) or (n_outputs, k)
+
+        Returns
+        -------
+        values of the outputs, J^T @ w of shape (n_inputs,) + w.shape[1:]
+
+        Example
+        -------
+        >>> tape = trace(lambda x1, x2: [x1*x2, x2], [1, 2])
+        >>> tape.vector_jacobian_product([1, 2], [1, 1])
+        (array([2., 2.]), array([2., 2.]))
+        """
+        values, inputs = self._point(x)
+        w = np.asarray(w, dtype=float)
+        assert w.shape[0] == len(self.outputs), f"Expected {len(self.outputs)} rows in w, got {w.shape[0]}"
+        zero = np.zeros(w.shape[1:])
+        adjoints = [None]*len(self.instructions)
+        for out, seed in zip(self.outputs, w):
+            adjoints[out] = seed if adjoints[out] is None else adjoints[out] + seed
+        for k in range(max(self.outputs), -1, -1):
+            ins = self.instructions[k]
+            if adjoints[k] is None or ins.op in ('input', 'const'):
+                continue
+            partials = primitive(ins.op).vjp([values[a] for a in ins.args], ins.params, values[k])
+            for a, partial in zip(ins.args, partials):
+                term = adjoints[k] * partial
+                adjoints[a] = term if adjoints[a] is None else adjoints[a] + term
+        outputs = np.array([values[out] for out in self.outputs], dtype=float)
+        products = np.array([zero if adjoints[inputs[i]] is None else adjoints[inputs[i]] + zero
+                             for i in range(self.n_inputs)])
+        return outputs[0] if self.scalar_output else outputs, products
+
+    def hessian_vector_product(self, x, v):
+        """
+        Value, gradient and Hessian-vector products of a scalar function at a point.
+
+        Forward over reverse: the forward sweep carries the tangent of every
+        variable along v, the reverse sweep the adjoints and their tangents,
+        which use the second derivative rules of the primitives. All the
+        columns of v are pushed through the same two sweeps.
+
+        Parameters
+        ----------
+        x : array-like of length n_inputs
+        v : array-like of shape (n_inputs,) or (n_inputs, k)
+
+        Returns
+        -------
+        value, gradient (n_inputs,), H @ v with the shape of v
+
+        Example
+        -------
+        >>> tape = trace(lambda x1, x2: x1*x1*x2, [1, 2])
+        >>> tape.hessian_vector_product([1, 2], [1, 0])
+        (2.0, array([4., 1.]), array([4., 2.]))
+        """
+        assert self.scalar_output and len(self.outputs) == 1, "Hessian-vector products need a scalar function"
+        values, inputs = self._point(x)
+        v = np.asarray(v, dtype=float)
+        assert v.shape[0] == self.n_inputs, f"Expected {self.n_inputs} rows in v, got {v.shape[0]}"
+        zero = np.zeros(v.shape[1:])
+        rules = []
+        tangents = []
+        for k, ins in enumerate(self.instructions):
+            if ins.op == 'input':
+                rules.append(None)
+                tangents.append(v[ins.params[0]])
+                continue
+            if ins.op == 'const':
+                rules.append(None)
+                tangents.append(zero)
+                continue
+            p = primitive(ins.op)
+            if p.hessian is None:
+                raise ValueError(f"The primitive {ins.op} has no second derivative rule")
+            a = [values[i] for i in ins.args]
+            partials = p.vjp(a, ins.params, values[k])
+            rules.append((partials, p.hessian(a, ins.params, values[k])))
+            tangent = zero
+            for i, partial in zip(ins.args, partials):
+                tangent = tangent + partial*tangents[i]
+            tangents.append(tangent)
+        out = self.outputs[0]
+        adjoints = [0.0]*len(self.instructions)
+        dadjoints = [zero]*len(self.instructions)
+        adjoints[out] = 1.0
+        for k in range(out, -1, -1):
+            if rules[k] is None:
+                continue
+            partials, second = rules[k]
+            args = self.instructions[k].args
+            for i, partial in zip(args, partials):
+                adjoints[i] = adjoints[i] + adjoints[k]*partial
+                dadjoints[i] = dadjoints[i] + dadjoints[k]*partial
+            if adjoints[k] == 0.0:
+                continue
+            for i, j, h in second:
+                dadjoints[args[i]] = dadjoints[args[i]] + adjoints[k]*h*tangents[args[j]]
+                if i != j:
+                    dadjoints[args[j]] = dadjoints[args[j]] + adjoints[k]*h*tangents[args[i]]
+        gradient = np.array([adjoints[inputs[i]] for i in range(self.n_inputs)], dtype=float)
+        hv = np.array([dadjoints[inputs[i]] + zero for i in range(self.n_inputs)], dtype=float)
+        return values[out], gradient, hv
+
+    def to_bytes(self):
+        """
+        Serialize the tape (without the trace point values) to a compact byte string.
+
+        Only plain ints, floats, strings and tuples are written, using marshal,
+        so loading a tape never executes code.
+
+        Returns
+        -------
+        bytes
+
+        Example
+        -------
+        >>> data = trace(lambda x1: rmo.sin(x1)*2, 1.0).to_bytes()
+        >>> Tape.from_bytes(data).replay([1.0])
+        (1.682941969615793, array([1.08060461]))
+        """
+        ops = tuple(ins.op for ins in self.instructions)
+        args = tuple(ins.args for ins in self.instructions)
+        params = tuple(tuple(p if isinstance(p, (int, str)) else float(p) for p in ins.params)
+                       for ins in self.instructions)
+        return marshal.dumps((_FORMAT_VERSION, self.n_inputs, bool(self.scalar_output),
+                              tuple(self.outputs), ops, args, params))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Rebuild a tape written by to_bytes.
+
+        Parameters
+        ----------
+        data : bytes
+
+        Returns
+        -------
+        Tape
+        """
+        version, n_inputs, scalar_output, outputs, ops, args, params = marshal.loads(data)
+        if version != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported tape format version {version}, expected {_FORMAT_VERSION}")
+        instructions = [Instruction(*ins) for ins in zip(ops, args, params)]
+        return cls(n_inputs, instructions, outputs, scalar_output=scalar_output)
+
+    @classmethod
+    def from_nodes(cls, inputs, output):
+        """
+        Flatten the graph hanging off output into a Tape.
+
+        The graph is walked iteratively (no recursion), so arbitrarily deep
+        graphs can be recorded. Leaves that are not one of the inputs are
+        recorded as constants.
+
+        Parameters
+        ----------
+        inputs : list of Node
+            the input nodes, in order
+        output : Node, int, float or a list/tuple of those
+            the result of the traced function
+
+        Returns
+        -------
+        Tape
+        """
+        scalar_output = not isinstance(output, (list, tuple))
+        outs = [output] if scalar_output else list(output)
+
+        instructions = []
+        values = []
+        index = {}  # id(node) -> variable index
+        for i, node in enumerate(inputs):
+            index[id(node)] = len(instructions)
+            instructions.append(Instruction('input', (), (i,)))
+            values.append(node.value)
+
+        outputs = []
+        for out in outs:
+            if not isinstance(out, Node):
+                # the output does not depend on the inputs at all
+                outputs.append(len(instructions))
+                instructions.append(Instruction('const', (), (out,)))
+                values.append(out)
+                continue
+            stack = [(out, False)]
+            while stack:
+                node, expanded = stack.pop()
+                if id(node) in index:
+                    continue
+                children = [child for child, _ in node.deriv] if node.deriv else []
+                if expanded or not children:
+                    index[id(node)] = len(instructions)
+                    if children:
+                        assert node.op is not None, f"Cannot trace {node}: it was not created by a recorded operation"
+                        args = tuple(index[id(child)] for child in children)
+                        instructions.append(Instruction(node.op, args, tuple(node.params)))
+                    else:
+                        instructions.append(Instruction('const', (), (node.value,)))
+                    values.append(node.value)
+                    continue
+                stack.append((node, True))
+                for child in reversed(children):
+                    if id(child) not in index:
+                        stack.append((child, False))
+            outputs.append(index[id(out)])
+
+        return cls(len(inputs), instructions, outputs, values, scalar_output)
+
+
+def trace(f, x):
+    """
+    Run f once on Node inputs and record the resulting graph as a Tape.
+
+    Parameters
+    ----------
+    f : user defined function with reverse LYCET operations, called as f(*nodes)
+    x : input variable(s) at which f is traced
+
+    Returns
+    -------
+    Tape
+
+    Example
+    -------
+    >>> tape = trace(lambda x1, x2: x1*x2 + rmo.exp(x1), [1, 2])
+    >>> len(tape)
+    5
+    """
+    if isinstance(x, (int, float)):
+        x = [x]
+    nodes = [Node(xi) for xi in x]
+    return Tape.from_nodes(nodes, f(*nodes))
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# File: __init__.py
+# Description: top-level API of LYCET_package; the submodules (and numpy) are only imported on first use
+
+import importlib
+
+__version__ = '0.1.0'
+
+# public name -> (submodule, attribute), resolved by __getattr__ on first access. Names of
+# submodules (Node, DualNumber, Tape, ...) stay the submodules: importing one sets that attribute
+_LAZY = {
+    'forward': ('ForwardMode', 'ForwardMode'),
+    'reverse': ('ReverseMode', 'ReverseMode'),
+    'forward_ops': ('LYCET_Operations_Forward', None),
+    'reverse_ops': ('LYCET_Operations_Reverse', None),
+    'trace': ('Tape', 'trace'),
+    'custom_jvp': ('Primitives', 'custom_jvp'),
+    'custom_vjp': ('Primitives', 'custom_vjp'),
+    'precision': ('Precision', 'precision'),
+    'hash_consing': ('CSE', 'hash_consing'),
+    'jacobian_sparsity': ('Sparsity', 'jacobian_sparsity'),
+    'hessian_sparsity': ('Sparsity', 'hessian_sparsity'),
+    'hessian_vector_product': ('Hessian', 'hessian_vector_product'),
+    'sparse_hessian': ('Hessian', 'sparse_hessian'),
+    'reverse_hessian': ('Hessian', 'reverse_hessian'),
+    'sparse_jacobian': ('SparseTangent', 'sparse_jacobian'),
+    'sketch_jacobian': ('Sketch', 'sketch_jacobian'),
+    'hessian_trace': ('Hutchinson', 'hessian_trace'),
+    'hessian_diagonal': ('Hutchinson', 'hessian_diagonal'),
+    'profiling': ('Profiler', 'profiling'),
+    'memory_report': ('Memory', 'memory_report'),
+    'memory_limit': ('Memory', 'memory_limit'),
+    'GradientService': ('Service', 'GradientService'),
+    'compile_expression': ('Expression', 'compile_expression'),
+    'memoize': ('Memoize', 'memoize'),
+}
+
+__all__ = ['grad', 'jacobian', 'hessian'] + list(_LAZY)
+
+
+def __getattr__(name):
+    """
+    Import the submodule behind a public name (or a submodule itself) on first access.
+    """
+    if name in _LAZY:
+        module, attribute = _LAZY[name]
+        value = importlib.import_module(f'.{module}', __name__)
+        if attribute is not None:
+            value = getattr(value, attribute)
+        # later accesses find it in the module dict and skip __getattr__
+        globals()[name] = value
+        return value
+    try:
+        return importlib.import_module(f'.{name}', __name__)
+    except ModuleNotFoundError as error:
+        if error.name != f'{__name__}.{name}':
+            raise
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+def grad(f, x, mode='reverse'):
+    """
+    Gradient of a scalar function.
+
+    Parameters
+    ----------
+    f : user defined scalar function with LYCET operations
+    x : input variable(s)
+    mode : str, optional
+        'reverse' (default) to differentiate f(*x) with ReverseMode,
+        'forward' to differentiate f(x) with ForwardMode
+
+    Returns
+    -------
+    np.ndarray of shape (n,)
+
+    Example
+    -------
+    >>> import LYCET_package as lycet
+    >>> lycet.grad(lambda x1, x2: x1*lycet.reverse_ops.sin(x2), [2.0, 0.0])
+    array([0., 2.])
+    """
+    import numpy as np
+    if mode == 'reverse':
+        return np.array(__getattr__('reverse')(f, x)[1], dtype=float)
+    if mode == 'forward':
+        return np.atleast_1d(np.asarray(__getattr__('forward')(f, x, gradient=True), dtype=float))
+    raise ValueError(f"Unknown mode {mode!r}, expected 'reverse' or 'forward'")
+
+
+def jacobian(f, x, mode='forward'):
+    """
+    Jacobian of a function, one row per output (a single row for a scalar function).
+
+    Parameters
+    ----------
+    f : user defined function with LYCET operations
+    x : input variable(s)
+    mode : str, optional
+        'forward' (default) to differentiate f(x) with ForwardMode,
+        'reverse' to differentiate f(*x) with one reverse sweep per output of its tape
+
+    Returns
+    -------
+    np.ndarray of shape (m, n)
+
+    Example
+    -------
+    >>> lycet.jacobian(lambda x: [x[0]*x[1], x[1]], [2.0, 3.0])
+    array([[3., 2.],
+           [0., 1.]])
+    """
+    import numpy as np
+    if isinstance(x, (int, float)):
+        x = [x]
+    if mode == 'forward':
+        return np.atleast_2d(np.asarray(__getattr__('forward')(f, x, jacobian=True), dtype=float))
+    if mode == 'reverse':
+        return np.atleast_2d(__getattr__('trace')(f, x).replay(x)[1])
+    raise ValueError(f"Unknown mode {mode!r}, expected 'forward' or 'reverse'")
+
+
+def hessian(f, x):
+    """
+    Dense Hessian of a scalar function f(*x), by edge pushing on its reverse mode graph.
+
+    Example
+    -------
+    >>> lycet.hessian(lambda x1, x2: x1*x1*x2, [1.0, 2.0])
+    array([[4., 2.],
+           [2., 0.]])
+    """
+    return __getattr__('reverse_hessian')(f, x)[2].toarray()
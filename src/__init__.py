@@ -1,7 +1,4 @@
 name = "LYCET"
 
-from .DualNumber import *
-from .LYCET_operations import *
-import numpy as np
-
-__all__ = ['DualNumber', 'LYCET_operations', 'numpy']
+# the package lives in LYCET_package (import LYCET_package); nothing is imported here,
+# so that scripts and workers starting from src/ do not pay for numpy or the submodules
@@ -10,6 +10,28 @@ tests=(
     test_LYCET_operations.py
     test_ForwardMode.py
     test_node_reverse_mode.py
+    test_compiler.py
+    test_optimize.py
+    test_cse.py
+    test_disk_cache.py
+    test_export.py
+    test_primitives.py
+    test_reductions.py
+    test_precision.py
+    test_sparsity.py
+    test_hessian.py
+    test_sparse_tangent.py
+    test_sketch.py
+    test_hutchinson.py
+    test_profiler.py
+    test_memory.py
+    test_package.py
+    test_threads.py
+    test_service.py
+    test_command_line.py
+    test_expression.py
+    test_serialization.py
+    test_memoize.py
 )
 
 
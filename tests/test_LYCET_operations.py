@@ -33,7 +33,7 @@ def test_tan():
     for i in inputs:
         output = lycet.tan(i)
         if isinstance(i, DualNumber):
-            assert (output.real) == np.tan(i.real) and (output.dual == (1 + (np.sin(i.real)**2)/(np.cos(i.real)**2)))
+            assert (output.real) == np.tan(i.real) and np.isclose(output.dual, 1 + (np.sin(i.real)**2)/(np.cos(i.real)**2), rtol=1e-14, atol=0)
         else:
             assert (output) == np.tan(i)
 
@@ -124,6 +124,14 @@ def test_arccos_inval_dom():
         with pytest.raises(ValueError):
             lycet.arccos(i)
 
+def test_plain_numbers_outside_domain_give_nan():
+    # plain numbers are evaluated like NumPy: nan outside the domain, no ValueError
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for output in [lycet.arcsin(5.0), lycet.arccos(-5), lycet.ln(-5.1), lycet.log(-5, 3)]:
+            assert np.isnan(output)
+    with pytest.raises(ValueError):
+        lycet.log(5, -3)
+
 def test_arctan():
     # test lycet forward mode elementary function arctam
     inputs = [DualNumber(5,1), DualNumber(5.1,1),5,5.1]
@@ -140,7 +148,7 @@ def test_sinh():
     for i in inputs:
         output = lycet.sinh(i)
         if isinstance(i, DualNumber):
-            assert np.abs(output.real - np.sinh(i.real)) < np.finfo(float).eps*1000 and np.abs(output.dual - np.cosh(i.real)) < np.finfo(float).eps
+            assert np.abs(output.real - np.sinh(i.real)) < np.finfo(float).eps*1000 and np.isclose(output.dual, np.cosh(i.real), rtol=1e-14, atol=0)
         else:
             assert np.abs(output - np.sinh(i)) < np.finfo(float).eps*1000
 
@@ -150,7 +158,7 @@ def test_cosh():
     for i in inputs:
         output = lycet.cosh(i)
         if isinstance(i, DualNumber):
-            assert output.real == np.cosh(i.real) and output.dual == (np.exp(i.real) - np.exp(-i.real))/2
+            assert output.real == np.cosh(i.real) and np.isclose(output.dual, (np.exp(i.real) - np.exp(-i.real))/2, rtol=1e-14, atol=0)
         else:
             assert output == np.cosh(i)
 
@@ -160,7 +168,7 @@ def test_tanh():
     for i in inputs:
         output = lycet.tanh(i)
         if isinstance(i, DualNumber):
-            assert (output.real) - np.tanh(i.real) and output.dual - (np.exp(i.real) - np.exp(-i.real))/(np.exp(i.real) + np.exp(-i.real))
+            assert (output.real) == np.tanh(i.real) and output.dual == 1 - np.tanh(i.real)**2
         else:
             assert (output) == np.tanh(i)
 
@@ -170,7 +178,7 @@ def test_sigmoid():
     for i in inputs:
         output = lycet.sigmoid(i)
         if isinstance(i, DualNumber):
-            assert (output.real) == 1/(1 + np.exp(-i.real)) and output.dual == (np.exp(-i.real)/(1+np.exp(-i.real))**2)
+            assert (output.real) == 1/(1 + np.exp(-i.real)) and np.isclose(output.dual, np.exp(-i.real)/(1+np.exp(-i.real))**2, rtol=1e-14, atol=0)
         else:
             assert (output) == 1/(1 + np.exp(-i))
 
@@ -191,4 +199,4 @@ if __name__ == '__main__':
     test_sinh()
     test_cosh()
     test_tanh()
-    test_sigmoid()
\ No newline at end of file
+    test_sigmoid()
\ No newline at end of file
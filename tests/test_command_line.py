@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+#File: test_command_line.py
+#Description: test the lycet command line evaluator on JSONL, CSV and .npy files, in batches and worker processes
+
+import os
+import sys
+import json
+import subprocess
+import pytest
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+from LYCET_package.CommandLine import evaluate_file, read_batches, load_function, Evaluator, main
+
+EXPRESSION = 'exp(x1)*sin(x2) + x3**2'
+
+
+def expected(x):
+    return rm.ReverseMode(lambda x1, x2, x3: rmo.exp(x1)*rmo.sin(x2) + x3**2, list(x))
+
+
+@pytest.fixture
+def points():
+    return np.random.default_rng(0).uniform(-1, 1, (25, 3))
+
+
+def read_jsonl(path):
+    with open(path) as file:
+        return [json.loads(line) for line in file]
+
+
+def test_load_function(tmp_path):
+    f, n = load_function(EXPRESSION)
+    assert n == 3
+    assert np.isclose(rm.ReverseMode(f, [0.0, 0.0, 2.0])[0], 4.0)
+    with pytest.raises(ValueError):
+        load_function('__import__("os").getcwd()')
+    path = tmp_path / 'model.py'
+    path.write_text('def f(x1, x2):\n    return x1*x2\n')
+    f, n = load_function(f'{path}:f')
+    assert n is None and f(2, 3) == 6
+    f, n = load_function('LYCET_package.LYCET_Operations_Reverse:sin')
+    assert f is rmo.sin
+    with pytest.raises(ValueError):
+        load_function(f'{path}:g')
+
+
+def test_read_batches(tmp_path, points):
+    np.save(tmp_path / 'x.npy', points)
+    with open(tmp_path / 'x.csv', 'w') as file:
+        file.write('x1,x2,x3\n' + '\n'.join(','.join(map(repr, row)) for row in points.tolist()) + '\n')
+    with open(tmp_path / 'x.jsonl', 'w') as file:
+        for k, row in enumerate(points.tolist()):
+            file.write(json.dumps({'x': row} if k % 2 else row) + '\n')
+    for name in ['x.npy', 'x.csv', 'x.jsonl']:
+        batches = list(read_batches(str(tmp_path / name), batch_size=10))
+        assert [len(batch) for batch in batches] == [10, 10, 5]
+        assert np.array_equal(np.concatenate(batches), points)
+    with pytest.raises(ValueError):
+        list(read_batches(str(tmp_path / 'x.txt')))
+
+
+def test_gradients_jsonl(tmp_path, points):
+    np.save(tmp_path / 'x.npy', points)
+    count = evaluate_file(EXPRESSION, str(tmp_path / 'x.npy'), str(tmp_path / 'out.jsonl'), batch_size=8)
+    assert count == 25
+    for row, x in zip(read_jsonl(tmp_path / 'out.jsonl'), points):
+        value, gradient = expected(x)
+        assert np.isclose(row['value'], value)
+        assert np.allclose(row['gradient'], gradient)
+
+
+def test_npy_and_csv_output(tmp_path, points):
+    np.save(tmp_path / 'x.npy', points)
+    evaluate_file(EXPRESSION, str(tmp_path / 'x.npy'), str(tmp_path / 'out.npy'), batch_size=7)
+    evaluate_file(EXPRESSION, str(tmp_path / 'x.npy'), str(tmp_path / 'out.csv'), mode='value')
+    out = np.load(tmp_path / 'out.npy')
+    assert out.shape == (25, 4)
+    values = np.loadtxt(tmp_path / 'out.csv', delimiter=',')
+    for row, value, x in zip(out, values, points):
+        expected_value, gradient = expected(x)
+        assert np.allclose(row, [expected_value] + list(gradient))
+        assert np.isclose(value, expected_value)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.raw')]
+
+
+def test_forward_jacobian_and_untraced(tmp_path, points):
+    path = tmp_path / 'model.py'
+    path.write_text('import LYCET_package.LYCET_Operations_Forward as fmo\n'
+                    'def f(x):\n    return [x[0]*x[1], fmo.exp(x[2])]\n'
+                    'def g(x1, x2, x3):\n    return x1*x2 if x1.value > 0 else x3\n')
+    np.save(tmp_path / 'x.npy', points)
+    evaluate_file(f'{path}:f', str(tmp_path / 'x.npy'), str(tmp_path / 'f.jsonl'), mode='jacobian', style='forward')
+    for row, (x1, x2, x3) in zip(read_jsonl(tmp_path / 'f.jsonl'), points):
+        assert np.allclose(row['value'], [x1*x2, np.exp(x3)])
+        assert np.allclose(row['jacobian'], [[x2, x1, 0], [0, 0, np.exp(x3)]])
+    evaluate_file(f'{path}:g', str(tmp_path / 'x.npy'), str(tmp_path / 'g.jsonl'), traced=False, batch_size=4)
+    for row, (x1, x2, x3) in zip(read_jsonl(tmp_path / 'g.jsonl'), points):
+        assert np.isclose(row['value'], x1*x2 if x1 > 0 else x3)
+        assert np.allclose(row['gradient'], [x2, x1, 0] if x1 > 0 else [0, 0, 1])
+    with pytest.raises(ValueError):
+        Evaluator(f'{path}:f', mode='gradient', style='forward')(points)
+
+
+def test_workers(tmp_path, points):
+    np.save(tmp_path / 'x.npy', points)
+    evaluate_file(EXPRESSION, str(tmp_path / 'x.npy'), str(tmp_path / 'serial.npy'), batch_size=4)
+    evaluate_file(EXPRESSION, str(tmp_path / 'x.npy'), str(tmp_path / 'parallel.npy'), batch_size=4, workers=2)
+    assert np.array_equal(np.load(tmp_path / 'serial.npy'), np.load(tmp_path / 'parallel.npy'))
+
+
+def test_main(tmp_path, points, capsys):
+    np.save(tmp_path / 'x.npy', points)
+    assert main([EXPRESSION, str(tmp_path / 'x.npy'), '-m', 'value']) == 0
+    values = [json.loads(line)['value'] for line in capsys.readouterr().out.splitlines()]
+    assert np.allclose(values, [expected(x)[0] for x in points])
+    with pytest.raises(SystemExit):
+        main(['x1 + y', str(tmp_path / 'x.npy')])
+    with pytest.raises(SystemExit) as exit:
+        main(['x1 + 1/0', str(tmp_path / 'x.npy')])
+    assert exit.value.code == 2
+
+
+def test_console_stdin():
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    result = subprocess.run([sys.executable, '-m', 'LYCET_package.CommandLine', 'x1*x2', '-'], input='[2, 3]\n[1, 5]\n',
+                            capture_output=True, text=True, env=env, check=True)
+    rows = [json.loads(line) for line in result.stdout.splitlines()]
+    assert rows == [{'value': 6.0, 'gradient': [3.0, 2.0]}, {'value': 5.0, 'gradient': [5.0, 1.0]}]
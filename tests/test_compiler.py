@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+#File: test_compiler.py
+#Description: test tracing a function to a tape and compiling it to straight-line NumPy code
+
+import pytest
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+from LYCET_package.Tape import trace
+import LYCET_package.Compiler as compiler
+from LYCET_package.Compiler import compile_tape, compile_function, generate_source
+from LYCET_package.DiskCache import function_key
+
+def f_7(x1, x2, x3, x4, x5, x6, x7):
+    return rmo.cos(x1) + rmo.tanh(x2) + (x3 / x4) + (x5**(rmo.cosh(x6))) + (x7 - x1)
+
+x_7 = [0.5912, 0.3242, 0.8177, 2.9087, 5.3690, 6.4394, 3.1917]
+
+def test_trace_instructions():
+    tape = trace(lambda x1, x2: rmo.sin(x1)*x2, [1, 2])
+    assert [ins.op for ins in tape.instructions] == ['input', 'input', 'sin', 'mul']
+    assert tape.instructions[3].args == (2, 1)
+    assert tape.outputs == [3] and tape.scalar_output
+    assert tape.values[3] == np.sin(1)*2
+
+def test_trace_constants_and_params():
+    tape = trace(lambda x1: rmo.log(x1, 5) + 3, 2)
+    ops = [ins.op for ins in tape.instructions]
+    assert ops == ['input', 'log', 'const', 'add']
+    assert tape.instructions[1].params == (5,)
+    assert tape.instructions[2].params == (3,)
+
+def test_trace_shared_subexpression():
+    # the shared node is recorded once
+    def f(x1):
+        y = rmo.exp(x1)
+        return y*y
+    tape = trace(f, 1)
+    assert len(tape) == 3
+
+def test_trace_deep_graph():
+    # tracing is iterative and does not hit the recursion limit
+    def f(x1):
+        y = x1
+        for _ in range(5000):
+            y = y + 1
+        return y
+    tape = trace(f, 1.0)
+    assert len(tape) == 1 + 2*5000
+
+def test_trace_constant_output():
+    tape = trace(lambda x1, x2: [x1*x2, 4.0], [1, 2])
+    assert not tape.scalar_output
+    assert tape.instructions[tape.outputs[1]] == ('const', (), (4.0,))
+
+def test_compile_matches_reverse_mode():
+    value, grad = rm.ReverseMode(f_7, x_7)
+    g = compile_function(f_7, x_7)
+    cvalue, cgrad = g(x_7)
+    assert np.isclose(cvalue, value)
+    assert np.allclose(cgrad, grad)
+
+def test_compile_math_backend():
+    value, grad = rm.ReverseMode(f_7, x_7)
+    g = compile_function(f_7, x_7, backend='math')
+    cvalue, cgrad = g(x_7)
+    assert np.isclose(cvalue, value)
+    assert np.allclose(cgrad, grad)
+
+def test_compile_all_elementary_functions():
+    funcs = [rmo.sin, rmo.cos, rmo.tan, rmo.exp, rmo.ln, lambda x: rmo.log(x, 5), rmo.arcsin,
+             rmo.arccos, rmo.arctan, rmo.sinh, rmo.cosh, rmo.tanh, rmo.sigmoid,
+             lambda x: 2**x, lambda x: 3 - x, lambda x: 2/x, lambda x: x**3]
+    for func in funcs:
+        value, grad = rm.ReverseMode(func, 0.5)
+        cvalue, cgrad = compile_tape(trace(func, 0.5))([0.5])
+        assert np.isclose(cvalue, value)
+        assert np.allclose(cgrad, grad)
+
+def test_compile_batched_inputs():
+    g = compile_function(f_7, x_7)
+    X = np.random.default_rng(0).uniform(0.5, 1.5, size=(7, 5))
+    values, grads = g(X)
+    assert values.shape == (5,) and grads.shape == (7, 5)
+    for b in range(5):
+        value, grad = rm.ReverseMode(f_7, list(X[:, b]))
+        assert np.isclose(values[b], value)
+        assert np.allclose(grads[:, b], grad)
+
+def test_compile_jacobian():
+    g = compile_function(lambda x1, x2: [x1*x2, rmo.sin(x1), 3.0], [1.0, 2.0])
+    values, J = g([1.0, 2.0])
+    assert np.allclose(values, [2, np.sin(1), 3])
+    assert np.allclose(J, [[2, 1], [np.cos(1), 0], [0, 0]])
+
+def test_compile_has_no_lycet_objects():
+    g = compile_function(f_7, x_7)
+    assert 'Node' not in g.source and 'rmo' not in g.source
+    assert set(g.__globals__) >= {'np', 'math'}
+
+def test_compile_cache():
+    f = lambda x1, x2: x1*x2
+    assert compile_function(f, [1, 2]) is compile_function(f, [3, 4])
+    assert compile_function(f, [1, 2]) is not compile_function(f, [1, 2], backend='math')
+
+def test_compile_cache_closure_state(monkeypatch):
+    keys = []
+    monkeypatch.setattr(compiler, 'function_key', lambda *args, **kwargs: keys.append(1) or function_key(*args, **kwargs))
+    scale = 2.0
+    def f(x1):
+        return x1*scale
+    g = compile_function(f, [1.0])
+    assert compile_function(f, [1.0]) is g and g([3.0])[0] == 6.0
+    # hits with the same captured objects do not hash the function again
+    assert len(keys) == 1
+    # the same function object capturing another value is traced again
+    scale = 5.0
+    value, grad = compile_function(f, [1.0])([3.0])
+    assert value == 15.0 and np.allclose(grad, [5.0])
+
+def test_generate_source_unknown_backend():
+    with pytest.raises(AssertionError):
+        generate_source(trace(lambda x1: x1*2, 1), backend='fortran')
+
+def test_replay_matches_reverse_mode():
+    tape = trace(f_7, x_7)
+    value, grad = rm.ReverseMode(f_7, x_7)
+    rvalue, rgrad = tape.replay(x_7)
+    assert np.isclose(rvalue, value)
+    assert np.allclose(rgrad, grad)
+    # batched replay
+    X = np.random.default_rng(1).uniform(0.5, 1.5, size=(7, 3))
+    values, grads = tape.replay(X)
+    assert np.allclose(values, compile_tape(tape)(X)[0])
+    assert np.allclose(grads, compile_tape(tape)(X)[1])
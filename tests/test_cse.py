@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+#File: test_cse.py
+#Description: test hash-consing of identical subexpressions while recording reverse mode graphs
+
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+from LYCET_package.Node import Node
+from LYCET_package.Primitives import Primitive
+from LYCET_package.Tape import trace
+from LYCET_package.CSE import hash_consing, CSEStats
+
+def test_off_by_default():
+    x = Node(1)
+    assert rmo.exp(x) is not rmo.exp(x)
+    assert x + 1 is not x + 1
+
+def test_repeated_calls_share_node():
+    x = Node(1)
+    with hash_consing() as stats:
+        a = rmo.exp(x)
+        b = rmo.exp(x)
+        c = rmo.exp(x)
+    assert a is b is c
+    assert stats.hits == 2 and stats.misses == 1
+    assert stats.lookups() == 3
+    assert np.isclose(stats.hit_rate(), 2/3)
+
+def test_constants_and_params_in_key():
+    x = Node(2)
+    with hash_consing():
+        assert x + 1 is x + 1
+        assert x + 1 is not x + 2
+        assert rmo.log(x, 3) is rmo.log(x, 3)
+        assert rmo.log(x, 3) is not rmo.log(x, 5)
+        assert 3 - x is 3 - x
+        assert 3 - x is not x - 3
+        assert 2**x is 2**x
+        assert 1/x is 1/x
+
+def test_commutative_operands():
+    x, y = Node(2), Node(3)
+    with hash_consing():
+        assert x*y is y*x
+        assert x + y is y + x
+        assert x - y is not y - x
+        assert x + 1 is 1 + x
+
+def test_distinct_operands_not_shared():
+    x, y = Node(2), Node(2)
+    with hash_consing():
+        assert rmo.sin(x) is not rmo.sin(y)
+
+def test_reverse_mode_unchanged():
+    f = lambda x1, x2: rmo.exp(x1)*rmo.exp(x1) + rmo.exp(x1)*x2 + rmo.sin(x1 + x2)*rmo.sin(x2 + x1)
+    x = [0.3, 0.7]
+    value, grad = rm.ReverseMode(f, x)
+    with hash_consing() as stats:
+        cvalue, cgrad = rm.ReverseMode(f, x)
+    assert stats.hits == 4
+    assert np.isclose(value, cvalue)
+    assert np.allclose(grad, cgrad)
+
+def test_smaller_tape():
+    f = lambda x1: rmo.exp(x1) + rmo.exp(x1) + rmo.exp(x1)
+    size = len(trace(f, 1.0))
+    with hash_consing():
+        tape = trace(f, 1.0)
+    assert len(tape) == size - 2
+    assert np.isclose(tape.replay([1.0])[1][0], 3*np.exp(1))
+
+def test_nested_blocks():
+    x = Node(1)
+    with hash_consing() as outer:
+        a = rmo.cos(x)
+        with hash_consing() as inner:
+            assert rmo.cos(x) is not a
+        assert rmo.cos(x) is a
+    assert outer.hits == 1 and inner.hits == 0
+
+def test_plain_operators_outside_blocks():
+    before = [Node.__add__, Node.__rpow__, Primitive._node]
+    with hash_consing():
+        assert Node.__add__ is not before[0] and Primitive._node is not before[2]
+        with hash_consing():
+            pass
+        assert Node.__add__ is not before[0]
+    assert [Node.__add__, Node.__rpow__, Primitive._node] == before
+
+def test_stats_repr():
+    assert repr(CSEStats()) == "CSEStats(hits=0, misses=0, hit_rate=0.000)"
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+#File: test_disk_cache.py
+#Description: test the persistent on-disk cache of traced gradient programs
+
+import os
+import threading
+import pytest
+import numpy as np
+import LYCET_package.LYCET_Operations_Reverse as rmo
+from LYCET_package.Tape import Tape, trace
+from LYCET_package.Compiler import compile_function
+from LYCET_package.DiskCache import GradientCache, function_key, persistent_key
+
+calls = []
+
+def make_function(scale):
+    return lambda x1, x2: rmo.sin(x1)*x2*scale
+
+def test_tape_round_trip():
+    tape = trace(lambda x1, x2: rmo.log(x1, 3)*x2 + 2**x1, [1.5, 2.0])
+    loaded = Tape.from_bytes(tape.to_bytes())
+    assert loaded.instructions == tape.instructions
+    assert loaded.outputs == tape.outputs and loaded.n_inputs == tape.n_inputs
+    value, grad = tape.replay([1.5, 2.0])
+    lvalue, lgrad = loaded.replay([1.5, 2.0])
+    assert value == lvalue and np.array_equal(grad, lgrad)
+
+def test_tape_bad_version():
+    import marshal
+    with pytest.raises(ValueError):
+        Tape.from_bytes(marshal.dumps((0, 1, True, (), (), (), ())))
+
+def test_function_key():
+    f, g = make_function(2), make_function(2)
+    assert f is not g
+    assert function_key(f, 2) == function_key(g, 2)
+    # closure constants, input dimension and options are part of the key
+    assert function_key(f, 2) != function_key(make_function(3), 2)
+    assert function_key(f, 2) != function_key(f, 3)
+    assert function_key(f, 2) != function_key(f, 2, optimize=False)
+    # so is the code itself
+    assert function_key(lambda x1, x2: x1*x2, 2) != function_key(lambda x1, x2: x1+x2, 2)
+
+def test_cold_start_reads_file(tmp_path):
+    calls.clear()
+    def f(x1, x2):
+        calls.append(1)
+        return rmo.exp(x1)*x2
+    cache = GradientCache(str(tmp_path))
+    value, grad = compile_function(f, [1.0, 2.0], cache=cache)([1.0, 2.0])
+    assert len(calls) == 1 and cache.misses == 1
+    assert len(os.listdir(tmp_path)) == 1
+
+    # a fresh function object with the same code, as after a restart
+    def f(x1, x2):
+        calls.append(1)
+        return rmo.exp(x1)*x2
+    restarted = GradientCache(str(tmp_path))
+    cvalue, cgrad = compile_function(f, [1.0, 2.0], cache=restarted)([1.0, 2.0])
+    assert len(calls) == 1 and restarted.hits == 1
+    assert np.isclose(value, cvalue) and np.allclose(grad, cgrad)
+
+def test_globals_of_nested_code():
+    global offset
+    offset = 1.0
+    f = lambda x1: rmo.sum([x1*k + offset for k in range(3)])
+    key = function_key(f, 1)
+    offset = 2.0
+    # offset is only read inside the comprehension
+    assert function_key(f, 1) != key
+
+def test_keys_by_id_are_not_persisted(tmp_path):
+    lock = threading.Lock()
+    f = lambda x1: x1*2 if lock else x1
+    assert function_key(f, 1) == function_key(f, 1)
+    assert persistent_key(f, 1) is None and persistent_key(make_function(2), 2) is not None
+    cache = GradientCache(str(tmp_path))
+    value, grad = compile_function(f, [1.0], cache=cache)([3.0])
+    assert value == 6.0 and np.allclose(grad, [2.0])
+    assert not os.listdir(tmp_path) and cache.hits == cache.misses == 0
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = GradientCache(str(tmp_path))
+    key = function_key(make_function(2), 2)
+    with open(os.path.join(tmp_path, key + '.tape'), 'wb') as file:
+        file.write(b'not a tape')
+    assert cache.load(key) is None
+    assert not os.listdir(tmp_path)
+
+def test_lru_eviction(tmp_path):
+    tape = trace(make_function(2), [1.0, 2.0])
+    size = len(tape.to_bytes())
+    cache = GradientCache(str(tmp_path), max_bytes=2*size)
+    cache.store('a', tape)
+    os.utime(os.path.join(tmp_path, 'a.tape'), (1, 1))
+    cache.store('b', tape)
+    os.utime(os.path.join(tmp_path, 'b.tape'), (2, 2))
+    assert cache.load('a') is not None # refreshes a
+    cache.store('c', tape)
+    assert sorted(os.listdir(tmp_path)) == ['a.tape', 'c.tape']
+    assert cache.size() == 2*size
+    cache.clear()
+    assert cache.size() == 0
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+#File: test_export.py
+#Description: test exporting traced gradients as standalone Python modules
+
+import os
+import sys
+import subprocess
+import pytest
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+from LYCET_package.Export import export_source, export_module, load_module, verify_module
+
+def f_scalar(x1, x2, x3):
+    return rmo.cos(x1 + x2) + (x3 * x2 ** 3) + rmo.sigmoid(x1)*rmo.log(x3, 2)
+
+def f_vector(x1, x2):
+    return [x1*x2, rmo.exp(x1) - x2, 4.0]
+
+points = [[0.5, 1.5, 2.0], [1.0, -0.3, 0.7], [2.0, 0.1, 3.0]]
+
+def test_export_scalar(tmp_path):
+    path = export_module(f_scalar, points[0], str(tmp_path / 'scalar_grad.py'))
+    module = load_module(path)
+    for x in points:
+        value, grad = rm.ReverseMode(f_scalar, x)
+        assert np.isclose(module.value(x), value)
+        assert np.allclose(module.grad(x), grad)
+        assert np.allclose(module.jacobian(x), [grad])
+    assert module.n_inputs == 3 and module.n_outputs == 1
+
+def test_export_vector(tmp_path):
+    module = load_module(export_module(f_vector, [1.0, 2.0], str(tmp_path / 'vector_grad.py')))
+    assert np.allclose(module.value([1.0, 2.0]), [2.0, np.exp(1) - 2, 4.0])
+    assert np.allclose(module.jacobian([1.0, 2.0]), [[2.0, 1.0], [np.exp(1), -1.0], [0.0, 0.0]])
+    with pytest.raises(ValueError):
+        module.grad([1.0, 2.0])
+
+def test_export_math_backend_is_dependency_free():
+    source = export_source(f_scalar, points[0])
+    code = source.split('"""', 2)[2]
+    assert 'numpy' not in code and 'np.' not in code
+    assert 'LYCET' not in code and 'Node' not in code
+
+def test_export_numpy_backend_batched(tmp_path):
+    module = load_module(export_module(f_scalar, points[0], str(tmp_path / 'batched_grad.py'), backend='numpy'))
+    X = np.array(points).T
+    values, grads = module.value(X), module.grad(X)
+    for b, x in enumerate(points):
+        value, grad = rm.ReverseMode(f_scalar, x)
+        assert np.isclose(values[b], value)
+        assert np.allclose(grads[:, b], grad)
+
+def test_export_runs_without_lycet(tmp_path):
+    path = export_module(f_scalar, points[0], str(tmp_path / 'standalone_grad.py'))
+    script = ("import sys, standalone_grad; "
+              "assert not any(m.startswith('LYCET') for m in sys.modules); "
+              "print(standalone_grad.grad([0.5, 1.5, 2.0])[2])")
+    env = dict(os.environ, PYTHONPATH=str(tmp_path))
+    output = subprocess.run([sys.executable, '-c', script], cwd=str(tmp_path), env=env,
+                            capture_output=True, text=True, check=True).stdout
+    assert np.isclose(float(output), rm.ReverseMode(f_scalar, points[0])[1][2])
+
+def test_verify_module(tmp_path):
+    path = export_module(f_scalar, points[0], str(tmp_path / 'checked_grad.py'))
+    report = verify_module(path, f_scalar, points)
+    assert report['ok'] and report['points'] == 3
+    report = verify_module(path, lambda x1, x2, x3: f_scalar(x1, x2, x3) + x1, points)
+    assert not report['ok'] and report['derivatives'] > 0.5
+
+def test_verify_vector_module(tmp_path):
+    path = export_module(f_vector, [1.0, 2.0], str(tmp_path / 'checked_vector_grad.py'))
+    report = verify_module(path, f_vector, [[1.0, 2.0], [0.3, -1.0]])
+    assert report['ok']
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+#File: test_expression.py
+#Description: test the expression parser, the compiled expression programs and their cache
+
+import pytest
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.ForwardMode as fm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+from LYCET_package.Profiler import profiling
+from LYCET_package.Expression import parse, compile_expression, cache_info, clear_cache
+
+EXPRESSIONS = {
+    'exp(x1)*sin(x2) + x3**2': lambda x1, x2, x3: rmo.exp(x1)*rmo.sin(x2) + x3**2,
+    '-x1/x2 - (x3 - 2)**3': lambda x1, x2, x3: (-1)*x1/x2 - (x3 - 2)**3,
+    'log(x1, 2) + ln(x2)*sqrt(x3)': lambda x1, x2, x3: rmo.log(x1, 2) + rmo.ln(x2)*x3**0.5,
+    'tanh(x1) + sigmoid(x2)*softplus(x3) + pi': lambda x1, x2, x3: rmo.tanh(x1) + rmo.sigmoid(x2)*rmo.softplus(x3) + np.pi,
+    'sum([x1, x2*x3, 2]) + logsumexp(x1, x2)': lambda x1, x2, x3: rmo.sum([x1, x2*x3, 2]) + rmo.logsumexp([x1, x2]),
+    '2**x1 * arctan(x2) / cosh(x3)': lambda x1, x2, x3: 2**x1*rmo.arctan(x2)/rmo.cosh(x3),
+    'x1**x2 + (x3 + 1)**(x1*x2)': lambda x1, x2, x3: x1**x2 + (x3 + 1)**(x1*x2),
+}
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_cache()
+    yield
+    clear_cache()
+
+
+@pytest.mark.parametrize('expression', EXPRESSIONS)
+def test_matches_reverse_mode(expression):
+    program = compile_expression(expression)
+    for x in np.random.default_rng(0).uniform(0.5, 1.5, (5, 3)):
+        value, gradient = program(x)
+        expected_value, expected_gradient = rm.ReverseMode(EXPRESSIONS[expression], list(x))
+        assert np.isclose(value, expected_value)
+        assert np.allclose(gradient, expected_gradient)
+
+
+def test_batch_and_forward():
+    program = compile_expression('exp(x1)*sin(x2) + x3**2')
+    X = np.random.default_rng(1).uniform(-1, 1, (3, 50))
+    values, gradients = program(X)
+    assert values.shape == (50,) and gradients.shape == (3, 50)
+    for k in range(50):
+        value, gradient = program(X[:, k])
+        assert np.isclose(values[k], value) and np.allclose(gradients[:, k], gradient)
+    gradient = fm.ForwardMode(program.function('forward'), list(X[:, 0]), gradient=True)
+    assert np.allclose(gradient, gradients[:, 0])
+
+
+def test_variable_exponent_matches_finite_differences():
+    program = compile_expression('x1**x2')
+    value, gradient = program([2.0, 3.0])
+    assert np.isclose(value, 8.0) and np.allclose(gradient, [12.0, 8*np.log(2)])
+    X = np.random.default_rng(2).uniform(0.5, 2.0, (2, 20))
+    h = 1e-6
+    _, gradients = program(X)
+    for i in range(2):
+        step = np.zeros((2, 1))
+        step[i] = h
+        difference = (program(X + step)[0] - program(X - step)[0])/(2*h)
+        assert np.allclose(gradients[i], difference, rtol=1e-6)
+
+
+def test_graph_is_compact():
+    graph = parse('sin(x1)*sin(x1) + 2*3 - -x2')
+    assert graph.expression == 'sin(x1) * sin(x1) + 2 * 3 - -x2'
+    ops = [op for op, _, _ in graph.ops]
+    assert ops.count('sin') == 1
+    assert ops.count('const') == 1 and graph.ops[ops.index('const')][2] == (6.0,)
+    # inputs come first, also the unused ones
+    assert parse('x3').ops[:3] == [('input', (), (0,)), ('input', (), (1,)), ('input', (), (2,))]
+    assert parse('a*b', variables=['b', 'a']).variables == ('b', 'a')
+
+
+@pytest.mark.parametrize('expression', ['__import__("os")', 'x1.real', 'x1 if x2 else x3', 'y + x1', 'x0',
+                                        'sin(x1, x2)', 'log(x1, x2)', 'x1 % 2', 'x1 +', 'f(x1)', "'a'",
+                                        'x1 + 1/0', '10**400*x1', '(-8)**(1/3)*x1', '1e308*10 + x1'])
+def test_rejected(expression):
+    with pytest.raises(ValueError):
+        parse(expression)
+
+
+def test_cache():
+    program = compile_expression('x1*x2')
+    assert compile_expression('x1 * (x2)') is program
+    assert compile_expression('x1*x2') is program
+    assert compile_expression('x1*x2', variables=['x1', 'x2']) is not program
+    info = cache_info()
+    assert info['misses'] == 2 and info['hits'] == 2
+    program([1.0, 2.0])
+    assert program.program is not None
+    # later calls skip parsing and tracing: no Node is created
+    with profiling() as profile:
+        value, gradient = compile_expression('x1 * x2')([3.0, 4.0])
+    assert profile.nodes_created == 0
+    assert value == 12 and np.allclose(gradient, [4, 3])
+
+
+def test_wrong_inputs():
+    with pytest.raises(ValueError):
+        compile_expression('x1 + x2')([1.0, 2.0, 3.0])
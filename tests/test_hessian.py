@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+#File: test_hessian.py
+#Description: test second derivative rules, Hessian sparsity, star coloring and sparse Hessians
+
+import pytest
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+import LYCET_package.LYCET_Operations_Forward as fmo
+from LYCET_package.Primitives import _REGISTRY, _BUILTINS, custom_vjp
+from LYCET_package.Sparsity import hessian_sparsity
+from LYCET_package.Coloring import star_coloring, is_star_coloring
+from LYCET_package.Hessian import sparse_hessian, hessian_vector_product, reverse_hessian
+from LYCET_package.CSE import hash_consing
+from LYCET_package.Tape import trace
+
+def f_small(x1, x2, x3):
+    return (rmo.sin(x1*x2) + rmo.exp(x3)/x2 + rmo.logsumexp([x1, x3]) + x2**3 + 2.0**x3
+            + rmo.prod([x1, x2, x3]) + rmo.norm([x1, x3]) + rmo.mse([x1, x2], [x3, 1.0]) + rmo.tanh(x1) * rmo.sigmoid(x3))
+
+def ring(*x):
+    # locally coupled objective: x[i] interacts with x[i+1] and x[i+2]
+    n = len(x)
+    return rmo.sum([x[i]*x[(i + 1) % n]*x[(i + 2) % n] + rmo.cos(x[i]) for i in range(n)])
+
+def numerical_hessian(f, x, h=1e-5):
+    x = np.array(x, dtype=float)
+    grad = lambda y: np.array(rm.ReverseMode(f, list(y))[1], dtype=float)
+    return np.array([(grad(x + h*e) - grad(x - h*e))/(2*h) for e in np.eye(len(x))])
+
+def test_second_derivative_rules():
+    x = [0.3, 0.7, 1.1]
+    _, gradient, H = hessian_vector_product(f_small, x, np.eye(3))
+    assert np.allclose(gradient, rm.ReverseMode(f_small, x)[1])
+    assert np.allclose(H, H.T)
+    assert np.allclose(H, numerical_hessian(f_small, x), atol=1e-6)
+    _, _, Hv = hessian_vector_product(f_small, x, [1.0, -2.0, 0.5])
+    assert np.allclose(Hv, H @ [1.0, -2.0, 0.5])
+
+def test_every_builtin_has_a_second_derivative_rule():
+    assert all(_REGISTRY[name].hessian is not None for name in _BUILTINS if name not in ('input', 'const'))
+
+def test_hessian_sparsity():
+    pattern = hessian_sparsity(lambda x1, x2, x3, x4: x1*x2 + rmo.sin(x3) + x4 + 3*x1/x2, 4, cache=False)
+    assert np.array_equal(pattern.toarray(), [[0, 1, 0, 0], [1, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 0]])
+    pattern = hessian_sparsity(lambda x: fmo.mse([x[0], x[1]], [x[2], 1.0]) + fmo.dot([x[0]], [x[3]]), 4, mode='forward', cache=False)
+    assert np.array_equal(pattern.toarray(), [[1, 0, 1, 1], [0, 1, 0, 0], [1, 0, 1, 0], [1, 0, 0, 0]])
+    x = np.random.default_rng(0).uniform(0.5, 1.5, 12)
+    _, _, H = hessian_vector_product(ring, x, np.eye(12))
+    pattern = hessian_sparsity(ring, 12, cache=False).toarray()
+    assert np.all(pattern[np.abs(H) > 0])
+
+def test_star_coloring():
+    pattern = hessian_sparsity(ring, 100, cache=False)
+    colors = star_coloring(pattern)
+    assert is_star_coloring(pattern, colors)
+    assert colors.max() + 1 <= 10
+    # a proper coloring that is not a star coloring: the path 0-1-2-3 on two colors
+    path = hessian_sparsity(lambda *x: rmo.sum([x[i]*x[i + 1] for i in range(3)]), 4, cache=False)
+    assert not is_star_coloring(path, np.array([0, 1, 0, 1]))
+    assert is_star_coloring(path, star_coloring(path))
+
+def test_sparse_hessian():
+    x = np.random.default_rng(1).uniform(0.5, 1.5, 40)
+    value, gradient, H = sparse_hessian(ring, x, cache=False)
+    _, _, dense = hessian_vector_product(ring, x, np.eye(40))
+    assert np.isclose(value, rm.ReverseMode(ring, list(x))[0])
+    assert np.allclose(H.toarray(), dense, rtol=1e-12, atol=1e-12)
+    value, gradient, H = sparse_hessian(f_small, [0.3, 0.7, 1.1])
+    assert np.allclose(H.toarray(), numerical_hessian(f_small, [0.3, 0.7, 1.1]), atol=1e-6)
+    # cached pattern and coloring give the same result at another point
+    _, _, H2 = sparse_hessian(f_small, [0.4, 0.2, 0.9])
+    assert np.allclose(H2.toarray(), numerical_hessian(f_small, [0.4, 0.2, 0.9]), atol=1e-6)
+
+def test_user_primitive_without_second_derivatives():
+    cube = custom_vjp(lambda x: x**3, lambda a, out: (3*a[0]**2,), name='test_cube_hessian')
+    tape = trace(lambda x1: cube(x1), [2.0])
+    with pytest.raises(ValueError):
+        tape.hessian_vector_product([2.0], [1.0])
+
+def test_edge_pushing():
+    x = [0.3, 0.7, 1.1]
+    value, gradient, H = reverse_hessian(f_small, x)
+    _, expected_gradient, dense = hessian_vector_product(f_small, x, np.eye(3))
+    assert np.isclose(value, rm.ReverseMode(f_small, x)[0])
+    assert np.allclose(gradient, expected_gradient)
+    assert np.allclose(H.toarray(), dense, rtol=1e-12, atol=1e-12)
+    # repeated operands and shared subexpressions
+    g = lambda x1, x2: x1*x1/x1 + rmo.exp(x1*x2)*rmo.exp(x1*x2) + x2**2
+    with hash_consing():
+        _, _, H = reverse_hessian(g, [0.5, -0.4])
+    assert np.allclose(H.toarray(), hessian_vector_product(g, [0.5, -0.4], np.eye(2))[2])
+
+def test_edge_pushing_is_sparse():
+    x = list(np.random.default_rng(2).uniform(0.5, 1.5, 300))
+    _, _, H = reverse_hessian(ring, x)
+    _, _, H_colored = sparse_hessian(ring, x, cache=False)
+    assert H.nnz == 5*300
+    assert np.allclose(H.toarray(), H_colored.toarray(), rtol=1e-12, atol=1e-12)
+
+def test_edge_pushing_special_cases():
+    value, gradient, H = reverse_hessian(lambda x1, x2: 3.0, [1.0, 2.0])
+    assert value == 3.0 and gradient == [0, 0] and H.nnz == 0
+    _, gradient, H = reverse_hessian(lambda x1, x2: 2*x1 - x2, [1.0, 2.0])
+    assert gradient == [2, -1] and H.nnz == 0
+    cube = custom_vjp(lambda x: x**3, lambda a, out: (3*a[0]**2,), name='test_cube_edge_pushing')
+    with pytest.raises(ValueError):
+        reverse_hessian(lambda x1: cube(x1), [2.0])
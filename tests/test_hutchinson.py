@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+#File: test_hutchinson.py
+#Description: test the stochastic Hessian trace and diagonal estimators
+
+import pytest
+import numpy as np
+import LYCET_package.LYCET_Operations_Reverse as rmo
+import LYCET_package.LYCET_Operations_Forward as fmo
+from LYCET_package.Hessian import reverse_hessian
+from LYCET_package.Hutchinson import StochasticEstimate, hessian_trace, hessian_diagonal
+
+rng = np.random.default_rng(3)
+U = rng.standard_normal((3, 40))
+x0 = 0.1*rng.standard_normal(40)
+
+def f_low_rank(*x):
+    # Hessian of rank 3 plus a small multiple of the identity
+    return (rmo.sum([rmo.softplus(rmo.dot(list(U[i]), list(x)))*(i + 1) for i in range(3)])
+            + 0.01*rmo.sum([xi*xi for xi in x]))
+
+def f_forward(x):
+    return fmo.sum([fmo.sin(x[0])*x[1], fmo.logsumexp([x[1], x[2]]), x[2]**3])
+
+def f_reverse(x1, x2, x3):
+    return rmo.sum([rmo.sin(x1)*x2, rmo.logsumexp([x2, x3]), x3**3])
+
+def test_diagonal_hessian_is_exact():
+    # Rademacher probes have z_i**2 = 1, so a diagonal Hessian needs one probe
+    f = lambda *x: rmo.sum([xi**4 for xi in x])
+    trace = hessian_trace(f, np.ones(50), n_probes=3, seed=0)
+    assert isinstance(trace, StochasticEstimate)
+    assert trace.estimate == pytest.approx(600.0)
+    assert trace.variance == pytest.approx(0.0)
+    assert trace.value == pytest.approx(50.0) and np.allclose(trace.gradient, 4.0)
+    assert np.allclose(hessian_diagonal(f, np.ones(5), n_probes=3, seed=0).estimate, 12.0)
+
+def test_hutch_plus_plus_reduces_variance():
+    H = reverse_hessian(f_low_rank, x0)[2].toarray()
+    plain = hessian_trace(f_low_rank, x0, n_probes=30, seed=1)
+    better = hessian_trace(f_low_rank, x0, n_probes=30, method='hutch++', seed=1)
+    assert (plain.n_probes, plain.n_hvp) == (30, 30)
+    assert (better.n_probes, better.n_hvp) == (10, 30)
+    assert better.standard_error() < plain.standard_error()/10
+    assert better.estimate == pytest.approx(np.trace(H), abs=5*better.standard_error() + 1e-8)
+    diagonal = hessian_diagonal(f_low_rank, x0, n_probes=30, method='hutch++', seed=1)
+    assert diagonal.estimate.shape == (40,) and diagonal.variance.shape == (40,)
+    assert np.all(np.abs(diagonal.estimate - np.diag(H)) <= 5*diagonal.standard_error() + 1e-8)
+
+def test_estimators_are_unbiased():
+    H = reverse_hessian(f_low_rank, x0)[2].toarray()
+    traces = [hessian_trace(f_low_rank, x0, n_probes=20, seed=seed).estimate for seed in range(30)]
+    assert np.mean(traces) == pytest.approx(np.trace(H), rel=0.1)
+    diagonal = hessian_diagonal(f_low_rank, x0, n_probes=2000, seed=0)
+    assert np.allclose(diagonal.estimate, np.diag(H), atol=5*np.sqrt(diagonal.variance.max()))
+
+def test_forward_and_reverse_engines_agree():
+    x = [1.0, 2.0, 3.0]
+    H = reverse_hessian(f_reverse, x)[2].toarray()
+    forward = hessian_diagonal(f_forward, x, n_probes=9, method='hutch++', mode='forward', seed=0)
+    reverse = hessian_diagonal(f_reverse, x, n_probes=9, method='hutch++', seed=0)
+    # with n = 3 the sketch spans the whole space
+    assert np.allclose(forward.estimate, np.diag(H))
+    assert np.allclose(reverse.estimate, forward.estimate)
+    assert hessian_trace(f_forward, x, n_probes=9, method='hutch++', mode='forward', seed=0).estimate == pytest.approx(np.trace(H))
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        hessian_trace(f_reverse, [1.0, 2.0, 3.0], method='exact')
+    with pytest.raises(ValueError):
+        hessian_diagonal(f_reverse, [1.0, 2.0, 3.0], mode='sideways')
+    with pytest.raises(AssertionError):
+        hessian_trace(f_reverse, [1.0, 2.0, 3.0], n_probes=0)
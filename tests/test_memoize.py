@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+#File: test_memoize.py
+#Description: test the memoizing LRU cache over ForwardMode and ReverseMode
+
+import pytest
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.ForwardMode as fm
+import LYCET_package.LYCET_Operations_Forward as fmo
+from LYCET_package.Memoize import EvaluationCache, memoize, point_digest
+
+
+class Counted:
+    """
+    Rosenbrock function counting its calls.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, x1, x2):
+        self.calls += 1
+        return (1 - x1)**2 + 100*(x2 - x1**2)**2
+
+
+def test_point_digest():
+    assert point_digest([1, 2]) == point_digest(np.array([1.0, 2.0]))
+    assert point_digest([1.0, 2.0]) != point_digest([1.0, 2.0 + 1e-15])
+    assert point_digest([1.0, 2.0]) != point_digest([[1.0, 2.0]])
+
+
+def test_reverse_hits():
+    f, cache = Counted(), EvaluationCache()
+    first = cache.reverse(f, [0.5, 1.5])
+    assert cache.reverse(f, np.array([0.5, 1.5])) == first
+    assert f.calls == 1
+    assert first == rm.ReverseMode(f, [0.5, 1.5])
+    # another point, another function or other options are misses
+    cache.reverse(f, [0.5, 1.6])
+    cache.reverse(Counted(), [0.5, 1.5])
+    cache.reverse(f, [0.5, 1.5], precision='float32')
+    stats = cache.stats
+    assert (stats.hits, stats.misses) == (1, 4)
+    assert stats.hit_rate() == 0.2
+
+
+def test_value_from_gradient_and_gradient_after_value():
+    f, cache = Counted(), EvaluationCache()
+    value, J = cache.reverse(f, [1.0, 2.0])
+    assert cache.value(f, [1.0, 2.0]) == value
+    # a value asked first also records the gradient
+    assert cache.value(f, [3.0, 4.0]) == rm.ReverseMode(f, [3.0, 4.0])[0]
+    calls = f.calls
+    cache.reverse(f, [3.0, 4.0])
+    assert f.calls == calls
+    assert cache.stats.hits == 2
+
+
+def test_forward():
+    cache = EvaluationCache()
+    f = lambda x: fmo.sin(x[0])*x[1]
+    gradient = cache.forward(f, [1.0, 2.0], gradient=True)
+    assert np.allclose(gradient, fm.ForwardMode(f, [1.0, 2.0], gradient=True))
+    assert np.allclose(cache.forward(f, [1.0, 2.0], gradient=True), gradient)
+    assert np.isclose(cache.value(f, [1.0, 2.0], mode='forward'), np.sin(1.0)*2)
+    assert np.isclose(cache.value(f, [1.0, 2.0], mode='forward'), np.sin(1.0)*2)
+    assert (cache.stats.hits, cache.stats.misses) == (2, 2)
+    with pytest.raises(ValueError):
+        cache.value(f, [1.0, 2.0], mode='sideways')
+
+
+def test_lru_eviction():
+    f, cache = Counted(), EvaluationCache(max_size=2)
+    cache.reverse(f, [0.0, 0.0])
+    cache.reverse(f, [1.0, 0.0])
+    cache.reverse(f, [0.0, 0.0])  # most recently used again
+    cache.reverse(f, [2.0, 0.0])  # evicts [1, 0]
+    assert len(cache) == 2 and cache.stats.evictions == 1
+    calls = f.calls
+    cache.reverse(f, [0.0, 0.0])
+    assert f.calls == calls
+    cache.reverse(f, [1.0, 0.0])
+    assert f.calls == calls + 1
+    cache.clear()
+    assert len(cache) == 0 and cache.stats.lookups() == 0
+
+
+def test_results_are_copies():
+    cache = EvaluationCache()
+    f = lambda x1, x2: x1*x2
+    _, J = cache.reverse(f, [2.0, 3.0])
+    J[0] = 100.0
+    assert cache.reverse(f, [2.0, 3.0])[1] == [3.0, 2.0]
+
+
+def test_memoized_function_line_search():
+    f = Counted()
+    g = memoize(f, max_size=8)
+    x, direction = np.array([-1.2, 1.0]), np.array([1.0, 0.5])
+    # a backtracking line search asks for the value, then the gradient, at the accepted point
+    value, gradient = g(x)
+    step = 1.0
+    while g.value(x + step*direction) > value + 1e-4*step*gradient @ direction:
+        step /= 2
+    new_gradient = g.gradient(x + step*direction)
+    assert np.allclose(new_gradient, rm.ReverseMode(f, list(x + step*direction))[1])
+    # one ReverseMode run per point visited
+    assert g.stats.misses == f.calls - 1
+    assert g.stats.hits == 2
+    forward = memoize(lambda x: fmo.exp(x[0])*x[1], mode='forward')
+    value, gradient = forward([0.0, 2.0])
+    assert value == 2.0 and np.allclose(gradient, [2.0, 1.0])
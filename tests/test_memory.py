@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+#File: test_memory.py
+#Description: test the memory accounting of graphs and tapes, the estimator and the memory ceiling
+
+import pytest
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+from LYCET_package.Node import Node
+from LYCET_package.Tape import trace
+from LYCET_package.Memory import (MemoryReport, MemoryLimitError, memory_report, graph_memory, tape_memory,
+                                  estimate_memory, memory_limit)
+
+def f_small(x1, x2):
+    return rmo.sin(x1)*x2
+
+def chain(*x):
+    s = 0
+    for xi in x:
+        s = s + rmo.sin(xi)*xi
+    return s
+
+def pairs(*x):
+    return rmo.sum([xi*xj for xi in x for xj in x])
+
+def test_memory_report():
+    report = memory_report(f_small, [1.0, 2.0])
+    assert isinstance(report, MemoryReport)
+    assert (report.nodes, report.edges) == (4, 3)
+    assert {op: count for op, (count, _) in report.by_op.items()} == {'input': 2, 'sin': 1, 'mul': 1}
+    assert sum(size for _, size in report.by_op.values()) == report.node_bytes + report.edge_bytes
+    assert report.adjoint_bytes > 0 and report.peak_traced > 0
+    assert report.total_bytes() == report.node_bytes + report.edge_bytes + report.adjoint_bytes
+    assert 'sin' in report.summary()
+    assert memory_report(f_small, [1.0, 2.0], trace_allocations=False).peak_traced is None
+
+def test_report_grows_with_the_graph():
+    small = memory_report(chain, np.ones(10), trace_allocations=False)
+    large = memory_report(chain, np.ones(100), trace_allocations=False)
+    assert large.nodes == 10*small.nodes - 9*1
+    assert 9 < large.total_bytes()/small.total_bytes() < 11
+    x = [Node(1.0), Node(2.0)]
+    assert graph_memory(f_small(*x)).adjoint_bytes == 0
+
+def test_tape_memory():
+    tape = trace(chain, np.ones(20))
+    report = tape_memory(tape)
+    assert report.nodes == len(tape) and report.peak_traced is None
+    batched = tape_memory(tape, np.ones((20, 1000)))
+    assert batched.peak_traced > 0
+    assert batched.adjoint_bytes > 100*report.adjoint_bytes
+
+def test_estimate_memory():
+    linear = estimate_memory(chain, 1000)
+    assert linear.exponent == pytest.approx(1.0, abs=0.1)
+    actual = memory_report(chain, np.linspace(0.1, 1.0, 1000), trace_allocations=False).total_bytes()
+    assert linear.bytes == pytest.approx(actual, rel=0.1)
+    quadratic = estimate_memory(pairs, 200, probe_sizes=(4, 8, 16))
+    assert quadratic.exponent == pytest.approx(2.0, abs=0.2)
+    assert sorted(quadratic.probes) == [4, 8, 16]
+
+def test_memory_limit():
+    init = Node.__init__
+    size = memory_report(chain, np.ones(100), trace_allocations=False)
+    with pytest.raises(MemoryLimitError):
+        rm.ReverseMode(chain, np.ones(100), max_memory=size.node_bytes//2)
+    assert Node.__init__ is init
+    value, J = rm.ReverseMode(chain, np.ones(100), max_memory=10*size.total_bytes())
+    assert value == pytest.approx(100*np.sin(1.0))
+    with memory_limit(10**9):
+        with pytest.raises(MemoryError):
+            with memory_limit(1000):
+                chain(*[Node(1.0) for _ in range(100)])
+        chain(*[Node(1.0) for _ in range(100)])
+    assert Node.__init__ is init
+
+def test_memory_limit_counts_live_nodes():
+    # the graph of one call fits, the graphs of all the calls together would not
+    size = memory_report(chain, np.ones(10), trace_allocations=False)
+    with memory_limit(5*size.total_bytes()):
+        for _ in range(200):
+            value, J = rm.ReverseMode(chain, np.ones(10))
+    assert value == pytest.approx(10*np.sin(1.0))
+    kept = []
+    with pytest.raises(MemoryLimitError):
+        with memory_limit(5*size.total_bytes()):
+            for _ in range(200):
+                kept.append(chain(*[Node(1.0) for _ in range(10)]))
+    assert len(kept) < 200
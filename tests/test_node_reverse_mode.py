@@ -413,7 +413,8 @@ def test_elementary_operations():
     np_output_deriv = []
     for func in np_functions_deriv:
         np_output_deriv.append(func(x1))
-    assert np_output_deriv == rm_output_deriv
+    # derivative rules reuse the primal, so they may differ from the textbook formulas in the last bits
+    assert np.allclose(np_output_deriv, rm_output_deriv, rtol=1e-14, atol=0)
 
 def test_reverse_mode_1():
     # test the reverse mode method for function nd.cos(x1 + x2) + (x3 * x2 ** 3), return function evaluated at x and derivative
@@ -496,9 +497,35 @@ def test_reverse_mode_8():
     assert eval_deriv[2] == 1/2.9087
     assert eval_deriv[3] == -1*0.8177/(2.9087**2)
     assert eval_deriv[4] == (5.3690**(np.cosh(6.4394)-1))*np.cosh(6.4394)
-    assert eval_deriv[5] == 0
+    # the exponent is a variable too: d(x5**y)/dy = x5**y log(x5)
+    assert np.isclose(eval_deriv[5], 5.3690**np.cosh(6.4394)*np.log(5.3690)*np.sinh(6.4394), rtol=1e-12, atol=0)
     assert eval_deriv[6] == 1
 
+def test_reverse_mode_constants():
+    # constants added to, subtracted from or raised to a node
+    eval_func, eval_deriv = rm.ReverseMode(lambda x1: x1 + 3, 2)
+    assert eval_func == 5 and eval_deriv[0] == 1
+    eval_func, eval_deriv = rm.ReverseMode(lambda x1: 3 - x1, 2)
+    assert eval_func == 1 and eval_deriv[0] == -1
+    eval_func, eval_deriv = rm.ReverseMode(lambda x1: 3**x1, 2)
+    assert eval_func == 9 and np.abs(eval_deriv[0] - 9*np.log(3)) < np.finfo(float).eps*10
+
+def test_reverse_mode_shared_nodes():
+    # a node reached through many paths is swept once and the graph can be deep
+    def f(x1):
+        y = x1
+        for _ in range(3000):
+            y = y*0.5 + y*0.5
+        return y
+    eval_func, eval_deriv = rm.ReverseMode(f, 2.0)
+    assert eval_func == 2.0 and eval_deriv[0] == 1.0
+
+def test_node_op():
+    x = Node(2)
+    assert x.op is None
+    assert (x*x).op == 'mul'
+    assert rmo.log(x, 3).op == 'log' and rmo.log(x, 3).params == (3,)
+
 if __name__ == '__main__':
     test_init_fail()
     test_add_2()
@@ -552,4 +579,4 @@ if __name__ == '__main__':
     test_sinh()
     test_ccsh()
     test_tanh()
-    test_sigmoid()
\ No newline at end of file
+    test_sigmoid()
\ No newline at end of file
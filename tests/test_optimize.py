@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+#File: test_optimize.py
+#Description: test algebraic simplification and dead-code elimination over traced tapes
+
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+from LYCET_package.Tape import trace
+from LYCET_package.Optimize import optimize
+from LYCET_package.Compiler import compile_tape, compile_function
+
+def ops(tape):
+    return [ins.op for ins in tape.instructions]
+
+def test_constant_folding():
+    tape, report = optimize(trace(lambda x1: x1 + rmo.sin(2*3) * rmo.exp(1), 1.0))
+    assert ops(tape) == ['input', 'const', 'add']
+    assert report['folded'] == 3
+    assert tape.instructions[1].params[0] == np.sin(6)*np.exp(1)
+
+def test_identity_elimination():
+    tape, report = optimize(trace(lambda x1: ((x1*1 + 0) - 0)/1, 2.0))
+    assert ops(tape) == ['input']
+    assert tape.outputs == [0]
+    assert report['identities'] == 4
+    assert report['removed'] == len(trace(lambda x1: ((x1*1 + 0) - 0)/1, 2.0)) - 1
+
+def test_multiplication_by_zero():
+    f = lambda x1, x2: x1*0 + x2 + x1**0
+    tape, _ = optimize(trace(f, [1.0, 2.0]), fast_math=True)
+    assert ops(tape) == ['input', 'input', 'const', 'add']
+    # without fast_math the tape keeps the nan of inf*0
+    tape, report = optimize(trace(f, [1.0, 2.0]))
+    assert report['identities'] == 0
+    with np.errstate(invalid='ignore'):
+        assert np.isnan(tape.replay([np.inf, 2.0])[0])
+
+def test_signed_zero_constants():
+    tape, _ = optimize(trace(lambda x1: x1*0.0 + x1*-0.0, 1.0))
+    assert sorted(repr(ins.params[0]) for ins in tape.instructions if ins.op == 'const') == ['-0.0', '0.0']
+
+def test_strength_reduction():
+    tape, report = optimize(trace(lambda x1: x1**2, 3.0))
+    assert ops(tape) == ['input', 'mul']
+    assert report['strength_reduced'] == 1
+    tape, report = optimize(trace(lambda x1: x1**5, 3.0))
+    assert ops(tape).count('mul') == 3 and 'pow' not in ops(tape)
+    # two multiplications more than the power they replace; the exponent is removed
+    assert report['added'] == 2 and report['removed'] == 1
+    tape, _ = optimize(trace(lambda x1: x1**-1, 3.0))
+    assert 'div' in ops(tape) and 'pow' not in ops(tape)
+    # non integer powers are left alone
+    tape, _ = optimize(trace(lambda x1: x1**2.5, 3.0))
+    assert 'pow' in ops(tape)
+
+def test_dead_node_removal():
+    # the exponent of a power node does not receive a gradient, but its value is
+    # still needed; a constant one is folded and its subgraph removed
+    tape, report = optimize(trace(lambda x1: x1**(rmo.cos(0) + 1), 3.0))
+    assert ops(tape) == ['input', 'mul']
+    assert report['dead'] > 0
+    assert report['removed'] == report['before'] + report['added'] - report['after']
+
+def test_inputs_kept():
+    tape, _ = optimize(trace(lambda x1, x2, x3: x2*2, [1.0, 2.0, 3.0]))
+    assert ops(tape).count('input') == 3
+    value, grad = tape.replay([1.0, 2.0, 3.0])
+    assert value == 4 and np.array_equal(grad, [0, 2, 0])
+
+def test_optimized_matches_reverse_mode():
+    f = lambda x1, x2, x3: rmo.cos(x1 + x2) * 1 + (x3 * x2 ** 3) + 0 + x1**2 * rmo.exp(0)
+    x = [1.0, 2.0, 3.0]
+    value, grad = rm.ReverseMode(f, x)
+    tape, report = optimize(trace(f, x))
+    assert report['removed'] > 0
+    for result in (tape.replay(x), compile_tape(tape)(x)):
+        assert np.isclose(result[0], value)
+        assert np.allclose(result[1], grad)
+
+def test_optimized_values():
+    tape = trace(lambda x1: (x1*1)**3 + 2, 1.5)
+    optimized, _ = optimize(tape)
+    assert np.isclose(optimized.values[optimized.outputs[0]], tape.values[tape.outputs[0]])
+
+def test_compile_function_optimizes():
+    g = compile_function(lambda x1: x1**2 + 0, 3.0)
+    assert '**' not in g.source
+    g = compile_function(lambda x1: x1**2 + 0, 3.0, optimize=False)
+    assert '**' in g.source
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+#File: test_package.py
+#Description: test the lazy top-level API of LYCET_package and its import time
+
+import os
+import sys
+import subprocess
+import pytest
+import numpy as np
+import LYCET_package as lycet
+
+# cold import budget in seconds; the package itself imports neither numpy nor its submodules
+IMPORT_BUDGET = 0.1
+
+def _run(code):
+    src = os.path.dirname(os.path.dirname(os.path.abspath(lycet.__file__)))
+    env = dict(os.environ, PYTHONPATH=src)
+    return subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True).stdout
+
+def test_import_is_lazy_and_fast():
+    out = _run("import sys, time\n"
+               "start = time.perf_counter()\n"
+               "import LYCET_package\n"
+               "print(time.perf_counter() - start)\n"
+               "print(sorted(m for m in sys.modules if m.startswith('LYCET_package.') or m == 'numpy'))")
+    seconds, modules = out.split('\n')[:2]
+    assert modules == '[]'
+    assert float(seconds) < IMPORT_BUDGET
+
+def test_lazy_attributes():
+    assert _run("import sys, LYCET_package as lycet\n"
+                "lycet.sketch_jacobian\n"
+                "print('LYCET_package.Sketch' in sys.modules, 'LYCET_package.Profiler' in sys.modules)") == 'True False\n'
+    from LYCET_package.ReverseMode import ReverseMode
+    assert lycet.reverse is ReverseMode
+    assert lycet.reverse_ops.sin is __import__('LYCET_package.LYCET_Operations_Reverse', fromlist=['sin']).sin
+    assert lycet.Node.Node(1.0).value == 1.0
+    assert set(lycet.__all__) <= set(dir(lycet))
+    with pytest.raises(AttributeError):
+        lycet.not_a_function
+
+def test_grad_jacobian_hessian():
+    rmo, fmo = lycet.reverse_ops, lycet.forward_ops
+    assert np.allclose(lycet.grad(lambda x1, x2: x1*rmo.sin(x2), [2.0, 0.0]), [0.0, 2.0])
+    assert np.allclose(lycet.grad(lambda x: x[0]*fmo.sin(x[1]), [2.0, 0.0], mode='forward'), [0.0, 2.0])
+    expected = [[3.0, 2.0], [0.0, 1.0]]
+    assert np.allclose(lycet.jacobian(lambda x: [x[0]*x[1], x[1]], [2.0, 3.0]), expected)
+    assert np.allclose(lycet.jacobian(lambda x1, x2: [x1*x2, x2], [2.0, 3.0], mode='reverse'), expected)
+    assert lycet.jacobian(lambda x: x[0]*x[1], [2.0, 3.0]).shape == (1, 2)
+    assert np.allclose(lycet.hessian(lambda x1, x2: x1*x1*x2, [1.0, 2.0]), [[4.0, 2.0], [2.0, 0.0]])
+    with pytest.raises(ValueError):
+        lycet.grad(lambda x1: x1, [1.0], mode='sideways')
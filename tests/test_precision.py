@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+#File: test_precision.py
+#Description: test the float32 and mixed precision policies of forward mode, reverse mode and tapes
+
+import pytest
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.ForwardMode as fm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+import LYCET_package.LYCET_Operations_Forward as fmo
+from LYCET_package.Context import current_context
+from LYCET_package.Precision import precision, get_policy, current_policy
+from LYCET_package.Node import Node
+from LYCET_package.DualNumber import DualNumber
+from LYCET_package.Tape import trace
+
+def f_reverse(x1, x2, x3):
+    return rmo.cos(x1 + x2) + (x3 * x2 ** 3) + rmo.sigmoid(x1)*rmo.log(x3, 2) + rmo.logsumexp([x1, x2])
+
+def f_forward(x):
+    x1, x2, x3 = x
+    return fmo.cos(x1 + x2) + (x3 * x2 ** 3) + fmo.sigmoid(x1)*fmo.log(x3, 2) + fmo.logsumexp([x1, x2])
+
+x = [0.5, 1.5, 2.0]
+
+def fan_in(x1):
+    s = 0
+    for _ in range(10000):
+        s = s + x1*0.1
+    return s
+
+def test_policies():
+    assert get_policy('float32').storage is np.float32
+    assert get_policy('mixed').storage is np.float32 and get_policy('mixed').accumulation is np.float64
+    assert get_policy(get_policy('float64')) is get_policy('float64')
+    with pytest.raises(ValueError):
+        get_policy('float16')
+
+def test_context_nesting():
+    assert current_policy().name == 'float64' and current_context().policy is None
+    with precision('float32'):
+        assert current_policy().name == 'float32'
+        with precision('float64'):
+            assert current_context().policy is None
+            assert type(Node(1.0).value) is float
+        with precision('mixed') as policy:
+            assert current_policy() is policy
+        assert current_policy().name == 'float32'
+    assert current_context().policy is None
+
+def test_storage_types():
+    with precision('float32'):
+        node = Node(2) * 3.0
+        dual = fmo.exp(DualNumber(1.0))
+    assert type(node.value) is np.float32
+    assert all(type(partial) is np.float32 for _, partial in node.deriv)
+    assert type(dual.real) is np.float32 and type(dual.dual) is np.float32
+
+def test_reverse_mode_precision():
+    value64, J64 = rm.ReverseMode(f_reverse, x)
+    value32, J32 = rm.ReverseMode(f_reverse, x, precision='float32')
+    assert type(value32) is np.float32 and all(type(j) is np.float32 for j in J32)
+    assert np.isclose(value32, value64, rtol=1e-6) and np.allclose(J32, J64, rtol=1e-5)
+    value_mixed, J_mixed = rm.ReverseMode(f_reverse, x, precision='mixed')
+    assert type(value_mixed) is np.float32 and all(type(j) is np.float64 for j in J_mixed)
+    assert np.allclose(J_mixed, J64, rtol=1e-5)
+    # the per-call policy does not leak out of the call
+    assert current_context().policy is None
+
+def test_forward_mode_precision():
+    grad64 = fm.ForwardMode(f_forward, x, gradient=True)
+    grad32 = fm.ForwardMode(f_forward, x, gradient=True, precision='float32')
+    assert grad32.dtype == np.float32 and np.allclose(grad32, grad64, rtol=1e-5)
+    J = fm.ForwardMode(lambda y: [y[0]*y[1], fmo.exp(y[0])], [1.0, 2.0], jacobian=True, precision='float32')
+    assert J.dtype == np.float32 and np.allclose(J, [[2, 1], [np.e, 0]])
+
+def test_mixed_accumulation():
+    _, J64 = rm.ReverseMode(fan_in, 1.0)
+    _, J32 = rm.ReverseMode(fan_in, 1.0, precision='float32')
+    _, J_mixed = rm.ReverseMode(fan_in, 1.0, precision='mixed')
+    # the only error left with float64 adjoints is the float32 rounding of 0.1
+    assert abs(J_mixed[0] - J64[0]) < 1e-4
+    assert abs(J_mixed[0] - J64[0]) < abs(J32[0] - J64[0])/100
+
+def test_tape_replay_precision():
+    tape = trace(f_reverse, x)
+    batch = np.random.default_rng(0).uniform(0.5, 2.0, (3, 100))
+    values64, grads64 = tape.replay(batch)
+    with precision('float32'):
+        values32, grads32 = tape.replay(batch)
+    assert values32.dtype == np.float32 and grads32.dtype == np.float32
+    assert np.allclose(values32, values64, rtol=1e-5) and np.allclose(grads32, grads64, rtol=1e-4)
+    with precision('mixed'):
+        values_mixed, grads_mixed = tape.replay(batch)
+    assert values_mixed.dtype == np.float32 and grads_mixed.dtype == np.float64
+    assert np.allclose(grads_mixed, grads64, rtol=1e-4)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+#File: test_primitives.py
+#Description: test the shared primitive registry and user defined custom_jvp/custom_vjp primitives
+
+import pytest
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.ForwardMode as fm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+import LYCET_package.LYCET_Operations_Forward as fmo
+from LYCET_package.Node import Node
+from LYCET_package.DualNumber import DualNumber
+from LYCET_package.Primitives import Primitive, primitive, apply, register, custom_jvp, custom_vjp
+from LYCET_package.Tape import trace
+from LYCET_package.Compiler import compile_function
+from LYCET_package.Export import export_source
+from LYCET_package.CSE import hash_consing
+
+def integral(x):
+    # int_0^x exp(-t^2) dt by the trapezoidal rule: many operations if traced
+    t = np.linspace(0.0, x, 2001)
+    return np.trapezoid(np.exp(-t**2), t)
+
+integral_vjp = custom_vjp(integral, lambda a, out: (np.exp(-a[0]**2),), name='test_integral')
+
+def scaled_hypot(x, y, s):
+    return s*np.hypot(x, y)
+
+scaled_hypot_jvp = custom_jvp(scaled_hypot, lambda a, t: (a[2]*(a[0]*t[0] + a[1]*t[1])/np.hypot(a[0], a[1])
+                                                          + np.hypot(a[0], a[1])*t[2]))
+
+def test_builtin_registry():
+    for name in ['sin', 'cos', 'tan', 'exp', 'ln', 'log', 'arcsin', 'arccos', 'arctan', 'sinh', 'cosh', 'tanh', 'sigmoid',
+                 'add', 'sub', 'mul', 'div', 'pow', 'rpow']:
+        assert primitive(name).name == name
+        assert primitive(name).template is not None
+    with pytest.raises(ValueError):
+        primitive('not_an_op')
+    with pytest.raises(ValueError):
+        register(Primitive('sin', lambda a, p: a[0], vjp=lambda a, p, out: (1.0,)))
+
+def test_both_modes_dispatch_through_registry():
+    x = 0.3
+    for name in ['sin', 'cos', 'tan', 'exp', 'ln', 'arcsin', 'arccos', 'arctan', 'sinh', 'cosh', 'tanh', 'sigmoid']:
+        node, dual = getattr(rmo, name)(Node(x)), getattr(fmo, name)(DualNumber(x))
+        assert node.op == name
+        assert np.isclose(node.value, dual.real) and np.isclose(node.deriv[0][1], dual.dual)
+        assert apply(name, x) == dual.real
+    assert np.isclose(rmo.log(Node(x), 3).deriv[0][1], fmo.log(DualNumber(x), 3).dual)
+
+def test_domain_checks_shared():
+    with pytest.raises(ValueError):
+        rmo.log(5, -3)
+    with pytest.raises(ValueError):
+        fmo.log(DualNumber(-1), 3)
+    with pytest.raises(ValueError):
+        apply('arcsin', 2.0)
+
+def test_custom_vjp_single_node():
+    x = Node(0.7)
+    out = integral_vjp(x)
+    assert out.op == 'test_integral' and len(out.deriv) == 1
+    value, grad = rm.ReverseMode(lambda x1: integral_vjp(x1)*x1, [0.7])
+    assert np.isclose(value, integral(0.7)*0.7)
+    assert np.isclose(grad[0], integral(0.7) + 0.7*np.exp(-0.49))
+    # forward mode derives the JVP from the registered partials
+    assert np.isclose(fm.ForwardMode(lambda x1: integral_vjp(x1)*x1, 0.7)[1], grad[0])
+    assert integral_vjp(0.7) == integral(0.7)
+
+def test_custom_jvp_both_modes():
+    f = lambda x1, x2: scaled_hypot_jvp(x1, x2, 2.0) + x1
+    value, grad = rm.ReverseMode(f, [3.0, 4.0])
+    assert np.isclose(value, 13.0) and np.allclose(grad, [1.0 + 1.2, 1.6])
+    assert np.isclose(fm.ForwardMode(lambda x1: scaled_hypot_jvp(x1, 4.0, 2.0), 3.0)[1], 1.2)
+    assert scaled_hypot_jvp.n_args == 3
+
+def test_custom_primitive_on_tape():
+    f = lambda x1, x2: integral_vjp(x1*x2) + rmo.sin(x2)
+    tape = trace(f, [0.5, 1.5])
+    assert [ins.op for ins in tape.instructions].count('test_integral') == 1
+    expected = rm.ReverseMode(f, [0.4, 1.1])
+    value, grad = tape.replay([0.4, 1.1])
+    assert np.isclose(value, expected[0]) and np.allclose(grad, expected[1])
+    g = compile_function(f, [0.5, 1.5])
+    value, grad = g([0.4, 1.1])
+    assert np.isclose(value, expected[0]) and np.allclose(grad, expected[1])
+    with pytest.raises(ValueError):
+        export_source(f, [0.5, 1.5])
+
+def test_custom_primitive_hash_consing():
+    x = Node(0.2)
+    with hash_consing() as stats:
+        a = integral_vjp(x)
+        b = integral_vjp(x)
+    assert a is b and stats.hits == 1
+
+def test_fused_rules_match_separate_rules():
+    # the fused rules reuse the primal; they must agree with the primal and VJP rules used on tapes
+    for name in ['sin', 'cos', 'tan', 'exp', 'ln', 'log', 'arcsin', 'arccos', 'arctan', 'sinh', 'cosh', 'tanh', 'sigmoid']:
+        p = primitive(name)
+        params = (3,) if name == 'log' else ()
+        for x in [-0.9, -0.2, 0.05, 0.7, 0.95]:
+            if name in ('ln', 'log') and x <= 0:
+                continue
+            out, partials = p.linearize([x], params)
+            assert out == p.primal([x], params)
+            assert np.allclose(partials, p.vjp([x], params, out), rtol=1e-14, atol=0)
+            assert np.isclose(p(DualNumber(x, 2.5), *params).dual, 2.5*partials[0], rtol=1e-15, atol=0)
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_fused_rules_large_arguments():
+    # the derivatives stay finite where sqrt(1 + sinh^2) overflows and exp(-x) sigmoid^2 is inf*0
+    cases = [('sinh', 400.0, np.cosh(400.0)), ('sinh', -400.0, np.cosh(400.0)),
+             ('sigmoid', -750.0, 0.0), ('sigmoid', 750.0, 0.0), ('sigmoid', 40.0, np.exp(-40.0))]
+    for name, x, expected in cases:
+        p = primitive(name)
+        out, partials = p.linearize([x], ())
+        assert np.isclose(partials[0], expected, rtol=1e-14, atol=0)
+        assert np.isclose(p(DualNumber(x, 1.0)).dual, expected, rtol=1e-14, atol=0)
+        assert np.isclose(rm.ReverseMode(getattr(rmo, name), [x])[1][0], expected, rtol=1e-14, atol=0)
+        # the tape rule out*(1 - out) is only accurate to ~eps in absolute terms
+        assert np.isclose(compile_function(getattr(rmo, name), 1)([x])[1][0], expected, rtol=1e-14, atol=1e-15)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+#File: test_profiler.py
+#Description: test the opt-in profiler of forward and reverse mode runs
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.ForwardMode as fm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+import LYCET_package.LYCET_Operations_Forward as fmo
+from LYCET_package.Node import Node
+from LYCET_package.DualNumber import DualNumber
+from LYCET_package.Primitives import Primitive
+from LYCET_package.Profiler import profiling, Profile, GraphStats
+
+def f_reverse(x1, x2):
+    return rmo.sin(x1)*x2 + x1*x1
+
+def test_reverse_mode_profile():
+    with profiling() as profile:
+        value, J = rm.ReverseMode(f_reverse, [1.0, 2.0])
+    assert isinstance(profile, Profile)
+    assert value == pytest.approx(2*np.sin(1.0) + 1.0)
+    assert profile.ops['node.sin'].count == 1
+    assert profile.ops['node.__mul__'].count == 2
+    assert profile.ops['node.__add__'].count == 1
+    assert profile.nodes_created == 6
+    graph, = profile.graphs
+    assert (graph.nodes, graph.edges, graph.depth, graph.max_fan_out) == (6, 7, 3, 3)
+    assert profile.backward_seconds > 0 and profile.forward_seconds > 0
+    assert profile.forward_seconds + profile.backward_seconds == pytest.approx(profile.total_seconds())
+    assert profile.top(1)[0][1].seconds == max(stats.seconds for stats in profile.ops.values())
+    assert 'node.sin' in profile.summary()
+
+def test_forward_mode_profile():
+    with profiling() as profile:
+        fm.ForwardMode(lambda x: fmo.exp(x[0])*x[1], [1.0, 2.0], gradient=True)
+    assert profile.ops['dual.exp'].count > 0
+    assert profile.ops['dual.__mul__'].count > 0
+    assert profile.graphs == [] and profile.backward_seconds == 0
+
+def test_methods_are_swapped_only_inside_the_block():
+    def methods():
+        return [Node.__add__, Node.__init__, Node.get_adjoints, DualNumber.__mul__, Primitive._node, Primitive._dual]
+    before = methods()
+    with pytest.raises(ZeroDivisionError):
+        with profiling() as profile:
+            assert all(inside is not plain for inside, plain in zip(methods(), before))
+            1/0
+    assert methods() == before
+    Node(1.0)*Node(2.0)
+    assert profile.nodes_created == 0 and profile.ops == {}
+    with profiling():
+        with pytest.raises(RuntimeError):
+            with profiling():
+                pass
+    assert methods() == before
+
+def test_other_threads_are_not_recorded():
+    with profiling() as profile:
+        with ThreadPoolExecutor(1) as pool:
+            pool.submit(rm.ReverseMode, f_reverse, [1.0, 2.0]).result()
+    assert profile.ops == {} and profile.nodes_created == 0 and profile.graphs == []
+
+def test_reflected_operators_count_once():
+    with profiling() as profile:
+        1.0 + Node(2.0)
+        2.0*Node(2.0)
+        1.0 + DualNumber(2.0)
+        2.0*DualNumber(2.0)
+    assert sorted(profile.ops) == ['dual.__radd__', 'dual.__rmul__', 'node.__radd__', 'node.__rmul__']
+    assert all(stats.count == 1 for stats in profile.ops.values())
+
+def test_graph_stats_of_deep_graph():
+    x = Node(0.5)
+    y = x
+    for _ in range(3000):
+        y = rmo.sin(y) + y
+    graph = GraphStats.of(y)
+    assert (graph.nodes, graph.depth, graph.max_fan_out) == (6001, 6000, 2)
+
+def test_chrome_trace(tmp_path):
+    with profiling(events=True) as profile:
+        rm.ReverseMode(f_reverse, [1.0, 2.0])
+    path = tmp_path/'trace.json'
+    profile.to_chrome_trace(str(path))
+    events = json.loads(path.read_text())['traceEvents']
+    names = [event['name'] for event in events]
+    assert names[0] == 'profiling' and 'get_adjoints' in names and 'node.sin' in names
+    assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in events)
+    backward = events[names.index('get_adjoints')]
+    assert backward['args']['nodes'] == 6
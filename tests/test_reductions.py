@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+#File: test_reductions.py
+#Description: test the fused n-ary reduction primitives in forward mode, reverse mode, tapes and generated code
+
+import pytest
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.ForwardMode as fm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+import LYCET_package.LYCET_Operations_Forward as fmo
+from LYCET_package.Node import Node
+from LYCET_package.DualNumber import DualNumber
+from LYCET_package.Tape import trace
+from LYCET_package.Compiler import compile_function
+from LYCET_package.Export import export_source
+
+def f_reverse(x1, x2, x3):
+    return (rmo.logsumexp([x1, x2, x3]) + rmo.norm([x1, x2]) * rmo.prod([x1, x2, x3])
+            + rmo.dot([x1, x2], [x3, x3]) - rmo.mean([x1, x3]) + rmo.mse([x1, x2], [x3, 1.0])
+            + rmo.least_squares([x2, x3], [0.5, x1]) + rmo.softplus(x3) + rmo.sum([x1, 2.0]))
+
+def f_forward(x):
+    x1, x2, x3 = x
+    return (fmo.logsumexp([x1, x2, x3]) + fmo.norm([x1, x2]) * fmo.prod([x1, x2, x3])
+            + fmo.dot([x1, x2], [x3, x3]) - fmo.mean([x1, x3]) + fmo.mse([x1, x2], [x3, 1.0])
+            + fmo.least_squares([x2, x3], [0.5, x1]) + fmo.softplus(x3) + fmo.sum([x1, 2.0]))
+
+points = [[0.5, 1.5, 2.0], [1.0, -0.3, 0.7], [-2.0, 0.1, 3.0]]
+
+def f_numpy(x):
+    x1, x2, x3 = x
+    return (np.log(np.exp(x).sum()) + np.hypot(x1, x2)*x1*x2*x3 + (x1 + x2)*x3 - (x1 + x3)/2
+            + ((x1 - x3)**2 + (x2 - 1)**2)/2 + ((x2 - 0.5)**2 + (x3 - x1)**2)/2 + np.log1p(np.exp(x3)) + x1 + 2)
+
+def numerical_gradient(x, h=1e-6):
+    x = np.array(x)
+    return np.array([(f_numpy(x + h*e) - f_numpy(x - h*e))/(2*h) for e in np.eye(len(x))])
+
+def test_long_sum_is_one_node():
+    xs = [Node(float(i)) for i in range(10**4)]
+    f = rmo.sum(xs)
+    assert f.value == sum(range(10**4))
+    assert len(f.deriv) == 10**4
+    assert all(not child.deriv for child, _ in f.deriv)
+    value, grad = rm.ReverseMode(lambda *x: rmo.sum(x), list(range(10**4)))
+    assert value == sum(range(10**4))
+    assert np.all(np.array(grad) == 1.0)
+
+def test_reverse_matches_forward_and_finite_differences():
+    for x in points:
+        value, grad = rm.ReverseMode(f_reverse, x)
+        J = fm.ForwardMode(f_forward, x, jacobian=True)
+        assert np.isclose(value, f_numpy(x))
+        assert np.allclose(J, grad)
+        assert np.allclose(grad, numerical_gradient(x), rtol=1e-6, atol=1e-6)
+
+def test_prod_with_zero():
+    f = rmo.prod([Node(2.0), Node(0.0), Node(5.0)])
+    assert f.value == 0.0
+    assert [partial for _, partial in f.deriv] == [0.0, 10.0, 0.0]
+    f = fmo.prod([DualNumber(0.0), DualNumber(0.0, 0), 3.0])
+    assert f.real == 0.0 and f.dual == 0.0
+
+def test_logsumexp_large_values():
+    f = rmo.logsumexp([Node(1000.0), Node(1000.0)])
+    assert np.isclose(f.value, 1000.0 + np.log(2))
+    assert [partial for _, partial in f.deriv] == [0.5, 0.5]
+    f = fmo.logsumexp([DualNumber(-1000.0), DualNumber(-1000.0, 0)])
+    assert np.isclose(f.real, -1000.0 + np.log(2)) and np.isclose(f.dual, 0.5)
+
+def test_norm_at_origin():
+    f = rmo.norm([Node(0.0), Node(0.0)])
+    assert f.value == 0.0
+    assert [partial for _, partial in f.deriv] == [0.0, 0.0]
+    # the tape, the compiled and the exported code use the same subgradient
+    g = lambda x1, x2: rmo.norm([x1, x2])
+    _, grads = trace(g, [1.0, 2.0]).replay(np.array([[0.0, 3.0], [0.0, 4.0]]))
+    assert np.array_equal(grads, [[0.0, 0.6], [0.0, 0.8]])
+    for backend in ('numpy', 'math'):
+        value, grad = compile_function(g, [1.0, 2.0], backend=backend)([0.0, 0.0])
+        assert value == 0.0 and list(grad) == [0.0, 0.0]
+        assert np.allclose(compile_function(g, [1.0, 2.0], backend=backend)([3.0, 4.0])[1], [0.6, 0.8])
+    namespace = {}
+    exec(compile(export_source(g, [1.0, 2.0]), 'exported', 'exec'), namespace)
+    assert list(namespace['grad']([0.0, 0.0])) == [0.0, 0.0]
+
+def test_softplus_large_values():
+    assert rmo.softplus(800.0).value == 800.0
+    assert fmo.softplus(DualNumber(-800.0)).dual == 0.0
+
+def test_inputs_are_checked():
+    with pytest.raises(AssertionError):
+        rmo.sum([])
+    with pytest.raises(AssertionError):
+        rmo.dot([Node(1.0)], [Node(1.0), Node(2.0)])
+    with pytest.raises(AssertionError):
+        fmo.mse([DualNumber(1.0)], ['a'])
+
+def test_tape_and_compiled_code():
+    tape = trace(f_reverse, points[0])
+    assert {'logsumexp', 'norm', 'prod', 'dot', 'mean', 'mse', 'least_squares', 'softplus', 'sum'} <= {ins.op for ins in tape.instructions}
+    batch = np.array(points).T
+    values, grads = tape.replay(batch)
+    for backend in ('numpy', 'math'):
+        g = compile_function(f_reverse, points[0], backend=backend)
+        for k, x in enumerate(points):
+            value, grad = rm.ReverseMode(f_reverse, x)
+            assert np.isclose(values[k], value) and np.allclose(grads[:, k], grad)
+            c_value, c_grad = g(x)
+            assert np.isclose(c_value, value) and np.allclose(c_grad, grad)
+
+def test_export_reductions():
+    source = export_source(f_reverse, points[0])
+    namespace = {}
+    exec(compile(source, 'exported', 'exec'), namespace)
+    for x in points:
+        value, grad = rm.ReverseMode(f_reverse, x)
+        assert np.isclose(namespace['value'](x), value)
+        assert np.allclose(namespace['grad'](x), grad)
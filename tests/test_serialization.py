@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+#File: test_serialization.py
+#Description: test pickling deep Node graphs as flat arrays and sharing them with other processes
+
+import os
+import sys
+import copy
+import pickle
+import subprocess
+import multiprocessing
+from multiprocessing import shared_memory
+import pytest
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+from LYCET_package.Node import Node
+from LYCET_package.Serialization import FlatGraph, SharedGraph
+
+DEPTH = 20000
+
+
+def deep(x1, x2):
+    # a long chain reusing both inputs, deeper than the recursion limit
+    y = x1
+    for _ in range(DEPTH):
+        y = rmo.sin(y)*0.5 + x2
+    return rmo.log(y*y, 2)
+
+
+def small(x1, x2):
+    shared = rmo.exp(x1*x2)
+    return shared*shared + rmo.log(x1, 10) - x2**3
+
+
+def graph(f, x):
+    nodes = [Node(xi) for xi in x]
+    return nodes, f(*nodes)
+
+
+def test_pickle_deep_node():
+    _, output = graph(deep, [0.3, 0.2])
+    loaded = pickle.loads(pickle.dumps(output))
+    assert loaded.value == output.value and loaded.op == 'log' and loaded.params == output.params
+    assert len(loaded.topological_order()) == len(output.topological_order())
+    # the default copy stays shallow
+    assert copy.copy(output).deriv is output.deriv
+
+
+def test_flat_graph_round_trip():
+    nodes, output = graph(small, [0.7, 1.3])
+    flat = pickle.loads(pickle.dumps(FlatGraph.from_nodes(output, inputs=nodes)))
+    assert len(flat) == len(output.topological_order())
+    assert flat.params and set(flat.op_names) == {'mul', 'exp', 'log', 'add', 'sub', 'pow'}
+    (rebuilt,), inputs = flat.to_nodes()
+    adjoints = rebuilt.get_adjoints()
+    expected_value, expected_gradient = rm.ReverseMode(small, [0.7, 1.3])
+    assert rebuilt.value == expected_value
+    assert np.allclose([adjoints[node] for node in inputs], expected_gradient)
+    assert np.allclose(flat.gradient(), expected_gradient)
+
+
+def test_flat_graph_to_tape():
+    nodes, output = graph(small, [0.7, 1.3])
+    tape = FlatGraph.from_nodes(output, inputs=nodes).to_tape()
+    value, gradient = tape.replay([1.1, 0.4])
+    expected_value, expected_gradient = rm.ReverseMode(small, [1.1, 0.4])
+    assert np.isclose(value, expected_value) and np.allclose(gradient, expected_gradient)
+
+
+def test_several_outputs():
+    nodes, first = graph(small, [0.7, 1.3])
+    second = nodes[0]*nodes[1]
+    flat = FlatGraph.from_nodes([first, second], inputs=nodes)
+    assert np.allclose(flat.gradient(1), [1.3, 0.7])
+    assert flat.to_tape().scalar_output is False
+
+
+def _backward(args):
+    shared, output = args
+    flat = shared.graph
+    try:
+        return flat.gradient(output), float(flat.values[flat.roots[output]])
+    finally:
+        shared.close()
+
+
+def test_shared_memory_workers():
+    nodes, output = graph(deep, [0.3, 0.2])
+    flat = FlatGraph.from_nodes([output, nodes[0]*output], inputs=nodes)
+    expected = [flat.gradient(0), flat.gradient(1)]
+    with flat.share() as shared:
+        assert isinstance(shared, SharedGraph)
+        assert np.array_equal(shared.graph.children, flat.children)
+        # the handle does not carry the arrays
+        assert len(pickle.dumps(shared)) < 2000 < flat.nbytes
+        with multiprocessing.get_context('spawn').Pool(2) as pool:
+            results = pool.map(_backward, [(shared, 0), (shared, 1)])
+        name = shared.name
+    for (gradient, value), expected_gradient, k in zip(results, expected, [0, 1]):
+        assert np.allclose(gradient, expected_gradient)
+        assert value == flat.values[flat.roots[k]]
+    # the owner destroyed the block
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+
+SHARING_SCRIPT = """
+import sys, pickle, subprocess, multiprocessing
+import LYCET_package.LYCET_Operations_Reverse as rmo
+from LYCET_package.Node import Node
+from LYCET_package.Serialization import FlatGraph
+
+def value(shared):
+    return float(shared.graph.values[-1])
+
+if __name__ == '__main__':
+    x = [Node(1.0), Node(2.0)]
+    flat = FlatGraph.from_nodes([rmo.exp(x[0]*x[1])], inputs=x)
+    with flat.share() as shared:
+        with multiprocessing.get_context(sys.argv[1]).Pool(2) as pool:
+            print(pool.map(value, [shared]*4))
+        # an unrelated process attaching the block must leave it to the owner
+        subprocess.run([sys.executable, '-c', 'import sys, pickle; pickle.loads(sys.stdin.buffer.read())'],
+                       input=pickle.dumps(shared), check=True)
+        print(value(shared))
+"""
+
+
+@pytest.mark.parametrize('method', ['fork', 'spawn'])
+def test_shared_memory_resource_tracker(tmp_path, method):
+    # workers share the resource tracker of the owner: the owner's unlink must not find the block gone
+    path = tmp_path/'sharing.py'
+    path.write_text(SHARING_SCRIPT)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    result = subprocess.run([sys.executable, str(path), method], capture_output=True, text=True, env=env, check=True)
+    assert result.stdout.count(repr(float(np.exp(2.0)))) == 5
+    assert result.stderr == ''
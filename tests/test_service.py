@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+#File: test_service.py
+#Description: test the asyncio gradient service, its micro-batching and histograms over TCP and a Unix socket
+
+import json
+import asyncio
+import pytest
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+import LYCET_package.LYCET_Operations_Forward as fmo
+from LYCET_package.Service import GradientService, GradientClient, Histogram
+
+
+def rosenbrock(x1, x2):
+    return (1 - x1)**2 + 100*(x2 - x1**2)**2
+
+
+def forward_f(x):
+    return fmo.sin(x[0])*fmo.exp(x[1])
+
+
+def points(n, seed=0):
+    return np.random.default_rng(seed).uniform(-1, 1, (n, 2))
+
+
+def check(results, f, xs):
+    for (value, gradient), x in zip(results, xs):
+        expected_value, expected_gradient = rm.ReverseMode(f, list(x))
+        assert np.isclose(value, expected_value)
+        assert np.allclose(gradient, expected_gradient)
+
+
+def test_histogram():
+    h = Histogram([1, 2, 4, 8])
+    assert h.quantile(0.5) is None
+    for size in [1, 3, 3, 8, 20]:
+        h.observe(size)
+    assert h.counts == [1, 0, 2, 1, 1]
+    assert h.count == 5 and h.mean() == 7
+    assert h.quantile(0.5) == 4
+    assert h.quantile(1.0) == float('inf')
+    assert h.to_dict()['counts'] == h.counts
+
+
+def test_batching_in_process():
+    service = GradientService(max_batch=8, max_wait=0.05)
+    service.register('rosenbrock', rosenbrock, 2)
+    xs = points(20)
+
+    async def main():
+        try:
+            return await asyncio.gather(*[service.evaluate('rosenbrock', x) for x in xs])
+        finally:
+            await service.close()
+
+    results = asyncio.run(main())
+    check(results, rosenbrock, xs)
+    # 20 concurrent requests, coalesced into batches of at most 8
+    assert service.batch_size.count == 3
+    assert service.batch_size.counts[service.batch_size.bounds.index(8)] == 2
+    assert service.latency.count == 20 and service.requests == 20
+
+
+def test_max_wait_zero():
+    service = GradientService(max_batch=64, max_wait=0)
+    service.register('rosenbrock', rosenbrock, 2)
+
+    async def main():
+        try:
+            value, gradient = await service.evaluate('rosenbrock', [1.0, 1.0])
+            return value, gradient
+        finally:
+            await service.close()
+
+    value, gradient = asyncio.run(main())
+    assert value == 0 and np.allclose(gradient, 0)
+
+
+def test_forward_and_untraced():
+    service = GradientService(max_batch=4, max_wait=0.01)
+    service.register('forward', forward_f, 2, mode='forward')
+    # branches on its input, so it cannot be replayed from one trace
+    service.register('abs', lambda x1, x2: x1*x2 if x1.value > 0 else (-1)*x1*x2, 2, traced=False)
+    xs = points(6, seed=1)
+
+    async def main():
+        try:
+            forward = await asyncio.gather(*[service.evaluate('forward', x) for x in xs])
+            absolute = await asyncio.gather(*[service.evaluate('abs', x) for x in xs])
+            return forward, absolute
+        finally:
+            await service.close()
+
+    forward, absolute = asyncio.run(main())
+    check(forward, lambda x1, x2: rmo.sin(x1)*rmo.exp(x2), xs)
+    for (value, gradient), (x1, x2) in zip(absolute, xs):
+        sign = 1 if x1 > 0 else -1
+        assert np.isclose(value, sign*x1*x2)
+        assert np.allclose(gradient, [sign*x2, sign*x1])
+
+
+def test_errors():
+    service = GradientService()
+    service.register('rosenbrock', rosenbrock, 2)
+    with pytest.raises(ValueError):
+        service.register('f', rosenbrock, 2, mode='sideways')
+
+    async def main():
+        try:
+            with pytest.raises(KeyError):
+                await service.evaluate('missing', [1.0])
+            with pytest.raises(ValueError):
+                await service.evaluate('rosenbrock', [1.0, 2.0, 3.0])
+        finally:
+            await service.close()
+
+    asyncio.run(main())
+
+
+def log_f(x1, x2):
+    return rmo.log(x1, 2)*x2
+
+
+@pytest.mark.parametrize('traced', [True, False])
+def test_bad_point_fails_only_its_request(traced):
+    service = GradientService(max_batch=8, max_wait=0.05)
+    service.register('log', log_f, 2, traced=traced)
+    xs = [[1.0, 2.0], [-1.0, 2.0], [3.0, 0.5], [0.0, 1.0]]
+
+    async def main():
+        try:
+            return await asyncio.gather(*[service.evaluate('log', x) for x in xs], return_exceptions=True)
+        finally:
+            await service.close()
+
+    results = asyncio.run(main())
+    # the traced replay gives nan outside the domain of log, the service raises as ReverseMode does
+    assert isinstance(results[1], ValueError) and isinstance(results[3], ValueError)
+    check([results[0], results[2]], log_f, [xs[0], xs[2]])
+    assert service.errors == 2 and service.batch_size.count == 1
+
+
+def test_cancelled_request_keeps_client_listening():
+    service = GradientService(max_batch=8, max_wait=0.1)
+    service.register('rosenbrock', rosenbrock, 2)
+
+    async def main():
+        server = await service.serve(port=0)
+        client = await GradientClient.connect(port=server.sockets[0].getsockname()[1])
+        try:
+            task = asyncio.get_running_loop().create_task(client.evaluate('rosenbrock', [1.0, 2.0]))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            # its answer arrives after the cancellation, in the batch of this request
+            value, _ = await asyncio.wait_for(client.evaluate('rosenbrock', [1.0, 1.0]), 5)
+            assert not client._listener.done()
+        finally:
+            await client.close()
+            await service.close()
+        return value
+
+    assert asyncio.run(main()) == 0.0
+
+
+def test_tcp_loopback():
+    service = GradientService(max_batch=16, max_wait=0.05)
+    service.register('rosenbrock', rosenbrock, 2)
+    xs = points(32, seed=2)
+
+    async def main():
+        server = await service.serve(port=0)
+        port = server.sockets[0].getsockname()[1]
+        client = await GradientClient.connect(port=port)
+        try:
+            results = await asyncio.gather(*[client.evaluate('rosenbrock', x) for x in xs])
+            with pytest.raises(RuntimeError, match='KeyError'):
+                await client.evaluate('missing', [1.0, 2.0])
+            stats = await client.stats()
+        finally:
+            await client.close()
+            await service.close()
+        return results, stats
+
+    results, stats = asyncio.run(main())
+    check(results, rosenbrock, xs)
+    assert stats['requests'] == 32
+    assert stats['batch_size']['count'] < 32
+    assert stats['latency']['count'] == 32
+
+
+def test_unix_socket(tmp_path):
+    service = GradientService(max_batch=8, max_wait=0.05)
+    service.register('rosenbrock', rosenbrock, 2)
+    path = str(tmp_path / 'lycet.sock')
+    xs = points(10, seed=3)
+
+    async def main():
+        await service.serve(path=path)
+        clients = [await GradientClient.connect(path=path) for _ in range(2)]
+        try:
+            # requests of several connections share the batches
+            return await asyncio.gather(*[clients[k % 2].evaluate('rosenbrock', x) for k, x in enumerate(xs)])
+        finally:
+            for client in clients:
+                await client.close()
+            await service.close()
+
+    results = asyncio.run(main())
+    check(results, rosenbrock, xs)
+    assert service.batch_size.count < 10
+
+
+def test_malformed_lines():
+    service = GradientService(max_batch=8, max_wait=0.01)
+    service.register('rosenbrock', rosenbrock, 2)
+
+    async def main():
+        server = await service.serve(port=0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        client = await GradientClient.connect(port=port)
+        try:
+            # the service answers a line it cannot read with an error, and keeps serving
+            writer.write(b'not json\n{"id": 7, "function": "rosenbrock", "x": [1.0, 1.0]}\n')
+            await writer.drain()
+            replies = [json.loads(await asyncio.wait_for(reader.readline(), 5)) for _ in range(2)]
+            # an error reply without an id matches no request: the pending requests are not failed
+            client._writer.write(b'{broken\n')
+            value, _ = await asyncio.wait_for(client.evaluate('rosenbrock', [1.0, 1.0]), 5)
+        finally:
+            writer.close()
+            await client.close()
+            await service.close()
+        return replies, value
+
+    replies, value = asyncio.run(main())
+    assert replies[0]['id'] is None and replies[0]['error'].startswith('JSONDecodeError')
+    assert replies[1] == {'id': 7, 'value': 0.0, 'gradient': [0.0, 0.0]}
+    assert value == 0.0
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+#File: test_sketch.py
+#Description: test batched Jacobian-vector products on tapes and randomized Jacobian sketches
+
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+from LYCET_package.Tape import trace
+from LYCET_package.Sketch import LowRankJacobian, sketch_jacobian, range_finder
+
+rng = np.random.default_rng(7)
+A = rng.standard_normal((40, 4))
+B = rng.standard_normal((4, 30))
+
+def f_low_rank(*x):
+    # Jacobian A diag(1 - tanh^2) B of rank 4
+    z = [rmo.tanh(rmo.dot(list(B[i]), list(x))) for i in range(4)]
+    return [rmo.dot(list(A[j]), z) for j in range(40)]
+
+def f_small(x1, x2, x3):
+    return [x1*x2, rmo.sin(x3)*x1, rmo.exp(x2) + x3]
+
+def jacobian(f, x):
+    # ReverseMode differentiates scalar functions: one row per output
+    m = len(f(*x))
+    return np.array([rm.ReverseMode(lambda *z, k=k: f(*z)[k], x)[1] for k in range(m)], dtype=float)
+
+def test_jacobian_vector_products():
+    x = [0.5, -1.0, 2.0]
+    J = jacobian(f_small, x)
+    tape = trace(f_small, x)
+    V = np.arange(6.0).reshape(3, 2)
+    W = np.arange(6.0).reshape(3, 2) - 2
+    outputs, JV = tape.jacobian_vector_product(x, V)
+    assert np.allclose(outputs, [-0.5, np.sin(2.0)*0.5, np.exp(-1.0) + 2.0])
+    assert np.allclose(JV, J @ V)
+    assert np.allclose(tape.jacobian_vector_product(x, V[:, 0])[1], J @ V[:, 0])
+    assert np.allclose(tape.vector_jacobian_product(x, W)[1], J.T @ W)
+    assert np.allclose(tape.vector_jacobian_product(x, W[:, 1])[1], J.T @ W[:, 1])
+
+def test_exact_low_rank():
+    x = rng.uniform(-0.1, 0.1, 30)
+    J = jacobian(f_low_rank, x)
+    sketch = sketch_jacobian(f_low_rank, x, rank=6, seed=0)
+    assert isinstance(sketch, LowRankJacobian)
+    assert np.allclose(sketch.toarray(), J, atol=1e-10)
+    assert sketch.numerical_rank(1e-8) == 4
+    assert sketch.error_estimate < 1e-8
+    v, w = rng.standard_normal(30), rng.standard_normal(40)
+    assert np.allclose(sketch.matvec(v), J @ v)
+    assert np.allclose(sketch.rmatvec(w), J.T @ w)
+    assert np.allclose(sketch.S, np.linalg.svd(J, compute_uv=False)[:6], atol=1e-10)
+
+def test_error_estimate_bounds_error():
+    x = rng.uniform(-0.1, 0.1, 30)
+    J = jacobian(f_low_rank, x)
+    for rank in [1, 2, 3]:
+        sketch = sketch_jacobian(f_low_rank, x, rank=rank, oversampling=0, power_iterations=1, seed=rank)
+        assert sketch.S.shape == (rank,)
+        assert np.linalg.norm(J - sketch.toarray(), 2) <= sketch.error_estimate*(1 + 1e-8)
+    Q, error = range_finder(f_low_rank, x, 2, seed=0)
+    assert Q.shape == (40, 2) and np.allclose(Q.T @ Q, np.eye(2))
+    assert np.linalg.norm(J - Q @ (Q.T @ J), 2) <= error
+
+def test_sketch_counts_and_reproducibility():
+    x = rng.uniform(-0.1, 0.1, 30)
+    first = sketch_jacobian(f_low_rank, x, rank=3, oversampling=2, power_iterations=2, n_test=5, seed=3)
+    second = sketch_jacobian(f_low_rank, x, rank=3, oversampling=2, power_iterations=2, n_test=5, seed=3)
+    assert np.array_equal(first.toarray(), second.toarray())
+    assert first.n_jvp == 5 + 5 + 2*5
+    assert first.n_vjp == 2*5 + 5
+    assert 'rank=3' in repr(first)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+#File: test_sparse_tangent.py
+#Description: test forward mode with sparse tangents and sparse Jacobians
+
+import pytest
+import numpy as np
+import LYCET_package.ForwardMode as fm
+import LYCET_package.LYCET_Operations_Forward as fmo
+from LYCET_package.DualNumber import DualNumber
+from LYCET_package.SparseTangent import SparseTangent, sparse_jacobian
+from LYCET_package.SparseMatrix import SparseMatrix
+
+def f_vector(x):
+    return [fmo.logsumexp([x[0], x[1]]), fmo.prod([x[0], x[1], x[2]]), fmo.norm([x[1], 2.0]),
+            fmo.tan(x[2])*fmo.sigmoid(x[0]), fmo.log(x[1], 2)/x[0], 4.0, 2**fmo.softplus(x[2]),
+            fmo.mse([x[0], x[1]], [x[2], 1.0]) - x[1]**3]
+
+def chain(x):
+    n = len(x)
+    return [fmo.sin(x[max(i - 1, 0)]) - 2*x[i] + x[min(i + 1, n - 1)]**2 for i in range(n)]
+
+def test_sparse_tangent_arithmetic():
+    a, b = SparseTangent({0: 1.0, 2: 2.0}), SparseTangent({2: 1.0, 5: -1.0})
+    assert (a + b).entries == {0: 1.0, 2: 3.0, 5: -1.0}
+    assert (a - b).entries == {0: 1.0, 2: 1.0, 5: 1.0}
+    assert (a + 0).entries == a.entries and (0 - a).entries == {0: -1.0, 2: -2.0}
+    assert (np.float64(2.0)*a).entries == {0: 2.0, 2: 4.0} and (a/2).entries == {0: 0.5, 2: 1.0}
+    assert a.entries == {0: 1.0, 2: 2.0}
+    with pytest.raises(AssertionError):
+        a*b
+    with pytest.raises(AssertionError):
+        a + 1.0
+
+def test_sparse_jacobian_matches_dense():
+    x = [0.3, 0.5, 0.7]
+    J = fm.ForwardMode(f_vector, x, jacobian=True, sparse=True)
+    assert isinstance(J, SparseMatrix) and J.shape == (8, 3)
+    assert np.allclose(J.toarray(), fm.ForwardMode(f_vector, x, jacobian=True))
+    assert J.row(5)[0].size == 0
+
+def test_scalar_cases():
+    J = fm.ForwardMode(lambda x: fmo.exp(x[0])*x[2], [1.0, 2.0, 3.0], jacobian=True, sparse=True)
+    assert J.shape == (1, 3) and np.allclose(J.toarray(), [[3*np.e, 0, np.e]])
+    J = sparse_jacobian(lambda x: [x**2, fmo.cos(x)], 2.0)
+    assert np.allclose(J.toarray(), [[4.0], [-np.sin(2.0)]])
+    with pytest.raises(ValueError):
+        fm.ForwardMode(chain, [1.0, 2.0], sparse=True)
+
+def test_cost_follows_dependencies():
+    n = 2000
+    x = list(np.linspace(0.0, 1.0, n))
+    outputs = chain([DualNumber(xi, SparseTangent({i: 1.0})) for i, xi in enumerate(x)])
+    assert max(out.dual.nnz() for out in outputs) == 3
+    J = sparse_jacobian(chain, x)
+    assert J.nnz == 3*n - 2
+    dense = fm.ForwardMode(chain, x[:20], jacobian=True)
+    assert np.allclose(sparse_jacobian(chain, x[:20]).toarray(), dense)
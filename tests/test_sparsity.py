@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+#File: test_sparsity.py
+#Description: test the IndexSet tracer, the SparseMatrix class and Jacobian sparsity detection
+
+import pytest
+import numpy as np
+import LYCET_package.ReverseMode as rm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+import LYCET_package.LYCET_Operations_Forward as fmo
+import LYCET_package.Sparsity as Sparsity
+from LYCET_package.IndexSet import IndexSet
+from LYCET_package.SparseMatrix import SparseMatrix
+from LYCET_package.Sparsity import jacobian_sparsity, trace_sparsity
+
+def f_reverse(x1, x2, x3, x4):
+    return [x1*x2 + rmo.exp(x1), rmo.log(x3, 2)/x2, 4.0, rmo.logsumexp([x1, 1.0, x4]), rmo.sigmoid(x4)**2 - 3]
+
+def chain(x):
+    # locally coupled model: output i depends on x[i-1], x[i] and x[i+1]
+    n = len(x)
+    return [fmo.sin(x[max(i - 1, 0)]) - 2*x[i] + x[min(i + 1, n - 1)]**2 for i in range(n)]
+
+def test_index_set():
+    x = [IndexSet.input(i) for i in range(70)]
+    y = (x[3]*2.0 - x[69])/x[3] + 1
+    assert y.indices() == [3, 69]
+    assert (-y).indices() == [3, 69] and (2**y).indices() == [3, 69]
+    assert IndexSet.union([x[1], 5.0, x[0]]).indices() == [0, 1]
+    assert IndexSet().indices() == []
+    with pytest.raises(TypeError):
+        x[0] < x[1]
+    with pytest.raises(TypeError):
+        bool(x[0])
+
+def test_sparse_matrix():
+    A = SparseMatrix([1, 0, 1, 1], [2, 0, 0, 2], [3.0, 1.0, 2.0, 4.0], (2, 3))
+    assert A.nnz == 3
+    assert np.array_equal(A.toarray(), [[1, 0, 0], [2, 0, 7]])
+    assert np.array_equal(A @ np.array([1.0, 1.0, 1.0]), [1, 9])
+    assert np.array_equal(A @ np.eye(3), A.toarray())
+    assert np.array_equal(A.T.toarray(), A.toarray().T)
+    assert np.array_equal(A.indptr(), [0, 1, 3])
+    cols, data = A.row(1)
+    assert list(cols) == [0, 2] and list(data) == [2.0, 7.0]
+    assert SparseMatrix.from_dense(A.toarray()) == A
+    pattern = SparseMatrix([0, 0], [1, 1], [True, True], (1, 2))
+    assert pattern.nnz == 1 and pattern.data.dtype == bool
+
+def test_pattern_matches_dense_jacobian():
+    pattern = jacobian_sparsity(f_reverse, 4, cache=False)
+    assert pattern.shape == (5, 4)
+    x = [0.3, 1.2, 2.5, -0.7]
+    J = np.array([rm.ReverseMode(lambda *nodes, i=i: f_reverse(*nodes)[i], x)[1] for i in range(5)], dtype=float)
+    assert np.array_equal(pattern.toarray(), J != 0)
+
+def test_forward_mode_functions():
+    pattern = jacobian_sparsity(chain, 50, mode='forward', cache=False)
+    assert pattern.nnz == 3*50 - 2
+    dense = pattern.toarray()
+    assert all(dense[i, i] for i in range(50)) and not dense[0, 2] and dense[10, 9] and dense[10, 11]
+    outputs, scalar_output = trace_sparsity(lambda x: fmo.norm(x[:3]) + fmo.prod([x[4], 2.0]), 6, mode='forward')
+    assert scalar_output and outputs[0].indices() == [0, 1, 2, 4]
+
+def test_control_flow_is_refused():
+    with pytest.raises(TypeError):
+        jacobian_sparsity(lambda x1: x1 if x1 > 0 else -x1, 1, cache=False)
+    with pytest.raises(ValueError):
+        jacobian_sparsity(f_reverse, 4, mode='sideways', cache=False)
+
+calls = []
+
+def counted(*x):
+    calls.append(1)
+    return [x[0]*x[1], x[1]]
+
+def test_pattern_cache():
+    Sparsity.clear_cache()
+    f = counted
+    first = jacobian_sparsity(f, 2)
+    second = jacobian_sparsity(f, 2)
+    assert second is first and len(calls) == 1
+    jacobian_sparsity(f, 3)
+    assert len(calls) == 2
+    Sparsity.clear_cache()
+    jacobian_sparsity(f, 2)
+    assert len(calls) == 3
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+#File: test_threads.py
+#Description: stress test concurrent ReverseMode and ForwardMode evaluations in threads and asyncio tasks,
+#             each with its own trace context
+
+import asyncio
+import threading
+import pytest
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+import LYCET_package.ReverseMode as rm
+import LYCET_package.ForwardMode as fm
+import LYCET_package.LYCET_Operations_Reverse as rmo
+import LYCET_package.LYCET_Operations_Forward as fmo
+from LYCET_package.Node import Node
+from LYCET_package.Context import TraceContext, current_context, trace_context
+from LYCET_package.Precision import precision, get_policy
+from LYCET_package.CSE import hash_consing
+from LYCET_package.Profiler import profiling
+from LYCET_package.Memory import memory_limit, MemoryLimitError
+
+def f_reverse(x1, x2, x3):
+    return rmo.exp(x1*x2)*rmo.sin(x3) + rmo.exp(x1*x2)/x3
+
+def f_forward(x):
+    return fmo.exp(x[0]*x[1])*fmo.sin(x[2]) + fmo.exp(x[0]*x[1])/x[2]
+
+points = [np.random.default_rng(i).uniform(0.5, 1.5, 3) for i in range(40)]
+expected = [rm.ReverseMode(f_reverse, x) for x in points]
+
+def worker(k, barrier):
+    """
+    Evaluate every point with its own context: the policy and hash-consing depend on k.
+    """
+    barrier.wait()
+    policy = ['float64', 'float32', 'mixed'][k % 3]
+    results = []
+    with precision(policy), hash_consing() as stats:
+        for x in points:
+            value, J = rm.ReverseMode(f_reverse, list(x))
+            gradient = fm.ForwardMode(f_forward, list(x), gradient=True)
+            assert current_context().policy is (None if policy == 'float64' else get_policy(policy))
+            results.append((value, J, gradient))
+    return policy, stats.hits, results
+
+def test_concurrent_contexts():
+    n_threads = 8
+    barrier = threading.Barrier(n_threads)
+    with ThreadPoolExecutor(n_threads) as pool:
+        outcomes = list(pool.map(worker, range(n_threads), [barrier]*n_threads))
+    for policy, hits, results in outcomes:
+        # x1*x2 and exp(x1*x2) are found again in every evaluation, only in this thread's table
+        assert hits == 2*len(points)
+        for (value, J, gradient), (value64, J64) in zip(results, expected):
+            storage = np.float64 if policy == 'float64' else np.float32
+            assert type(value) in ((float, np.float64) if policy == 'float64' else (storage,))
+            assert np.allclose(J, J64, rtol=1e-5) and np.allclose(gradient, J64, rtol=1e-5)
+    assert current_context().policy is None and current_context().table is None
+
+def test_profiles_and_limits_are_per_thread():
+    started, done = threading.Event(), threading.Event()
+
+    def busy():
+        started.set()
+        while not done.is_set():
+            rm.ReverseMode(f_reverse, [1.0, 1.0, 1.0])
+
+    thread = threading.Thread(target=busy)
+    thread.start()
+    started.wait()
+    try:
+        with memory_limit(10**4):
+            with profiling() as profile:
+                rm.ReverseMode(f_reverse, [1.0, 2.0, 3.0])
+                with pytest.raises(MemoryLimitError):
+                    rm.ReverseMode(lambda x: rmo.sum([x*i for i in range(1000)]), 1.0)
+    finally:
+        done.set()
+        thread.join()
+    # one graph swept here, none of the other thread's
+    assert len(profile.graphs) == 1
+    assert profile.ops['node.exp'].count == 2
+
+def test_trace_context_run_and_isolation():
+    mixed = TraceContext().replace(policy=get_policy('mixed'))
+    with ThreadPoolExecutor(2) as pool:
+        value, J = pool.submit(mixed.run, rm.ReverseMode, f_reverse, [1.0, 2.0, 3.0]).result()
+    assert type(value) is np.float32 and type(J[0]) is np.float64
+    with precision('float32'):
+        with trace_context():
+            assert type(Node(1.0).value) is float
+        assert type(Node(1.0).value) is np.float32
+
+def test_asyncio_tasks_have_their_own_context():
+    async def evaluate(policy):
+        with precision(policy):
+            values = []
+            for x in points[:5]:
+                # let the other task run inside this block
+                await asyncio.sleep(0)
+                values.append(rm.ReverseMode(f_reverse, list(x))[0])
+            return values
+
+    async def main():
+        return await asyncio.gather(evaluate('float32'), evaluate('float64'))
+
+    values32, values64 = asyncio.run(main())
+    assert all(type(v) is np.float32 for v in values32)
+    assert all(type(v) in (float, np.float64) for v in values64)
+    assert np.allclose(values32, values64, rtol=1e-5)